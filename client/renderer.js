@@ -459,6 +459,19 @@ function handleWebSocketMessage(response) {
                 hideEmailDialog();
             }
             break;
+            
+        case 'busy':
+            // The server turned the request away; nothing was run
+            console.warn('Server busy:', response.reason);
+            showError(response.error);
+            updateStatus('Server busy, please try again');
+            updateOrbState(null);
+            break;
+            
+        case 'cancelled':
+            // The previous turn was abandoned because the user spoke again
+            console.log('Turn cancelled:', response.reason);
+            break;
     }
 }
 
@@ -558,7 +571,7 @@ async function connectTextWebSocket() {
 // Update WebSocket connection to only handle audio
 async function connectWebSockets() {
     // Connect to audio WebSocket
-    audioWs = new WebSocket('ws://localhost:8000/ws/audio');
+    audioWs = new WebSocket(`ws://localhost:8000/ws/audio?user_id=${encodeURIComponent(getUserId())}`);
     
     audioWs.onopen = () => {
         console.log('Audio WebSocket connection established');
@@ -610,6 +623,11 @@ async function startRecording() {
         connectWebSockets();
     }
 
+    // Speaking again interrupts the answer still being prepared or spoken
+    if (audioWs && audioWs.readyState === WebSocket.OPEN) {
+        audioWs.send(JSON.stringify({ type: 'cancel' }));
+    }
+
     try {
         // Clear previous responses and errors
         console.log('Clearing previous responses');
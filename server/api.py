@@ -4,6 +4,7 @@ from pathlib import Path
 import uuid
 from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from pydantic import BaseModel
 from typing import Optional, Dict, Any, List
 import speech_recognition as sr
@@ -11,6 +12,8 @@ import json
 import asyncio
 from google.cloud import speech
 import io
+import hashlib
+import time
 from datetime import datetime
 
 # Add the server directory to Python path
@@ -18,11 +21,27 @@ server_dir = Path(__file__).parent
 os.chdir(server_dir)  # Change to server directory
 sys.path.append(str(server_dir))
 
-from llm.llm_handler import process_with_llm
+from llm.llm_handler import process_with_llm, response_cache
+from llm.intent_router import router_stats
+from llm.prompt_builder import prompt_stats
+from llm.hedged_calls import hedge_stats
+from llm.model_router import model_router
+from llm.intent_classifier import cross_validate, load_examples, reload_classifier, train_from_log
+from monitoring.metrics import registry
+from monitoring.loop_lag import monitor_event_loop
+from monitoring.profiler import ProfilingMiddleware, profile_control, profile_trace
+from monitoring.tracing import set_command_type, span, start_trace
+from monitoring.turn_recorder import turn_recorder
+from pipeline.admission import (MAX_AUDIO_BYTES, MAX_AUDIO_SECONDS, RETRY_AFTER_SECONDS, Busy, TurnQueue,
+                                busy_response, rejected_total, stage_limiter)
+from pipeline.cancellation import (BARGE_IN, CancelToken, InFlightTurn, TurnCancelled, cancel_control,
+                                   set_cancel_token)
 from tools.command_executor import execute_command
 from tools.followup_handler import handle_followup
 from context.conversation_manager import ConversationManager
+from context.session_store import SessionStore
 from tools.email_handler import EmailHandler
+from tools.file_search import start_file_index, start_content_index, start_semantic_index, get_file_index_stats
 from voice.tts_speaker import speak_text
 
 app = FastAPI()
@@ -35,6 +54,8 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Profiles requests that ask for it with ?profile=1 or an X-Profile header
+app.add_middleware(ProfilingMiddleware)
 
 # Initialize services
 recognizer = sr.Recognizer()
@@ -68,8 +89,27 @@ class CommandResponse(BaseModel):
     followup_context: Optional[Dict[str, Any]] = None
     response: Optional[str] = None
 
-# Store active user sessions
-active_sessions = {}
+# Commands waiting for a REST follow-up, per user; they expire if never answered
+active_sessions = SessionStore("followup")
+
+@app.on_event("startup")
+async def start_background_indexes():
+    """Start the file indexes so file searches don't walk the disk"""
+    start_file_index()
+    start_content_index()
+    start_semantic_index()
+
+@app.on_event("startup")
+async def start_event_loop_monitor():
+    """Report event loop lag on /metrics"""
+    asyncio.create_task(monitor_event_loop())
+
+def _recognize(config, audio):
+    """Transcribe an utterance, returning an empty string when there was no speech"""
+    response = client.recognize(config=config, audio=audio)
+    if response.results:
+        return response.results[0].alternatives[0].transcript
+    return ""
 
 @app.websocket("/ws/audio")
 async def websocket_endpoint(websocket: WebSocket):
@@ -77,116 +117,265 @@ async def websocket_endpoint(websocket: WebSocket):
     await websocket.accept()
     client_id = str(uuid.uuid4())
     active_connections[client_id] = websocket
+    # Clients name their user so history and cached answers outlive the connection
+    user_id = websocket.query_params.get("user_id") or client_id
     print(f"WebSocket connection accepted for client {client_id}")
+    # Set by a {"type": "profile"} message to profile the next turn
+    profile_mode = None
+    # This loop only reads; a worker handles the queued utterances in order,
+    # so a client talking faster than it is answered gets a busy response
+    turns = TurnQueue("audio")
+    # The turn being answered, which new audio or a cancel message abandons
+    in_flight = InFlightTurn()
+    worker = asyncio.create_task(_audio_worker(websocket, user_id, turns, in_flight))
     
     try:
         while True:
-            try:
-                # Receive complete audio data
-                print("Waiting for audio data...")
-                audio_data = await websocket.receive_bytes()
-                print(f"Received complete audio data: {len(audio_data)} bytes")
-                
-                if len(audio_data) == 0:
-                    print("Received empty audio data")
-                    await websocket.send_json({
-                        "type": "error",
-                        "error": "No audio data received"
-                    })
+            # Receive complete audio data, or a control message
+            print("Waiting for audio data...")
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+            if message.get("text") is not None:
+                if cancel_control(message["text"]):
+                    print(f"Client {client_id} cancelled its turn")
+                    turns.close()
+                    in_flight.cancel("cancel")
                     continue
-                
-                # The audio data is already in LINEAR16 format (16-bit PCM)
-                audio = speech.RecognitionAudio(content=audio_data)
-                config = speech.RecognitionConfig(
-                    encoding=speech.RecognitionConfig.AudioEncoding.LINEAR16,
-                    sample_rate_hertz=44100,
-                    language_code="en-US",
-                    enable_automatic_punctuation=True,
-                    model="default",
-                    use_enhanced=True,
-                    audio_channel_count=1,
-                )
-                
-                try:
-                    # Perform the transcription
-                    print("Sending audio to Google Speech-to-Text...")
-                    response = client.recognize(config=config, audio=audio)
-                    print("Received response from Google Speech-to-Text")
-                    
-                    if response.results:
-                        transcript = response.results[0].alternatives[0].transcript
-                        print(f"Transcription: {transcript}")
-                        
-                        # Immediately send the transcription
-                        transcription_response = {
-                            "type": "transcription",
-                            "transcription": transcript
-                        }
-                        print(f"Sending transcription response: {transcription_response}")
-                        await websocket.send_json(transcription_response)
-                        
-                        # Process the transcribed text with LLM
-                        print("Processing with LLM...")
-                        command_data = process_with_llm(transcript, client_id)
-                        
-                        if command_data:
-                            print("Command processed successfully")
-                            # Execute the command and get the formatted response
-                            formatted_response = execute_command(command_data)
-                            
-                            # Update command_data with the formatted response
-                            command_data["response"] = formatted_response
-                            
-                            # Send the JARVIS response
-                            jarvis_response = {
-                                "type": "jarvis",
-                                "command_data": command_data,
-                                "response": formatted_response  # Add response at the top level as well
-                            }
-                            print(f"Sending JARVIS response to client: {jarvis_response}")
-                            await websocket.send_json(jarvis_response)
-                        else:
-                            print("Failed to process command")
-                            error_response = {
-                                "type": "jarvis",
-                                "error": "Could not process command"
-                            }
-                            print(f"Sending error response: {error_response}")
-                            await websocket.send_json(error_response)
-                    else:
-                        print("No speech detected in audio")
-                        await websocket.send_json({
-                            "type": "transcription",
-                            "transcription": "",
-                            "error": "No speech detected"
-                        })
-                        
-                except Exception as e:
-                    print(f"Error processing audio: {str(e)}")
-                    await websocket.send_json({
-                        "type": "error",
-                        "error": f"Error processing audio: {str(e)}"
-                    })
-                    
-            except WebSocketDisconnect:
-                print(f"WebSocket disconnected for client {client_id}")
-                break
-            except Exception as e:
-                print(f"Error in WebSocket connection: {str(e)}")
+                profile_mode = profile_control(message["text"])
+                if profile_mode:
+                    await websocket.send_json({"type": "profile", "status": "armed", "mode": profile_mode})
+                continue
+            audio_data = message.get("bytes") or b""
+            
+            if len(audio_data) > MAX_AUDIO_BYTES:
+                print(f"Rejected {len(audio_data)} bytes of audio, over the {MAX_AUDIO_BYTES} byte limit")
+                rejected_total.inc(reason="too_large")
                 await websocket.send_json({
                     "type": "error",
-                    "error": f"Server error: {str(e)}"
+                    "error": f"Audio is too long. Please keep requests under {MAX_AUDIO_SECONDS:.0f} seconds.",
+                    "reason": "too_large"
                 })
+                continue
+            if BARGE_IN and audio_data:
+                # The user spoke over the answer; the new utterance replaces every older one
+                turns.close()
+                if in_flight.cancel("barge_in"):
+                    print(f"Client {client_id} interrupted its turn")
+            if not turns.offer((audio_data, profile_mode)):
+                print(f"Turn queue full for client {client_id}")
+                await websocket.send_json(busy_response("queue_full"))
+                continue
+            profile_mode = None
                 
     except WebSocketDisconnect:
         print(f"WebSocket disconnected for client {client_id}")
     except Exception as e:
         print(f"Error in WebSocket connection: {str(e)}")
     finally:
+        in_flight.cancel("disconnect")
+        worker.cancel()
+        turns.close()
         if client_id in active_connections:
             del active_connections[client_id]
             print(f"Cleaned up connection for client {client_id}")
 
+async def _audio_worker(websocket, user_id, turns, in_flight):
+    """Handle one connection's queued utterances in order, each as a cancellable task"""
+    while True:
+        received, (audio_data, profile_mode) = await turns.get()
+        token = CancelToken()
+        task = asyncio.create_task(
+            _handle_audio_turn(websocket, user_id, audio_data, profile_mode, received, token)
+        )
+        in_flight.start(token, task)
+        try:
+            # Waiting rather than awaiting, so cancelling the turn doesn't cancel the worker
+            await asyncio.wait({task})
+        finally:
+            in_flight.finish()
+        try:
+            if task.cancelled() or token.cancelled:
+                if token.reason != "disconnect":
+                    await websocket.send_json({
+                        "type": "cancelled",
+                        "reason": token.reason,
+                        "trace_id": token.trace_id
+                    })
+                continue
+            task.result()
+        except WebSocketDisconnect:
+            return
+        except Exception as e:
+            print(f"Error in WebSocket connection: {str(e)}")
+            try:
+                await websocket.send_json({
+                    "type": "error",
+                    "error": f"Server error: {str(e)}"
+                })
+            except Exception:
+                return
+
+async def _handle_audio_turn(websocket, user_id, audio_data, profile_mode, received, token):
+    """
+    Transcribe an utterance, run the command and send the responses
+    
+    The blocking calls run in threads, each within its stage's concurrency
+    limit, so one slow turn doesn't stall the other connections.
+    
+    Args:
+        websocket (WebSocket): The client's connection
+        user_id (str): The user named by the client, or else the connection's ID
+        audio_data (bytes): LINEAR16 audio of the utterance
+        profile_mode (str): Profiler mode if the client asked for a profile
+        received (float): perf_counter time the audio arrived
+        token (CancelToken): Cancelled when the user abandons the turn
+    """
+    # The threads doing this turn's work see the token and stop when it is cancelled
+    set_cancel_token(token)
+    # Each turn is traced from the moment its audio has arrived
+    trace = start_trace("audio", started=received)
+    token.trace_id = trace.trace_id
+    trace.add_span("queue", time.perf_counter() - received)
+    turn_recorder.start(trace, audio=audio_data)
+    if profile_mode:
+        profile_trace(trace, profile_mode)
+    print(f"Received complete audio data: {len(audio_data)} bytes (turn {trace.trace_id})")
+    
+    if len(audio_data) == 0:
+        print("Received empty audio data")
+        await websocket.send_json({
+            "type": "error",
+            "error": "No audio data received",
+            "trace_id": trace.trace_id
+        })
+        trace.finish("empty")
+        return
+    
+    with span("receive"):
+        # The audio data is already in LINEAR16 format (16-bit PCM)
+        audio = speech.RecognitionAudio(content=audio_data)
+        config = speech.RecognitionConfig(
+            encoding=speech.RecognitionConfig.AudioEncoding.LINEAR16,
+            sample_rate_hertz=44100,
+            language_code="en-US",
+            enable_automatic_punctuation=True,
+            model="default",
+            use_enhanced=True,
+            audio_channel_count=1,
+        )
+    
+    try:
+        # Perform the transcription
+        print("Sending audio to Google Speech-to-Text...")
+        async with stage_limiter.slot("stt"):
+            with span("stt"):
+                transcript = await asyncio.to_thread(
+                    turn_recorder.call,
+                    "stt",
+                    {"audio": hashlib.sha1(audio_data).hexdigest()},
+                    lambda: _recognize(config, audio),
+                )
+        print("Received response from Google Speech-to-Text")
+        
+        if transcript:
+            print(f"Transcription: {transcript}")
+            
+            # Immediately send the transcription
+            transcription_response = {
+                "type": "transcription",
+                "transcription": transcript,
+                "trace_id": trace.trace_id
+            }
+            print(f"Sending transcription response: {transcription_response}")
+            with span("send"):
+                await websocket.send_json(transcription_response)
+            
+            # Process the transcribed text with LLM
+            print("Processing with LLM...")
+            async with stage_limiter.slot("llm"):
+                command_data = await asyncio.to_thread(process_with_llm, transcript, user_id)
+            set_command_type(command_data)
+            
+            if command_data:
+                print("Command processed successfully")
+                # Execute the command and get the formatted response
+                formatted_response = await asyncio.to_thread(execute_command, command_data, False)
+                # The action has happened, so the reply goes out even if it can't be spoken
+                await _speak_reply(formatted_response)
+                
+                # Update command_data with the formatted response
+                command_data["response"] = formatted_response
+                turn_recorder.record_output(formatted_response)
+                
+                # Send the JARVIS response
+                jarvis_response = {
+                    "type": "jarvis",
+                    "command_data": command_data,
+                    "response": formatted_response,  # Add response at the top level as well
+                    "trace_id": trace.trace_id
+                }
+                print(f"Sending JARVIS response to client: {jarvis_response}")
+                with span("send"):
+                    await websocket.send_json(jarvis_response)
+                trace.finish("ok")
+            else:
+                print("Failed to process command")
+                error_response = {
+                    "type": "jarvis",
+                    "error": "Could not process command",
+                    "trace_id": trace.trace_id
+                }
+                print(f"Sending error response: {error_response}")
+                with span("send"):
+                    await websocket.send_json(error_response)
+                trace.finish("unprocessed")
+        else:
+            print("No speech detected in audio")
+            with span("send"):
+                await websocket.send_json({
+                    "type": "transcription",
+                    "transcription": "",
+                    "error": "No speech detected",
+                    "trace_id": trace.trace_id
+                })
+            trace.finish("no_speech")
+    
+    except Busy as e:
+        print(f"Turned away turn {trace.trace_id}: {e.reason} is at its limit")
+        trace.finish("busy")
+        await websocket.send_json(busy_response(e.reason, trace.trace_id))
+    except (WebSocketDisconnect, asyncio.CancelledError, TurnCancelled):
+        if token.cancelled and token.reason != "disconnect":
+            # The user spoke again or cancelled
+            trace.finish("cancelled")
+        else:
+            # The client left mid-turn
+            trace.finish("disconnected")
+        raise
+    except Exception as e:
+        print(f"Error processing audio: {str(e)}")
+        trace.finish("error")
+        await websocket.send_json({
+            "type": "error",
+            "error": f"Error processing audio: {str(e)}",
+            "trace_id": trace.trace_id
+        })
+
+async def _speak_reply(text):
+    """
+    Speak a reply in a text-to-speech slot, off the event loop
+    
+    The action behind the reply has already happened, so a busy speech stage
+    only skips the speaking; the reply still goes out as text.
+    """
+    try:
+        async with stage_limiter.slot("tts"):
+            with span("tts"):
+                await asyncio.to_thread(speak_text, text)
+    except Busy:
+        print("Reply not spoken: text-to-speech is busy")
+
 @app.websocket("/ws/text")
 async def text_websocket_endpoint(websocket: WebSocket):
     """WebSocket endpoint for handling text-based follow-up responses."""
@@ -194,149 +383,177 @@ async def text_websocket_endpoint(websocket: WebSocket):
     print("New text WebSocket connection request")
     client_id = str(uuid.uuid4())
     print(f"Text WebSocket connection accepted for client {client_id}")
+    profile_mode = None
     
     try:
         while True:
             data = await websocket.receive_text()
             print(f"Received text data: {data}")
             
+            control = profile_control(data)
+            if control:
+                profile_mode = control
+                await websocket.send_json({"type": "profile", "status": "armed", "mode": profile_mode})
+                continue
+            
+            trace = start_trace("text")
+            if profile_mode:
+                profile_trace(trace, profile_mode)
+                profile_mode = None
+            outcome = "rejected"
             try:
-                message = json.loads(data)
-                if message.get("type") != "followup_response":
-                    await websocket.send_json({
-                        "type": "error",
-                        "error": "Invalid message type. Expected followup_response."
-                    })
-                    continue
-                
-                # Get context from the client message
-                current_context = message.get("context")
-                print(f"Received context from client: {current_context}")
-                
-                if not current_context:
-                    await websocket.send_json({
-                        "type": "error",
-                        "error": "No context provided. Please try the command again."
-                    })
-                    continue
-                
-                # Validate command type
-                if current_context.get("command_type") not in ["email_send", "email_draft"]:
-                    await websocket.send_json({
-                        "type": "error",
-                        "error": "Invalid command type for text follow-up."
-                    })
-                    continue
-                
-                # Process email address
-                email_address = message.get("response", "").strip()
-                if message.get("cancelled", False):
-                    print("Email cancelled by user")
-                    await websocket.send_json({
-                        "type": "jarvis",
-                        "response": "Email cancelled.",
-                        "command_data": current_context
-                    })
-                    continue
-                
-                print(f"Processing email address: {email_address}")
+                try:
+                    message = json.loads(data)
+                    if message.get("type") != "followup_response":
+                        await websocket.send_json({
+                            "type": "error",
+                            "error": "Invalid message type. Expected followup_response."
+                        })
+                        continue
+                    
+                    # Get context from the client message
+                    current_context = message.get("context")
+                    print(f"Received context from client: {current_context}")
+                    
+                    if not current_context:
+                        await websocket.send_json({
+                            "type": "error",
+                            "error": "No context provided. Please try the command again."
+                        })
+                        continue
+                    
+                    trace.command_type = current_context.get("command_type", "none")
+                    
+                    # Validate command type
+                    if current_context.get("command_type") not in ["email_send", "email_draft"]:
+                        await websocket.send_json({
+                            "type": "error",
+                            "error": "Invalid command type for text follow-up."
+                        })
+                        continue
+                    
+                    # Process email address
+                    email_address = message.get("response", "").strip()
+                    if message.get("cancelled", False):
+                        print("Email cancelled by user")
+                        outcome = "cancelled"
+                        await websocket.send_json({
+                            "type": "jarvis",
+                            "response": "Email cancelled.",
+                            "command_data": current_context
+                        })
+                        continue
+                    
+                    print(f"Processing email address: {email_address}")
+                    
+                    # Basic email validation
+                    if not email_address or "@" not in email_address:
+                        await websocket.send_json({
+                            "type": "error",
+                            "error": "Invalid email address format. Please provide a valid email address."
+                        })
+                        continue
+                    
+                    # Update the context with the email address
+                    current_context["parameters"]["to"] = email_address
+                    
+                    try:
+                        # Execute the email command using the global email_handler
+                        if current_context["command_type"] == "email_send":
+                            with span("tool"):
+                                result = await asyncio.to_thread(
+                                    email_handler.send_email,
+                                    to=email_address,
+                                    subject=current_context["parameters"]["subject"],
+                                    body=current_context["parameters"]["body"]
+                                )
+                            if result:
+                                print(f"Email sent successfully to {email_address}")
+                                response_text = f"I've sent your email to {email_address} with the subject '{current_context['parameters']['subject']}'. The email has been delivered successfully."
+                                # Speak the response
+                                await _speak_reply(response_text)
+                                outcome = "ok"
+                                await websocket.send_json({
+                                    "type": "jarvis",
+                                    "response": response_text,
+                                    "command_data": {
+                                        **current_context,
+                                        "response": response_text
+                                    }
+                                })
+                            else:
+                                print(f"Failed to send email to {email_address}")
+                                error_text = "I apologize, but I couldn't send the email. Please check your Gmail authentication and try again."
+                                # Speak the error
+                                await _speak_reply(error_text)
+                                outcome = "failed"
+                                await websocket.send_json({
+                                    "type": "error",
+                                    "error": error_text,
+                                    "command_data": {
+                                        **current_context,
+                                        "response": error_text
+                                    }
+                                })
+                        else:  # email_draft
+                            with span("tool"):
+                                result = await asyncio.to_thread(
+                                    email_handler.draft_email,
+                                    to=email_address,
+                                    subject=current_context["parameters"]["subject"],
+                                    body=current_context["parameters"]["body"]
+                                )
+                            if result:
+                                print(f"Email draft created successfully for {email_address}")
+                                response_text = f"I've created a draft email to {email_address} with the subject '{current_context['parameters']['subject']}'. You can find it in your Gmail drafts folder."
+                                # Speak the response
+                                await _speak_reply(response_text)
+                                outcome = "ok"
+                                await websocket.send_json({
+                                    "type": "jarvis",
+                                    "response": response_text,
+                                    "command_data": {
+                                        **current_context,
+                                        "response": response_text
+                                    }
+                                })
+                            else:
+                                print(f"Failed to create email draft for {email_address}")
+                                error_text = "I apologize, but I couldn't create the email draft. Please check your Gmail authentication and try again."
+                                # Speak the error
+                                await _speak_reply(error_text)
+                                outcome = "failed"
+                                await websocket.send_json({
+                                    "type": "error",
+                                    "error": error_text,
+                                    "command_data": {
+                                        **current_context,
+                                        "response": error_text
+                                    }
+                                })
+                    
+                    except Exception as e:
+                        print(f"Error executing email command: {str(e)}")
+                        outcome = "error"
+                        await websocket.send_json({
+                            "type": "error",
+                            "error": f"Error processing email: {str(e)}"
+                        })
                 
-                # Basic email validation
-                if not email_address or "@" not in email_address:
+                except json.JSONDecodeError:
                     await websocket.send_json({
                         "type": "error",
-                        "error": "Invalid email address format. Please provide a valid email address."
+                        "error": "Invalid JSON message format."
                     })
-                    continue
-                
-                # Update the context with the email address
-                current_context["parameters"]["to"] = email_address
-                
-                try:
-                    # Execute the email command using the global email_handler
-                    if current_context["command_type"] == "email_send":
-                        result = email_handler.send_email(
-                            to=email_address,
-                            subject=current_context["parameters"]["subject"],
-                            body=current_context["parameters"]["body"]
-                        )
-                        if result:
-                            print(f"Email sent successfully to {email_address}")
-                            response_text = f"I've sent your email to {email_address} with the subject '{current_context['parameters']['subject']}'. The email has been delivered successfully."
-                            # Speak the response
-                            speak_text(response_text)
-                            await websocket.send_json({
-                                "type": "jarvis",
-                                "response": response_text,
-                                "command_data": {
-                                    **current_context,
-                                    "response": response_text
-                                }
-                            })
-                        else:
-                            print(f"Failed to send email to {email_address}")
-                            error_text = "I apologize, but I couldn't send the email. Please check your Gmail authentication and try again."
-                            # Speak the error
-                            speak_text(error_text)
-                            await websocket.send_json({
-                                "type": "error",
-                                "error": error_text,
-                                "command_data": {
-                                    **current_context,
-                                    "response": error_text
-                                }
-                            })
-                    else:  # email_draft
-                        result = email_handler.draft_email(
-                            to=email_address,
-                            subject=current_context["parameters"]["subject"],
-                            body=current_context["parameters"]["body"]
-                        )
-                        if result:
-                            print(f"Email draft created successfully for {email_address}")
-                            response_text = f"I've created a draft email to {email_address} with the subject '{current_context['parameters']['subject']}'. You can find it in your Gmail drafts folder."
-                            # Speak the response
-                            speak_text(response_text)
-                            await websocket.send_json({
-                                "type": "jarvis",
-                                "response": response_text,
-                                "command_data": {
-                                    **current_context,
-                                    "response": response_text
-                                }
-                            })
-                        else:
-                            print(f"Failed to create email draft for {email_address}")
-                            error_text = "I apologize, but I couldn't create the email draft. Please check your Gmail authentication and try again."
-                            # Speak the error
-                            speak_text(error_text)
-                            await websocket.send_json({
-                                "type": "error",
-                                "error": error_text,
-                                "command_data": {
-                                    **current_context,
-                                    "response": error_text
-                                }
-                            })
-                
                 except Exception as e:
-                    print(f"Error executing email command: {str(e)}")
+                    print(f"Error processing message: {str(e)}")
+                    outcome = "error"
                     await websocket.send_json({
                         "type": "error",
-                        "error": f"Error processing email: {str(e)}"
+                        "error": f"Error processing message: {str(e)}"
                     })
-                
-            except json.JSONDecodeError:
-                await websocket.send_json({
-                    "type": "error",
-                    "error": "Invalid JSON message format."
-                })
-            except Exception as e:
-                print(f"Error processing message: {str(e)}")
-                await websocket.send_json({
-                    "type": "error",
-                    "error": f"Error processing message: {str(e)}"
-                })
+            finally:
+                trace.finish(outcome)
                 
     except WebSocketDisconnect:
         print(f"Text WebSocket disconnected for client {client_id}")
@@ -352,35 +569,64 @@ async def process_command(request: CommandRequest):
     if not request.user_id:
         request.user_id = str(uuid.uuid4())
     
-    # Process the command using existing LLM handler
-    command_data = process_with_llm(request.text, request.user_id)
-    if not command_data:
-        raise HTTPException(status_code=400, detail="Could not process command")
+    trace = start_trace("rest")
+    turn_recorder.start(trace, text=request.text, user_id=request.user_id)
     
-    # Execute the command
-    response = execute_command(command_data)
-    command_data["response"] = response
+    # Whatever happens, the trace is finished; an unfinished one would also keep its recording
+    outcome = "error"
+    try:
+        # Process the command using existing LLM handler
+        async with stage_limiter.slot("llm"):
+            command_data = await asyncio.to_thread(process_with_llm, request.text, request.user_id)
+        set_command_type(command_data)
+        if not command_data:
+            outcome = "unprocessed"
+            raise HTTPException(status_code=400, detail="Could not process command")
+        
+        # Execute the command
+        response = await asyncio.to_thread(execute_command, command_data, False)
+        # The action has happened, so the result is returned even if it can't be spoken
+        await _speak_reply(response)
+        command_data["response"] = response
+        turn_recorder.record_output(response)
+        outcome = "ok"
+    except Busy as e:
+        outcome = "busy"
+        raise HTTPException(status_code=503, detail=str(e),
+                            headers={"Retry-After": str(RETRY_AFTER_SECONDS)})
+    finally:
+        trace.finish(outcome)
     
     # Store session data if follow-up is required
     if command_data.get("requires_followup"):
-        active_sessions[request.user_id] = command_data
+        active_sessions.set(request.user_id, command_data)
     
     return command_data
 
 @app.post("/api/handle-followup", response_model=CommandResponse)
 async def handle_command_followup(request: CommandRequest):
-    if not request.user_id or request.user_id not in active_sessions:
+    # Taking the session in one step means a repeated request can't handle it twice
+    command_data = active_sessions.pop(request.user_id) if request.user_id else None
+    if not command_data:
         raise HTTPException(status_code=400, detail="No active session found")
     
-    command_data = active_sessions[request.user_id]
-    success = handle_followup(command_data, request.user_id, request.text)
+    try:
+        # Speaks the question and the result, so it holds a speech slot
+        async with stage_limiter.slot("tts"):
+            success = await asyncio.to_thread(handle_followup, command_data, request.user_id, request.text)
+    except Busy as e:
+        active_sessions.set(request.user_id, command_data)
+        raise HTTPException(status_code=503, detail=str(e),
+                            headers={"Retry-After": str(RETRY_AFTER_SECONDS)})
     
     if not success:
+        # Keep the session so the user can answer again
+        active_sessions.set(request.user_id, command_data)
         raise HTTPException(status_code=400, detail="Failed to handle follow-up")
     
-    # Clean up session if no more follow-up is needed
-    if not command_data.get("requires_followup"):
-        del active_sessions[request.user_id]
+    # Keep the session while more follow-up is needed
+    if command_data.get("requires_followup"):
+        active_sessions.set(request.user_id, command_data)
     
     return command_data
 
@@ -498,4 +744,69 @@ async def delete_chat(chat_id: str):
         raise he
     except Exception as e:
         print(f"Error deleting chat: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Failed to delete chat: {str(e)}") 
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Failed to delete chat: {str(e)}") 
+
+@app.get("/api/file-index/status")
+async def file_index_status():
+    """Report size and freshness of the filename index"""
+    stats = get_file_index_stats()
+    if stats is None:
+        raise HTTPException(status_code=503, detail="File index is not running")
+    return stats
+
+@app.get("/api/router-stats")
+async def get_router_stats():
+    """Report how often the rule fast path answered instead of the LLM"""
+    return router_stats.snapshot()
+
+@app.post("/api/intent-model/train")
+async def train_intent_model():
+    """Retrain the intent classifier on the logged commands and load the new model"""
+    results = await asyncio.to_thread(train_from_log)
+    if results is None:
+        raise HTTPException(status_code=400, detail="Not enough logged commands to train the intent model")
+    results["loaded"] = reload_classifier()
+    return results
+
+@app.post("/api/intent-model/reload")
+async def reload_intent_model():
+    """Load the intent model file again, e.g. after training it from the command line"""
+    return {"loaded": reload_classifier()}
+
+@app.get("/api/intent-model/evaluate")
+async def evaluate_intent_model(folds: int = 5):
+    """Estimate the intent model's accuracy on unseen commands by cross-validating on the logged ones"""
+    results = await asyncio.to_thread(cross_validate, load_examples(), folds)
+    if results is None:
+        raise HTTPException(status_code=400, detail="Not enough logged commands to evaluate the intent model")
+    return results
+
+@app.get("/api/response-cache/stats")
+async def get_response_cache_stats():
+    """Report hit rate and latency saved by the general question cache"""
+    return response_cache.stats()
+
+@app.get("/api/prompt-stats")
+async def get_prompt_stats():
+    """Report average prompt tokens and latency per kind of LLM call"""
+    return prompt_stats.snapshot()
+
+@app.get("/api/openai-latency")
+async def get_openai_latency():
+    """Report OpenAI request latency per operation, model and outcome"""
+    return registry.snapshot()
+
+@app.get("/api/hedge-stats")
+async def get_hedge_stats():
+    """Report how often slow LLM calls were hedged and which path answered"""
+    return hedge_stats.snapshot()
+
+@app.get("/api/model-router-stats")
+async def get_model_router_stats():
+    """Report requests served per model and shadow agreement of the smaller models"""
+    return model_router.snapshot()
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Expose turn, stage and OpenAI latency metrics in the Prometheus text format"""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
\ No newline at end of file
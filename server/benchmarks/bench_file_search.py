@@ -0,0 +1,142 @@
+"""
+Benchmark file search on synthetic directory trees.
+
+Compares the original per-extension glob scan, the single-pass scandir walker
+and the persistent filename index on trees of 10k, 100k and 1M files.
+
+Usage:
+    python benchmarks/bench_file_search.py [--sizes 10000 100000 1000000] [--output results.json]
+"""
+import argparse
+import glob
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+# Add the server directory to sys.path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir)
+
+from tools.file_index import FileIndex
+from tools.file_search import COMMON_EXTENSIONS, walk_search
+
+WORDS = ["report", "notes", "budget", "invoice", "resume", "draft", "summary", "lease",
+         "meeting", "plan", "photo", "scan", "contract", "agenda", "review", "q3"]
+EXTENSIONS = COMMON_EXTENSIONS + [".png", ".jpg", ".js", ".py", ".csv"]
+FILES_PER_DIR = 50
+DIRS_PER_DIR = 8
+QUERIES = ["resume", "invoice_17", "lease", "zzz_missing"]
+
+
+def build_tree(root, file_count, seed=0):
+    """
+    Create a synthetic tree of empty files spread over three search roots
+
+    Roughly 5% of the files are placed under node_modules and hidden directories,
+    which the walker prunes but the glob scan has to list.
+    """
+    rng = random.Random(seed)
+    roots = [os.path.join(root, name) for name in ("Documents", "Downloads", "Desktop")]
+    created = 0
+    pending = [(r, 0) for r in roots]
+    while created < file_count:
+        directory, depth = pending.pop(0)
+        if rng.random() < 0.05 and depth > 0:
+            directory = os.path.join(directory, rng.choice(["node_modules", ".git"]))
+        os.makedirs(directory, exist_ok=True)
+        for _ in range(min(FILES_PER_DIR, file_count - created)):
+            name = f"{rng.choice(WORDS)}_{rng.randrange(1000)}_{created}{rng.choice(EXTENSIONS)}"
+            path = os.path.join(directory, name)
+            open(path, "w").close()
+            mtime = time.time() - rng.randrange(365 * 86400)
+            os.utime(path, (mtime, mtime))
+            created += 1
+        for i in range(DIRS_PER_DIR):
+            pending.append((os.path.join(directory, f"dir{depth}_{i}"), depth + 1))
+    return roots
+
+
+def legacy_glob_search(filename, search_dirs, max_results=5):
+    """The original search_file implementation: one recursive glob per extension"""
+    results = []
+    if '.' not in filename:
+        patterns = [f"**/*{filename}*{ext}" for ext in COMMON_EXTENSIONS]
+    else:
+        patterns = [f"**/*{filename}*"]
+    for search_dir in search_dirs:
+        for pattern in patterns:
+            for file_path in glob.glob(os.path.join(search_dir, pattern), recursive=True):
+                if os.path.isfile(file_path):
+                    file_stat = os.stat(file_path)
+                    results.append((file_stat.st_mtime, file_path))
+    return sorted(results, reverse=True)[:max_results]
+
+
+def timed(fn, repeat=3):
+    """Best-of-n wall time in milliseconds, plus the last result"""
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def bench_size(file_count, workdir, skip_glob_above):
+    root = os.path.join(workdir, f"tree_{file_count}")
+    print(f"\nBuilding tree with {file_count} files...")
+    start = time.perf_counter()
+    roots = build_tree(root, file_count)
+    print(f"  built in {time.perf_counter() - start:.1f} s")
+
+    index = FileIndex(os.path.join(workdir, f"index_{file_count}.db"), roots)
+    start = time.perf_counter()
+    index.rescan()
+    rescan_ms = (time.perf_counter() - start) * 1000
+
+    result = {"files": file_count, "index_rescan_ms": rescan_ms, "queries": {}}
+    for query in QUERIES:
+        row = {}
+        if file_count <= skip_glob_above:
+            row["glob_ms"], _ = timed(lambda: legacy_glob_search(query, roots), repeat=1)
+        row["walker_ms"], _ = timed(lambda: walk_search(query, roots, timeout=600))
+        row["index_ms"], _ = timed(lambda: index.search(query, extensions=COMMON_EXTENSIONS), repeat=5)
+        result["queries"][query] = row
+        print(f"  {query:12s} " + "  ".join(f"{k}={v:9.2f}" for k, v in row.items()))
+
+    index.stop()
+    shutil.rmtree(root, ignore_errors=True)
+    return result
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    arg_parser.add_argument("--skip-glob-above", type=int, default=100_000,
+                            help="Skip the slow legacy glob scan on larger trees")
+    arg_parser.add_argument("--workdir", default=None, help="Where to build the trees (default: a temp dir)")
+    arg_parser.add_argument("--output", default=None, help="Write results as JSON to this file")
+    args = arg_parser.parse_args()
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="file_search_bench_")
+    try:
+        results = [bench_size(size, workdir, args.skip_glob_above) for size in args.sizes]
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
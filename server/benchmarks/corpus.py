@@ -0,0 +1,46 @@
+# Utterances the benchmarks replay, with the tool calls the fake LLM answers
+# them with. Together they cover the rule fast path, the response cache,
+# single and multi-part LLM commands and the email follow-up over /ws/text.
+TURNS = [
+    {
+        "name": "calendar_today",
+        "text": "What's on my calendar today",
+        "tool_calls": [("calendar_check", {"timeframe": "today"})],
+    },
+    {
+        "name": "email_check",
+        "text": "Check my email",
+        "tool_calls": [("email_check", {"days_back": 7, "important_only": False, "max_results": 10})],
+    },
+    {
+        "name": "general_question",
+        "text": "What time zone is Tokyo in",
+        "tool_calls": [("general_question", {"response": "Tokyo uses Japan Standard Time, UTC plus nine."})],
+    },
+    {
+        "name": "calendar_add",
+        "text": "Add a dentist appointment tomorrow at 3 PM",
+        "tool_calls": [("calendar_add", {"title": "Dentist appointment", "date": "tomorrow", "time": "3 PM",
+                                         "duration_minutes": 60})],
+    },
+    {
+        "name": "calendar_find_slot",
+        "text": "Find me a free half hour tomorrow afternoon",
+        "tool_calls": [("calendar_find_slot", {"duration_minutes": 30, "date": "tomorrow",
+                                               "part_of_day": "afternoon"})],
+    },
+    {
+        "name": "multi_part",
+        "text": "Check my email and then tell me what's on my calendar tomorrow",
+        "tool_calls": [("email_check", {"days_back": 1}), ("calendar_check", {"timeframe": "tomorrow"})],
+    },
+    {
+        "name": "email_send",
+        "text": "Send an email saying I'll be ten minutes late to the standup",
+        "tool_calls": [("email_send", {"subject": "Running late", "body": "I'll be ten minutes late to the standup.",
+                                       "followup_question": "Who should I send it to?",
+                                       "parameter_to_update": "to"})],
+        # Answered over /ws/text once the audio turn asks for the recipient
+        "followup_response": "sam@example.com",
+    },
+]
@@ -0,0 +1,24 @@
+# The server app with every external service faked, for running real worker
+# processes offline. Importing this module installs the fakes, so uvicorn can
+# load it in each worker it starts:
+#
+#   python -m uvicorn benchmarks.fake_server:app --workers 4 --lifespan off
+#
+# FAKE_PROFILE picks the latency profile (default: zero) and FAKE_LATENCY
+# overrides single backends, e.g. "llm_chat=fixed:1.5,tts_playback=fixed:30".
+# The fake recognizer knows the benchmark corpus clips.
+import os
+import sys
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVER_DIR)
+
+from benchmarks.fakes import FakeBackends
+from benchmarks.load_test import corpus_clips
+from benchmarks.run_benchmark import parse_overrides, start_server
+
+backends = FakeBackends(os.getenv('FAKE_PROFILE', 'zero'),
+                        parse_overrides([spec for spec in os.getenv('FAKE_LATENCY', '').split(',') if spec]))
+for _, audio, transcript in corpus_clips():
+    backends.register_audio(audio, transcript)
+app = start_server(backends).app
@@ -0,0 +1,614 @@
+# Local stand-ins for every network service the server talks to. install() puts
+# fake Google Speech, Text-to-Speech, Gmail, Calendar, Pinecone and pygame
+# modules into sys.modules and swaps the AsyncOpenAI class used by
+# llm.openai_client, so the real server code runs end to end offline. Each
+# backend call waits for a sample from a configurable latency distribution.
+import asyncio
+import hashlib
+import json
+import math
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import types
+import uuid
+import zlib
+from collections import Counter
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import numpy as np
+
+EMBEDDING_DIMENSION = 1536
+
+# Backend latencies in seconds, as "kind:parameters" distributions
+PROFILES = {
+    # Roughly what the hosted services show from a home connection
+    "realistic": {
+        "stt": "lognormal:0.6:0.35",
+        "tts": "lognormal:0.35:0.3",
+        "tts_playback": "fixed:0",
+        "llm_chat": "lognormal:1.1:0.45",
+        "llm_embeddings": "lognormal:0.15:0.35",
+        "pinecone_query": "lognormal:0.08:0.4",
+        "pinecone_upsert": "lognormal:0.06:0.4",
+        "gmail": "lognormal:0.18:0.35",
+        "calendar": "lognormal:0.15:0.35",
+    },
+    # Measures the server's own overhead
+    "zero": {},
+}
+BACKENDS = ("stt", "tts", "tts_playback", "llm_chat", "llm_embeddings", "pinecone_query", "pinecone_upsert",
+            "gmail", "calendar")
+
+
+class Latency:
+    """
+    A latency distribution parsed from a spec string
+
+    "fixed:S", "uniform:LOW:HIGH", "normal:MEAN:STD" or "lognormal:MEDIAN:SIGMA",
+    all in seconds. Samples are never negative.
+    """
+
+    def __init__(self, spec):
+        self.spec = spec
+        kind, _, rest = spec.partition(":")
+        self.kind = kind
+        self.params = [float(value) for value in rest.split(":") if value]
+        expected = {"fixed": 1, "uniform": 2, "normal": 2, "lognormal": 2}
+        if kind not in expected or len(self.params) != expected[kind]:
+            raise ValueError(f"Invalid latency spec: {spec}")
+
+    def sample(self, rng):
+        if self.kind == "fixed":
+            value = self.params[0]
+        elif self.kind == "uniform":
+            value = rng.uniform(*self.params)
+        elif self.kind == "normal":
+            value = rng.gauss(*self.params)
+        else:
+            median, sigma = self.params
+            value = median * math.exp(rng.gauss(0, sigma)) if median > 0 else 0.0
+        return max(0.0, value)
+
+
+class FakeBackends:
+    """Shared state of the fake services: latencies, scripted answers and call counts"""
+
+    def __init__(self, profile="realistic", overrides=None, seed=0, time_scale=1.0):
+        specs = {backend: "fixed:0" for backend in BACKENDS}
+        specs.update(PROFILES[profile])
+        specs.update(overrides or {})
+        self.profile = profile
+        self.latencies = {backend: Latency(spec) for backend, spec in specs.items()}
+        self.time_scale = time_scale
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = Counter()
+        self.transcripts = {}
+        self.commands = {}
+        self.playing_until = 0.0
+
+    def config(self):
+        """Latency specs, for the results file"""
+        return {backend: latency.spec for backend, latency in sorted(self.latencies.items())}
+
+    def _sample(self, backend):
+        with self._lock:
+            self.calls[backend] += 1
+            return self.latencies[backend].sample(self._rng) * self.time_scale
+
+    def delay(self, backend):
+        """Count a call and block for its latency"""
+        seconds = self._sample(backend)
+        if seconds:
+            time.sleep(seconds)
+        return seconds
+
+    async def adelay(self, backend):
+        """Count a call and wait for its latency without blocking the event loop"""
+        seconds = self._sample(backend)
+        await asyncio.sleep(seconds)
+        return seconds
+
+    def register_audio(self, audio, transcript):
+        """Make the fake recognizer return a transcript for this exact audio payload"""
+        self.transcripts[hashlib.sha1(audio).hexdigest()] = transcript
+
+    def transcript_for(self, audio):
+        return self.transcripts.get(hashlib.sha1(audio).hexdigest(), "")
+
+    def register_command(self, text, tool_calls):
+        """
+        Script the fake LLM's answer for an utterance
+
+        Args:
+            text (str): The utterance
+            tool_calls (list): (command_type, arguments) pairs
+        """
+        self.commands[_normalize(text)] = tool_calls
+
+
+def _normalize(text):
+    return " ".join(text.lower().strip().rstrip("?.!").split())
+
+
+def synthetic_audio(text, seed, sample_rate=44100):
+    """
+    Deterministic LINEAR16 audio about as long as speaking the text
+
+    Args:
+        text (str): Utterance the clip stands for
+        seed (int): Makes clips of the same text distinct
+        sample_rate (int): Samples per second
+
+    Returns:
+        bytes: 16-bit mono PCM
+    """
+    seconds = 0.5 + 0.3 * len(text.split())
+    rng = np.random.default_rng(seed)
+    samples = (rng.normal(0, 2000, int(seconds * sample_rate))).clip(-32768, 32767).astype("<i2")
+    return samples.tobytes()
+
+
+def _embedding(text):
+    """Unit vector that is identical for identical text"""
+    rng = np.random.default_rng(zlib.crc32(text.encode("utf-8")))
+    vector = rng.normal(size=EMBEDDING_DIMENSION)
+    return (vector / np.linalg.norm(vector)).tolist()
+
+
+class _Call:
+    """A prepared API request, like the ones googleapiclient returns"""
+
+    def __init__(self, backends, backend, result):
+        self._backends = backends
+        self._backend = backend
+        self._result = result
+
+    def execute(self):
+        self._backends.delay(self._backend)
+        return self._result() if callable(self._result) else self._result
+
+
+def _record(**fields):
+    return SimpleNamespace(**fields)
+
+
+# Google Speech-to-Text
+
+def _speech_module(backends):
+    module = types.ModuleType("google.cloud.speech")
+
+    class RecognitionConfig:
+        AudioEncoding = SimpleNamespace(LINEAR16="LINEAR16", FLAC="FLAC")
+
+        def __init__(self, **kwargs):
+            self.__dict__.update(kwargs)
+
+    class SpeechClient:
+        def recognize(self, config=None, audio=None):
+            backends.delay("stt")
+            transcript = backends.transcript_for(audio.content)
+            alternatives = [_record(transcript=transcript, confidence=0.95)]
+            return _record(results=[_record(alternatives=alternatives, is_final=True)] if transcript else [])
+
+        def streaming_recognize(self, config=None, requests=()):
+            audio = b"".join(request.audio_content for request in requests)
+            backends.delay("stt")
+            transcript = backends.transcript_for(audio)
+            if transcript:
+                alternatives = [_record(transcript=transcript, confidence=0.95)]
+                yield _record(results=[_record(alternatives=alternatives, is_final=True)])
+
+    module.SpeechClient = SpeechClient
+    module.RecognitionConfig = RecognitionConfig
+    module.RecognitionAudio = _record
+    module.StreamingRecognitionConfig = _record
+    module.StreamingRecognizeRequest = _record
+    return module
+
+
+# Google Text-to-Speech and pygame playback
+
+def _texttospeech_module(backends):
+    module = types.ModuleType("google.cloud.texttospeech")
+
+    class TextToSpeechClient:
+        def synthesize_speech(self, input=None, voice=None, audio_config=None, **kwargs):
+            backends.delay("tts")
+            return _record(audio_content=b"ID3" + input.text.encode("utf-8"))
+
+    module.TextToSpeechClient = TextToSpeechClient
+    module.SynthesisInput = _record
+    module.VoiceSelectionParams = _record
+    module.AudioConfig = _record
+    module.SsmlVoiceGender = SimpleNamespace(NEUTRAL=0, MALE=1, FEMALE=2)
+    module.AudioEncoding = SimpleNamespace(LINEAR16=1, MP3=2, OGG_OPUS=3)
+    return module
+
+
+def _pygame_module(backends):
+    module = types.ModuleType("pygame")
+    music = types.ModuleType("pygame.mixer.music")
+    mixer = types.ModuleType("pygame.mixer")
+
+    def play(*args, **kwargs):
+        backends.playing_until = time.monotonic() + backends._sample("tts_playback")
+
+    def stop():
+        backends.playing_until = 0.0
+
+    music.load = lambda *args, **kwargs: None
+    music.play = play
+    music.stop = stop
+    music.get_busy = lambda: time.monotonic() < backends.playing_until
+    mixer.init = lambda *args, **kwargs: None
+    mixer.quit = lambda: None
+    mixer.get_init = lambda: True
+    mixer.music = music
+    module.mixer = mixer
+    module.init = lambda: None
+    return module
+
+
+def _speech_recognition_module():
+    module = types.ModuleType("speech_recognition")
+
+    class Recognizer:
+        pass
+
+    class Microphone:
+        def __init__(self, *args, **kwargs):
+            raise RuntimeError("No microphone in the benchmark environment")
+
+    module.Recognizer = Recognizer
+    module.Microphone = Microphone
+    module.AudioData = _record
+    return module
+
+
+# Gmail and Calendar
+
+class FakeGmailService:
+    def __init__(self, backends):
+        self._backends = backends
+        now = datetime.now()
+        self._messages = [
+            {
+                "id": f"msg{index}",
+                "snippet": f"Benchmark message {index}",
+                "payload": {"headers": [
+                    {"name": "From", "value": f"sender{index}@example.com"},
+                    {"name": "Subject", "value": f"Update {index}"},
+                    {"name": "Date", "value": (now - timedelta(hours=index * 5)).strftime("%a, %d %b %Y %H:%M:%S")},
+                ]},
+            }
+            for index in range(12)
+        ]
+
+    def users(self):
+        return self
+
+    def getProfile(self, userId=None):
+        return _Call(self._backends, "gmail", {"emailAddress": "benchmark@example.com"})
+
+    def messages(self):
+        return self
+
+    def drafts(self):
+        return SimpleNamespace(create=lambda userId=None, body=None: _Call(
+            self._backends, "gmail", lambda: {"id": f"draft-{uuid.uuid4().hex[:8]}"}))
+
+    def list(self, userId=None, q=None, maxResults=10, **kwargs):
+        return _Call(self._backends, "gmail", {"messages": [{"id": m["id"]} for m in self._messages[:maxResults]]})
+
+    def get(self, userId=None, id=None, **kwargs):
+        message = next((m for m in self._messages if m["id"] == id), {"id": id, "payload": {"headers": []}})
+        return _Call(self._backends, "gmail", message)
+
+    def send(self, userId=None, body=None):
+        return _Call(self._backends, "gmail", lambda: {"id": f"sent-{uuid.uuid4().hex[:8]}"})
+
+
+class FakeCalendarService:
+    def __init__(self, backends):
+        self._backends = backends
+        self._lock = threading.Lock()
+        self._events = []
+        today = datetime.now().astimezone().replace(minute=0, second=0, microsecond=0)
+        for day in range(3):
+            for hour, summary in ((10, "Standup"), (14, "Design review")):
+                start = (today + timedelta(days=day)).replace(hour=hour)
+                self._events.append({
+                    "id": f"event{day}{hour}",
+                    "summary": summary,
+                    "start": {"dateTime": start.isoformat()},
+                    "end": {"dateTime": (start + timedelta(minutes=45)).isoformat()},
+                })
+
+    def calendarList(self):
+        return SimpleNamespace(list=lambda: _Call(self._backends, "calendar", {"items": []}))
+
+    def events(self):
+        return self
+
+    def list(self, calendarId=None, timeMin=None, timeMax=None, maxResults=10, **kwargs):
+        def result():
+            low, high = datetime.fromisoformat(timeMin), datetime.fromisoformat(timeMax)
+            with self._lock:
+                items = [event for event in self._events
+                         if datetime.fromisoformat(event["end"]["dateTime"]) > low
+                         and datetime.fromisoformat(event["start"]["dateTime"]) < high]
+            items.sort(key=lambda event: event["start"]["dateTime"])
+            return {"items": items[:maxResults]}
+        return _Call(self._backends, "calendar", result)
+
+    def insert(self, calendarId=None, body=None):
+        def result():
+            event = dict(body, id=uuid.uuid4().hex[:12])
+            with self._lock:
+                self._events.append(event)
+            return event
+        return _Call(self._backends, "calendar", result)
+
+
+def _google_modules(backends):
+    """The google.* and googleapiclient modules the server imports"""
+    google = types.ModuleType("google")
+    google.__path__ = []
+    cloud = types.ModuleType("google.cloud")
+    cloud.__path__ = []
+    cloud.speech = _speech_module(backends)
+    cloud.texttospeech = _texttospeech_module(backends)
+    google.cloud = cloud
+
+    credentials = SimpleNamespace(valid=True, expired=False, refresh_token=None)
+    oauth2 = types.ModuleType("google.oauth2")
+    oauth2.__path__ = []
+    service_account = types.ModuleType("google.oauth2.service_account")
+    service_account.Credentials = SimpleNamespace(
+        from_service_account_file=lambda *args, **kwargs: credentials)
+    oauth2_credentials = types.ModuleType("google.oauth2.credentials")
+    oauth2_credentials.Credentials = SimpleNamespace
+    oauth2.service_account = service_account
+    oauth2.credentials = oauth2_credentials
+    google.oauth2 = oauth2
+
+    auth = types.ModuleType("google.auth")
+    auth.__path__ = []
+    transport = types.ModuleType("google.auth.transport")
+    transport.__path__ = []
+    requests = types.ModuleType("google.auth.transport.requests")
+    requests.Request = SimpleNamespace
+    transport.requests = requests
+    auth.transport = transport
+    google.auth = auth
+
+    oauthlib = types.ModuleType("google_auth_oauthlib")
+    oauthlib.__path__ = []
+    flow = types.ModuleType("google_auth_oauthlib.flow")
+    flow.InstalledAppFlow = SimpleNamespace(from_client_secrets_file=lambda *args, **kwargs: SimpleNamespace(
+        run_local_server=lambda **options: credentials))
+    oauthlib.flow = flow
+
+    apiclient = types.ModuleType("googleapiclient")
+    apiclient.__path__ = []
+    discovery = types.ModuleType("googleapiclient.discovery")
+
+    def build(service_name, version, credentials=None, **kwargs):
+        if service_name == "gmail":
+            return FakeGmailService(backends)
+        if service_name == "calendar":
+            return FakeCalendarService(backends)
+        raise ValueError(f"No fake for the {service_name} API")
+
+    discovery.build = build
+    apiclient.discovery = discovery
+
+    return {
+        "google": google,
+        "google.cloud": cloud,
+        "google.cloud.speech": cloud.speech,
+        "google.cloud.texttospeech": cloud.texttospeech,
+        "google.oauth2": oauth2,
+        "google.oauth2.service_account": service_account,
+        "google.oauth2.credentials": oauth2_credentials,
+        "google.auth": auth,
+        "google.auth.transport": transport,
+        "google.auth.transport.requests": requests,
+        "google_auth_oauthlib": oauthlib,
+        "google_auth_oauthlib.flow": flow,
+        "googleapiclient": apiclient,
+        "googleapiclient.discovery": discovery,
+    }
+
+
+# Pinecone
+
+def _matches_filter(metadata, conditions):
+    for key, condition in (conditions or {}).items():
+        value = metadata.get(key)
+        if isinstance(condition, dict):
+            if "$eq" in condition and value != condition["$eq"]:
+                return False
+            if "$in" in condition and value not in condition["$in"]:
+                return False
+            if "$ne" in condition and value == condition["$ne"]:
+                return False
+        elif value != condition:
+            return False
+    return True
+
+
+class FakeIndex:
+    """In-memory vector index with Pinecone's upsert, query and delete calls"""
+
+    def __init__(self, backends):
+        self._backends = backends
+        self._lock = threading.Lock()
+        self._vectors = {}
+
+    def upsert(self, vectors, **kwargs):
+        self._backends.delay("pinecone_upsert")
+        with self._lock:
+            for vector_id, values, metadata in vectors:
+                self._vectors[vector_id] = (np.asarray(values, dtype=np.float32), dict(metadata))
+        return {"upserted_count": len(vectors)}
+
+    def query(self, vector=None, filter=None, top_k=10, include_metadata=False, **kwargs):
+        self._backends.delay("pinecone_query")
+        query = np.asarray(vector, dtype=np.float32)
+        with self._lock:
+            candidates = [(vector_id, values, metadata) for vector_id, (values, metadata) in self._vectors.items()
+                          if _matches_filter(metadata, filter)]
+        scored = sorted(((float(values @ query), vector_id, metadata) for vector_id, values, metadata in candidates),
+                        key=lambda item: item[0], reverse=True)[:top_k]
+        return SimpleNamespace(matches=[
+            SimpleNamespace(id=vector_id, score=score, metadata=dict(metadata) if include_metadata else None)
+            for score, vector_id, metadata in scored
+        ])
+
+    def delete(self, ids=None, filter=None, delete_all=False, **kwargs):
+        self._backends.delay("pinecone_upsert")
+        with self._lock:
+            for vector_id in list(self._vectors):
+                if delete_all or (ids and vector_id in ids) or (filter and _matches_filter(self._vectors[vector_id][1], filter)):
+                    del self._vectors[vector_id]
+
+
+def _pinecone_module(backends):
+    module = types.ModuleType("pinecone")
+    indexes = {}
+
+    class Pinecone:
+        def __init__(self, api_key=None, **kwargs):
+            pass
+
+        def list_indexes(self):
+            return SimpleNamespace(names=lambda: list(indexes))
+
+        def create_index(self, name, dimension=None, metric=None, **kwargs):
+            indexes.setdefault(name, FakeIndex(backends))
+
+        def Index(self, name):
+            return indexes.setdefault(name, FakeIndex(backends))
+
+    module.Pinecone = Pinecone
+    module.ServerlessSpec = _record
+    return module
+
+
+# OpenAI
+
+def fake_async_openai(backends):
+    """AsyncOpenAI replacement answering chat from the scripted commands"""
+
+    # Real response types, so callers see the same objects as in production
+    from openai.types import CreateEmbeddingResponse
+    from openai.types.chat import ChatCompletion
+
+    def completion(model, message, prompt_tokens):
+        return ChatCompletion.model_validate({
+            "id": "chatcmpl-benchmark",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model or "benchmark",
+            "choices": [{"index": 0, "finish_reason": "tool_calls" if message.get("tool_calls") else "stop",
+                         "message": message}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": 24, "total_tokens": prompt_tokens + 24},
+        })
+
+    async def create_chat(model=None, messages=(), tools=None, tool_choice=None, timeout=None, **kwargs):
+        await backends.adelay("llm_chat")
+        prompt_tokens = sum(len(str(message.get("content", ""))) for message in messages) // 4
+        if not tools:
+            return completion(model, {"role": "assistant", "content": "Benchmark chat"}, prompt_tokens)
+
+        text = messages[-1]["content"]
+        offered = {tool["function"]["name"] for tool in tools}
+        script = backends.commands.get(_normalize(text)) or [
+            ("general_question", {"response": f"Here is an offline answer to: {text}"})]
+        calls = [(name, arguments) for name, arguments in script if name in offered]
+        if calls and not kwargs.get("parallel_tool_calls", True):
+            calls = calls[:1]
+        tool_calls = [
+            {"id": f"call_{index}", "type": "function", "function": {"name": name, "arguments": json.dumps(arguments)}}
+            for index, (name, arguments) in enumerate(calls)
+        ] or None
+        message = {"role": "assistant", "content": None if tool_calls else "mismatch", "tool_calls": tool_calls}
+        return completion(model, message, prompt_tokens)
+
+    async def create_embeddings(model=None, input=None, timeout=None, **kwargs):
+        await backends.adelay("llm_embeddings")
+        texts = [input] if isinstance(input, str) else list(input)
+        return CreateEmbeddingResponse.model_validate({
+            "object": "list",
+            "model": model or "benchmark",
+            "data": [{"object": "embedding", "index": index, "embedding": _embedding(text)}
+                     for index, text in enumerate(texts)],
+            "usage": {"prompt_tokens": 0, "total_tokens": 0},
+        })
+
+    class FakeAsyncOpenAI:
+        def __init__(self, *args, **kwargs):
+            self.chat = SimpleNamespace(completions=SimpleNamespace(create=create_chat))
+            self.embeddings = SimpleNamespace(create=create_embeddings)
+
+    return FakeAsyncOpenAI
+
+
+def install(backends, work_dir=None):
+    """
+    Replace the external services with fakes, before the server is imported
+
+    Args:
+        backends (FakeBackends): Latencies and scripted answers
+        work_dir (str): Where to put credentials and index files (default: a new temp dir)
+
+    Returns:
+        str: The work directory
+    """
+    work_dir = work_dir or tempfile.mkdtemp(prefix="voice-benchmark-")
+    credentials_path = os.path.join(work_dir, "credentials.json")
+    with open(credentials_path, "w") as f:
+        json.dump({"type": "service_account", "client_email": "benchmark@example.com"}, f)
+
+    # Everything the server reads from .env, pointed at fakes and the work directory;
+    # load_dotenv does not override variables that are already set
+    os.environ.update({
+        "GOOGLE_APPLICATION_CREDENTIALS": credentials_path,
+        "TARGET_CALENDAR_EMAIL": "benchmark@example.com",
+        "PINECONE_API_KEY": "benchmark",
+        "PINECONE_ENVIRONMENT": "benchmark",
+        "OPENAI_API_KEY": "benchmark",
+        "INTENT_LOG_PATH": os.path.join(work_dir, "intent_log.jsonl"),
+        "INTENT_MODEL_PATH": os.path.join(work_dir, "intent_model.npz"),
+        "FILE_INDEX_PATH": os.path.join(work_dir, "file_index.db"),
+        "CONTENT_INDEX_PATH": os.path.join(work_dir, "content_index.db"),
+        "SEMANTIC_INDEX_DIR": os.path.join(work_dir, "semantic_index"),
+    })
+
+    sys.modules.update(_google_modules(backends))
+    sys.modules["pinecone"] = _pinecone_module(backends)
+    pygame = _pygame_module(backends)
+    sys.modules["pygame"] = pygame
+    sys.modules["pygame.mixer"] = pygame.mixer
+    sys.modules["speech_recognition"] = _speech_recognition_module()
+
+    from llm import openai_client
+    openai_client.AsyncOpenAI = fake_async_openai(backends)
+
+    # Gmail authentication looks for OAuth files next to the server code; the
+    # fake service needs none of that
+    from tools import email_handler
+
+    def authenticate(handler):
+        handler.creds = SimpleNamespace(valid=True)
+        handler.service = FakeGmailService(backends)
+
+    email_handler.EmailHandler._authenticate = authenticate
+    return work_dir
@@ -0,0 +1,359 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import socket
+import sys
+import threading
+import time
+from datetime import datetime
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVER_DIR)
+
+import httpx
+import websockets
+
+from benchmarks.corpus import TURNS
+from benchmarks.fakes import PROFILES, FakeBackends, synthetic_audio
+from benchmarks.report import print_table, summarize, write_results
+from benchmarks.run_benchmark import parse_overrides, start_server
+
+SAMPLE_RATE = 44100
+# The client records 4096-sample frames and sends the utterance when it stops
+FRAME_SAMPLES = 4096
+BYTES_PER_SAMPLE = 2
+
+
+def load_clips(clips_dir):
+    """
+    Read recorded clips from a directory
+
+    Each clip is 16-bit mono PCM at 44.1kHz in a .pcm or .raw file. A .txt
+    file with the same name holds its transcript for the fake Speech-to-Text.
+
+    Args:
+        clips_dir (str): Directory of clips
+
+    Returns:
+        list: (name, audio bytes, transcript or None) tuples
+    """
+    clips = []
+    for file_name in sorted(os.listdir(clips_dir)):
+        name, extension = os.path.splitext(file_name)
+        if extension not in (".pcm", ".raw"):
+            continue
+        with open(os.path.join(clips_dir, file_name), "rb") as f:
+            audio = f.read()
+        transcript = None
+        transcript_path = os.path.join(clips_dir, name + ".txt")
+        if os.path.exists(transcript_path):
+            with open(transcript_path) as f:
+                transcript = f.read().strip()
+        clips.append((name, audio, transcript))
+    return clips
+
+
+def corpus_clips():
+    """Synthetic clips for the benchmark corpus"""
+    return [(turn["name"], synthetic_audio(turn["text"], seed=index), turn["text"])
+            for index, turn in enumerate(TURNS)]
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def serve_in_thread(api, port):
+    """
+    Run the app under uvicorn on its own thread
+
+    The lifespan stays off so the startup hooks don't index the local disk;
+    the event loop monitor is started directly instead.
+
+    Args:
+        api (module): The api module
+        port (int): Port to listen on
+
+    Returns:
+        uvicorn.Server: The running server
+    """
+    import uvicorn
+    from monitoring.loop_lag import monitor_event_loop
+
+    server = uvicorn.Server(uvicorn.Config(api.app, host="127.0.0.1", port=port, lifespan="off",
+                                           log_level="warning"))
+
+    async def serve():
+        monitor = asyncio.create_task(monitor_event_loop())
+        try:
+            await server.serve()
+        finally:
+            monitor.cancel()
+
+    thread = threading.Thread(target=asyncio.run, args=(serve(),), daemon=True)
+    thread.start()
+    deadline = time.time() + 30
+    while not server.started:
+        if not thread.is_alive() or time.time() > deadline:
+            raise RuntimeError("Server did not start")
+        time.sleep(0.05)
+    server.thread = thread
+    return server
+
+
+def read_loop_lag(base_url):
+    """
+    Read the event loop lag histogram from /metrics
+
+    Args:
+        base_url (str): http://host:port of the server
+
+    Returns:
+        dict: Cumulative bucket counts, sum and count, or None if unavailable
+    """
+    try:
+        text = httpx.get(base_url + "/metrics", timeout=10).text
+    except httpx.HTTPError as e:
+        print(f"Could not read /metrics: {e}", file=sys.stderr)
+        return None
+    lag = {"buckets": {}, "sum": 0.0, "count": 0}
+    for line in text.splitlines():
+        if not line.startswith("event_loop_lag_seconds"):
+            continue
+        name, _, value = line.rpartition(" ")
+        bucket = re.search(r'le="([^"]+)"', name)
+        if bucket:
+            lag["buckets"][bucket.group(1)] = float(value)
+        elif name.endswith("_sum"):
+            lag["sum"] = float(value)
+        elif name.endswith("_count"):
+            lag["count"] = int(float(value))
+    return lag if lag["buckets"] else None
+
+
+def lag_between(before, after):
+    """
+    Summarize the event loop lag observed between two reads of /metrics
+
+    Percentiles are the upper bounds of the buckets they fall in.
+
+    Returns:
+        dict: Probe count, mean and bucketed p50/p99 in milliseconds
+    """
+    if not before or not after:
+        return None
+    count = after["count"] - before["count"]
+    if count <= 0:
+        return {"count": 0}
+    summary = {"count": count, "mean_ms": round((after["sum"] - before["sum"]) / count * 1000, 1)}
+    for quantile in (0.5, 0.99):
+        for bound, cumulative in after["buckets"].items():
+            if cumulative - before["buckets"].get(bound, 0) >= quantile * count:
+                summary[f"p{int(quantile * 100)}_ms"] = "+Inf" if bound == "+Inf" else round(float(bound) * 1000, 1)
+                break
+    return summary
+
+
+class LoadStats:
+    """Per-turn results gathered from every simulated user"""
+
+    def __init__(self):
+        self.turns = []
+        self.errors = {}
+        self.connection_errors = 0
+
+    def record(self, **turn):
+        self.turns.append(turn)
+        if turn["error"]:
+            self.errors[turn["error"]] = self.errors.get(turn["error"], 0) + 1
+
+
+async def simulate_user(url, clips, stop_at, stats, think_time, pace, rng):
+    """
+    One client talking to /ws/audio until the run ends
+
+    Each turn waits as long as recording the clip takes, frame by frame,
+    before sending the whole utterance the way the desktop client does.
+
+    Args:
+        url (str): WebSocket URL of /ws/audio
+        clips (list): (name, audio, transcript) tuples
+        stop_at (float): perf_counter time to stop starting turns
+        stats (LoadStats): Where results go
+        think_time (float): Mean seconds between a reply and the next utterance
+        pace (bool): Whether to wait out the recording of each clip
+        rng (random.Random): Picks clips and think times
+    """
+    frame_seconds = FRAME_SAMPLES / SAMPLE_RATE
+    frame_bytes = FRAME_SAMPLES * BYTES_PER_SAMPLE
+    try:
+        async with websockets.connect(url, max_size=None, open_timeout=30) as websocket:
+            while time.perf_counter() < stop_at:
+                name, audio, _ = rng.choice(clips)
+                if pace:
+                    for _ in range(0, len(audio), frame_bytes):
+                        await asyncio.sleep(frame_seconds)
+
+                sent = time.perf_counter()
+                await websocket.send(audio)
+                transcribed = None
+                error = None
+                trace_id = None
+                while True:
+                    message = await websocket.recv()
+                    reply = json.loads(message)
+                    trace_id = reply.get("trace_id", trace_id)
+                    if reply.get("type") == "transcription" and transcribed is None:
+                        transcribed = time.perf_counter() - sent
+                        if reply.get("error"):
+                            error = reply["error"]
+                            break
+                    elif reply.get("type") == "busy":
+                        error = f"busy ({reply.get('reason')})"
+                        break
+                    elif reply.get("type") in ("jarvis", "error") or reply.get("error"):
+                        error = reply.get("error")
+                        break
+                stats.record(name=name, latency=time.perf_counter() - sent, transcribed=transcribed,
+                             trace_id=trace_id, error=error)
+
+                if think_time:
+                    await asyncio.sleep(rng.expovariate(1 / think_time))
+    except (OSError, asyncio.TimeoutError, websockets.exceptions.WebSocketException) as e:
+        print(f"Connection failed: {e}", file=sys.stderr)
+        stats.connection_errors += 1
+
+
+async def run_load(url, clips, users, duration, ramp, think_time, pace, seed):
+    """
+    Drive concurrent clients and gather their results
+
+    Returns:
+        tuple: (LoadStats, wall seconds)
+    """
+    stats = LoadStats()
+    started = time.perf_counter()
+    stop_at = started + duration
+
+    async def start_user(index):
+        if users > 1:
+            await asyncio.sleep(ramp * index / (users - 1))
+        await simulate_user(url, clips, stop_at, stats, think_time, pace, random.Random(seed + index))
+
+    await asyncio.gather(*(start_user(index) for index in range(users)))
+    return stats, time.perf_counter() - started
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Concurrent /ws/audio load test")
+    parser.add_argument("--users", type=int, default=10, help="Concurrent WebSocket connections")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds to keep starting turns")
+    parser.add_argument("--ramp", type=float, default=5.0, help="Seconds over which the users connect")
+    parser.add_argument("--think-time", type=float, default=2.0, help="Mean seconds between turns per user")
+    parser.add_argument("--no-pacing", action="store_true",
+                        help="Send clips back to back instead of waiting as long as recording them takes")
+    parser.add_argument("--clips", help="Directory of .pcm clips with .txt transcripts (default: the corpus)")
+    parser.add_argument("--url", help="Test a running server, e.g. ws://localhost:8000/ws/audio, "
+                                      "instead of an in-process one with fake backends")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="realistic", help="Backend latency profile")
+    parser.add_argument("--latency", action="append", metavar="BACKEND=SPEC",
+                        help="Override one backend, e.g. llm_chat=lognormal:1.5:0.5 (repeatable)")
+    parser.add_argument("--time-scale", type=float, default=1.0, help="Multiply every backend latency")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for latencies, clip choice and think times")
+    parser.add_argument("--output", help="Results file (default: benchmarks/results/load-<time>.json)")
+    parser.add_argument("--verbose", action="store_true", help="Show the server's own output")
+    args = parser.parse_args(argv)
+
+    clips = load_clips(args.clips) if args.clips else corpus_clips()
+    if not clips:
+        raise SystemExit(f"No clips found in {args.clips}")
+
+    collector = {}
+    backends = None
+    server = None
+    stdout = sys.stdout
+    if not args.url:
+        backends = FakeBackends(args.profile, parse_overrides(args.latency), args.seed, args.time_scale)
+        if not args.verbose:
+            sys.stdout = open(os.devnull, "w")
+        api = start_server(backends)
+        from monitoring.tracing import add_finish_listener
+
+        for name, audio, transcript in clips:
+            if transcript:
+                backends.register_audio(audio, transcript)
+        add_finish_listener(lambda trace, outcome, total, totals: collector.__setitem__(trace.trace_id, total))
+        port = _free_port()
+        server = serve_in_thread(api, port)
+        url = f"ws://127.0.0.1:{port}/ws/audio"
+    else:
+        url = args.url
+    base_url = re.sub(r"^ws", "http", url.split("/ws/")[0])
+
+    try:
+        lag_before = read_loop_lag(base_url)
+        if backends:
+            backends.calls.clear()
+        stats, wall_seconds = asyncio.run(run_load(url, clips, args.users, args.duration, args.ramp,
+                                                   args.think_time, not args.no_pacing, args.seed))
+        lag_after = read_loop_lag(base_url)
+    finally:
+        if server:
+            server.should_exit = True
+            server.thread.join(timeout=10)
+        if sys.stdout is not stdout:
+            sys.stdout.close()
+            sys.stdout = stdout
+
+    failed = sum(1 for turn in stats.turns if turn["error"])
+    # Time a turn spent waiting before the server started on it, and after it
+    # finished, is the client's latency minus the server's own trace of it
+    queue_delays = [turn["latency"] - collector[turn["trace_id"]] for turn in stats.turns
+                    if turn["trace_id"] in collector]
+    results = {
+        "started_at": datetime.now().isoformat(),
+        "url": args.url or "in-process",
+        "profile": None if args.url else args.profile,
+        "latencies": backends.config() if backends else None,
+        "time_scale": args.time_scale,
+        "users": args.users,
+        "duration": args.duration,
+        "think_time": args.think_time,
+        "paced": not args.no_pacing,
+        "seed": args.seed,
+        "wall_seconds": round(wall_seconds, 3),
+        "turns": len(stats.turns),
+        "failed_turns": failed,
+        "error_rate": round(failed / len(stats.turns), 4) if stats.turns else None,
+        "errors": stats.errors,
+        "connection_errors": stats.connection_errors,
+        "throughput_per_second": round(len(stats.turns) / wall_seconds, 3) if wall_seconds else None,
+        "latency": summarize([turn["latency"] for turn in stats.turns]),
+        "time_to_transcription": summarize([turn["transcribed"] for turn in stats.turns
+                                            if turn["transcribed"] is not None]),
+        "queue_delay": summarize(queue_delays) if collector else None,
+        "event_loop_lag": lag_between(lag_before, lag_after),
+        "backend_calls": dict(sorted(backends.calls.items())) if backends else None,
+    }
+    path = write_results(results, args.output, prefix="load")
+
+    rows = []
+    for metric in ("latency", "time_to_transcription", "queue_delay", "event_loop_lag"):
+        summary = results[metric] or {}
+        rows.append([metric, summary.get("count"), summary.get("p50_ms"), summary.get("p99_ms"),
+                     summary.get("max_ms")])
+    print(f"{results['turns']} turns from {args.users} users in {results['wall_seconds']}s: "
+          f"{results['throughput_per_second']} turns/s, error rate {results['error_rate']}, "
+          f"{stats.connection_errors} connection errors")
+    print_table(["metric", "n", "p50 ms", "p99 ms", "max ms"], rows)
+    print(f"\nResults written to {path}")
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+import argparse
+import base64
+import os
+import sys
+from datetime import datetime
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVER_DIR)
+
+from benchmarks.fakes import PROFILES, FakeBackends
+from benchmarks.report import print_table, summarize, write_results
+from benchmarks.run_benchmark import TraceCollector, _receive_reply, parse_overrides, start_server
+
+
+def replay_turn(client, turn):
+    """
+    Send a recorded turn's input through its endpoint
+
+    Returns:
+        str: The response the user would get, or None on failure
+    """
+    inputs = turn["inputs"]
+    if turn["kind"] == "audio":
+        # Without recorded audio, silence of the same length stands in for it
+        audio = base64.b64decode(inputs["audio"]) if inputs.get("audio") else bytes(inputs["audio_bytes"])
+        with client.websocket_connect("/ws/audio") as websocket:
+            websocket.send_bytes(audio)
+            reply = _receive_reply(websocket)
+        return None if reply.get("error") else reply.get("response")
+    response = client.post("/api/process-command", json={"text": inputs["text"], "user_id": inputs.get("user_id")})
+    return response.json().get("response") if response.status_code == 200 else None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay recorded turns offline to compare against the recording")
+    parser.add_argument("recordings", nargs="+", help="turns-*.jsonl.gz files written with RECORD_TURNS=true")
+    parser.add_argument("--time-scale", type=float, default=1.0,
+                        help="Multiply the recorded STT, OpenAI and tool delays (0 replays them instantly)")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="zero",
+                        help="Latency profile for the backends that are not recorded, like TTS and Pinecone")
+    parser.add_argument("--latency", action="append", metavar="BACKEND=SPEC",
+                        help="Override one unrecorded backend, e.g. tts=fixed:0.5 (repeatable)")
+    parser.add_argument("--output", help="Results file (default: benchmarks/results/replay-<time>.json)")
+    parser.add_argument("--verbose", action="store_true", help="Show the server's own output")
+    args = parser.parse_args(argv)
+
+    # Replays must never record themselves
+    os.environ["RECORD_TURNS"] = "false"
+    from monitoring.turn_recorder import load_turns
+    turns = [turn for path in args.recordings for turn in load_turns(path)]
+    if not turns:
+        raise SystemExit("No recorded turns to replay")
+
+    backends = FakeBackends(args.profile, parse_overrides(args.latency), 0, 1.0)
+    stdout = sys.stdout
+    if not args.verbose:
+        sys.stdout = open(os.devnull, "w")
+    try:
+        api = start_server(backends)
+        from fastapi.testclient import TestClient
+        from monitoring.tracing import STAGES, add_finish_listener, remove_finish_listener
+        from monitoring.turn_recorder import turn_recorder
+
+        client = TestClient(api.app)
+        collector = TraceCollector()
+        add_finish_listener(collector)
+        compared = []
+        for turn in turns:
+            replayed = turn_recorder.replay_next(turn, args.time_scale)
+            finished = len(collector.finished)
+            response = replay_turn(client, turn)
+            outcome, total = collector.finished[finished] if len(collector.finished) > finished else ("none", 0.0)
+            compared.append({
+                "trace_id": turn["trace_id"],
+                "kind": turn["kind"],
+                "recorded_ms": round(turn["total"] * 1000, 1),
+                "replayed_ms": round(total * 1000, 1),
+                "recorded_outcome": turn["outcome"],
+                "replayed_outcome": outcome,
+                "same_response": response == turn.get("response"),
+                "drift": replayed.drift,
+                "misses": replayed.misses,
+            })
+        remove_finish_listener(collector)
+    finally:
+        if sys.stdout is not stdout:
+            sys.stdout.close()
+            sys.stdout = stdout
+
+    recorded_stages = {}
+    for turn in turns:
+        for stage, seconds in turn["stages"].items():
+            recorded_stages.setdefault(stage, []).append(seconds)
+    replayed_stages = {}
+    for kind_stages in collector.stages.values():
+        for stage, values in kind_stages.items():
+            replayed_stages.setdefault(stage, []).extend(values)
+
+    results = {
+        "started_at": datetime.now().isoformat(),
+        "recordings": args.recordings,
+        "time_scale": args.time_scale,
+        "profile": args.profile,
+        "latencies": backends.config(),
+        "turns": len(turns),
+        "different_responses": sum(1 for turn in compared if not turn["same_response"]),
+        "drift": sum(turn["drift"] for turn in compared),
+        "misses": sum(turn["misses"] for turn in compared),
+        "recorded": summarize([turn["total"] for turn in turns]),
+        "replayed": summarize([total for _, total in collector.finished]),
+        "stages": {
+            stage: {"recorded": summarize(recorded_stages.get(stage, [])),
+                    "replayed": summarize(replayed_stages.get(stage, []))}
+            for stage in STAGES if stage in recorded_stages or stage in replayed_stages
+        },
+        "by_turn": compared,
+    }
+    path = write_results(results, args.output, prefix="replay")
+
+    rows = [["total", results["recorded"].get("p50_ms"), results["replayed"].get("p50_ms"),
+             results["recorded"].get("p90_ms"), results["replayed"].get("p90_ms")]]
+    for stage, summary in results["stages"].items():
+        rows.append([stage, summary["recorded"].get("p50_ms"), summary["replayed"].get("p50_ms"),
+                     summary["recorded"].get("p90_ms"), summary["replayed"].get("p90_ms")])
+    print(f"{len(turns)} turns replayed: {results['different_responses']} different responses, "
+          f"{results['drift']} drifted and {results['misses']} missing backend calls")
+    print_table(["stage", "recorded p50", "replayed p50", "recorded p90", "replayed p90"], rows)
+    print(f"\nResults written to {path}")
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+import json
+import math
+import os
+from datetime import datetime
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+
+def percentile(sorted_values, quantile):
+    """
+    Nearest-rank percentile
+
+    Args:
+        sorted_values (list): Values in ascending order
+        quantile (float): 0 to 1
+
+    Returns:
+        float: The percentile, or None for no values
+    """
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(quantile * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(seconds):
+    """
+    Latency percentiles of a list of durations
+
+    Args:
+        seconds (list): Durations in seconds
+
+    Returns:
+        dict: Count, mean, p50, p90, p99 and max in milliseconds
+    """
+    values = sorted(seconds)
+    if not values:
+        return {"count": 0}
+
+    def ms(value):
+        return round(value * 1000, 1)
+    return {
+        "count": len(values),
+        "mean_ms": ms(sum(values) / len(values)),
+        "p50_ms": ms(percentile(values, 0.5)),
+        "p90_ms": ms(percentile(values, 0.9)),
+        "p99_ms": ms(percentile(values, 0.99)),
+        "max_ms": ms(values[-1]),
+    }
+
+
+def write_results(results, path=None, prefix="benchmark"):
+    """
+    Write results as JSON for regression tracking
+
+    Args:
+        results (dict): The results
+        path (str): Output file (default: a timestamped file in benchmarks/results)
+        prefix (str): File name prefix for the default path
+
+    Returns:
+        str: The file written
+    """
+    if not path:
+        path = os.path.join(RESULTS_DIR, f"{prefix}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+    return path
+
+
+def print_table(headers, rows):
+    """Print rows as aligned columns"""
+    rows = [[("" if value is None else str(value)) for value in row] for row in rows]
+    widths = [max(len(str(header)), *(len(row[index]) for row in rows)) if rows else len(str(header))
+              for index, header in enumerate(headers)]
+    print("  ".join(str(header).ljust(width) for header, width in zip(headers, widths)))
+    for row in rows:
+        print("  ".join(value.ljust(width) for value, width in zip(row, widths)))
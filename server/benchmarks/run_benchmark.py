@@ -0,0 +1,202 @@
+import argparse
+import json
+import os
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVER_DIR)
+
+from benchmarks.corpus import TURNS
+from benchmarks.fakes import BACKENDS, PROFILES, FakeBackends, install, synthetic_audio
+from benchmarks.report import print_table, summarize, write_results
+
+# Endpoint names match the kinds of turn traces
+ENDPOINTS = {"rest": "/api/process-command", "audio": "/ws/audio", "text": "/ws/text"}
+
+
+def parse_overrides(values):
+    """Turn repeated backend=spec options into a dict"""
+    overrides = {}
+    for value in values or []:
+        backend, _, spec = value.partition("=")
+        if backend not in BACKENDS or not spec:
+            raise SystemExit(f"Invalid --latency {value!r}; expected one of {', '.join(BACKENDS)}=kind:params")
+        overrides[backend] = spec
+    return overrides
+
+
+def start_server(backends):
+    """
+    Install the fakes, then import the FastAPI app
+
+    Args:
+        backends (FakeBackends): Latencies and scripted answers
+
+    Returns:
+        module: The api module
+    """
+    for turn in TURNS:
+        backends.register_command(turn["text"], turn["tool_calls"])
+    install(backends)
+    import api
+    return api
+
+
+class TraceCollector:
+    """Stage timings of finished turn traces, grouped by endpoint"""
+
+    def __init__(self):
+        self.stages = defaultdict(lambda: defaultdict(list))
+        self.outcomes = defaultdict(lambda: defaultdict(int))
+        # (outcome, total seconds) of every trace, in the order they finished
+        self.finished = []
+
+    def __call__(self, trace, outcome, total, totals):
+        self.finished.append((outcome, total))
+        for stage, seconds in totals.items():
+            self.stages[trace.kind][stage].append(seconds)
+        self.outcomes[trace.kind][outcome] += 1
+
+
+def _receive_reply(websocket):
+    """Read messages until the final reply to an audio turn"""
+    while True:
+        message = websocket.receive_json()
+        if message.get("type") in ("jarvis", "error", "busy") or message.get("error"):
+            return message
+
+
+def run_turns(client, clips, iterations, record):
+    """
+    Replay the corpus over every endpoint
+
+    Args:
+        client (TestClient): Client for the app
+        clips (dict): Turn name -> audio payload
+        iterations (int): Passes over the corpus
+        record (callable): Takes endpoint, turn name, seconds and whether it succeeded
+    """
+    with client.websocket_connect(ENDPOINTS["audio"]) as audio_socket, \
+            client.websocket_connect(ENDPOINTS["text"]) as text_socket:
+        for _ in range(iterations):
+            for turn in TURNS:
+                started = time.perf_counter()
+                response = client.post(ENDPOINTS["rest"], json={"text": turn["text"], "user_id": "benchmark-rest"})
+                record("rest", turn["name"], time.perf_counter() - started, response.status_code == 200)
+
+                started = time.perf_counter()
+                audio_socket.send_bytes(clips[turn["name"]])
+                reply = _receive_reply(audio_socket)
+                record("audio", turn["name"], time.perf_counter() - started, reply.get("type") == "jarvis"
+                       and not reply.get("error"))
+
+                if turn.get("followup_response") and reply.get("command_data", {}).get("requires_followup"):
+                    started = time.perf_counter()
+                    text_socket.send_text(json.dumps({
+                        "type": "followup_response",
+                        "context": reply["command_data"],
+                        "response": turn["followup_response"],
+                    }))
+                    reply = text_socket.receive_json()
+                    record("text", turn["name"], time.perf_counter() - started, reply.get("type") == "jarvis")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline end-to-end latency benchmark with fake backends")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="realistic", help="Backend latency profile")
+    parser.add_argument("--latency", action="append", metavar="BACKEND=SPEC",
+                        help="Override one backend, e.g. llm_chat=lognormal:1.5:0.5 (repeatable)")
+    parser.add_argument("--time-scale", type=float, default=1.0, help="Multiply every backend latency")
+    parser.add_argument("--iterations", type=int, default=5, help="Measured passes over the corpus")
+    parser.add_argument("--warmup", type=int, default=1, help="Unmeasured passes before measuring")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the latency samples")
+    parser.add_argument("--output", help="Results file (default: benchmarks/results/benchmark-<time>.json)")
+    parser.add_argument("--verbose", action="store_true", help="Show the server's own output")
+    args = parser.parse_args(argv)
+
+    backends = FakeBackends(args.profile, parse_overrides(args.latency), args.seed, args.time_scale)
+    stdout = sys.stdout
+    if not args.verbose:
+        sys.stdout = open(os.devnull, "w")
+    try:
+        api = start_server(backends)
+        from fastapi.testclient import TestClient
+        from llm.hedged_calls import hedge_stats
+        from llm.intent_router import router_stats
+        from monitoring.tracing import STAGES, add_finish_listener, remove_finish_listener
+
+        clips = {}
+        for index, turn in enumerate(TURNS):
+            clips[turn["name"]] = synthetic_audio(turn["text"], seed=index)
+            backends.register_audio(clips[turn["name"]], turn["text"])
+
+        # Without the context manager the startup hooks, which index the disk, stay off
+        client = TestClient(api.app)
+        if args.warmup:
+            run_turns(client, clips, args.warmup, lambda *result: None)
+
+        latencies = defaultdict(lambda: defaultdict(list))
+        errors = defaultdict(int)
+
+        def record(endpoint, name, seconds, succeeded):
+            latencies[endpoint][name].append(seconds)
+            if not succeeded:
+                errors[endpoint] += 1
+
+        collector = TraceCollector()
+        backends.calls.clear()
+        add_finish_listener(collector)
+        started = time.perf_counter()
+        run_turns(client, clips, args.iterations, record)
+        wall_seconds = time.perf_counter() - started
+        remove_finish_listener(collector)
+    finally:
+        if sys.stdout is not stdout:
+            sys.stdout.close()
+            sys.stdout = stdout
+
+    results = {
+        "started_at": datetime.now().isoformat(),
+        "profile": args.profile,
+        "latencies": backends.config(),
+        "time_scale": args.time_scale,
+        "iterations": args.iterations,
+        "seed": args.seed,
+        "wall_seconds": round(wall_seconds, 3),
+        "endpoints": {
+            endpoint: {
+                "path": ENDPOINTS[endpoint],
+                "turns": sum(len(values) for values in latencies[endpoint].values()),
+                "errors": errors[endpoint],
+                "outcomes": dict(collector.outcomes[endpoint]),
+                "total": summarize([value for values in latencies[endpoint].values() for value in values]),
+                "by_turn": {name: summarize(values) for name, values in sorted(latencies[endpoint].items())},
+                "stages": {stage: summarize(collector.stages[endpoint][stage])
+                           for stage in STAGES if stage in collector.stages[endpoint]},
+            }
+            for endpoint in ENDPOINTS
+        },
+        "backend_calls": dict(sorted(backends.calls.items())),
+        "router": router_stats.snapshot(),
+        "hedging": hedge_stats.snapshot(),
+    }
+    path = write_results(results, args.output)
+
+    rows = []
+    for endpoint, summary in results["endpoints"].items():
+        total = summary["total"]
+        rows.append([endpoint, "total", summary["turns"], summary["errors"], total.get("p50_ms"), total.get("p90_ms"),
+                     total.get("p99_ms")])
+        for stage, stage_summary in summary["stages"].items():
+            rows.append(["", stage, stage_summary["count"], "", stage_summary["p50_ms"], stage_summary["p90_ms"],
+                         stage_summary["p99_ms"]])
+    print_table(["endpoint", "stage", "n", "errors", "p50 ms", "p90 ms", "p99 ms"], rows)
+    print(f"\nResults written to {path}")
+    return results
+
+
+if __name__ == "__main__":
+    main()
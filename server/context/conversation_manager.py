@@ -4,7 +4,8 @@ from datetime import datetime
 import json
 import uuid
 from dotenv import load_dotenv
-from openai import OpenAI
+from llm.openai_client import openai_client
+from context.session_store import SessionStore
 
 # Load environment variables
 load_dotenv()
@@ -32,16 +33,17 @@ class ConversationManager:
             
         self.index = self.pc.Index(self.index_name)
         
-        # Initialize OpenAI client for embeddings and chat
-        self.openai_client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+        # Shared OpenAI client for embeddings and chat
+        self.openai_client = openai_client
         
-        # Store current context
-        self._current_context = None
+        # Follow-up context of each user's pending command
+        self._current_contexts = SessionStore("context")
 
     def _generate_chat_title(self, message):
         """Generate a meaningful title for a chat based on the first message"""
         try:
-            response = self.openai_client.chat.completions.create(
+            response = self.openai_client.chat(
+                operation="titles",
                 model="gpt-3.5-turbo",
                 messages=[
                     {"role": "system", "content": "Generate a short, descriptive title (max 5 words) for a chat based on the first message. The title should capture the main topic or intent."},
@@ -265,13 +267,13 @@ class ConversationManager:
         if not text or not isinstance(text, str):
             text = "empty message"  # Use a default value for empty or invalid text
             
-        response = self.openai_client.embeddings.create(
+        response = self.openai_client.embed(
             model="text-embedding-3-small",
             input=text
         )
         return response.data[0].embedding
         
-    def store_conversation(self, user_id, query, response, requires_followup=False, followup_context=None):
+    def store_conversation(self, user_id, query, response, requires_followup=False, followup_context=None, embedding=None):
         """
         Store a conversation turn in Pinecone
         
@@ -281,6 +283,7 @@ class ConversationManager:
             response (str): Assistant's response
             requires_followup (bool): Whether this conversation requires follow-up
             followup_context (dict): Additional context for follow-up questions
+            embedding (list): Precomputed embedding of the query, to save an embeddings call
         """
         timestamp = datetime.now().isoformat()
         
@@ -298,7 +301,8 @@ class ConversationManager:
         vector_id = f"{user_id}_{timestamp}"
         
         # Get embedding for the query
-        embedding = self._get_embedding(query)
+        if embedding is None:
+            embedding = self._get_embedding(query)
         
         # Store in Pinecone with the actual embedding
         self.index.upsert(
@@ -353,33 +357,37 @@ class ConversationManager:
         # Delete all vectors for this user
         self.index.delete(filter={"user_id": user_id})
 
-    def set_current_context(self, context):
+    def set_current_context(self, user_id, context):
         """
-        Store the current conversation context
+        Store a user's current conversation context
         
         Args:
+            user_id (str): User identifier
             context (dict): The current command context to store
         """
-        print(f"\nSetting current context: {context}")
-        self._current_context = context
-        # Verify context was stored
-        print(f"Current context after setting: {self._current_context}")
+        print(f"\nSetting current context for {user_id}: {context}")
+        self._current_contexts.set(user_id, context)
 
-    def clear_current_context(self):
+    def clear_current_context(self, user_id):
         """
-        Clear the current conversation context
+        Clear a user's current conversation context
+        
+        Args:
+            user_id (str): User identifier
         """
-        print("\nClearing current context")
-        print(f"Context before clearing: {self._current_context}")
-        self._current_context = None
-        print("Context cleared")
+        print(f"\nClearing current context for {user_id}")
+        self._current_contexts.delete(user_id)
 
-    def get_current_context(self):
+    def get_current_context(self, user_id):
         """
-        Get the current conversation context
+        Get a user's current conversation context
         
+        Args:
+            user_id (str): User identifier
+            
         Returns:
             dict: The current command context, or None if no context exists
         """
-        print(f"\nGetting current context: {self._current_context}")
-        return self._current_context 
\ No newline at end of file
+        context = self._current_contexts.get(user_id)
+        print(f"\nGetting current context for {user_id}: {context}")
+        return context 
\ No newline at end of file
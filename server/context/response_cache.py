@@ -0,0 +1,203 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+# Minimum cosine similarity between utterances for a cached answer to be reused
+SIMILARITY_THRESHOLD = 0.93
+# Cached answers expire after this many seconds
+TTL_SECONDS = 24 * 60 * 60
+# Least recently used answers are evicted beyond this many per user
+MAX_ENTRIES_PER_USER = 256
+# and, taken from the least recently active users first, beyond this many in all
+MAX_ENTRIES = 4096
+
+# Answers to these depend on when they're asked
+_TIME_SENSITIVE = re.compile(
+    r"\b(now|today|tonight|tomorrow|yesterday|current(ly)?|latest|recent(ly)?|this (week|month|year|morning|evening)|"
+    r"weather|forecast|news|score|price|stock|time is it|what day is|date)\b"
+)
+# Follow-ups that only make sense with the previous turn
+_CONTEXT_DEPENDENT = re.compile(
+    r"^(and|but|also|what about|how about|why|then)\b|\b(it|that|those|these|he|she|they|them|his|her|their)\b"
+)
+
+
+def normalize_utterance(text):
+    """Lowercase, drop trailing punctuation and collapse whitespace"""
+    return " ".join(text.lower().strip().rstrip("?.!").split())
+
+
+def is_cacheable(text):
+    """
+    Whether a question's answer can be reused for a later, similar question
+
+    Args:
+        text (str): Normalized utterance
+
+    Returns:
+        bool: False for time-sensitive or context-dependent questions
+    """
+    return bool(text) and not _TIME_SENSITIVE.search(text) and not _CONTEXT_DEPENDENT.search(text)
+
+
+class ResponseCache:
+    """
+    Per-user cache of general_question answers keyed by utterance embedding.
+
+    Each user's entries live in an OrderedDict in least recently used order, so
+    a hit moves its entry to the end and eviction pops from the front. Users
+    are kept in least recently used order too, for the global cap, and in the
+    order they last stored an answer, so users whose answers have all expired
+    are dropped from the front.
+    """
+
+    def __init__(self, threshold=SIMILARITY_THRESHOLD, ttl=TTL_SECONDS, max_entries=MAX_ENTRIES_PER_USER,
+                 max_total_entries=MAX_ENTRIES):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_total_entries = max_total_entries
+        self._lock = threading.Lock()
+        self._users = OrderedDict()  # user_id -> entries, least recently used user first
+        self._stored_at = OrderedDict()  # user_id -> time of the user's newest entry, oldest first
+        self._size = 0
+        self._next_key = 0
+        self._stats = {"lookups": 0, "hits": 0, "bypassed": 0, "saved_seconds": 0.0, "lookup_seconds": 0.0}
+
+    def bypass(self):
+        """Count a question that skipped the cache"""
+        with self._lock:
+            self._stats["bypassed"] += 1
+
+    def lookup(self, user_id, embedding):
+        """
+        Find a cached answer to a similar question
+
+        Args:
+            user_id (str): Unique identifier for the user
+            embedding (list): Embedding of the normalized utterance
+
+        Returns:
+            dict: A copy of the cached command data, or None on a miss
+        """
+        started = time.perf_counter()
+        vector = _unit(embedding)
+        with self._lock:
+            self._stats["lookups"] += 1
+            entries = self._users.get(user_id)
+            best_key, best_score = None, self.threshold
+            if entries:
+                now = time.time()
+                for key in [key for key, entry in entries.items() if now - entry["created"] > self.ttl]:
+                    del entries[key]
+                    self._size -= 1
+                if not entries:
+                    self._drop_user(user_id)
+                for key, entry in entries.items():
+                    score = float(entry["vector"] @ vector)
+                    if score >= best_score:
+                        best_key, best_score = key, score
+
+            result = None
+            if best_key is not None:
+                entries.move_to_end(best_key)
+                self._users.move_to_end(user_id)
+                entry = entries[best_key]
+                self._stats["hits"] += 1
+                self._stats["saved_seconds"] += entry["llm_seconds"]
+                result = dict(entry["command_data"])
+                print(f"Response cache hit for \"{entry['text']}\" (similarity {best_score:.3f})")
+            self._stats["lookup_seconds"] += time.perf_counter() - started
+            return result
+
+    def store(self, user_id, text, embedding, command_data, llm_seconds):
+        """
+        Cache a general_question answer
+
+        Args:
+            user_id (str): Unique identifier for the user
+            text (str): Normalized utterance
+            embedding (list): Embedding of the normalized utterance
+            command_data (dict): Command data produced by the LLM
+            llm_seconds (float): Time the LLM call took, credited on later hits
+        """
+        now = time.time()
+        with self._lock:
+            # Users whose newest answer has expired have nothing left worth keeping
+            while self._stored_at:
+                oldest_user, stored = next(iter(self._stored_at.items()))
+                if now - stored <= self.ttl:
+                    break
+                self._drop_user(oldest_user)
+
+            entries = self._users.setdefault(user_id, OrderedDict())
+            self._users.move_to_end(user_id)
+            self._stored_at[user_id] = now
+            self._stored_at.move_to_end(user_id)
+            entries[self._next_key] = {
+                "text": text,
+                "vector": _unit(embedding),
+                "command_data": dict(command_data),
+                "created": now,
+                "llm_seconds": llm_seconds,
+            }
+            self._next_key += 1
+            self._size += 1
+            while len(entries) > self.max_entries:
+                entries.popitem(last=False)
+                self._size -= 1
+            while self._size > self.max_total_entries:
+                lru_user, lru_entries = next(iter(self._users.items()))
+                lru_entries.popitem(last=False)
+                self._size -= 1
+                if not lru_entries:
+                    self._drop_user(lru_user)
+
+    def _drop_user(self, user_id):
+        """Forget a user and their answers; call with the lock held"""
+        entries = self._users.pop(user_id, None)
+        if entries:
+            self._size -= len(entries)
+        self._stored_at.pop(user_id, None)
+
+    def clear(self, user_id=None):
+        """Drop the cached answers of one user, or of everyone"""
+        with self._lock:
+            if user_id is None:
+                self._users.clear()
+                self._stored_at.clear()
+                self._size = 0
+            else:
+                self._drop_user(user_id)
+
+    def stats(self):
+        """
+        Report hit rate and latency saved
+
+        Returns:
+            dict: Cache statistics
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            entries = self._size
+            users = len(self._users)
+        misses = stats["lookups"] - stats["hits"]
+        return {
+            "entries": entries,
+            "users": users,
+            "lookups": stats["lookups"],
+            "hits": stats["hits"],
+            "misses": misses,
+            "bypassed": stats["bypassed"],
+            "hit_rate": stats["hits"] / stats["lookups"] if stats["lookups"] else 0.0,
+            "estimated_seconds_saved": stats["saved_seconds"],
+            "average_lookup_ms": stats["lookup_seconds"] / stats["lookups"] * 1000 if stats["lookups"] else None,
+        }
+
+
+def _unit(embedding):
+    vector = np.asarray(embedding, dtype=np.float32)
+    return vector / (np.linalg.norm(vector) or 1)
@@ -0,0 +1,277 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from dotenv import load_dotenv
+
+from monitoring.metrics import registry
+
+try:
+    # Only needed for SESSION_STORE=redis
+    import redis
+except ImportError:
+    redis = None
+
+# Load environment variables
+load_dotenv()
+
+# "memory" keeps sessions in this process; "sqlite" shares them between the
+# workers on one machine and "redis" between machines
+SESSION_STORE = os.getenv('SESSION_STORE', 'memory')
+SESSION_SQLITE_PATH = os.getenv('SESSION_SQLITE_PATH', 'sessions.db')
+SESSION_REDIS_URL = os.getenv('SESSION_REDIS_URL', 'redis://localhost:6379/0')
+# Sessions expire this long after they were last written
+SESSION_TTL_SECONDS = float(os.getenv('SESSION_TTL_SECONDS', '900'))
+# The in-process backend evicts the least recently used sessions beyond this many
+SESSION_MAX_ENTRIES = int(os.getenv('SESSION_MAX_ENTRIES', '10000'))
+
+session_entries = registry.gauge("session_store_entries", "Sessions held in this process", ("namespace",))
+session_lookups = registry.counter("session_store_lookups_total", "Session reads", ("namespace", "result"))
+session_evictions = registry.counter("session_store_evictions_total", "Sessions dropped before being deleted",
+                                     ("namespace", "reason"))
+
+
+class MemoryBackend:
+    """
+    In-process sessions with TTL and LRU eviction
+
+    Entries live in an OrderedDict in least recently used order; expired
+    entries are dropped when read and from the front when writing.
+    """
+
+    def __init__(self, namespace, max_entries=SESSION_MAX_ENTRIES):
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def _expire(self, key, now):
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] <= now:
+            del self._entries[key]
+            session_evictions.inc(namespace=self.namespace, reason="ttl")
+            return None
+        return entry
+
+    def _update_size(self):
+        session_entries.set(len(self._entries), namespace=self.namespace)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._expire(key, time.monotonic())
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value, ttl):
+        now = time.monotonic()
+        with self._lock:
+            self._entries[key] = (now + ttl, value)
+            self._entries.move_to_end(key)
+            # The oldest entries are the likeliest to have expired
+            while self._entries:
+                oldest = next(iter(self._entries))
+                if self._entries[oldest][0] <= now:
+                    del self._entries[oldest]
+                    session_evictions.inc(namespace=self.namespace, reason="ttl")
+                elif len(self._entries) > self.max_entries:
+                    del self._entries[oldest]
+                    session_evictions.inc(namespace=self.namespace, reason="lru")
+                else:
+                    break
+            self._update_size()
+
+    def pop(self, key):
+        with self._lock:
+            entry = self._expire(key, time.monotonic())
+            if entry is not None:
+                del self._entries[key]
+            self._update_size()
+            return None if entry is None else entry[1]
+
+    def size(self):
+        with self._lock:
+            return len(self._entries)
+
+
+class RedisBackend:
+    """
+    Sessions in Redis, shared by every worker process
+
+    Redis expires keys itself; configure maxmemory-policy allkeys-lru for LRU
+    eviction. Works with any client offering get, set(ex=), getdel and
+    scan_iter, such as redis.Redis.
+    """
+
+    def __init__(self, namespace, client):
+        self.namespace = namespace
+        self.client = client
+        self.prefix = f"session:{namespace}:"
+
+    def get(self, key):
+        return self.client.get(self.prefix + key)
+
+    def set(self, key, value, ttl):
+        self.client.set(self.prefix + key, value, ex=max(1, int(ttl)))
+
+    def pop(self, key):
+        # GETDEL reads and deletes in one step, so two workers can't both take a session
+        return self.client.getdel(self.prefix + key)
+
+    def size(self):
+        return sum(1 for _ in self.client.scan_iter(match=self.prefix + "*"))
+
+
+class SqliteBackend:
+    """
+    Sessions in a SQLite file, shared by the worker processes on one machine
+
+    Expiry uses wall-clock time since every process must agree on it; expired
+    rows are ignored when read and purged on writes.
+    """
+
+    # Purge expired rows on one write in this many
+    PURGE_EVERY = 100
+
+    def __init__(self, namespace, db_path=None):
+        self.namespace = namespace
+        self.db_path = db_path or SESSION_SQLITE_PATH
+        self._lock = threading.Lock()
+        self._writes = 0
+        # Autocommit, so each statement is its own transaction across processes
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=5.0, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS sessions (
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT NOT NULL,
+                expires REAL NOT NULL,
+                PRIMARY KEY (namespace, key)
+            ) WITHOUT ROWID
+        """)
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM sessions WHERE namespace = ? AND key = ? AND expires > ?",
+                (self.namespace, key, time.time())
+            ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key, value, ttl):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sessions (namespace, key, value, expires) VALUES (?, ?, ?, ?)",
+                (self.namespace, key, value, now + ttl)
+            )
+            self._writes += 1
+            if self._writes % self.PURGE_EVERY == 0:
+                purged = self._conn.execute(
+                    "DELETE FROM sessions WHERE namespace = ? AND expires <= ?", (self.namespace, now)
+                ).rowcount
+                if purged:
+                    session_evictions.inc(purged, namespace=self.namespace, reason="ttl")
+
+    def pop(self, key):
+        # DELETE ... RETURNING reads and deletes in one statement, so two workers can't both take a session
+        with self._lock:
+            row = self._conn.execute(
+                "DELETE FROM sessions WHERE namespace = ? AND key = ? RETURNING value, expires",
+                (self.namespace, key)
+            ).fetchone()
+        if row is None or row[1] <= time.time():
+            return None
+        return row[0]
+
+    def size(self):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM sessions WHERE namespace = ? AND expires > ?", (self.namespace, time.time())
+            ).fetchone()[0]
+
+
+def create_backend(namespace, kind=None):
+    """
+    Build the backend selected by SESSION_STORE
+
+    Args:
+        namespace (str): Keeps the stores of different uses apart
+        kind (str): "memory", "sqlite" or "redis" (default: SESSION_STORE)
+
+    Returns:
+        The backend, or a MemoryBackend if Redis is unavailable
+    """
+    kind = kind or SESSION_STORE
+    if kind == "sqlite":
+        return SqliteBackend(namespace)
+    if kind == "redis":
+        if redis is None:
+            print("SESSION_STORE=redis but the redis package is not installed; keeping sessions in memory")
+        else:
+            return RedisBackend(namespace, redis.Redis.from_url(SESSION_REDIS_URL))
+    return MemoryBackend(namespace)
+
+
+class SessionStore:
+    """
+    Per-user session state with expiry
+
+    Values are stored as JSON, so every backend hands out independent
+    copies: changing a value has no effect until it is set again.
+    """
+
+    def __init__(self, namespace, backend=None, ttl=SESSION_TTL_SECONDS):
+        self.namespace = namespace
+        self.backend = backend or create_backend(namespace)
+        self.ttl = ttl
+
+    def get(self, user_id):
+        """
+        Read a user's session
+
+        Args:
+            user_id (str): Unique identifier for the user
+
+        Returns:
+            The stored value, or None if there is none or it expired
+        """
+        data = self.backend.get(user_id)
+        session_lookups.inc(namespace=self.namespace, result="miss" if data is None else "hit")
+        return None if data is None else json.loads(data)
+
+    def set(self, user_id, value):
+        """
+        Store a user's session, restarting its expiry
+
+        Args:
+            user_id (str): Unique identifier for the user
+            value: JSON-serializable state
+        """
+        self.backend.set(user_id, json.dumps(value, default=str), self.ttl)
+
+    def pop(self, user_id):
+        """
+        Remove a user's session and return it, in one step
+
+        Returns:
+            The stored value, or None
+        """
+        data = self.backend.pop(user_id)
+        return None if data is None else json.loads(data)
+
+    def delete(self, user_id):
+        """Remove a user's session"""
+        self.backend.pop(user_id)
+
+    def __contains__(self, user_id):
+        return self.backend.get(user_id) is not None
+
+    def size(self):
+        """Number of sessions held"""
+        return self.backend.size()
@@ -0,0 +1,224 @@
+import copy
+import json
+from typing import Literal, Optional
+
+from pydantic import BaseModel, ConfigDict, Field, ValidationError
+
+
+class CommandParameters(BaseModel):
+    """Base for the parameters of a command; unknown fields are dropped"""
+    model_config = ConfigDict(extra="ignore")
+
+
+class SearchStoreParameters(CommandParameters):
+    query: str = Field(description="Search term")
+
+
+class CalendarCheckParameters(CommandParameters):
+    date: Optional[str] = Field(None, description="YYYY-MM-DD for a specific date")
+    timeframe: Optional[Literal["today", "tomorrow", "this_week", "next week", "next"]] = Field(
+        None, description="Common timeframe, instead of a date")
+    start_date: Optional[str] = Field(None, description="YYYY-MM-DD start of a custom range")
+    end_date: Optional[str] = Field(None, description="YYYY-MM-DD end of a custom range")
+
+
+class CalendarAddParameters(CommandParameters):
+    title: str = Field(description="Event title")
+    date: str = Field(description="Natural language date, e.g. 'next Friday' or 'tomorrow'")
+    time: str = Field(description="Time in 24h format (e.g. '17:30') or 12h format (e.g. '5:30 PM')")
+    duration_minutes: int = Field(60, description="Event length in minutes")
+
+
+class CalendarFindSlotParameters(CommandParameters):
+    duration_minutes: int = Field(30, description="Length of the slot in minutes")
+    date: Optional[str] = Field(None, description="Natural language date; omit for today")
+    part_of_day: Optional[Literal["morning", "afternoon", "evening"]] = Field(
+        None, description="Omit for working hours")
+    title: Optional[str] = Field(
+        None, description="Event title, only when the user asked to schedule something without a fixed time")
+
+
+class OpenAppParameters(CommandParameters):
+    app_name: str = Field(description="Application name")
+
+
+class SearchFileParameters(CommandParameters):
+    filename: Optional[str] = Field(None, description="File name to search for")
+    content_query: Optional[str] = Field(
+        None, description="Words the document contains, when the user describes what is written inside it")
+    file_type: Optional[Literal["pdf", "docx", "txt", "md"]] = Field(None, description="Restrict to one document type")
+    semantic: bool = Field(False, description="True when the description is vague rather than specific words")
+
+
+class GeneralQuestionParameters(CommandParameters):
+    response: str = Field(description="The direct response to the user's question")
+
+
+class EmailCheckParameters(CommandParameters):
+    days_back: int = Field(7, description="How many days of mail to check")
+    important_only: bool = Field(False, description="Only important messages")
+    max_results: int = Field(10, description="Maximum number of messages")
+
+
+class EmailComposeParameters(CommandParameters):
+    to: Optional[str] = Field(None, description="Recipient email address")
+    subject: str = Field("No Subject", description="Subject, generated from the context if not given")
+    body: str = Field("", description="Message body, generated briefly from the context if not given")
+
+
+# The command set: type -> (description, parameter model). Prompts, tool
+# definitions, validation and execute_command dispatch are all derived from it.
+COMMANDS = {
+    "search_store": ("Search an online store for a product", SearchStoreParameters),
+    "calendar_check": ("Read the user's calendar events for a date, timeframe or range", CalendarCheckParameters),
+    "calendar_add": ("Add an event at a fixed date and time to the user's calendar", CalendarAddParameters),
+    "calendar_find_slot": ("Find free time in the user's calendar, booking it when a title is given",
+                           CalendarFindSlotParameters),
+    "open_app": ("Open an application on the desktop", OpenAppParameters),
+    "search_file": ("Find local files by name or by what is written inside them", SearchFileParameters),
+    "general_question": ("Answer a question or remark that needs none of the other tools",
+                         GeneralQuestionParameters),
+    "email_check": ("Read the user's recent email", EmailCheckParameters),
+    "email_send": ("Send an email", EmailComposeParameters),
+    "email_draft": ("Save an email as a draft", EmailComposeParameters),
+}
+COMMAND_TYPES = list(COMMANDS)
+
+# Tool arguments shared by every command for asking the user a follow-up question
+_FOLLOWUP_PROPERTIES = {
+    "followup_question": {
+        "type": ["string", "null"],
+        "description": "Question to ask the user when information is missing, else null",
+    },
+    "parameter_to_update": {
+        "type": ["string", "null"],
+        "description": "Parameter the user's answer to the follow-up question fills in, else null",
+    },
+}
+
+
+def _strict_schema(model):
+    """
+    Convert a parameter model to a JSON schema accepted by strict function calling
+
+    Strict mode needs every property listed as required and no additional
+    properties, so fields that are optional or have defaults become nullable;
+    a null argument falls back to the model default during validation.
+    """
+    schema = copy.deepcopy(model.model_json_schema())
+    schema.pop("title", None)
+    properties = {}
+    for name, prop in schema.get("properties", {}).items():
+        prop.pop("title", None)
+        has_default = "default" in prop
+        prop.pop("default", None)
+        if "anyOf" in prop:
+            # Optional[X] is rendered as anyOf [X, null]
+            for option in prop["anyOf"]:
+                option.pop("title", None)
+        elif has_default:
+            description = prop.pop("description", None)
+            prop = {"anyOf": [prop, {"type": "null"}]}
+            if description:
+                prop["description"] = description
+        properties[name] = prop
+    properties.update(copy.deepcopy(_FOLLOWUP_PROPERTIES))
+    return {
+        "type": "object",
+        "properties": properties,
+        "required": list(properties),
+        "additionalProperties": False,
+    }
+
+
+_TOOLS = {
+    command_type: {
+        "type": "function",
+        "function": {
+            "name": command_type,
+            "description": description,
+            "strict": True,
+            "parameters": _strict_schema(model),
+        },
+    }
+    for command_type, (description, model) in COMMANDS.items()
+}
+
+
+def tool_definitions(command_types=None, strict=True):
+    """
+    OpenAI tool definitions for a set of command types
+
+    Args:
+        command_types (list): Command types to offer (default: all)
+        strict (bool): Use strict function calling. Outputs are only guaranteed to
+            match the schemas without parallel tool calls, so requests allowing
+            several calls turn it off and rely on validate_parameters
+
+    Returns:
+        list: Tool definitions in the chat completions format
+    """
+    tools = [_TOOLS[command_type] for command_type in (command_types or COMMAND_TYPES)]
+    if strict:
+        return tools
+    return [dict(tool, function=dict(tool["function"], strict=False)) for tool in tools]
+
+
+def validate_parameters(command_type, parameters):
+    """
+    Validate raw parameters into the typed model of a command type
+
+    Null values are dropped first so they take the model defaults.
+
+    Args:
+        command_type (str): Command type
+        parameters (dict): Raw parameters from the LLM, a fast path or a follow-up
+
+    Returns:
+        CommandParameters: The typed parameters
+
+    Raises:
+        ValueError: For an unknown command type or invalid parameters
+    """
+    if command_type not in COMMANDS:
+        raise ValueError(f"Invalid command type: {command_type}")
+    model = COMMANDS[command_type][1]
+    try:
+        return model.model_validate({key: value for key, value in (parameters or {}).items() if value is not None})
+    except ValidationError as e:
+        problems = "; ".join(f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in e.errors())
+        raise ValueError(f"Invalid parameters for {command_type}: {problems}") from e
+
+
+def command_from_tool_call(tool_call):
+    """
+    Turn a tool call into command data with validated parameters
+
+    Args:
+        tool_call: A tool call from a chat completion message
+
+    Returns:
+        dict: Command data in the format process_with_llm returns
+
+    Raises:
+        ValueError: When the arguments are not valid JSON or fail validation
+    """
+    command_type = tool_call.function.name
+    try:
+        arguments = json.loads(tool_call.function.arguments or "{}")
+    except ValueError as e:
+        raise ValueError(f"Malformed arguments for {command_type}: {e}") from e
+    question = arguments.pop("followup_question", None)
+    parameter_to_update = arguments.pop("parameter_to_update", None)
+
+    parameters = validate_parameters(command_type, arguments)
+    command_data = {
+        "command_type": command_type,
+        "parameters": parameters.model_dump(exclude_none=True),
+        "requires_followup": bool(question),
+    }
+    if question:
+        command_data["followup_context"] = {"question": question, "context": {}}
+        if parameter_to_update:
+            command_data["followup_context"]["parameter_to_update"] = parameter_to_update
+    return command_data
@@ -0,0 +1,194 @@
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+
+from dotenv import load_dotenv
+
+from llm.openai_client import openai_client
+from monitoring.metrics import registry
+
+# Load environment variables
+load_dotenv()
+
+# "hedge" repeats a slow request on the same model, "fallback" sends it to a
+# faster model, "off" waits for the primary model alone. Backup requests cost
+# extra tokens, so hedging is opt-in.
+HEDGE_MODE = os.getenv('LLM_HEDGE_MODE', 'off')
+PRIMARY_MODEL = os.getenv('LLM_PRIMARY_MODEL', 'gpt-4o')
+FALLBACK_MODEL = os.getenv('LLM_FALLBACK_MODEL', 'gpt-4o-mini')
+# Seconds to wait for the primary before the backup request, or "auto" for the
+# observed p95 of the primary model
+HEDGE_AFTER = os.getenv('LLM_HEDGE_AFTER', 'auto')
+# Used by "auto" until enough primary latencies have been seen
+DEFAULT_HEDGE_AFTER = 3.0
+MIN_SAMPLES = 20
+LATENCY_WINDOW = 500
+
+call_seconds = registry.histogram(
+    "llm_hedged_call_seconds",
+    "Latency of hedged LLM calls, by winning path",
+    ("winner", "hedged"),
+)
+
+
+class HedgeStats:
+    """Which path answered each hedged call, and the primary model's latency"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._wins = {}
+        self._calls = 0
+        self._hedged = 0
+        self._primary_seconds = deque(maxlen=LATENCY_WINDOW)
+
+    def record(self, winner, seconds, hedged, primary_seconds):
+        """
+        Record one hedged call
+
+        Args:
+            winner (str): "primary", "hedge" or "fallback"
+            seconds (float): Time until the winning response was validated
+            hedged (bool): Whether a backup request was sent
+            primary_seconds (float): Latency of the primary if it answered validly, else None
+        """
+        print(f"LLM call answered by {winner} in {seconds:.2f}s" + (" (hedged)" if hedged else ""))
+        call_seconds.observe(seconds, winner=winner, hedged=str(hedged).lower())
+        with self._lock:
+            self._calls += 1
+            self._hedged += int(hedged)
+            self._wins[winner] = self._wins.get(winner, 0) + 1
+        if primary_seconds is not None:
+            self.record_primary(primary_seconds)
+
+    def record_primary(self, seconds):
+        """Add the latency of a primary request that completed with a valid answer"""
+        with self._lock:
+            self._primary_seconds.append(seconds)
+
+    def primary_p95(self):
+        """
+        p95 of recent primary latencies
+
+        Returns:
+            float: Seconds, or None before MIN_SAMPLES calls
+        """
+        with self._lock:
+            samples = sorted(self._primary_seconds)
+        if len(samples) < MIN_SAMPLES:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+
+    def hedge_after(self):
+        """
+        Seconds to wait for the primary before sending the backup request
+
+        Returns:
+            float: The configured delay, or the observed p95 when set to "auto"
+        """
+        if HEDGE_AFTER != "auto":
+            return float(HEDGE_AFTER)
+        p95 = self.primary_p95()
+        return DEFAULT_HEDGE_AFTER if p95 is None else p95
+
+    def snapshot(self):
+        """
+        Summarize hedging so the delay can be tuned
+
+        Returns:
+            dict: Call and hedge counts, wins per path and the current delay
+        """
+        with self._lock:
+            calls, hedged, wins = self._calls, self._hedged, dict(self._wins)
+        return {
+            "mode": HEDGE_MODE,
+            "calls": calls,
+            "hedged": hedged,
+            "hedge_rate": hedged / calls if calls else 0.0,
+            "wins": wins,
+            "primary_p95_seconds": self.primary_p95(),
+            "hedge_after_seconds": self.hedge_after(),
+        }
+
+
+hedge_stats = HedgeStats()
+
+
+async def _attempt(path, model, parse, kwargs):
+    """Send one request and parse it, so an invalid response never wins"""
+    response = await openai_client.achat(model=model, **kwargs)
+    return path, parse(response), response
+
+
+async def ahedged_chat(parse, model=None, mode=None, hedge_after=None, **kwargs):
+    """
+    Chat completion that sends a backup request when the primary is slow
+
+    The first valid response wins and a pending backup is cancelled. A
+    primary that loses the race is left to finish, so its latency still counts
+    towards the p95; one that fails outright triggers the backup straight away.
+
+    Args:
+        parse (callable): Turns a response into a result, raising ValueError when it is invalid
+        model (str): Primary model (default LLM_PRIMARY_MODEL)
+        mode (str): "hedge", "fallback" or "off" (default LLM_HEDGE_MODE)
+        hedge_after (float): Seconds before the backup request (default from hedge_stats)
+        **kwargs: Arguments for chat.completions.create, without the model
+
+    Returns:
+        tuple: (parsed result, response, winning path)
+    """
+    model = model or PRIMARY_MODEL
+    mode = mode or HEDGE_MODE
+    delay = hedge_after if hedge_after is not None else hedge_stats.hedge_after()
+    if mode == "fallback" and FALLBACK_MODEL != model:
+        backup = ("fallback", FALLBACK_MODEL)
+    else:
+        backup = ("hedge", model)
+
+    started = time.perf_counter()
+    primary = asyncio.ensure_future(_attempt("primary", model, parse, kwargs))
+    pending = {primary}
+    backup_sent = mode == "off"
+    error = None
+    answered = False
+    try:
+        while pending or not backup_sent:
+            if not pending or (not backup_sent and time.perf_counter() - started >= delay):
+                print(f"No valid answer from {model} after {time.perf_counter() - started:.2f}s, "
+                      f"sending {backup[0]} request to {backup[1]}")
+                pending.add(asyncio.ensure_future(_attempt(backup[0], backup[1], parse, kwargs)))
+                backup_sent = True
+            timeout = None if backup_sent else max(0.0, delay - (time.perf_counter() - started))
+            done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                try:
+                    path, result, response = task.result()
+                except Exception as e:
+                    print(f"LLM request failed: {type(e).__name__}: {str(e)}")
+                    error = e
+                    continue
+                seconds = time.perf_counter() - started
+                hedge_stats.record(path, seconds, mode != "off" and backup_sent,
+                                   seconds if task is primary else None)
+                answered = True
+                return result, response, path
+        raise error
+    finally:
+        for task in pending:
+            if answered and task is primary:
+                primary.add_done_callback(lambda task: _record_late_primary(task, started))
+            else:
+                task.cancel()
+
+
+def _record_late_primary(task, started):
+    # Only a valid answer says how long the primary takes
+    if not task.cancelled() and task.exception() is None:
+        hedge_stats.record_primary(time.perf_counter() - started)
+
+
+def hedged_chat(parse, model=None, mode=None, hedge_after=None, **kwargs):
+    """Blocking version of ahedged_chat"""
+    return openai_client.run(ahedged_chat(parse, model, mode, hedge_after, **kwargs))
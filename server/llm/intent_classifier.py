@@ -0,0 +1,368 @@
+import argparse
+import json
+import os
+import random
+import threading
+import time
+import zlib
+from collections import Counter
+
+import numpy as np
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# (utterance, command_type) pairs labelled by the LLM, one JSON object per line
+INTENT_LOG_PATH = os.getenv('INTENT_LOG_PATH', os.path.join(SERVER_DIR, 'intent_log.jsonl'))
+# Trained weights
+INTENT_MODEL_PATH = os.getenv('INTENT_MODEL_PATH', os.path.join(SERVER_DIR, 'intent_model.npz'))
+
+# Number of hashed feature buckets; collisions are rare at the vocabulary size of spoken commands
+FEATURE_BUCKETS = 2 ** 15
+# Training defaults
+EPOCHS = 30
+LEARNING_RATE = 0.5
+L2 = 1e-5
+BATCH_SIZE = 64
+# Intents need this many logged examples before the model will predict them
+MIN_EXAMPLES_PER_INTENT = 5
+
+_log_lock = threading.Lock()
+
+
+def _normalize(text):
+    return " ".join(text.lower().strip().rstrip("?.!").split())
+
+
+def featurize(text):
+    """
+    Hash word unigrams, word bigrams and character trigrams into feature buckets
+
+    Args:
+        text (str): Utterance
+
+    Returns:
+        numpy.ndarray: Sorted unique bucket indices
+    """
+    normalized = _normalize(text)
+    words = normalized.split()
+    features = ["w:" + word for word in words]
+    features += ["b:" + a + " " + b for a, b in zip(["<s>"] + words, words + ["</s>"])]
+    padded = f" {normalized} "
+    features += ["c:" + padded[i:i + 3] for i in range(len(padded) - 2)]
+    # crc32 rather than hash(): string hashes are salted per process
+    return np.unique(np.array(
+        [zlib.crc32(feature.encode('utf-8')) % FEATURE_BUCKETS for feature in features], dtype=np.int64
+    ))
+
+
+def log_example(text, command_type, path=None):
+    """
+    Append a labelled utterance to the training log
+
+    Args:
+        text (str): The recognized speech text
+        command_type (str): Command type chosen by the LLM
+        path (str): Log file (default INTENT_LOG_PATH)
+    """
+    try:
+        line = json.dumps({"text": text, "command_type": command_type, "ts": time.time()})
+        with _log_lock, open(path or INTENT_LOG_PATH, 'a', encoding='utf-8') as f:
+            f.write(line + "\n")
+    except Exception as e:
+        print(f"Error logging intent example: {str(e)}")
+
+
+def load_examples(path=None):
+    """
+    Read logged examples, keeping the latest label for repeated utterances
+
+    Args:
+        path (str): Log file (default INTENT_LOG_PATH)
+
+    Returns:
+        list: (text, command_type) tuples
+    """
+    latest = {}
+    path = path or INTENT_LOG_PATH
+    if not os.path.exists(path):
+        return []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record.get("text") and record.get("command_type"):
+                latest[_normalize(record["text"])] = (record["text"], record["command_type"])
+    return list(latest.values())
+
+
+class IntentClassifier:
+    """
+    Multinomial logistic regression over hashed n-gram features.
+
+    Weights are a (FEATURE_BUCKETS, intents) matrix, so a prediction is a sum
+    of a few dozen rows followed by a softmax.
+    """
+
+    def __init__(self, labels=None, weights=None, bias=None):
+        self.labels = list(labels or [])
+        self.weights = weights
+        self.bias = bias
+
+    def is_trained(self):
+        return self.weights is not None and len(self.labels) > 1
+
+    def _logits(self, features):
+        return self.weights[features].sum(axis=0) + self.bias
+
+    def rank(self, text):
+        """
+        Score every command type for an utterance
+
+        Args:
+            text (str): The recognized speech text
+
+        Returns:
+            list: (command_type, probability) tuples, most likely first; empty if the model isn't trained
+        """
+        if not self.is_trained():
+            return []
+        logits = self._logits(featurize(text))
+        probabilities = np.exp(logits - logits.max())
+        probabilities /= probabilities.sum()
+        order = np.argsort(-probabilities)
+        return [(self.labels[i], float(probabilities[i])) for i in order]
+
+    def predict(self, text):
+        """
+        Predict the command type of an utterance
+
+        Args:
+            text (str): The recognized speech text
+
+        Returns:
+            tuple: (command_type, confidence), or (None, 0.0) if the model isn't trained
+        """
+        ranked = self.rank(text)
+        return ranked[0] if ranked else (None, 0.0)
+
+    def train(self, examples, epochs=EPOCHS, learning_rate=LEARNING_RATE, seed=0):
+        """
+        Fit the model with mini-batch gradient descent
+
+        Args:
+            examples (list): (text, command_type) tuples
+            epochs (int): Passes over the data
+            learning_rate (float): Step size
+            seed (int): Shuffle seed, for repeatable training
+        """
+        counts = Counter(label for _, label in examples)
+        self.labels = sorted(label for label, count in counts.items() if count >= MIN_EXAMPLES_PER_INTENT)
+        label_ids = {label: i for i, label in enumerate(self.labels)}
+        data = [(featurize(text), label_ids[label]) for text, label in examples if label in label_ids]
+
+        self.weights = np.zeros((FEATURE_BUCKETS, len(self.labels)), dtype=np.float32)
+        self.bias = np.zeros(len(self.labels), dtype=np.float32)
+        if len(self.labels) < 2:
+            return
+
+        rng = random.Random(seed)
+        for _ in range(epochs):
+            rng.shuffle(data)
+            for start in range(0, len(data), BATCH_SIZE):
+                batch = data[start:start + BATCH_SIZE]
+                rows = np.concatenate([np.full(len(features), i) for i, (features, _) in enumerate(batch)])
+                columns = np.concatenate([features for features, _ in batch])
+                targets = np.array([label for _, label in batch])
+
+                logits = np.zeros((len(batch), len(self.labels)), dtype=np.float32)
+                np.add.at(logits, rows, self.weights[columns])
+                logits += self.bias
+                logits -= logits.max(axis=1, keepdims=True)
+                gradient = np.exp(logits)
+                gradient /= gradient.sum(axis=1, keepdims=True)
+                gradient[np.arange(len(batch)), targets] -= 1
+                gradient /= len(batch)
+
+                # Only the rows of features present in the batch change
+                self.weights[np.unique(columns)] *= 1 - learning_rate * L2
+                np.add.at(self.weights, columns, -learning_rate * gradient[rows])
+                self.bias -= learning_rate * gradient.sum(axis=0)
+
+    def evaluate(self, examples):
+        """
+        Measure accuracy on labelled examples
+
+        Args:
+            examples (list): (text, command_type) tuples
+
+        Returns:
+            dict: Overall accuracy, per-intent accuracy and the average prediction time
+        """
+        started = time.perf_counter()
+        predictions = [(label, self.predict(text)[0]) for text, label in examples]
+        return _score(predictions, time.perf_counter() - started)
+
+    def save(self, path):
+        """Write the model to an .npz file"""
+        np.savez_compressed(path, labels=np.array(self.labels), weights=self.weights, bias=self.bias)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Read a model written by save
+
+        Returns:
+            IntentClassifier: The model, or None if the file is missing or unreadable
+        """
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path) as data:
+                return cls(data["labels"].tolist(), data["weights"], data["bias"])
+        except Exception as e:
+            print(f"Error loading intent model: {str(e)}")
+            return None
+
+
+def _score(predictions, elapsed):
+    """Accuracy report for (label, predicted) pairs that took elapsed seconds to predict"""
+    correct = 0
+    per_intent = {}
+    for label, predicted in predictions:
+        hit = predicted == label
+        correct += hit
+        totals = per_intent.setdefault(label, [0, 0])
+        totals[0] += hit
+        totals[1] += 1
+    return {
+        "examples": len(predictions),
+        "accuracy": correct / len(predictions) if predictions else None,
+        "per_intent": {label: hits / total for label, (hits, total) in sorted(per_intent.items())},
+        "average_predict_us": elapsed / len(predictions) * 1e6 if predictions else None,
+    }
+
+
+def cross_validate(examples, folds=5, seed=0):
+    """
+    Estimate accuracy on unseen utterances
+
+    Each fold is predicted by a model trained on the other folds, so every
+    example is scored by a model that never saw it.
+
+    Args:
+        examples (list): (text, command_type) tuples
+        folds (int): Number of folds
+        seed (int): Shuffle seed, for repeatable folds
+
+    Returns:
+        dict: Accuracy as from evaluate, plus the fold count, or None if there are too few examples
+    """
+    examples = list(examples)
+    if len(examples) < 2 * MIN_EXAMPLES_PER_INTENT:
+        return None
+    random.Random(seed).shuffle(examples)
+    folds = max(2, min(folds, len(examples)))
+    predictions = []
+    elapsed = 0.0
+    for fold in range(folds):
+        held_out = examples[fold::folds]
+        model = IntentClassifier()
+        model.train([example for i, example in enumerate(examples) if i % folds != fold], seed=seed)
+        started = time.perf_counter()
+        predictions.extend((label, model.predict(text)[0]) for text, label in held_out)
+        elapsed += time.perf_counter() - started
+    results = _score(predictions, elapsed)
+    results["folds"] = folds
+    return results
+
+
+def split_examples(examples, holdout=0.2, seed=0):
+    """Shuffle and split examples into training and evaluation sets"""
+    examples = list(examples)
+    random.Random(seed).shuffle(examples)
+    cut = int(len(examples) * (1 - holdout))
+    return examples[:cut], examples[cut:]
+
+
+def train_from_log(log_path=None, model_path=None, holdout=0.2):
+    """
+    Train on the logged examples, report held-out accuracy and save the model
+
+    The saved model is refitted on all examples after evaluation.
+
+    Args:
+        log_path (str): Log file (default INTENT_LOG_PATH)
+        model_path (str): Output file (default INTENT_MODEL_PATH)
+        holdout (float): Share of examples kept back for evaluation
+
+    Returns:
+        dict: Evaluation results, or None if there are too few examples
+    """
+    examples = load_examples(log_path)
+    if len(examples) < 2 * MIN_EXAMPLES_PER_INTENT:
+        print(f"Not enough logged examples to train ({len(examples)})")
+        return None
+
+    train_set, test_set = split_examples(examples, holdout)
+    model = IntentClassifier()
+    model.train(train_set)
+    results = model.evaluate(test_set) if test_set else {}
+
+    model.train(examples)
+    model.save(model_path or INTENT_MODEL_PATH)
+    results["trained_on"] = len(examples)
+    results["intents"] = model.labels
+    print(f"Trained intent model: {results}")
+    return results
+
+
+_classifier = None
+_classifier_lock = threading.Lock()
+
+
+def get_classifier():
+    """Return the loaded model, loading it on first use; None if no model is trained"""
+    global _classifier
+    with _classifier_lock:
+        if _classifier is None:
+            _classifier = IntentClassifier.load(INTENT_MODEL_PATH) or IntentClassifier()
+        return _classifier if _classifier.is_trained() else None
+
+
+def reload_classifier():
+    """
+    Load the model file again, e.g. after retraining
+
+    Returns:
+        bool: Whether a trained model is now active
+    """
+    global _classifier
+    with _classifier_lock:
+        _classifier = IntentClassifier.load(INTENT_MODEL_PATH) or IntentClassifier()
+        return _classifier.is_trained()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train or evaluate the local intent classifier")
+    parser.add_argument("command", choices=["train", "evaluate"])
+    parser.add_argument("--log", default=INTENT_LOG_PATH, help="Logged (utterance, command_type) pairs")
+    parser.add_argument("--model", default=INTENT_MODEL_PATH, help="Model file")
+    parser.add_argument("--holdout", type=float, default=0.2, help="Share of examples held out for evaluation")
+    parser.add_argument("--folds", type=int, default=5, help="Cross-validation folds for evaluate")
+    args = parser.parse_args()
+
+    if args.command == "train":
+        results = train_from_log(args.log, args.model, args.holdout)
+    else:
+        # The saved model was trained on the whole log, so it is scored by cross-validation instead
+        results = cross_validate(load_examples(args.log), args.folds)
+        if results is None:
+            print(f"Not enough logged examples to evaluate in {args.log}")
+            return
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,236 @@
+import re
+import threading
+import time
+from datetime import datetime, timedelta
+
+WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+
+# Words that mean the utterance asks for an action or more than one thing; those
+# always go to the LLM
+_AMBIGUOUS = re.compile(
+    r"\b(send|draft|write|compose|reply|forward|(?<!my )(?<!the )schedule|add|create|book|cancel|delete|move|"
+    r"remind|and then|also|after that)\b|\band\b.*\b(calendar|e-?mails?|inbox|files?)\b"
+)
+
+_CALENDAR_CHECK = re.compile(
+    r"^(?:hey |ok |okay )?(?:jarvis,? )?"
+    r"(?:what(?:'s| is| do i have)|what's happening|show(?: me)?|check|read|tell me|list|do i have|am i free|"
+    r"is there anything|anything)\b.*\b(?:calendar|schedule|agenda|events?|meetings?|appointments?|plans?|free)\b"
+    r"|^(?:am i|are we) (?:free|busy|available)\b"
+)
+
+_EMAIL_CHECK = re.compile(
+    r"^(?:hey |ok |okay )?(?:jarvis,? )?"
+    r"(?:check|read|show(?: me)?|any|what(?:'s| are| is)|do i have|did i get|list|go through)\b.*"
+    r"\b(?:e-?mails?|inbox|mail|messages)\b"
+)
+
+# The utterance is about the user's own calendar or inbox, not e.g. a sports schedule
+_PERSONAL = re.compile(r"\b(my|me|i|i'm|am i|do i)\b|^(check|read|any) |\bon the (calendar|agenda)\b")
+
+_LAST_N_DAYS = re.compile(r"\b(?:last|past) (\d+|two|three|four|five|six|seven|ten|fourteen|thirty) days?\b")
+_NUMBER_WORDS = {"two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7,
+                 "ten": 10, "fourteen": 14, "thirty": 30}
+_ON_WEEKDAY = re.compile(r"\b(?:on |this |next )?(" + "|".join(WEEKDAYS) + r")\b")
+
+# Time phrases extract_timeframe can't resolve; an utterance with one goes to the LLM
+# rather than falling back to a wrong default
+_COUNT = r"(?:\d+|a|an|one|two|three|four|five|six|seven|eight|nine|ten|fourteen|thirty|few|couple(?: of)?)"
+_ORDINAL_WORDS = (r"(?:first|second|third|fourth|fifth|sixth|seventh|eighth|ninth|tenth|eleventh|twelfth|"
+                  r"\w+teenth|twentieth|twenty[- ]\w+|thirtieth|thirty[- ]first)")
+_UNPARSED_TIME = re.compile(
+    r"\b(?:january|february|march|april|june|july|august|september|october|november|december|may \d)"
+    r"|\b\d{1,2}(?:st|nd|rd|th)\b|\b(?:on|by|until) the " + _ORDINAL_WORDS + r"\b|\bthe " + _ORDINAL_WORDS + r" of\b"
+    r"|\b\d{1,2}/\d{1,2}\b|\b\d{4}-\d{2}-\d{2}\b"
+    r"|\bweekends?\b|\b(?:months?|years?|fortnight)\b|\bday after tomorrow\b|\byesterday\b|\bago\b"
+    r"|\bin " + _COUNT + r"? ?(?:days?|weeks?)\b"
+    r"|\b(?:next|following|coming|upcoming|last|past) " + _COUNT + r" (?:days?|weeks?)\b"
+    r"|\b(?:next|following|coming|upcoming|last|past) days?\b|\b(?:last|past|previous) week\b"
+)
+
+
+def _normalize(text):
+    """Lowercase, drop trailing punctuation and collapse whitespace"""
+    return " ".join(text.lower().strip().rstrip("?.!").split())
+
+
+def extract_timeframe(text, today=None):
+    """
+    Extract calendar_check parameters from an utterance
+
+    Args:
+        text (str): Normalized utterance
+        today (date): Reference date, for repeatable results
+
+    Returns:
+        dict: {"timeframe": ...} or {"date": "YYYY-MM-DD"}, or None if no
+            unambiguous timeframe was found
+    """
+    today = today or datetime.now().date()
+    if _UNPARSED_TIME.search(text):
+        return None
+    if re.search(r"\bnext week\b", text):
+        return {"timeframe": "next week"}
+    if re.search(r"\b(this|the) week\b|\bweek ahead\b", text):
+        return {"timeframe": "this_week"}
+    if re.search(r"\b(tomorrow|tmrw)\b", text):
+        return {"timeframe": "tomorrow"}
+    match = _ON_WEEKDAY.search(text)
+    if match:
+        days_ahead = (WEEKDAYS.index(match.group(1)) - today.weekday()) % 7
+        if "next " + match.group(1) in text and days_ahead == 0:
+            days_ahead = 7
+        return {"date": (today + timedelta(days=days_ahead)).isoformat()}
+    if re.search(r"\b(today|tonight|this (morning|afternoon|evening))\b", text):
+        return {"timeframe": "today"}
+    # "What's next", "upcoming events", but not "next month" or "next three days"
+    if re.search(r"\b(next|upcoming|coming up)\b(?!\s+(?:\w+\s+)?(?:days?|weeks?|weekends?|months?|years?)\b)",
+                 text):
+        return {"timeframe": "next"}
+    return None
+
+
+def _email_parameters(text):
+    """Build email_check parameters from an utterance"""
+    days_back = 7
+    match = _LAST_N_DAYS.search(text)
+    if match:
+        value = match.group(1)
+        days_back = int(value) if value.isdigit() else _NUMBER_WORDS[value]
+    elif re.search(r"\b(today|this morning)\b", text):
+        days_back = 1
+    elif "yesterday" in text:
+        days_back = 2
+    elif re.search(r"\b(this|last|past) month\b", text):
+        days_back = 30
+    return {
+        "days_back": days_back,
+        "important_only": bool(re.search(r"\b(important|urgent|priority)\b", text)),
+        "max_results": 10,
+    }
+
+
+def local_parameters(command_type, text):
+    """
+    Extract parameters without the LLM for intents simple enough to allow it
+
+    Args:
+        command_type (str): Command type predicted for the utterance
+        text (str): The recognized speech text
+
+    Returns:
+        dict: Parameters, or None if they can't be extracted locally
+    """
+    normalized = _normalize(text)
+    if _AMBIGUOUS.search(normalized):
+        return None
+    if command_type == "calendar_check":
+        return extract_timeframe(normalized)
+    if command_type == "email_check":
+        return _email_parameters(normalized)
+    return None
+
+
+def route_command(text):
+    """
+    Map an unambiguous utterance straight to a command without calling the LLM
+
+    Args:
+        text (str): The recognized speech text
+
+    Returns:
+        dict: Command data in the same schema as process_with_llm, or None to
+            fall back to the LLM
+    """
+    normalized = _normalize(text)
+    if (not normalized or len(normalized.split()) > 14 or _AMBIGUOUS.search(normalized)
+            or not _PERSONAL.search(normalized)):
+        return None
+
+    is_calendar = bool(_CALENDAR_CHECK.search(normalized))
+    is_email = bool(_EMAIL_CHECK.search(normalized))
+    # Mentions of both (or neither) are left to the LLM
+    if is_calendar == is_email:
+        return None
+
+    if is_calendar:
+        parameters = extract_timeframe(normalized)
+        if parameters is None:
+            # Today is only the default when no time was mentioned at all
+            if _UNPARSED_TIME.search(normalized) or not re.search(r"\b(calendar|schedule|agenda)\b", normalized):
+                return None
+            parameters = {"timeframe": "today"}
+        command_type = "calendar_check"
+    else:
+        command_type = "email_check"
+        parameters = _email_parameters(normalized)
+
+    return {
+        "command_type": command_type,
+        "parameters": parameters,
+        "requires_followup": False
+    }
+
+
+class RouterStats:
+    """Counts and latency totals for each way a command can be produced"""
+
+    # "rules": rule fast path, "classifier": local model without an LLM call,
+    # "cache": cached general_question answer, "intent_llm": LLM with a
+    # single-intent prompt, "llm": LLM with the full prompt
+    PATHS = ("rules", "classifier", "cache", "intent_llm", "llm")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._started = time.time()
+        self._counts = {path: 0 for path in self.PATHS}
+        self._seconds = {path: 0.0 for path in self.PATHS}
+
+    def record(self, path, seconds):
+        """
+        Record one routed utterance
+
+        Args:
+            path (str): One of PATHS
+            seconds (float): Time spent producing the command on that path
+        """
+        with self._lock:
+            self._counts[path] += 1
+            self._seconds[path] += seconds
+
+    def snapshot(self):
+        """
+        Summarize hit rate, latency per path and estimated time saved
+
+        Returns:
+            dict: Routing statistics
+        """
+        with self._lock:
+            counts = dict(self._counts)
+            seconds = dict(self._seconds)
+        total = sum(counts.values())
+        average = {path: seconds[path] / counts[path] if counts[path] else None for path in counts}
+        # Time saved is measured against the full-prompt LLM path
+        saved = 0.0
+        if average["llm"] is not None:
+            for path in ("rules", "classifier", "cache", "intent_llm"):
+                if counts[path]:
+                    saved += counts[path] * max(0.0, average["llm"] - average[path])
+        uptime_days = max((time.time() - self._started) / 86400, 1 / 24)
+        return {
+            "total": total,
+            "rule_hits": counts["rules"],
+            "classifier_hits": counts["classifier"],
+            "cache_hits": counts["cache"],
+            "intent_prompt_calls": counts["intent_llm"],
+            "llm_calls": counts["llm"],
+            # Share of utterances answered without any LLM call
+            "hit_rate": (counts["rules"] + counts["classifier"] + counts["cache"]) / total if total else 0.0,
+            "average_ms": {path: value * 1000 if value is not None else None for path, value in average.items()},
+            "estimated_seconds_saved": saved,
+            # Uptime under an hour is treated as an hour to avoid wild projections
+            "estimated_seconds_saved_per_day": saved / uptime_days,
+        }
+
+
+router_stats = RouterStats()
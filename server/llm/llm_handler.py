@@ -1,19 +1,35 @@
 import os
 from dotenv import load_dotenv
-from openai import OpenAI
-import json
+import time
 from context.conversation_manager import ConversationManager
+from llm.intent_router import local_parameters, route_command, router_stats
+from llm.intent_classifier import get_classifier, log_example
+from context.response_cache import ResponseCache, is_cacheable, normalize_utterance
+from llm.prompt_builder import (build_intent_prompt, build_messages, build_system_prompt, likely_intents,
+                                prompt_stats, summarize_command)
+from llm.command_schemas import COMMANDS, command_from_tool_call, tool_definitions, validate_parameters
+from llm.hedged_calls import hedged_chat
+from llm.model_router import model_router
+from monitoring.tracing import span
+from pipeline.cancellation import check_cancelled
 from datetime import datetime, timedelta
 
 # Load environment variables
 load_dotenv()
 
-# Initialize OpenAI client
-client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
-
 # Initialize conversation manager
 conversation_manager = ConversationManager()
 
+# Answers to repeated general questions, keyed by utterance embedding
+response_cache = ResponseCache()
+
+# Above this classifier confidence the LLM only extracts parameters, with a prompt for that intent
+INTENT_PROMPT_THRESHOLD = float(os.getenv('INTENT_PROMPT_THRESHOLD', '0.85'))
+# Above this confidence intents whose parameters can be read locally skip the LLM entirely
+INTENT_SKIP_THRESHOLD = float(os.getenv('INTENT_SKIP_THRESHOLD', '0.97'))
+# Tool calls whose arguments fail validation are retried up to this many attempts in total
+MAX_TOOL_ATTEMPTS = 2
+
 def process_with_llm(text, user_id="default_user"):
     """
     Process the recognized speech text with OpenAI to understand the command
@@ -27,197 +43,257 @@ def process_with_llm(text, user_id="default_user"):
         dict: A dictionary containing the command type, parameters, and follow-up information
     """
     print(f"\nProcessing command: {text}")
+    started = time.perf_counter()
     
-    # Get recent conversation context
-    recent_context = conversation_manager.get_recent_context(user_id)
-    print(f"Recent context: {recent_context}")
+    # Unambiguous calendar and email checks skip the context lookup and the LLM call
+    command_data = route_command(text)
+    if command_data:
+        router_stats.record("rules", time.perf_counter() - started)
+        print(f"Fast path command data: {command_data}")
+        try:
+            return _finish_command(text, user_id, command_data)
+        except Exception as e:
+            print(f"Error processing command: {str(e)}")
+            conversation_manager.clear_current_context(user_id)
+            return None
     
-    # Define the system message that sets up the context and expected output format
-    system_message = """You are a command processor for a desktop assistant. 
-    Your job is to understand user commands and output them in a structured format.
-    For email commands (email_send or email_draft), you MUST include both subject and body in the parameters.
-    If the user doesn't specify a subject or body, use appropriate defaults:
-    - For subject: "No Subject" or generate a subject based on the context
-    - For body: "" (empty string) or generate a brief body based on the context
-    
-    The output should be a JSON object with the following structure:
-    {
-        "command_type": one of ["search_store", "calendar_check", "calendar_add", "open_app", "search_file", "general_question", "email_check", "email_send", "email_draft"],
-        "parameters": {
-            // For specific command types:
-            // search_store: {"query": "search term"}
-            // calendar_check: {
-            //     "date": "YYYY-MM-DD" for specific dates, or
-            //     "timeframe": "today/tomorrow/this_week" for common timeframes, or
-            //     "start_date": "YYYY-MM-DD",
-            //     "end_date": "YYYY-MM-DD" for custom date ranges
-            // }
-            // calendar_add: {
-            //     "title": "event title",
-            //     "date": "natural language date (e.g., 'next Friday', 'tomorrow', 'next week')",
-            //     "time": "time in 24h format (e.g., '17:30') or 12h format (e.g., '5:30 PM')"
-            // }
-            // open_app: {"app_name": "application name"}
-            // search_file: {"filename": "file name to search"}
-            // email_check: {"days_back": number, "important_only": boolean, "max_results": number}
-            // email_send: {"to": "email", "subject": "subject", "body": "content"}
-            // email_draft: {"to": "email", "subject": "subject", "body": "content"}
-            
-            // For general_question:
-            // {
-            //     "response": "The direct response to the user's question",
-            //     "requires_followup": boolean,
-            //     "followup_context": {
-            //         "question": "Follow-up question if needed",
-            //         "context": "Additional context for follow-up"
-            //     }
-            // }
-        },
-        "requires_followup": boolean,
-        "followup_context": {
-            // When requires_followup is true, include:
-            "question": "The specific question to ask the user",
-            "parameter_to_update": "The parameter name that will be updated with the user's response",
-            // Optional additional context that might be needed for the follow-up
-            "context": {
-                // Any additional information needed for processing the follow-up
-            }
-        }
-    }
+    # A confident local prediction either skips the LLM or narrows it to one intent
+    classifier = get_classifier()
+    ranked = classifier.rank(text) if classifier else []
+    predicted_type, confidence = ranked[0] if ranked else (None, 0.0)
+    if predicted_type:
+        print(f"Predicted intent: {predicted_type} ({confidence:.2f})")
+    if predicted_type and confidence >= INTENT_SKIP_THRESHOLD:
+        parameters = local_parameters(predicted_type, text)
+        if parameters is not None:
+            router_stats.record("classifier", time.perf_counter() - started)
+            command_data = {"command_type": predicted_type, "parameters": parameters, "requires_followup": False}
+            try:
+                return _finish_command(text, user_id, command_data)
+            except Exception as e:
+                print(f"Error processing command: {str(e)}")
+                conversation_manager.clear_current_context(user_id)
+                return None
     
-    For general questions that don't fit into specific command types, use the "general_question" command type.
-    In this case, you should:
-    1. Analyze if the user's input is a general question or requires a specific tool
-    2. If it's a general question, use "general_question" command type and provide a direct response
-    3. If it requires a specific tool, use the appropriate command type
-    
-    Examples:
-    1. For a general question:
-       {
-         "command_type": "general_question",
-         "parameters": {
-           "response": "The capital of France is Paris. It's known for landmarks like the Eiffel Tower and the Louvre Museum."
-         },
-         "requires_followup": false
-       }
-    
-    2. For a question that needs follow-up:
-       {
-         "command_type": "general_question",
-         "parameters": {
-           "response": "I can help you learn about that topic. Would you like to know about its history, current state, or future developments?",
-           "requires_followup": true,
-           "followup_context": {
-             "question": "Which aspect would you like to explore further?",
-             "context": {
-               "options": ["history", "current state", "future developments"]
-             }
-           }
-         },
-         "requires_followup": true,
-         "followup_context": {
-           "question": "Which aspect would you like to explore further?",
-           "parameter_to_update": "aspect",
-           "context": {
-             "options": ["history", "current state", "future developments"]
-           }
-         }
-       }
-    
-    // ... existing examples for other command types ...
-    
-    Only output valid JSON, no other text."""
-    
-    # Prepare conversation history for context
-    conversation_history = []
-    for turn in recent_context:
-        conversation_history.append({
-            "role": "user",
-            "content": turn["query"]
-        })
-        conversation_history.append({
-            "role": "assistant",
-            "content": turn["response"]
-        })
+    # Repeated general questions are answered from the cache. The utterance embedding is
+    # reused when the turn is stored, so a miss costs no extra embeddings call.
+    normalized = normalize_utterance(text)
+    query_embedding = None
+    # Skipped when the classifier is confident the utterance is some other command
+    if predicted_type in (None, "general_question") or confidence < INTENT_PROMPT_THRESHOLD:
+        if not is_cacheable(normalized):
+            response_cache.bypass()
+        else:
+            try:
+                with span("context"):
+                    query_embedding = conversation_manager._get_embedding(normalized)
+                    command_data = response_cache.lookup(user_id, query_embedding)
+                if command_data:
+                    router_stats.record("cache", time.perf_counter() - started)
+                    return _finish_command(text, user_id, command_data, query_embedding)
+            except Exception as e:
+                print(f"Error checking response cache: {str(e)}")
+    
+    # Get recent conversation context
+    with span("context"):
+        recent_context = conversation_manager.get_recent_context(user_id)
+    print(f"Recent context: {recent_context}")
     
     try:
-        # Call OpenAI API with GPT-4
-        response = client.chat.completions.create(
-            model="gpt-4o",  # Changed from gpt-4-turbo-preview to gpt-4
-            messages=[
-                {"role": "system", "content": system_message},
-                *conversation_history,
-                {"role": "user", "content": text}
-            ],
-            temperature=0.2,  # Slightly lowered temperature for more consistent outputs with GPT-4
-            response_format={"type": "json_object"}
-        )
+        command_data = None
+        path = "intent_llm"
+        if predicted_type in COMMANDS and confidence >= INTENT_PROMPT_THRESHOLD:
+            command_data = _extract_parameters(text, predicted_type, recent_context)
+        
+        if not command_data:
+            # Offer only the command types this utterance could plausibly be
+            intents = likely_intents(text, ranked)
+            messages, prompt_tokens, turns_kept = build_messages(build_system_prompt(intents), recent_context, text)
+            print(f"Prompt offers {len(intents)} tools and {turns_kept} history turns")
+            command_data = _call_tools(messages, intents, "required", "full", prompt_tokens, allow_multiple=True)
+            if not command_data:
+                raise ValueError("No tool was called")
+            print(f"Parsed command data: {command_data}")
+            # Full-prompt answers label the training data for the intent classifier;
+            # multi-part requests have no single label
+            if not command_data.get("additional_commands"):
+                log_example(text, command_data["command_type"])
+            path = "llm"
+        
+        llm_seconds = time.perf_counter() - started
+        router_stats.record(path, llm_seconds)
+        command_data = _finish_command(text, user_id, command_data, query_embedding)
+        
+        if (query_embedding is not None and command_data["command_type"] == "general_question"
+                and not command_data.get("requires_followup") and not command_data.get("additional_commands")):
+            response_cache.store(user_id, normalized, query_embedding, command_data, llm_seconds)
+        return command_data
         
-        # Parse the response
-        command_data = json.loads(response.choices[0].message.content)
-        print(f"Parsed command data: {command_data}")
+    except Exception as e:
+        print(f"Error processing command: {str(e)}")
+        conversation_manager.clear_current_context(user_id)  # Clear context on error
+        return None
+
+
+def _reported_prompt_tokens(response):
+    """Prompt token count from the API's usage block, if present"""
+    usage = getattr(response, "usage", None)
+    return getattr(usage, "prompt_tokens", None)
+
+
+def _call_tools(messages, command_types, tool_choice, kind, prompt_tokens, allow_multiple=False):
+    """
+    Ask the LLM to call the command tools
+    
+    The model is picked by llm.model_router. A call whose arguments fail
+    validation is retried once. Slow calls are hedged, see llm.hedged_calls.
+    
+    Args:
+        messages (list): Chat messages
+        command_types (list): Command types offered as tools
+        tool_choice (str): "required" to force a tool call, "auto" to allow a plain reply
+        kind (str): Label for the prompt statistics
+        prompt_tokens (int): Locally counted prompt tokens
+        allow_multiple (bool): Let a multi-part request call several tools, with
+            non-strict schemas since strict outputs don't hold for parallel calls
         
-        # Validate the command structure
-        valid_commands = ["search_store", "calendar_check", "calendar_add", "open_app", "search_file", "general_question", "email_check", "email_send", "email_draft"]
-        if command_data.get("command_type") not in valid_commands:
-            raise ValueError(f"Invalid command type: {command_data.get('command_type')}")
+    Returns:
+        dict: Validated command data of the first tool call, with any further calls
+            under "additional_commands", or None if the LLM replied without calling a tool
+    """
+    def parse(response):
+        tool_calls = response.choices[0].message.tool_calls
+        if not tool_calls:
+            return None
+        commands = [command_from_tool_call(tool_call) for tool_call in tool_calls]
+        command_data = commands[0]
+        if len(commands) > 1:
+            command_data["additional_commands"] = commands[1:]
+        return command_data
+    
+    request = {
+        "messages": messages,
+        "tools": tool_definitions(command_types, strict=not allow_multiple),
+        "tool_choice": tool_choice,
+        "parallel_tool_calls": allow_multiple,
+        "temperature": 0.2,
+    }
+    model, shadow_model = model_router.select(messages[-1]["content"], command_types)
+    for attempt in range(MAX_TOOL_ATTEMPTS):
+        call_started = time.perf_counter()
+        try:
+            # A slow primary is raced against a backup request; invalid tool
+            # calls never win the race
+            with span("llm"):
+                command_data, response, _ = hedged_chat(parse, model=model, **request)
+        except ValueError as e:
+            print(f"Invalid tool call (attempt {attempt + 1}): {str(e)}")
+            if attempt + 1 == MAX_TOOL_ATTEMPTS:
+                raise
+            continue
+        prompt_stats.record(kind, prompt_tokens, _reported_prompt_tokens(response), time.perf_counter() - call_started)
+        if shadow_model:
+            model_router.run_shadow(shadow_model, command_types, parse, request, command_data)
+        return command_data
+
+
+def _extract_parameters(text, command_type, recent_context):
+    """
+    Ask the LLM for the parameters of an already classified command
+    
+    Args:
+        text (str): The recognized speech text
+        command_type (str): Command type predicted by the intent classifier
+        recent_context (list): Recent conversation turns
         
-        # For email commands, ensure parameters are properly set
-        if command_data["command_type"] in ["email_send", "email_draft"]:
-            print("Processing email command, validating parameters")
-            if "parameters" not in command_data:
-                command_data["parameters"] = {}
-            
-            # Ensure subject and body are present
-            if "subject" not in command_data["parameters"]:
-                command_data["parameters"]["subject"] = "No Subject"
-            if "body" not in command_data["parameters"]:
-                command_data["parameters"]["body"] = ""
-                
-            print(f"Email command parameters after validation: {command_data['parameters']}")
-            
-            # Set up follow-up context
-            command_data["requires_followup"] = True
-            command_data["followup_context"] = {
-                "question": "What email address should I send this to?",
-                "parameter_to_update": "to",
-                "context": {
-                    "type": "email_input",
-                    "current_draft": {
-                        "subject": command_data["parameters"]["subject"],
-                        "body": command_data["parameters"]["body"]
-                    }
+    Returns:
+        dict: Command data, or None if the LLM says the prediction was wrong
+    """
+    messages, prompt_tokens, _ = build_messages(build_intent_prompt(command_type), recent_context, text)
+    command_data = _call_tools(messages, [command_type], "auto", "intent", prompt_tokens)
+    if not command_data:
+        print(f"Intent prompt rejected predicted type {command_type}, using the full prompt")
+        return None
+    print(f"Intent prompt command data: {command_data}")
+    return command_data
+
+
+def _prepare_command(command_data):
+    """
+    Validate one command and set up what it needs before execution
+    
+    Args:
+        command_data (dict): A single command
+    """
+    # Validate the parameters into the command's typed model, which also fills in
+    # defaults such as the email subject and body
+    parameters = validate_parameters(command_data.get("command_type"), command_data.get("parameters"))
+    command_data["parameters"] = parameters.model_dump(exclude_none=True)
+    
+    if command_data["command_type"] in ["email_send", "email_draft"]:
+        # Set up follow-up context
+        command_data["requires_followup"] = True
+        command_data["followup_context"] = {
+            "question": "What email address should I send this to?",
+            "parameter_to_update": "to",
+            "context": {
+                "type": "email_input",
+                "current_draft": {
+                    "subject": parameters.subject,
+                    "body": parameters.body
                 }
             }
-            print(f"Set up email follow-up context: {command_data['followup_context']}")
-        
-        # For general questions, extract the response from parameters
-        if command_data["command_type"] == "general_question":
-            command_data["response"] = command_data["parameters"].get("response", "")
+        }
+        print(f"Set up email follow-up context: {command_data['followup_context']}")
+    
+    # For general questions, the spoken answer is the response parameter
+    if command_data["command_type"] == "general_question":
+        command_data["response"] = parameters.response
+
+
+def _finish_command(text, user_id, command_data, query_embedding=None):
+    """
+    Validate a command, store the conversation turn and update the follow-up context
+    
+    Args:
+        text (str): The recognized speech text
+        user_id (str): Unique identifier for the user
+        command_data (dict): Command produced by the LLM, the rule fast path or the cache,
+            with the other parts of a multi-part request under "additional_commands"
+        query_embedding (list): Embedding of the utterance, if already computed
         
-        # Store the conversation turn
+    Returns:
+        dict: The validated command data
+    """
+    commands = [command_data] + command_data.pop("additional_commands", [])
+    for command in commands:
+        _prepare_command(command)
+    
+    # A command waiting for a follow-up answer leads, so the follow-up handlers complete it
+    commands.sort(key=lambda command: not command.get("requires_followup"))
+    command_data = commands[0]
+    if len(commands) > 1:
+        command_data["additional_commands"] = commands[1:]
+    
+    # An abandoned turn leaves no history or follow-up context behind
+    check_cancelled()
+    
+    # Store the conversation turn, summarized so it stays cheap to replay as history
+    with span("persist"):
         conversation_manager.store_conversation(
             user_id=user_id,
             query=text,
-            response=json.dumps(command_data),
+            response="; ".join(summarize_command(command) for command in commands),
             requires_followup=command_data.get("requires_followup", False),
-            followup_context=command_data.get("followup_context")
+            followup_context=command_data.get("followup_context"),
+            embedding=query_embedding
         )
-        
-        # If the command requires follow-up, store the context
-        if command_data.get("requires_followup"):
-            print(f"Setting current context for follow-up: {command_data}")
-            conversation_manager.set_current_context(command_data)
-            # Verify context was set
-            current_context = conversation_manager.get_current_context()
-            print(f"Verified current context: {current_context}")
-        else:
-            print("No follow-up required, clearing context")
-            conversation_manager.clear_current_context()
-            
-        return command_data
-        
-    except Exception as e:
-        print(f"Error processing command: {str(e)}")
-        conversation_manager.clear_current_context()  # Clear context on error
-        return None
\ No newline at end of file
+    
+    # If the command requires follow-up, store the context
+    if command_data.get("requires_followup"):
+        print(f"Setting current context for follow-up: {command_data}")
+        conversation_manager.set_current_context(user_id, command_data)
+    else:
+        print("No follow-up required, clearing context")
+        conversation_manager.clear_current_context(user_id)
+    return command_data
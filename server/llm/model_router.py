@@ -0,0 +1,257 @@
+import copy
+import os
+import re
+import threading
+
+from dotenv import load_dotenv
+
+from llm.openai_client import openai_client
+
+# Load environment variables
+load_dotenv()
+
+# Models from smallest to largest as "model:max_score"; the last model takes
+# every request scoring above the others' limits
+MODEL_TIERS = os.getenv('LLM_MODEL_TIERS', 'gpt-4o-mini:0.5,gpt-4o')
+# "off" always uses the largest model, "shadow" serves the largest model and
+# compares the routed one against it, "auto" serves the routed model for
+# intents whose shadow comparisons agree often enough, "on" always routes
+ROUTER_MODE = os.getenv('LLM_MODEL_ROUTER_MODE', 'off')
+# Shadow comparisons needed, and the agreement rate, before "auto" trusts a smaller model
+MIN_SHADOW_SAMPLES = int(os.getenv('LLM_MODEL_ROUTER_MIN_SAMPLES', '50'))
+MIN_AGREEMENT = float(os.getenv('LLM_MODEL_ROUTER_MIN_AGREEMENT', '0.95'))
+
+# Commands that write something for the user or reason about dates and times
+_COMPLEX_INTENTS = {"email_send", "email_draft", "calendar_add", "calendar_find_slot"}
+# Words that only make sense with the earlier conversation
+_NEEDS_HISTORY = re.compile(
+    r"\b(it|that|those|them|he|she|they|him|her|again|instead|same|previous|last one|the other|"
+    r"earlier|before|above)\b"
+)
+_MULTI_PART = re.compile(r"\b(and then|also|after that|then)\b|\band\b.*\b(calendar|e-?mails?|inbox|files?)\b")
+# Short confirmations and cancellations
+_TRIVIAL = re.compile(r"^(yes|yeah|yep|no|nope|ok|okay|sure|cancel|stop|never ?mind|thanks|thank you)\b")
+
+
+def parse_tiers(spec):
+    """
+    Parse a tier list
+
+    Args:
+        spec (str): Comma-separated "model:max_score" entries, smallest model first
+
+    Returns:
+        list: (model, max_score) tuples; the last max_score is None
+    """
+    tiers = []
+    for entry in spec.split(","):
+        model, _, limit = entry.strip().partition(":")
+        if model:
+            tiers.append((model, float(limit) if limit else None))
+    if tiers:
+        tiers[-1] = (tiers[-1][0], None)
+    return tiers
+
+
+def score_request(text, command_types):
+    """
+    Estimate how much model a request needs
+
+    Args:
+        text (str): The recognized speech text
+        command_types (list): Command types offered as tools
+
+    Returns:
+        tuple: (score from 0 for trivial upwards, list of reasons)
+    """
+    normalized = text.lower().strip()
+    reasons = []
+    score = 0.0
+    if _TRIVIAL.match(normalized) and len(normalized.split()) <= 3:
+        return 0.0, ["trivial"]
+
+    words = len(normalized.split())
+    score += min(words / 30, 1.0)
+    reasons.append(f"{words} words")
+    if _NEEDS_HISTORY.search(normalized):
+        score += 0.4
+        reasons.append("refers to history")
+    if _MULTI_PART.search(normalized):
+        score += 0.5
+        reasons.append("multi-part")
+    if _COMPLEX_INTENTS & set(command_types):
+        score += 0.3
+        reasons.append("complex intent")
+    if len(command_types) > 3:
+        # The full prompt with several tools also has to pick between them
+        score += 0.2
+        reasons.append(f"{len(command_types)} tools")
+    return score, reasons
+
+
+def intent_key(command_types):
+    """Bucket that shadow agreement and trust are tracked in"""
+    return command_types[0] if len(command_types) == 1 else "any"
+
+
+def same_command(served, candidate):
+    """
+    Whether two command results would do the same thing
+
+    General question answers are free text, so only their command type is compared.
+
+    Args:
+        served (dict): Command data from the served model, or None
+        candidate (dict): Command data from the routed model, or None
+
+    Returns:
+        bool: True when they agree
+    """
+    if not served or not candidate:
+        return served == candidate
+
+    def describe(command):
+        commands = [command] + command.get("additional_commands", [])
+        return [
+            (part["command_type"], bool(part.get("requires_followup")),
+             None if part["command_type"] == "general_question" else part.get("parameters"))
+            for part in commands
+        ]
+    return describe(served) == describe(candidate)
+
+
+class ModelRouter:
+    """Pick the smallest adequate model per request and track how far it can be trusted"""
+
+    def __init__(self, tiers=None, mode=None):
+        self.tiers = parse_tiers(tiers or MODEL_TIERS)
+        self.mode = mode or ROUTER_MODE
+        self._lock = threading.Lock()
+        self._decisions = {}
+        self._shadow = {}
+
+    @property
+    def largest(self):
+        return self.tiers[-1][0]
+
+    def route(self, text, command_types):
+        """
+        Choose the tier for a request
+
+        Args:
+            text (str): The recognized speech text
+            command_types (list): Command types offered as tools
+
+        Returns:
+            tuple: (model, score, reasons)
+        """
+        score, reasons = score_request(text, command_types)
+        for model, limit in self.tiers:
+            if limit is None or score <= limit:
+                return model, score, reasons
+        return self.largest, score, reasons
+
+    def select(self, text, command_types):
+        """
+        Decide which model serves a request and which, if any, runs in its shadow
+
+        Args:
+            text (str): The recognized speech text
+            command_types (list): Command types offered as tools
+
+        Returns:
+            tuple: (model to serve, model to shadow or None)
+        """
+        routed, score, reasons = self.route(text, command_types)
+        if self.mode == "off" or routed == self.largest:
+            served, shadow = self.largest, None
+        elif self.mode == "on" or (self.mode == "auto" and self.trusted(routed, intent_key(command_types))):
+            served, shadow = routed, None
+        else:
+            served, shadow = self.largest, routed
+        print(f"Model router: score {score:.2f} ({', '.join(reasons)}) -> {routed}, serving {served}"
+              + (f", shadowing {shadow}" if shadow else ""))
+        with self._lock:
+            self._decisions[served] = self._decisions.get(served, 0) + 1
+        return served, shadow
+
+    def record_shadow(self, model, key, agreed):
+        """
+        Record one shadow comparison
+
+        Args:
+            model (str): The routed model that ran in the shadow
+            key (str): Intent bucket from intent_key
+            agreed (bool): Whether it produced the same command as the served model
+        """
+        with self._lock:
+            totals = self._shadow.setdefault((model, key), {"samples": 0, "agreed": 0})
+            totals["samples"] += 1
+            totals["agreed"] += int(agreed)
+        if not agreed:
+            print(f"Shadow model {model} disagreed with {self.largest} on a {key} request")
+
+    def run_shadow(self, model, command_types, parse, request, served):
+        """
+        Send the same request to the routed model in the background and compare
+
+        Args:
+            model (str): Routed model to evaluate
+            command_types (list): Command types offered as tools
+            parse (callable): Turns a response into command data, raising ValueError when invalid
+            request (dict): Arguments for chat.completions.create, without the model
+            served (dict): Command data the served model produced
+
+        Returns:
+            concurrent.futures.Future: Resolves once the comparison is recorded
+        """
+        served = copy.deepcopy(served)
+        key = intent_key(command_types)
+
+        async def shadow():
+            try:
+                response = await openai_client.achat(operation="shadow", model=model, **request)
+                agreed = same_command(served, parse(response))
+            except ValueError:
+                agreed = False
+            except Exception as e:
+                print(f"Shadow request to {model} failed: {str(e)}")
+                return
+            self.record_shadow(model, key, agreed)
+        return openai_client.submit(shadow())
+
+    def trusted(self, model, key):
+        """Whether shadow comparisons show the model is good enough for the intent bucket"""
+        with self._lock:
+            totals = self._shadow.get((model, key))
+        return bool(totals and totals["samples"] >= MIN_SHADOW_SAMPLES
+                    and totals["agreed"] / totals["samples"] >= MIN_AGREEMENT)
+
+    def snapshot(self):
+        """
+        Summarize routing decisions and shadow agreement
+
+        Returns:
+            dict: Mode, tiers, requests served per model and agreement per model and intent
+        """
+        with self._lock:
+            decisions = dict(self._decisions)
+            shadow = {key: dict(totals) for key, totals in self._shadow.items()}
+        return {
+            "mode": self.mode,
+            "tiers": [{"model": model, "max_score": limit} for model, limit in self.tiers],
+            "served": decisions,
+            "shadow": [
+                {
+                    "model": model,
+                    "intent": key,
+                    "samples": totals["samples"],
+                    "agreement": totals["agreed"] / totals["samples"],
+                    "trusted": self.trusted(model, key),
+                }
+                for (model, key), totals in sorted(shadow.items())
+            ],
+        }
+
+
+model_router = ModelRouter()
@@ -0,0 +1,257 @@
+import array
+import asyncio
+import base64
+import concurrent.futures
+import contextvars
+import os
+import random
+import threading
+import time
+
+import httpx
+import openai
+from dotenv import load_dotenv
+from openai import AsyncOpenAI
+from openai.types import CreateEmbeddingResponse
+from openai.types.chat import ChatCompletion
+
+from monitoring.metrics import registry
+from monitoring.turn_recorder import turn_recorder
+from pipeline.cancellation import TurnCancelled, current_token
+
+# Load environment variables
+load_dotenv()
+
+# Connection pool shared by every OpenAI call in the process
+MAX_CONNECTIONS = int(os.getenv('OPENAI_MAX_CONNECTIONS', '20'))
+MAX_KEEPALIVE_CONNECTIONS = int(os.getenv('OPENAI_MAX_KEEPALIVE_CONNECTIONS', '10'))
+KEEPALIVE_EXPIRY = 30.0
+CONNECT_TIMEOUT = 5.0
+
+# Total time allowed per operation, including retries
+DEADLINES = {
+    "chat": float(os.getenv('OPENAI_CHAT_DEADLINE', '20')),
+    "embeddings": float(os.getenv('OPENAI_EMBEDDINGS_DEADLINE', '8')),
+    "titles": float(os.getenv('OPENAI_TITLES_DEADLINE', '8')),
+}
+DEFAULT_DEADLINE = 20.0
+
+# Retry policy: full-jitter exponential backoff
+MAX_ATTEMPTS = 3
+BACKOFF_BASE = 0.25
+BACKOFF_CAP = 4.0
+
+# Failures where resending the same request is safe: the request never reached
+# the model, or the server explicitly asked us to come back later. Client errors
+# (bad request, auth, not found) would fail the same way again.
+RETRIABLE_ERRORS = (
+    openai.APIConnectionError,  # includes APITimeoutError
+    openai.RateLimitError,
+    openai.InternalServerError,
+)
+
+request_seconds = registry.histogram(
+    "openai_request_seconds",
+    "Latency of OpenAI API requests, per attempt",
+    ("operation", "model", "outcome"),
+)
+
+
+class OpenAIClient:
+    """
+    Shared AsyncOpenAI client with pooled connections, deadlines and retries.
+
+    The async client lives on its own event loop in a daemon thread, so the
+    synchronous callers in this codebase get the pooled client through
+    blocking wrappers, while async code can await the coroutines directly.
+    """
+
+    def __init__(self, api_key=None):
+        self._api_key = api_key or os.getenv('OPENAI_API_KEY')
+        self._lock = threading.Lock()
+        self._loop = None
+        self._client = None
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=loop.run_forever, name="openai-client", daemon=True)
+                thread.start()
+                self._loop = loop
+                self._client = AsyncOpenAI(
+                    api_key=self._api_key,
+                    # Retries are handled here, with deadlines and metrics
+                    max_retries=0,
+                    http_client=httpx.AsyncClient(
+                        limits=httpx.Limits(
+                            max_connections=MAX_CONNECTIONS,
+                            max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+                            keepalive_expiry=KEEPALIVE_EXPIRY,
+                        ),
+                        timeout=httpx.Timeout(DEFAULT_DEADLINE, connect=CONNECT_TIMEOUT),
+                    ),
+                )
+            return self._loop
+
+    async def _call(self, operation, request, model, deadline):
+        """
+        Run one API request with retries inside a deadline
+
+        Args:
+            operation (str): "chat", "embeddings" or "titles"
+            request (callable): Takes a timeout in seconds and returns the request coroutine
+            model (str): Model name, for the metrics
+            deadline (float): Seconds allowed for all attempts together
+
+        Returns:
+            The API response
+        """
+        deadline = deadline or DEADLINES.get(operation, DEFAULT_DEADLINE)
+        give_up_at = time.monotonic() + deadline
+        for attempt in range(MAX_ATTEMPTS):
+            remaining = give_up_at - time.monotonic()
+            started = time.perf_counter()
+            try:
+                response = await asyncio.wait_for(request(remaining), timeout=remaining)
+            except (asyncio.TimeoutError, openai.APITimeoutError) as e:
+                request_seconds.observe(time.perf_counter() - started, operation=operation, model=model,
+                                        outcome="timeout")
+                # The whole deadline is spent
+                raise openai.APITimeoutError(request=getattr(e, "request", None)) from e
+            except RETRIABLE_ERRORS as e:
+                request_seconds.observe(time.perf_counter() - started, operation=operation, model=model,
+                                        outcome="retriable_error")
+                backoff = random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+                if attempt + 1 == MAX_ATTEMPTS or time.monotonic() + backoff >= give_up_at:
+                    raise
+                print(f"OpenAI {operation} request failed ({type(e).__name__}), retrying in {backoff:.2f}s")
+                await asyncio.sleep(backoff)
+                continue
+            except Exception:
+                request_seconds.observe(time.perf_counter() - started, operation=operation, model=model,
+                                        outcome="error")
+                raise
+            request_seconds.observe(time.perf_counter() - started, operation=operation, model=model, outcome="ok")
+            return response
+
+    async def achat(self, operation="chat", deadline=None, **kwargs):
+        """
+        Create a chat completion
+
+        Args:
+            operation (str): Label for deadlines and metrics, e.g. "chat" or "titles"
+            deadline (float): Seconds allowed including retries (default per operation)
+            **kwargs: Arguments for chat.completions.create
+
+        Returns:
+            ChatCompletion: The API response
+        """
+        self._ensure_started()
+        return await turn_recorder.acall(
+            f"openai_{operation}",
+            {"messages": kwargs.get("messages"), "tools": kwargs.get("tools")},
+            lambda: self._call(
+                operation,
+                lambda timeout: self._client.chat.completions.create(timeout=timeout, **kwargs),
+                kwargs.get("model"),
+                deadline,
+            ),
+            encode=_dump,
+            decode=ChatCompletion.model_validate,
+        )
+
+    async def aembed(self, operation="embeddings", deadline=None, **kwargs):
+        """
+        Create embeddings
+
+        Args:
+            operation (str): Label for deadlines and metrics
+            deadline (float): Seconds allowed including retries (default per operation)
+            **kwargs: Arguments for embeddings.create
+
+        Returns:
+            CreateEmbeddingResponse: The API response
+        """
+        self._ensure_started()
+        return await turn_recorder.acall(
+            f"openai_{operation}",
+            {"input": kwargs.get("input")},
+            lambda: self._call(
+                operation,
+                lambda timeout: self._client.embeddings.create(timeout=timeout, **kwargs),
+                kwargs.get("model"),
+                deadline,
+            ),
+            encode=_dump_embeddings,
+            decode=_load_embeddings,
+        )
+
+    def run(self, coroutine):
+        """
+        Run a coroutine on the client's event loop and wait for its result
+
+        If the current turn is cancelled meanwhile, the coroutine is cancelled
+        too, which aborts its request.
+
+        Raises:
+            TurnCancelled: If the turn was cancelled before the result arrived
+        """
+        future = self.submit(coroutine)
+        token = current_token()
+        if token is None:
+            return future.result()
+        token.add_callback(future.cancel)
+        try:
+            return future.result()
+        except concurrent.futures.CancelledError:
+            raise TurnCancelled(token.reason)
+        finally:
+            token.remove_callback(future.cancel)
+
+    def submit(self, coroutine):
+        """
+        Start a coroutine on the client's event loop without waiting for it
+
+        The coroutine sees the caller's context variables, such as the turn
+        being traced or recorded.
+
+        Returns:
+            concurrent.futures.Future: Resolves with the coroutine's result
+        """
+        loop = self._ensure_started()
+        return asyncio.run_coroutine_threadsafe(_in_context(coroutine, contextvars.copy_context()), loop)
+
+    def chat(self, operation="chat", deadline=None, **kwargs):
+        """Blocking version of achat"""
+        return self.run(self.achat(operation, deadline, **kwargs))
+
+    def embed(self, operation="embeddings", deadline=None, **kwargs):
+        """Blocking version of aembed"""
+        return self.run(self.aembed(operation, deadline, **kwargs))
+
+
+async def _in_context(coroutine, context):
+    return await asyncio.get_running_loop().create_task(coroutine, context=context)
+
+
+def _dump(response):
+    return response.model_dump(mode="json")
+
+
+def _dump_embeddings(response):
+    # Vectors as base64 float32 keep recorded turns small
+    data = response.model_dump(mode="json")
+    for item in data["data"]:
+        item["embedding"] = base64.b64encode(array.array("f", item["embedding"]).tobytes()).decode("ascii")
+    return data
+
+
+def _load_embeddings(data):
+    data = dict(data, data=[
+        dict(item, embedding=array.array("f", base64.b64decode(item["embedding"])).tolist()) for item in data["data"]
+    ])
+    return CreateEmbeddingResponse.model_validate(data)
+
+
+openai_client = OpenAIClient()
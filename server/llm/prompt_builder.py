@@ -0,0 +1,248 @@
+import json
+import os
+import re
+import threading
+
+from llm.command_schemas import COMMAND_TYPES
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# Input tokens allowed per call; the oldest history turns are dropped to stay under it
+PROMPT_TOKEN_BUDGET = int(os.getenv('PROMPT_TOKEN_BUDGET', '3000'))
+# History turns longer than this are clipped
+MAX_TURN_CHARS = 600
+# Framing tokens the chat format adds to every message
+TOKENS_PER_MESSAGE = 4
+
+# Words that make a group of command types worth offering as tools
+_INTENT_GROUPS = [
+    (re.compile(r"\b(e-?mails?|inbox|mail|messages?|send|reply|draft|write)\b"),
+     ["email_check", "email_send", "email_draft"]),
+    (re.compile(r"\b(calendar|schedule|agenda|meetings?|events?|appointments?|busy|free|book|remind|slot|plans?|"
+                r"today|tomorrow|tonight|week|monday|tuesday|wednesday|thursday|friday|saturday|sunday|"
+                r"morning|afternoon|evening|at \d)\b"),
+     ["calendar_check", "calendar_add", "calendar_find_slot"]),
+    (re.compile(r"\b(open|launch|start|run|apps?|application)\b"), ["open_app"]),
+    (re.compile(r"\b(files?|documents?|pdfs?|docx?|folders?|notes|find|search|locate|where|saved|wrote)\b"),
+     ["search_file"]),
+    (re.compile(r"\b(buy|shop|shopping|store|order|price|amazon|search)\b"), ["search_store"]),
+]
+# The classifier's most likely intents are added until they cover this much probability
+CLASSIFIER_COVERAGE = 0.9
+
+_EMAIL_RULES = """For email_send and email_draft, always fill in subject and body, generating them from the
+    context when the user doesn't dictate them."""
+
+_encoding = None
+_encoding_lock = threading.Lock()
+
+
+def count_tokens(text):
+    """
+    Count tokens with tiktoken when it is installed, else estimate four characters per token
+
+    Args:
+        text (str): Text to measure
+
+    Returns:
+        int: Token count
+    """
+    global _encoding
+    if tiktoken is not None:
+        with _encoding_lock:
+            if _encoding is None:
+                try:
+                    _encoding = tiktoken.encoding_for_model("gpt-4o")
+                except Exception as e:
+                    print(f"Could not load tokenizer, estimating tokens: {str(e)}")
+                    _encoding = False
+        if _encoding:
+            return len(_encoding.encode(text))
+    return (len(text) + 3) // 4
+
+
+def likely_intents(text, ranked=None):
+    """
+    Pick the command types worth describing for an utterance
+
+    Args:
+        text (str): The recognized speech text
+        ranked (list): (command_type, probability) tuples from the intent classifier, best first
+
+    Returns:
+        list: Command types in COMMAND_TYPES order; all of them when there is nothing to go on
+    """
+    normalized = text.lower()
+    intents = {"general_question"}
+    for pattern, group in _INTENT_GROUPS:
+        if pattern.search(normalized):
+            intents.update(group)
+
+    covered = 0.0
+    for command_type, probability in ranked or []:
+        if covered >= CLASSIFIER_COVERAGE:
+            break
+        intents.add(command_type)
+        covered += probability
+
+    # With neither keywords nor a trained classifier to go on, describe everything
+    if intents == {"general_question"} and not ranked:
+        return list(COMMAND_TYPES)
+    return [command_type for command_type in COMMAND_TYPES if command_type in intents]
+
+
+def build_system_prompt(intents):
+    """
+    Assemble the command processor prompt for a set of command types
+
+    The parameter schemas travel as tool definitions, so the prompt itself only
+    carries instructions.
+
+    Args:
+        intents (list): Command types offered as tools
+
+    Returns:
+        str: The system message
+    """
+    email_rules = _EMAIL_RULES if {"email_send", "email_draft"} & set(intents) else ""
+    return f"""You are a command processor for a desktop assistant.
+    Call the tool that carries out the user's command, filling in its arguments from the request
+    and the conversation. When the user asks for several things at once, call one tool per request.
+    Use general_question, with a direct response, for anything the other tools don't cover.
+    {email_rules}
+    When required information is missing, set followup_question to what you need to ask the user."""
+
+
+def build_intent_prompt(command_type):
+    """
+    Build a short system prompt that only extracts arguments for one command type
+
+    Args:
+        command_type (str): Command type predicted by the intent classifier
+
+    Returns:
+        str: The system message
+    """
+    return f"""You extract the arguments of the {command_type} tool for a desktop assistant.
+    If the request is not a {command_type} command, reply with the single word mismatch instead of calling the tool.
+    When required information is missing, set followup_question to what you need to ask the user."""
+
+
+def summarize_command(command_data):
+    """
+    Describe a command compactly for the conversation history
+
+    Args:
+        command_data (dict): Command data produced by process_with_llm
+
+    Returns:
+        str: The spoken answer for general questions, else the command type and its parameters
+    """
+    command_type = command_data.get("command_type")
+    if command_type == "general_question":
+        summary = command_data.get("response") or command_data.get("parameters", {}).get("response", "")
+    else:
+        parameters = {key: value for key, value in command_data.get("parameters", {}).items()
+                      if value not in (None, "", [], {})}
+        summary = f"{command_type} {json.dumps(parameters, separators=(',', ':'))}"
+    followup = command_data.get("followup_context") or {}
+    if command_data.get("requires_followup") and followup.get("question"):
+        summary += f" | asked: {followup['question']}"
+    return summary[:MAX_TURN_CHARS]
+
+
+def _compact_response(response):
+    """Summarize turns stored as raw command JSON before summaries were stored"""
+    if response.startswith("{"):
+        try:
+            command_data = json.loads(response)
+            if isinstance(command_data, dict) and "command_type" in command_data:
+                return summarize_command(command_data)
+        except ValueError:
+            pass
+    return response[:MAX_TURN_CHARS]
+
+
+def build_messages(system_message, recent_context, text, budget=PROMPT_TOKEN_BUDGET):
+    """
+    Assemble chat messages, keeping as much recent history as fits the token budget
+
+    Args:
+        system_message (str): The system prompt
+        recent_context (list): Conversation turns from ConversationManager.get_recent_context
+        text (str): The recognized speech text
+        budget (int): Maximum prompt tokens
+
+    Returns:
+        tuple: (messages, prompt token count, history turns kept)
+    """
+    used = count_tokens(system_message) + count_tokens(text) + 2 * TOKENS_PER_MESSAGE
+    turns = sorted(recent_context, key=lambda turn: turn.get("timestamp", ""))
+
+    # Newest turns matter most, so fill the budget from the end
+    history = []
+    for turn in reversed(turns):
+        pair = [
+            {"role": "user", "content": str(turn.get("query", ""))[:MAX_TURN_CHARS]},
+            {"role": "assistant", "content": _compact_response(str(turn.get("response", "")))},
+        ]
+        cost = sum(count_tokens(message["content"]) + TOKENS_PER_MESSAGE for message in pair)
+        if used + cost > budget:
+            break
+        used += cost
+        history[:0] = pair
+
+    messages = [{"role": "system", "content": system_message}, *history, {"role": "user", "content": text}]
+    return messages, used, len(history) // 2
+
+
+class PromptStats:
+    """Prompt token totals per kind of call, to measure the effect of prompt changes"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def record(self, kind, estimated_tokens, prompt_tokens=None, seconds=None):
+        """
+        Record one LLM call
+
+        Args:
+            kind (str): "full" or "intent" prompt
+            estimated_tokens (int): Tokens counted locally before the call
+            prompt_tokens (int): Tokens the API reported, if available
+            seconds (float): Call latency
+        """
+        print(f"LLM call ({kind} prompt): {estimated_tokens} estimated / {prompt_tokens} reported prompt tokens"
+              + (f", {seconds:.2f}s" if seconds is not None else ""))
+        with self._lock:
+            totals = self._calls.setdefault(kind, {"calls": 0, "estimated_tokens": 0, "prompt_tokens": 0, "seconds": 0.0})
+            totals["calls"] += 1
+            totals["estimated_tokens"] += estimated_tokens
+            totals["prompt_tokens"] += prompt_tokens or estimated_tokens
+            totals["seconds"] += seconds or 0.0
+
+    def snapshot(self):
+        """
+        Average prompt size and latency per kind of call
+
+        Returns:
+            dict: Statistics keyed by kind
+        """
+        with self._lock:
+            calls = {kind: dict(totals) for kind, totals in self._calls.items()}
+        return {
+            kind: {
+                "calls": totals["calls"],
+                "average_prompt_tokens": totals["prompt_tokens"] / totals["calls"],
+                "average_estimated_tokens": totals["estimated_tokens"] / totals["calls"],
+                "average_seconds": totals["seconds"] / totals["calls"],
+            }
+            for kind, totals in calls.items()
+        }
+
+
+prompt_stats = PromptStats()
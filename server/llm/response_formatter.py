@@ -1,12 +1,17 @@
-from openai import OpenAI
 import os
+from datetime import datetime
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
-# Initialize OpenAI client
-client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+def _format_slot_time(iso_time):
+    """Format an ISO timestamp as a spoken time, e.g. '2:30 PM on Tuesday'"""
+    try:
+        moment = datetime.fromisoformat(iso_time)
+    except (TypeError, ValueError):
+        return str(iso_time)
+    return f"{moment.strftime('%I:%M %p').lstrip('0')} on {moment.strftime('%A')}"
 
 def format_response(command_type, raw_output):
     """
@@ -79,8 +84,27 @@ def format_response(command_type, raw_output):
         event = raw_output.get("event", {})
         if raw_output.get("status") == "success":
             return f"I've added the event '{event.get('summary')}' to your calendar."
+        if raw_output.get("status") == "conflict":
+            conflicts = ", ".join(f"'{c.get('summary')}'" for c in raw_output.get("conflicts", []))
+            response = f"That time overlaps with {conflicts}, so I didn't add '{event.get('summary')}'."
+            suggestions = raw_output.get("suggestions", [])
+            if suggestions:
+                times = ", ".join(_format_slot_time(slot['start']) for slot in suggestions)
+                response += f" You're free at {times}."
+            return response
         return "I was unable to add the event to your calendar."
         
+    elif command_type == "calendar_find_slot":
+        slots = raw_output.get("slots", [])
+        duration = raw_output.get("duration_minutes", 30)
+        if raw_output.get("status") == "booked":
+            event = raw_output.get("event", {})
+            return f"I've scheduled '{event.get('summary')}' at {_format_slot_time(event.get('start'))}."
+        if not slots:
+            return f"I couldn't find a free {duration}-minute slot in that time range."
+        times = ", ".join(_format_slot_time(slot['start']) for slot in slots)
+        return f"You have {duration} minutes free at {times}."
+        
     elif command_type == "search_file":
         results = raw_output.get("results", [])
         search_term = raw_output.get("search_term", "")
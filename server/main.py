@@ -1,7 +1,9 @@
-from voice.mic_listener import listen_for_speech
+from voice.wake_listener import WAKE_WORD, wake_listener
 from llm.llm_handler import process_with_llm
 from tools.command_executor import execute_command
 from tools.followup_handler import handle_followup
+from tools.file_search import start_file_index
+from monitoring.tracing import set_command_type, start_trace
 # We'll add more imports as we create the other components
 # from tools.file_search import search_file
 import json
@@ -11,37 +13,58 @@ import uuid
 def main():
     print("Jarvis Desktop Assistant")
     print("----------------------")
-    print("Listening for commands...")
+    if WAKE_WORD:
+        print(f"Listening for commands... (start them with '{WAKE_WORD.title()}')")
+    else:
+        print("Listening for commands...")
     print("Press Ctrl+C to exit")
     
     # Generate a unique user ID for this session
     user_id = str(uuid.uuid4())
     
+    # Build the filename index in the background so file searches are instant
+    start_file_index()
+    
     try:
         while True:
-            # Get voice input
-            text = listen_for_speech()
-            if text:                
-                # Process with LLM
-                command_data = process_with_llm(text, user_id)
-                if command_data:
-                    print(f"\nCommand type: {command_data['command_type']}")
-                    print(f"Parameters: {command_data['parameters']}")
-                    
-                    # Execute the command
-                    response = execute_command(command_data)
-                    
-                    # If follow-up is required, handle it
-                    if command_data.get("requires_followup"):
-                        handle_followup(command_data, user_id)
-                else:
-                    print("Could not process command")
+            # Wait for a command; the microphone stays open between turns
+            utterance = wake_listener.listen()
+            if utterance:
+                # The turn starts when the user started speaking
+                trace = start_trace("voice", started=utterance.started)
+                trace.add_span("vad", utterance.vad_seconds)
+                trace.add_span("stt", utterance.stt_seconds)
                 
+                outcome = "error"
+                try:
+                    # Process with LLM
+                    command_data = process_with_llm(utterance.transcript, user_id)
+                    set_command_type(command_data)
+                    if command_data:
+                        print(f"\nCommand type: {command_data['command_type']}")
+                        print(f"Parameters: {command_data['parameters']}")
+                        
+                        # Execute the command
+                        response = execute_command(command_data)
+                        trace.finish("ok")
+                        
+                        # If follow-up is required, handle it
+                        if command_data.get("requires_followup"):
+                            handle_followup(command_data, user_id)
+                    else:
+                        print("Could not process command")
+                        outcome = "unprocessed"
+                finally:
+                    # A failed turn still reaches the metrics; does nothing once finished as ok
+                    trace.finish(outcome)
+                    
                 print("----------------------")
                 
     except KeyboardInterrupt:
         print("\nExiting...")
+    finally:
+        wake_listener.close()
 
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
@@ -0,0 +1,29 @@
+import asyncio
+
+from monitoring.metrics import registry
+
+# How often the event loop is probed
+LAG_INTERVAL = 0.1
+
+event_loop_lag = registry.histogram(
+    "event_loop_lag_seconds",
+    "How much later than scheduled the event loop woke a sleeping task",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+
+
+async def monitor_event_loop(interval=LAG_INTERVAL):
+    """
+    Measure event loop lag until cancelled
+
+    Blocking work on the loop, such as a synchronous API call inside a
+    WebSocket handler, delays every other connection by the same amount.
+
+    Args:
+        interval (float): Seconds between probes
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        started = loop.time()
+        await asyncio.sleep(interval)
+        event_loop_lag.observe(max(0.0, loop.time() - started - interval))
@@ -0,0 +1,280 @@
+import bisect
+import threading
+
+# Latency buckets in seconds, sized for network calls from tens of milliseconds to a minute
+LATENCY_BUCKETS = (0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value):
+    """Escape a label value for the Prometheus text format"""
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in labels.items()) + "}"
+
+
+def _format_number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """
+    Cumulative histogram with a fixed set of label names.
+
+    Each label combination keeps per-bucket counts, a running sum and a count,
+    which is enough to report averages and approximate percentiles.
+    """
+
+    def __init__(self, name, description, label_names=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.description = description
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def observe(self, value, **labels):
+        """
+        Record one observation
+
+        Args:
+            value (float): Observed value, e.g. seconds
+            **labels: A value for every label name
+        """
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {"counts": [0] * (len(self.buckets) + 1), "sum": 0.0, "count": 0}
+            series["counts"][index] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def series(self):
+        """
+        Copy the recorded series
+
+        Returns:
+            list: (labels dict, bucket counts, sum, count) tuples; the last count is for +Inf
+        """
+        with self._lock:
+            return [
+                (dict(zip(self.label_names, key)), list(series["counts"]), series["sum"], series["count"])
+                for key, series in sorted(self._series.items())
+            ]
+
+    def snapshot(self):
+        """
+        Summarize every label combination
+
+        Returns:
+            list: Dicts with the labels, count, average and approximate p50/p95 in milliseconds
+        """
+        summaries = []
+        for labels, counts, total, count in self.series():
+            summaries.append({
+                **labels,
+                "count": count,
+                "average_ms": total / count * 1000 if count else None,
+                "p50_ms": self._quantile(counts, count, 0.5),
+                "p95_ms": self._quantile(counts, count, 0.95),
+            })
+        return summaries
+
+    def render(self):
+        """
+        Render in the Prometheus text exposition format
+
+        Returns:
+            list: Lines for this histogram
+        """
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} histogram"]
+        for labels, counts, total, count in self.series():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                bucket_labels = _format_labels({**labels, "le": _format_number(float(bound))})
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_number(total)}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {count}")
+        return lines
+
+    def _quantile(self, counts, count, quantile):
+        """Upper bound of the bucket holding the quantile, in milliseconds"""
+        if not count:
+            return None
+        seen = 0
+        for bound, bucket_count in zip(self.buckets, counts):
+            seen += bucket_count
+            if seen >= quantile * count:
+                return bound * 1000
+        return float("inf")
+
+
+class Counter:
+    """Monotonic counter with a fixed set of label names"""
+
+    def __init__(self, name, description, label_names=()):
+        self.name = name
+        self.description = description
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        """
+        Add to the counter
+
+        Args:
+            amount (float): Increment
+            **labels: A value for every label name
+        """
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def snapshot(self):
+        """
+        Current values
+
+        Returns:
+            list: Dicts with the labels and the value
+        """
+        with self._lock:
+            values = sorted(self._values.items())
+        return [{**dict(zip(self.label_names, key)), "value": value} for key, value in values]
+
+    def render(self):
+        """
+        Render in the Prometheus text exposition format
+
+        Returns:
+            list: Lines for this counter
+        """
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} counter"]
+        for entry in self.snapshot():
+            value = entry.pop("value")
+            lines.append(f"{self.name}{_format_labels(entry)} {_format_number(value)}")
+        return lines
+
+
+class Gauge(Counter):
+    """Value that goes up and down, e.g. a queue depth"""
+
+    def dec(self, amount=1, **labels):
+        """Subtract from the gauge"""
+        self.inc(-amount, **labels)
+
+    def set(self, value, **labels):
+        """
+        Replace the gauge's value
+
+        Args:
+            value (float): New value
+            **labels: A value for every label name
+        """
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        with self._lock:
+            self._values[key] = value
+
+    def render(self):
+        lines = super().render()
+        lines[1] = f"# TYPE {self.name} gauge"
+        return lines
+
+
+class Registry:
+    """Process-wide collection of named metrics"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+
+    def histogram(self, name, description, label_names=(), buckets=LATENCY_BUCKETS):
+        """
+        Get or create a histogram
+
+        Args:
+            name (str): Metric name, e.g. "openai_request_seconds"
+            description (str): What is measured
+            label_names (tuple): Names of the labels each observation carries
+            buckets (tuple): Bucket upper bounds
+
+        Returns:
+            Histogram: The shared histogram of that name
+        """
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = Histogram(name, description, label_names, buckets)
+            return metric
+
+    def counter(self, name, description, label_names=()):
+        """
+        Get or create a counter
+
+        Args:
+            name (str): Metric name, e.g. "turns_total"
+            description (str): What is counted
+            label_names (tuple): Names of the labels each increment carries
+
+        Returns:
+            Counter: The shared counter of that name
+        """
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = Counter(name, description, label_names)
+            return metric
+
+    def gauge(self, name, description, label_names=()):
+        """
+        Get or create a gauge
+
+        Args:
+            name (str): Metric name, e.g. "pipeline_queue_depth"
+            description (str): What is measured
+            label_names (tuple): Names of the labels each change carries
+
+        Returns:
+            Gauge: The shared gauge of that name
+        """
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = Gauge(name, description, label_names)
+            return metric
+
+    def render(self):
+        """
+        Render every metric in the Prometheus text exposition format
+
+        Returns:
+            str: The /metrics response body
+        """
+        with self._lock:
+            metrics = dict(self._metrics)
+        lines = []
+        for _, metric in sorted(metrics.items()):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self):
+        """
+        Summarize all metrics
+
+        Returns:
+            dict: Metric name -> summaries
+        """
+        with self._lock:
+            metrics = dict(self._metrics)
+        return {name: metric.snapshot() for name, metric in sorted(metrics.items())}
+
+
+registry = Registry()
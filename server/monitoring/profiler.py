@@ -0,0 +1,215 @@
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from urllib.parse import parse_qs
+
+from dotenv import load_dotenv
+
+from monitoring.tracing import add_finish_listener
+
+# Load environment variables
+load_dotenv()
+
+# Profiling only runs for turns that ask for it, and only once this switch allows it
+PROFILING_ALLOWED = os.getenv('PROFILING_ALLOWED', 'false').lower() in ('1', 'true', 'yes')
+PROFILE_DIR = os.getenv('PROFILE_DIR', 'profiles')
+# "sample" takes the stacks of every thread every SAMPLE_INTERVAL seconds. There is
+# no cProfile mode: it only sees the thread that enables it, and a turn spends
+# most of its time in to_thread workers; other modes fall back to sampling
+PROFILE_MODES = ("sample",)
+SAMPLE_INTERVAL = float(os.getenv('PROFILE_SAMPLE_INTERVAL', '0.005'))
+# A sampled profile stops by itself after this long
+MAX_PROFILE_SECONDS = 60.0
+
+# One profile at a time: samples would overlap
+_active = threading.Lock()
+_trace_profilers = {}
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class Profiler:
+    """
+    Profile of one turn, saved under PROFILE_DIR
+
+    Profiles are written as collapsed stacks (<name>.folded), one line per
+    stack with each thread as the root, for flamegraph.pl or speedscope.
+    """
+
+    def __init__(self, name, mode="sample", interval=SAMPLE_INTERVAL, directory=PROFILE_DIR):
+        self.name = name
+        self.mode = mode if mode in PROFILE_MODES else "sample"
+        self.interval = interval
+        self.directory = directory
+        self.stacks = Counter()
+        self.samples = 0
+        self.paths = []
+        self._sampler = None
+        self._stop = threading.Event()
+        self._stopping = threading.Lock()
+        self._started = None
+
+    def start(self):
+        """
+        Start profiling
+
+        Returns:
+            bool: False if profiling is off or another profile is running
+        """
+        if not PROFILING_ALLOWED or not _active.acquire(blocking=False):
+            print(f"Profile {self.name} skipped: profiling is disabled or busy")
+            return False
+        self._started = time.perf_counter()
+        self._sampler = threading.Thread(target=self._sample, name="profiler", daemon=True)
+        self._sampler.start()
+        return True
+
+    def _sample(self):
+        own = threading.get_ident()
+        deadline = self._started + MAX_PROFILE_SECONDS
+        while not self._stop.wait(self.interval) and time.perf_counter() < deadline:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                stack.append(names.get(ident, f"thread-{ident}"))
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+        if not self._stop.is_set():
+            # The turn never finished; save what there is and free the profiler
+            for trace_id, profiler in list(_trace_profilers.items()):
+                if profiler is self:
+                    _trace_profilers.pop(trace_id, None)
+            self.stop()
+
+    def stop(self):
+        """
+        Stop profiling and save the artifacts
+
+        Returns:
+            list: Paths written
+        """
+        # Only the first call saves, whether from the turn or the time limit
+        if self._started is None or not self._stopping.acquire(blocking=False):
+            return []
+        try:
+            seconds = time.perf_counter() - self._started
+            os.makedirs(self.directory, exist_ok=True)
+            base = os.path.join(self.directory, self.name)
+            self._stop.set()
+            if self._sampler is not threading.current_thread():
+                self._sampler.join()
+            with open(base + ".folded", "w") as f:
+                for stack, count in self.stacks.most_common():
+                    f.write(f"{stack} {count}\n")
+            self.paths = [base + ".folded"]
+            print(f"Profile {self.name} ({self.mode}, {seconds:.2f}s) saved to {', '.join(self.paths)}")
+        except Exception as e:
+            print(f"Error saving profile {self.name}: {str(e)}")
+        finally:
+            self._started = None
+            _active.release()
+        return self.paths
+
+
+def profile_control(text):
+    """
+    Read a WebSocket control message asking to profile the next turn
+
+    Args:
+        text (str): A text message, e.g. {"type": "profile", "mode": "sample"}
+
+    Returns:
+        str: The profiler mode, or None if the message is something else
+    """
+    try:
+        message = json.loads(text)
+    except ValueError:
+        return None
+    if not isinstance(message, dict) or message.get("type") != "profile":
+        return None
+    return message.get("mode") if message.get("mode") in PROFILE_MODES else "sample"
+
+
+def profile_trace(trace, mode="sample"):
+    """
+    Profile a turn until its trace finishes
+
+    Args:
+        trace (Trace): The turn's trace; its ID names the artifacts
+        mode (str): "sample"
+
+    Returns:
+        Profiler: The running profiler, or None if it could not start
+    """
+    profiler = Profiler(f"{trace.kind}-{trace.trace_id}", mode)
+    if not profiler.start():
+        return None
+    _trace_profilers[trace.trace_id] = profiler
+    return profiler
+
+
+def _stop_trace_profile(trace, outcome, total, totals):
+    profiler = _trace_profilers.pop(trace.trace_id, None)
+    if profiler is not None:
+        profiler.stop()
+
+
+add_finish_listener(_stop_trace_profile)
+
+
+def _requested_mode(scope):
+    if b"profile" in scope.get("query_string", b""):
+        values = parse_qs(scope["query_string"].decode("latin-1")).get("profile")
+        if values and values[0] not in ("", "0", "false"):
+            return values[0]
+    for name, value in scope.get("headers", ()):
+        if name == b"x-profile" and value not in (b"", b"0", b"false"):
+            return value.decode("latin-1")
+    return None
+
+
+class ProfilingMiddleware:
+    """
+    Profile HTTP requests sent with ?profile=1 or an X-Profile header
+
+    The value may name the mode ("sample"). The response
+    carries an X-Profile-Id header naming the saved artifacts. Requests that
+    don't ask for a profile pass straight through.
+    """
+
+    def __init__(self, app, directory=PROFILE_DIR):
+        self.app = app
+        self.directory = directory
+
+    async def __call__(self, scope, receive, send):
+        mode = _requested_mode(scope) if scope["type"] == "http" else None
+        if mode is None:
+            await self.app(scope, receive, send)
+            return
+
+        profiler = Profiler(f"http-{uuid.uuid4().hex[:16]}", mode, directory=self.directory)
+        started = profiler.start()
+
+        async def send_with_profile_id(message):
+            if started and message["type"] == "http.response.start":
+                headers = list(message.get("headers", [])) + [(b"x-profile-id", profiler.name.encode("latin-1"))]
+                message = dict(message, headers=headers)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            if started:
+                profiler.stop()
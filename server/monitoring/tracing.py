@@ -0,0 +1,176 @@
+import contextvars
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from monitoring.metrics import registry
+
+# Stages of a voice turn, in order. "queue" is time spent waiting behind earlier
+# turns of the same connection; "vad" is only reported by capture paths that
+# gate audio locally; "persist" covers storing the turn in conversation memory.
+STAGES = ("receive", "queue", "vad", "stt", "context", "llm", "tool", "format", "tts", "persist", "send")
+
+stage_seconds = registry.histogram(
+    "turn_stage_seconds",
+    "Time spent in each stage of a turn",
+    ("stage", "command_type", "outcome"),
+)
+turn_seconds = registry.histogram(
+    "turn_seconds",
+    "End-to-end turn latency",
+    ("kind", "command_type", "outcome"),
+)
+turns_total = registry.counter(
+    "turns_total",
+    "Turns handled",
+    ("kind", "command_type", "outcome"),
+)
+
+_current_trace = contextvars.ContextVar("current_trace", default=None)
+# Callbacks run for every finished trace, e.g. by the benchmarks
+_finish_listeners = []
+
+
+class Trace:
+    """Span timings of one turn, reported to the metrics when it finishes"""
+
+    def __init__(self, kind, trace_id=None, started=None):
+        self.kind = kind
+        self.trace_id = trace_id or uuid.uuid4().hex[:16]
+        self.command_type = "none"
+        self.started = started or time.perf_counter()
+        self._lock = threading.Lock()
+        self._spans = []
+        self._finished = False
+
+    def add_span(self, stage, seconds):
+        """
+        Record time spent in a stage
+
+        Args:
+            stage (str): One of STAGES
+            seconds (float): Duration
+        """
+        with self._lock:
+            self._spans.append((stage, seconds))
+
+    def stage_totals(self):
+        """
+        Time per stage, summing stages that ran more than once
+
+        Returns:
+            dict: Stage -> seconds, in STAGES order
+        """
+        with self._lock:
+            spans = list(self._spans)
+        totals = {}
+        for stage, seconds in spans:
+            totals[stage] = totals.get(stage, 0.0) + seconds
+        return dict(sorted(totals.items(), key=lambda item: STAGES.index(item[0]) if item[0] in STAGES else len(STAGES)))
+
+    def finish(self, outcome="ok"):
+        """
+        Close the trace and feed its spans into the metrics
+
+        Args:
+            outcome (str): E.g. "ok", "no_speech" or "error"
+
+        Returns:
+            float: Total turn seconds
+        """
+        with self._lock:
+            if self._finished:
+                return None
+            self._finished = True
+        total = time.perf_counter() - self.started
+        totals = self.stage_totals()
+        for stage, seconds in totals.items():
+            stage_seconds.observe(seconds, stage=stage, command_type=self.command_type, outcome=outcome)
+        turn_seconds.observe(total, kind=self.kind, command_type=self.command_type, outcome=outcome)
+        turns_total.inc(kind=self.kind, command_type=self.command_type, outcome=outcome)
+        spans = ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in totals.items())
+        print(f"Turn {self.trace_id} ({self.kind}, {self.command_type}, {outcome}) {total:.2f}s: {spans}")
+        for listener in list(_finish_listeners):
+            try:
+                listener(self, outcome, total, totals)
+            except Exception as e:
+                print(f"Error in trace listener: {str(e)}")
+        # Later code in this context, e.g. the next turn on a WebSocket, is outside the turn
+        if _current_trace.get() is self:
+            _current_trace.set(None)
+        return total
+
+
+def add_finish_listener(callback):
+    """
+    Call a function with every finished trace
+
+    Args:
+        callback (callable): Takes the trace, its outcome, total seconds and stage totals
+    """
+    _finish_listeners.append(callback)
+
+
+def remove_finish_listener(callback):
+    """Stop calling a function added with add_finish_listener"""
+    if callback in _finish_listeners:
+        _finish_listeners.remove(callback)
+
+
+def start_trace(kind, trace_id=None, started=None):
+    """
+    Start a trace for the current turn
+
+    Spans recorded in this context, including code run through asyncio.to_thread
+    or submitted with propagate_context, are added to it.
+
+    Args:
+        kind (str): "audio", "text", "rest" or "voice" (main.py)
+        trace_id (str): Reuse an ID, e.g. one sent by the client
+        started (float): perf_counter time the turn arrived, if earlier than now
+
+    Returns:
+        Trace: The new trace
+    """
+    trace = Trace(kind, trace_id, started)
+    _current_trace.set(trace)
+    return trace
+
+
+def current_trace():
+    """The trace of the turn being handled, or None"""
+    return _current_trace.get()
+
+
+def set_command_type(command_data):
+    """Label the current trace with the command a turn produced"""
+    trace = _current_trace.get()
+    if trace is not None and command_data:
+        extra = command_data.get("additional_commands")
+        trace.command_type = "multiple" if extra else command_data.get("command_type", "none")
+
+
+@contextmanager
+def span(stage):
+    """
+    Time a block as a stage of the current turn; does nothing outside a trace
+
+    Args:
+        stage (str): One of STAGES
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add_span(stage, time.perf_counter() - started)
+
+
+def propagate_context(function):
+    """Wrap a callable so it runs with the caller's trace, e.g. in a thread pool"""
+    context = contextvars.copy_context()
+    return lambda *args, **kwargs: context.run(function, *args, **kwargs)
@@ -0,0 +1,284 @@
+import asyncio
+import atexit
+import base64
+import contextvars
+import gzip
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+from dotenv import load_dotenv
+
+from monitoring.tracing import add_finish_listener, current_trace
+
+# Load environment variables
+load_dotenv()
+
+# Recording is opt-in: recorded turns hold the user's audio, emails and calendar
+RECORD_TURNS = os.getenv('RECORD_TURNS', 'false').lower() in ('1', 'true', 'yes')
+RECORD_DIR = os.getenv('RECORD_DIR', 'recordings')
+RECORD_AUDIO = os.getenv('RECORD_AUDIO', 'true').lower() in ('1', 'true', 'yes')
+
+_current_turn = contextvars.ContextVar("current_recorded_turn", default=None)
+
+
+def request_key(request):
+    """Short stable hash of a backend request, for matching calls on replay"""
+    encoded = json.dumps(request, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha1(encoded).hexdigest()[:16]
+
+
+class _Recording:
+    """Inputs, backend calls and output of one turn being recorded"""
+
+    def __init__(self, inputs):
+        self.inputs = inputs
+        self.started_at = datetime.now().isoformat()
+        self.calls = []
+        self.response = None
+        self._lock = threading.Lock()
+
+    def add(self, backend, key, seconds, response=None, error=None):
+        call = {"backend": backend, "key": key, "seconds": round(seconds, 4)}
+        if error is not None:
+            call["error"] = f"{type(error).__name__}: {error}"
+        else:
+            call["response"] = response
+        with self._lock:
+            self.calls.append(call)
+
+
+class ReplayedTurn:
+    """
+    Recorded backend responses for one turn being replayed
+
+    Calls are matched by backend and request hash. When the pipeline now asks
+    something different, the next unused call of the same backend is used and
+    counted as drift; when none is left the call is a miss.
+    """
+
+    def __init__(self, turn, time_scale=1.0):
+        self.turn = turn
+        self.time_scale = time_scale
+        self.drift = 0
+        self.misses = 0
+        self._unused = list(turn.get("calls", []))
+        self._lock = threading.Lock()
+
+    def take(self, backend, key):
+        """
+        Use up the recorded call answering a request
+
+        Returns:
+            dict: The recorded call
+
+        Raises:
+            LookupError: If the recording has no call left for the backend
+        """
+        with self._lock:
+            same_backend = [call for call in self._unused if call["backend"] == backend]
+            exact = [call for call in same_backend if call["key"] == key]
+            if exact:
+                call = exact[0]
+            elif same_backend:
+                call = same_backend[0]
+                self.drift += 1
+            else:
+                self.misses += 1
+                raise LookupError(f"No recorded {backend} call left to replay")
+            self._unused.remove(call)
+        return call
+
+
+class TurnRecorder:
+    """
+    Records turns to gzipped JSON lines and replays them without the network
+
+    Backend calls go through call() or acall(). While recording they run
+    normally and their responses and timings are kept with the turn; while
+    replaying, the recorded response is returned after the recorded delay.
+    """
+
+    def __init__(self, enabled=RECORD_TURNS, directory=RECORD_DIR, record_audio=RECORD_AUDIO):
+        self.enabled = enabled
+        self.directory = directory
+        self.record_audio = record_audio
+        self._pending_replay = None
+        self._writes = queue.Queue()
+        self._writer = None
+        self._recordings = {}
+        self._lock = threading.Lock()
+        add_finish_listener(self._on_finish)
+
+    def start(self, trace, **inputs):
+        """
+        Begin recording, or replaying, the turn of a trace
+
+        Args:
+            trace (Trace): The turn's trace
+            **inputs: What the turn was given, e.g. audio bytes or text and user_id
+        """
+        pending, self._pending_replay = self._pending_replay, None
+        if pending is not None:
+            _current_turn.set(pending)
+            return
+        if not self.enabled or trace is None:
+            # A WebSocket handler keeps its context from one turn to the next
+            _current_turn.set(None)
+            return
+        if "audio" in inputs:
+            audio = inputs.pop("audio")
+            inputs["audio_bytes"] = len(audio)
+            if self.record_audio:
+                inputs["audio"] = base64.b64encode(audio).decode("ascii")
+        recording = _Recording(inputs)
+        with self._lock:
+            self._recordings[trace.trace_id] = recording
+        _current_turn.set(recording)
+
+    def replay_next(self, turn, time_scale=1.0):
+        """
+        Answer the next turn started from a recorded one
+
+        Args:
+            turn (dict): A line of a recording
+            time_scale (float): Multiply the recorded backend delays, 0 for none
+
+        Returns:
+            ReplayedTurn: Counts drift and misses once the turn has run
+        """
+        self._pending_replay = ReplayedTurn(turn, time_scale)
+        return self._pending_replay
+
+    def record_output(self, response):
+        """Keep the response the user got, to compare against on replay"""
+        recording = _current_turn.get()
+        if isinstance(recording, _Recording):
+            recording.response = response
+
+    def call(self, backend, request, function, encode=None, decode=None):
+        """
+        Run a blocking backend call through the recorder
+
+        Args:
+            backend (str): Backend name, e.g. "stt" or "tool"
+            request: JSON-able description of the request, hashed for matching
+            function (callable): Makes the call
+            encode (callable): Turns the result into JSON-able data
+            decode (callable): Turns recorded data back into a result
+
+        Returns:
+            The call's result, or the recorded one when replaying
+        """
+        turn = _current_turn.get()
+        if isinstance(turn, ReplayedTurn):
+            call = turn.take(backend, request_key(request))
+            if turn.time_scale:
+                time.sleep(call["seconds"] * turn.time_scale)
+            return self._replayed(backend, call, decode)
+        if turn is None:
+            return function()
+        started = time.perf_counter()
+        try:
+            result = function()
+        except Exception as e:
+            turn.add(backend, request_key(request), time.perf_counter() - started, error=e)
+            raise
+        turn.add(backend, request_key(request), time.perf_counter() - started,
+                 response=encode(result) if encode else result)
+        return result
+
+    async def acall(self, backend, request, function, encode=None, decode=None):
+        """Async version of call(), where function returns an awaitable"""
+        turn = _current_turn.get()
+        if isinstance(turn, ReplayedTurn):
+            call = turn.take(backend, request_key(request))
+            if turn.time_scale:
+                await asyncio.sleep(call["seconds"] * turn.time_scale)
+            return self._replayed(backend, call, decode)
+        if turn is None:
+            return await function()
+        started = time.perf_counter()
+        try:
+            result = await function()
+        except Exception as e:
+            turn.add(backend, request_key(request), time.perf_counter() - started, error=e)
+            raise
+        turn.add(backend, request_key(request), time.perf_counter() - started,
+                 response=encode(result) if encode else result)
+        return result
+
+    def _replayed(self, backend, call, decode):
+        if "error" in call:
+            raise RuntimeError(f"Recorded {backend} failure: {call['error']}")
+        return decode(call["response"]) if decode else call["response"]
+
+    def _on_finish(self, trace, outcome, total, totals):
+        if current_trace() is trace:
+            # Finished in the turn's own context: later calls there aren't part of it
+            _current_turn.set(None)
+        with self._lock:
+            recording = self._recordings.pop(trace.trace_id, None)
+        if recording is None:
+            return
+        self._ensure_writer()
+        self._writes.put({
+            "trace_id": trace.trace_id,
+            "kind": trace.kind,
+            "started_at": recording.started_at,
+            "command_type": trace.command_type,
+            "outcome": outcome,
+            "total": round(total, 4),
+            "stages": {stage: round(seconds, 4) for stage, seconds in totals.items()},
+            "inputs": recording.inputs,
+            "calls": list(recording.calls),
+            "response": recording.response,
+        })
+
+    def _ensure_writer(self):
+        with self._lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_forever, name="turn-recorder", daemon=True)
+                self._writer.start()
+                # Don't lose the last turns when the server stops
+                atexit.register(self.flush)
+
+    def _write_forever(self):
+        # Writes happen off the request path; each turn is its own gzip member
+        while True:
+            turn = self._writes.get()
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+                path = os.path.join(self.directory, f"turns-{datetime.now().strftime('%Y%m%d')}.jsonl.gz")
+                with gzip.open(path, "at", encoding="utf-8") as f:
+                    f.write(json.dumps(turn, default=str) + "\n")
+            except Exception as e:
+                print(f"Error writing recorded turn: {str(e)}")
+            finally:
+                self._writes.task_done()
+
+    def flush(self):
+        """Wait until every finished turn is on disk"""
+        self._writes.join()
+
+
+def load_turns(path):
+    """
+    Read the turns of a recording
+
+    Args:
+        path (str): A .jsonl.gz file written by the recorder
+
+    Returns:
+        list: One dict per turn
+    """
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+# Create a global instance
+turn_recorder = TurnRecorder()
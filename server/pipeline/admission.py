@@ -0,0 +1,154 @@
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+
+from dotenv import load_dotenv
+
+from monitoring.metrics import registry
+
+# Load environment variables
+load_dotenv()
+
+# Calls each stage may run at once, across every connection
+STAGE_LIMITS = {
+    "stt": int(os.getenv('STT_CONCURRENCY', '4')),
+    "llm": int(os.getenv('LLM_CONCURRENCY', '8')),
+    "tts": int(os.getenv('TTS_CONCURRENCY', '2')),
+}
+# How long a turn may wait for a stage before it is turned away as busy
+STAGE_WAIT = float(os.getenv('STAGE_WAIT_SECONDS', '1.0'))
+# Utterances a connection may have waiting behind the one being handled
+CONNECTION_QUEUE_SIZE = int(os.getenv('CONNECTION_QUEUE_SIZE', '2'))
+# Longest utterance accepted, as 16-bit mono audio at 44.1kHz
+MAX_AUDIO_SECONDS = float(os.getenv('MAX_AUDIO_SECONDS', '60'))
+MAX_AUDIO_BYTES = int(MAX_AUDIO_SECONDS * 44100 * 2)
+# Suggested client back-off after a busy response
+RETRY_AFTER_SECONDS = 1
+
+stage_in_flight = registry.gauge("pipeline_stage_in_flight", "Calls running in each limited stage", ("stage",))
+stage_waiting = registry.gauge("pipeline_stage_waiting", "Turns waiting for a slot in each limited stage", ("stage",))
+queue_depth = registry.gauge("pipeline_queue_depth", "Utterances waiting in per-connection queues", ("endpoint",))
+rejected_total = registry.counter("pipeline_rejected_total", "Turns turned away by admission control", ("reason",))
+
+
+class Busy(Exception):
+    """A stage or queue is full; the client should try again shortly"""
+
+    def __init__(self, reason):
+        super().__init__(f"Server busy ({reason})")
+        self.reason = reason
+
+
+def busy_response(reason, trace_id=None):
+    """
+    Message telling a WebSocket client its turn was turned away
+
+    Args:
+        reason (str): The full stage, "queue_full" or "too_large"
+        trace_id (str): The turn's trace, if it had one
+
+    Returns:
+        dict: The message
+    """
+    response = {
+        "type": "busy",
+        "error": "I'm handling too many requests right now. Please try again in a moment.",
+        "reason": reason,
+        "retry_after": RETRY_AFTER_SECONDS,
+    }
+    if trace_id:
+        response["trace_id"] = trace_id
+    return response
+
+
+class StageLimiter:
+    """Caps the calls running in each stage, turning away turns that wait too long"""
+
+    def __init__(self, limits=None, wait=STAGE_WAIT):
+        self.limits = dict(limits or STAGE_LIMITS)
+        self.wait = wait
+        self._semaphores = {}
+
+    @asynccontextmanager
+    async def slot(self, stage):
+        """
+        Hold one of a stage's slots for the duration of a block
+
+        Args:
+            stage (str): A stage in limits; other stages are not limited
+
+        Raises:
+            Busy: If no slot freed up within the wait
+        """
+        if stage not in self.limits:
+            yield
+            return
+        semaphore = self._semaphores.get(stage)
+        if semaphore is None:
+            semaphore = self._semaphores[stage] = asyncio.Semaphore(self.limits[stage])
+        if semaphore.locked():
+            stage_waiting.inc(stage=stage)
+            try:
+                await asyncio.wait_for(semaphore.acquire(), timeout=self.wait)
+            except asyncio.TimeoutError:
+                rejected_total.inc(reason=stage)
+                raise Busy(stage)
+            finally:
+                stage_waiting.dec(stage=stage)
+        else:
+            await semaphore.acquire()
+        stage_in_flight.inc(stage=stage)
+        try:
+            yield
+        finally:
+            stage_in_flight.dec(stage=stage)
+            semaphore.release()
+
+
+class TurnQueue:
+    """
+    Bounded queue of one connection's utterances
+
+    The connection's reader offers turns and its worker handles them in
+    order; a full queue refuses new turns instead of letting them pile up.
+    """
+
+    def __init__(self, endpoint, size=CONNECTION_QUEUE_SIZE):
+        self.endpoint = endpoint
+        self._queue = asyncio.Queue(maxsize=size)
+
+    def offer(self, turn):
+        """
+        Queue a turn unless the queue is full
+
+        Returns:
+            bool: Whether the turn was queued
+        """
+        try:
+            self._queue.put_nowait((time.perf_counter(), turn))
+        except asyncio.QueueFull:
+            rejected_total.inc(reason="queue_full")
+            return False
+        queue_depth.inc(endpoint=self.endpoint)
+        return True
+
+    async def get(self):
+        """
+        Wait for the next turn
+
+        Returns:
+            tuple: (perf_counter time it arrived, the turn)
+        """
+        item = await self._queue.get()
+        queue_depth.dec(endpoint=self.endpoint)
+        return item
+
+    def close(self):
+        """Drop the turns still waiting, e.g. when the client disconnects or speaks over them"""
+        while not self._queue.empty():
+            self._queue.get_nowait()
+            queue_depth.dec(endpoint=self.endpoint)
+
+
+stage_limiter = StageLimiter()
@@ -0,0 +1,164 @@
+import contextvars
+import json
+import os
+import threading
+
+from dotenv import load_dotenv
+
+from monitoring.metrics import registry
+
+# Load environment variables
+load_dotenv()
+
+# New audio on a connection cancels the turn still being answered there
+BARGE_IN = os.getenv('BARGE_IN', 'true').lower() in ('1', 'true', 'yes')
+
+cancelled_total = registry.counter("pipeline_cancelled_total", "Turns abandoned before they finished", ("reason",))
+
+# The running turn's token; asyncio.to_thread and propagate_context carry it
+# into the threads doing the turn's work
+_current_token = contextvars.ContextVar("cancel_token", default=None)
+
+
+class TurnCancelled(BaseException):
+    """
+    The turn was abandoned by its user
+
+    Like asyncio.CancelledError it derives from BaseException, so the
+    handlers that turn failures into fallback answers let it through.
+    """
+
+
+class CancelToken:
+    """
+    Cancellation flag shared by everything working on one turn
+
+    Blocking work polls it with check(), or registers a callback that
+    interrupts it, such as cancelling an API request or stopping playback.
+    """
+
+    def __init__(self):
+        self.reason = None
+        self.trace_id = None
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks = []
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def cancel(self, reason="cancel"):
+        """
+        Cancel the turn and run its callbacks, once
+
+        Args:
+            reason (str): "barge_in", "cancel" or "disconnect"
+
+        Returns:
+            bool: False if the turn was already cancelled
+        """
+        with self._lock:
+            if self._event.is_set():
+                return False
+            self.reason = reason
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        cancelled_total.inc(reason=reason)
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                print(f"Error cancelling turn: {str(e)}")
+        return True
+
+    def add_callback(self, callback):
+        """Run callback on cancellation, or right away if the turn is already cancelled"""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def remove_callback(self, callback):
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+    def check(self):
+        """
+        Raises:
+            TurnCancelled: If the turn was cancelled
+        """
+        if self._event.is_set():
+            raise TurnCancelled(self.reason)
+
+
+class InFlightTurn:
+    """The turn a connection is answering, as a task its user can abandon"""
+
+    def __init__(self):
+        self.token = None
+        self.task = None
+
+    def start(self, token, task):
+        self.token = token
+        self.task = task
+
+    def finish(self):
+        self.token = None
+        self.task = None
+
+    def cancel(self, reason):
+        """
+        Abandon the turn: interrupt its blocking work and cancel its task
+
+        Args:
+            reason (str): "barge_in", "cancel" or "disconnect"
+
+        Returns:
+            bool: Whether there was a turn to cancel
+        """
+        if self.task is None or self.task.done() or not self.token.cancel(reason):
+            return False
+        self.task.cancel()
+        return True
+
+
+def cancel_control(text):
+    """
+    Whether a WebSocket text message asks to cancel the turn in flight
+
+    Args:
+        text (str): A text message, e.g. {"type": "cancel"}
+
+    Returns:
+        bool: True for a cancel message
+    """
+    try:
+        message = json.loads(text)
+    except ValueError:
+        return False
+    return isinstance(message, dict) and message.get("type") == "cancel"
+
+
+def set_cancel_token(token):
+    """Make token the current turn's token in this context"""
+    _current_token.set(token)
+
+
+def current_token():
+    """The current turn's token, or None outside a cancellable turn"""
+    return _current_token.get()
+
+
+def check_cancelled():
+    """
+    Stop the current turn's work here if it was cancelled
+
+    Raises:
+        TurnCancelled: If the turn was cancelled
+    """
+    token = _current_token.get()
+    if token is not None:
+        token.check()
@@ -1,17 +1,54 @@
+import argparse
+import os
 import uvicorn
 import logging
+from pipeline.admission import MAX_AUDIO_BYTES
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("uvicorn")
 
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Start the assistant server")
+    parser.add_argument("--workers", type=int, default=int(os.getenv('WORKERS', '1')),
+                        help="Worker processes; more than one turns off auto-reload (default: WORKERS or 1)")
+    parser.add_argument("--host", default=os.getenv('HOST', 'localhost'))
+    parser.add_argument("--port", type=int, default=int(os.getenv('PORT', '8000')))
+    args = parser.parse_args(argv)
+    # Each worker would crawl the same directories into the same index files, and
+    # the filename and semantic indexes assume a single writer
+    if args.workers > 1 and os.getenv('FILE_INDEXING', 'true').lower() in ('1', 'true', 'yes'):
+        parser.error("--workers above 1 needs FILE_INDEXING=false; file searches then walk the disk "
+                     "and content search is unavailable")
+    return args
+
+def share_sessions(workers):
+    """
+    Make sure sessions are visible to every worker
+
+    Follow-ups may reach a different worker than the command that asked for
+    them, so in-process sessions are moved to SQLite next to the server. The
+    workers inherit the environment.
+    """
+    if workers > 1 and os.getenv('SESSION_STORE', 'memory') == 'memory':
+        logger.info("Sharing sessions between workers with SESSION_STORE=sqlite; "
+                    "use SESSION_STORE=redis when running on several machines")
+        os.environ['SESSION_STORE'] = 'sqlite'
+
 if __name__ == "__main__":
-    logger.info("Starting server with WebSocket endpoint at ws://localhost:8000/ws")
+    args = parse_args()
+    share_sessions(args.workers)
+    logger.info(f"Starting server with WebSocket endpoint at ws://{args.host}:{args.port}/ws")
     uvicorn.run(
         "api:app",
-        host="localhost",
-        port=8000,
-        reload=True,  # Enable auto-reload during development
+        host=args.host,
+        port=args.port,
+        # Auto-reload during development; it can't be combined with workers
+        reload=args.workers == 1,
+        workers=args.workers,
         log_level="info",
-        ws="websockets"  # Explicitly enable WebSocket support
-    ) 
\ No newline at end of file
+        ws="websockets",  # Explicitly enable WebSocket support
+        # Refuse oversized messages before they are buffered; the app replies to
+        # audio just over its own limit
+        ws_max_size=MAX_AUDIO_BYTES + 1024 * 1024
+    )
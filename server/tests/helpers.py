@@ -0,0 +1,85 @@
+import json
+import os
+import socket
+import subprocess
+import sys
+import textwrap
+import time
+from unittest import mock
+
+import httpx
+
+parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The benchmark fakes replace the Google, Pinecone and speech modules process-wide,
+# so tests of code importing them run it in its own interpreter
+
+
+def run_child(script, *args):
+    """
+    Run a script in a new interpreter from the server directory
+
+    Args:
+        script (str): Python source whose last line of output is JSON
+        *args: Command line arguments for the script
+
+    Returns:
+        The decoded last line of output
+    """
+    completed = subprocess.run(
+        [sys.executable, "-c", textwrap.dedent(script), *args],
+        cwd=parent_dir, capture_output=True, text=True, timeout=120,
+    )
+    if completed.returncode != 0:
+        raise AssertionError(completed.stderr[-2000:])
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_fake_server(**env):
+    """
+    Start the server against the benchmark fakes and wait until it answers
+
+    Args:
+        **env: Environment variables for the server process
+
+    Returns:
+        tuple: The server process and its "host:port" address
+    """
+    address = f"127.0.0.1:{free_port()}"
+    server_env = dict(os.environ, RECORD_TURNS="false")
+    server_env.update(env)
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "benchmarks.fake_server:app", "--port", address.split(":")[1],
+         "--lifespan", "off", "--log-level", "warning"],
+        cwd=parent_dir, env=server_env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    deadline = time.time() + 60
+    while True:
+        try:
+            httpx.get(f"http://{address}/metrics", timeout=1.0)
+            return process, address
+        except httpx.TransportError:
+            if process.poll() is not None or time.time() > deadline:
+                stop_server(process)
+                raise AssertionError("Server did not start")
+            time.sleep(0.2)
+
+
+def stop_server(process):
+    process.terminate()
+    process.wait(timeout=30)
+
+
+def import_llm_handler():
+    """Import the LLM handler with a stand-in Pinecone client, which it connects to on import"""
+    with mock.patch("pinecone.Pinecone"), \
+            mock.patch.dict(os.environ, {"PINECONE_API_KEY": "test", "PINECONE_ENVIRONMENT": "test"}):
+        from llm import llm_handler
+    return llm_handler
@@ -0,0 +1,110 @@
+import asyncio
+import os
+import sys
+import unittest
+
+parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, parent_dir)
+
+from helpers import run_child
+from monitoring.metrics import registry
+from pipeline.admission import Busy, StageLimiter, TurnQueue, busy_response, queue_depth
+
+# Turns against the app with every external service faked and no text-to-speech
+# slot ever free
+SATURATED_TTS_SCRIPT = """
+import json
+from fastapi.testclient import TestClient
+from benchmarks.fakes import FakeBackends, synthetic_audio
+from benchmarks.run_benchmark import TURNS, start_server
+from pipeline.admission import StageLimiter
+
+backends = FakeBackends("zero")
+api = start_server(backends)
+turn = TURNS[0]
+audio = synthetic_audio(turn["text"], seed=0)
+backends.register_audio(audio, turn["text"])
+
+client = TestClient(api.app)
+# Each request below runs in its own event loop, so each gets its own limiter
+api.stage_limiter = StageLimiter({"tts": 0}, wait=0.05)
+rest = client.post("/api/process-command", json={"text": turn["text"], "user_id": "user"})
+api.stage_limiter = StageLimiter({"tts": 0}, wait=0.05)
+with client.websocket_connect("/ws/audio") as websocket:
+    websocket.send_bytes(audio)
+    replies = [websocket.receive_json(), websocket.receive_json()]
+print(json.dumps({
+    "rest_status": rest.status_code, "rest_response": rest.json().get("response"),
+    "replies": [reply["type"] for reply in replies], "audio_response": replies[-1].get("response"),
+    "spoken": backends.calls["tts"],
+}))
+"""
+
+
+class TestStageLimiter(unittest.TestCase):
+    def test_turns_away_when_the_stage_stays_full(self):
+        limiter = StageLimiter({"stt": 1}, wait=0.05)
+
+        async def scenario():
+            async with limiter.slot("stt"):
+                with self.assertRaises(Busy) as raised:
+                    async with limiter.slot("stt"):
+                        pass
+                self.assertEqual(raised.exception.reason, "stt")
+            # Free again, and unlimited stages never wait
+            async with limiter.slot("stt"):
+                async with limiter.slot("format"):
+                    return True
+
+        self.assertTrue(asyncio.run(scenario()))
+
+    def test_waiting_turn_gets_the_freed_slot(self):
+        limiter = StageLimiter({"llm": 1}, wait=1.0)
+        order = []
+
+        async def turn(name, seconds):
+            async with limiter.slot("llm"):
+                order.append(name)
+                await asyncio.sleep(seconds)
+
+        async def scenario():
+            await asyncio.gather(turn("first", 0.05), turn("second", 0))
+
+        asyncio.run(scenario())
+        self.assertEqual(order, ["first", "second"])
+
+
+class TestTurnQueue(unittest.TestCase):
+    def test_bounded_queue_and_depth_gauge(self):
+        async def scenario():
+            turns = TurnQueue("test", size=2)
+            self.assertTrue(turns.offer("a"))
+            self.assertTrue(turns.offer("b"))
+            self.assertFalse(turns.offer("c"))
+            self.assertIn('pipeline_queue_depth{endpoint="test"} 2', registry.render())
+            _, turn = await turns.get()
+            self.assertEqual(turn, "a")
+            turns.close()
+            return [entry["value"] for entry in queue_depth.snapshot() if entry["endpoint"] == "test"]
+
+        self.assertEqual(asyncio.run(scenario()), [0])
+        self.assertIn("# TYPE pipeline_queue_depth gauge", registry.render())
+
+    def test_busy_response(self):
+        response = busy_response("queue_full", "abc")
+        self.assertEqual((response["type"], response["reason"], response["trace_id"]), ("busy", "queue_full", "abc"))
+
+
+class TestSaturatedSpeech(unittest.TestCase):
+    def test_result_is_sent_when_it_cannot_be_spoken(self):
+        result = run_child(SATURATED_TTS_SCRIPT)
+        # The command ran, so a retry would repeat it; the client gets the result, unspoken
+        self.assertEqual(result["rest_status"], 200)
+        self.assertTrue(result["rest_response"])
+        self.assertEqual(result["replies"], ["transcription", "jarvis"])
+        self.assertEqual(result["audio_response"], result["rest_response"])
+        self.assertEqual(result["spoken"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
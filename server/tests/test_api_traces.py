@@ -0,0 +1,61 @@
+import os
+import sys
+import unittest
+
+parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, parent_dir)
+
+from helpers import run_child
+
+# A REST turn whose command execution fails, once without and once with turn
+# recording, against the app with every external service faked
+FAILING_TURN_SCRIPT = """
+import json, os, tempfile
+from fastapi.testclient import TestClient
+from benchmarks.fakes import FakeBackends
+from benchmarks.run_benchmark import TURNS, start_server
+from monitoring.tracing import add_finish_listener
+
+api = start_server(FakeBackends("zero"))
+outcomes = []
+add_finish_listener(lambda trace, outcome, total, totals: outcomes.append((trace.kind, outcome)))
+
+def failing_execute(command_data, speak=True):
+    raise RuntimeError("tool crashed")
+
+api.execute_command = failing_execute
+client = TestClient(api.app, raise_server_exceptions=False)
+
+def failing_turn(record):
+    outcomes.clear()
+    api.turn_recorder.enabled = record
+    api.turn_recorder.directory = tempfile.mkdtemp()
+    response = client.post("/api/process-command", json={"text": TURNS[0]["text"], "user_id": "user"})
+    api.turn_recorder.flush()
+    return {"status": response.status_code, "outcomes": list(outcomes),
+            "open_recordings": len(api.turn_recorder._recordings),
+            "recorded": sorted(os.listdir(api.turn_recorder.directory))}
+
+print(json.dumps({"plain": failing_turn(False), "recorded": failing_turn(True)}))
+"""
+
+
+class TestRestTraces(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.results = run_child(FAILING_TURN_SCRIPT)
+
+    def test_failed_turn_finishes_its_trace(self):
+        result = self.results["plain"]
+        self.assertEqual(result["status"], 500)
+        self.assertEqual(result["outcomes"], [["rest", "error"]])
+
+    def test_failed_turn_releases_its_recording(self):
+        result = self.results["recorded"]
+        self.assertEqual(result["outcomes"], [["rest", "error"]])
+        self.assertEqual(result["open_recordings"], 0)
+        self.assertEqual(len(result["recorded"]), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
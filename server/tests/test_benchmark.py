@@ -0,0 +1,87 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, parent_dir)
+
+from benchmarks.fakes import Latency
+from benchmarks.load_test import lag_between
+from benchmarks.report import percentile, summarize
+
+
+class TestReport(unittest.TestCase):
+    def test_percentiles(self):
+        values = [i / 1000 for i in range(1, 101)]
+        self.assertEqual(percentile(values, 0.5), 0.05)
+        self.assertEqual(percentile(values, 0.99), 0.099)
+        summary = summarize(values)
+        self.assertEqual(summary["count"], 100)
+        self.assertEqual(summary["p90_ms"], 90.0)
+        self.assertEqual(summary["max_ms"], 100.0)
+        self.assertEqual(summarize([]), {"count": 0})
+
+    def test_latency_specs(self):
+        import random
+        rng = random.Random(1)
+        self.assertEqual(Latency("fixed:0.2").sample(rng), 0.2)
+        self.assertTrue(0.1 <= Latency("uniform:0.1:0.3").sample(rng) <= 0.3)
+        self.assertGreaterEqual(Latency("normal:0:1").sample(rng), 0.0)
+        with self.assertRaises(ValueError):
+            Latency("gamma:1")
+
+    def test_loop_lag_between_reads(self):
+        before = {"buckets": {"0.01": 5, "0.1": 5, "+Inf": 5}, "sum": 0.02, "count": 5}
+        after = {"buckets": {"0.01": 14, "0.1": 15, "+Inf": 15}, "sum": 0.32, "count": 15}
+        summary = lag_between(before, after)
+        self.assertEqual(summary["count"], 10)
+        self.assertEqual(summary["mean_ms"], 30.0)
+        self.assertEqual(summary["p50_ms"], 10.0)
+        self.assertEqual(summary["p99_ms"], 100.0)
+        self.assertIsNone(lag_between(None, after))
+
+
+class TestBenchmarkRun(unittest.TestCase):
+    def test_zero_latency_run_covers_every_endpoint(self):
+        # The fakes replace modules process-wide, so the run gets its own interpreter
+        with tempfile.TemporaryDirectory() as temp_dir:
+            output = os.path.join(temp_dir, "results.json")
+            completed = subprocess.run(
+                [sys.executable, "-m", "benchmarks.run_benchmark", "--profile", "zero", "--iterations", "1",
+                 "--warmup", "0", "--output", output],
+                cwd=parent_dir, capture_output=True, text=True, timeout=300,
+            )
+            self.assertEqual(completed.returncode, 0, completed.stderr[-2000:])
+            with open(output) as f:
+                results = json.load(f)
+
+        for endpoint in ("rest", "audio", "text"):
+            self.assertGreater(results["endpoints"][endpoint]["turns"], 0)
+            self.assertEqual(results["endpoints"][endpoint]["errors"], 0)
+        self.assertIn("stt", results["endpoints"]["audio"]["stages"])
+        self.assertIn("llm", results["endpoints"]["rest"]["stages"])
+        self.assertGreater(results["backend_calls"]["llm_chat"], 0)
+
+    def test_concurrent_load_run(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            output = os.path.join(temp_dir, "load.json")
+            completed = subprocess.run(
+                [sys.executable, "-m", "benchmarks.load_test", "--profile", "zero", "--users", "3",
+                 "--duration", "1", "--ramp", "0", "--think-time", "0", "--no-pacing", "--output", output],
+                cwd=parent_dir, capture_output=True, text=True, timeout=300,
+            )
+            self.assertEqual(completed.returncode, 0, completed.stderr[-2000:])
+            with open(output) as f:
+                results = json.load(f)
+
+        self.assertGreater(results["turns"], 0)
+        self.assertEqual(results["connection_errors"], 0)
+        self.assertEqual(results["queue_delay"]["count"], results["turns"])
+        self.assertGreater(results["event_loop_lag"]["count"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,45 @@
+import os
+import sys
+import unittest
+
+parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, parent_dir)
+
+from helpers import run_child
+
+# Runs against the fake Calendar API
+SHARED_INDEX_SCRIPT = """
+import json
+from datetime import datetime, timedelta
+from benchmarks.fakes import FakeBackends, install
+
+backends = FakeBackends("zero")
+install(backends)
+from tools.calendar_handler import CalendarHandler
+
+first, second = CalendarHandler(), CalendarHandler()
+start = first.to_datetime("2026-10-20T10:00:00")
+calls = backends.calls["calendar"]
+first.find_conflicts(start, start + timedelta(hours=1))
+# A later command's handler reuses the synced day, including events added since
+event = second.add_event("Standup", start_time=start + timedelta(hours=2), end_time=start + timedelta(hours=3))
+conflicts = first.find_conflicts(start + timedelta(hours=2), start + timedelta(hours=2, minutes=30))
+print(json.dumps({
+    "calendar_requests": backends.calls["calendar"] - calls,
+    "conflicts": [conflict["summary"] for conflict in conflicts],
+    "aware": start.tzinfo is not None,
+}))
+"""
+
+
+class TestCalendarHandler(unittest.TestCase):
+    def test_handlers_share_the_synced_event_index(self):
+        result = run_child(SHARED_INDEX_SCRIPT)
+        # One sync for both lookups, plus the insert
+        self.assertEqual(result["calendar_requests"], 2)
+        self.assertEqual(result["conflicts"], ["Standup"])
+        self.assertTrue(result["aware"])
+
+
+if __name__ == "__main__":
+    unittest.main()
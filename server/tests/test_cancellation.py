@@ -0,0 +1,131 @@
+import asyncio
+import contextvars
+import json
+import os
+import sys
+import threading
+import time
+import unittest
+
+import httpx
+from websockets.sync.client import connect
+
+parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, parent_dir)
+
+from benchmarks.load_test import corpus_clips
+from helpers import start_fake_server, stop_server
+from llm.openai_client import OpenAIClient
+from pipeline.cancellation import CancelToken, TurnCancelled, cancel_control, check_cancelled, set_cancel_token
+
+
+class TestCancelToken(unittest.TestCase):
+    def test_cancel_runs_callbacks_once(self):
+        token = CancelToken()
+        calls = []
+        token.add_callback(lambda: calls.append("first"))
+        removed = lambda: calls.append("removed")
+        token.add_callback(removed)
+        token.remove_callback(removed)
+        self.assertTrue(token.cancel("barge_in"))
+        self.assertFalse(token.cancel("cancel"))
+        # Registered after the fact, it runs at once
+        token.add_callback(lambda: calls.append("late"))
+        self.assertEqual(calls, ["first", "late"])
+        self.assertEqual(token.reason, "barge_in")
+        with self.assertRaises(TurnCancelled):
+            token.check()
+
+    def test_check_cancelled_follows_the_context(self):
+        token = CancelToken()
+        token.cancel()
+        check_cancelled()
+
+        def in_turn():
+            set_cancel_token(token)
+            check_cancelled()
+
+        with self.assertRaises(TurnCancelled):
+            contextvars.Context().run(in_turn)
+
+    def test_cancel_control(self):
+        self.assertTrue(cancel_control('{"type": "cancel"}'))
+        self.assertFalse(cancel_control('{"type": "profile"}'))
+        self.assertFalse(cancel_control("cancel"))
+
+    def test_cancelling_the_turn_cancels_its_request(self):
+        client = OpenAIClient(api_key="test")
+        token = CancelToken()
+        request_cancelled = threading.Event()
+
+        async def slow_request():
+            try:
+                await asyncio.sleep(30)
+            except asyncio.CancelledError:
+                request_cancelled.set()
+                raise
+
+        def turn():
+            set_cancel_token(token)
+            return client.run(slow_request())
+
+        threading.Timer(0.2, token.cancel).start()
+        started = time.perf_counter()
+        with self.assertRaises(TurnCancelled):
+            contextvars.Context().run(turn)
+        self.assertLess(time.perf_counter() - started, 5)
+        self.assertTrue(request_cancelled.wait(5))
+
+
+class TestBargeIn(unittest.TestCase):
+    """A server with a slow LLM and half-minute answers, interrupted by its client"""
+
+    def setUp(self):
+        self.process, self.url = start_fake_server(FAKE_LATENCY="llm_chat=fixed:1.5,tts_playback=fixed:30",
+                                                   SESSION_STORE="memory")
+        self.clips = {name: audio for name, audio, _ in corpus_clips()}
+
+    def tearDown(self):
+        stop_server(self.process)
+
+    def _receive(self, websocket, expected_type):
+        while True:
+            reply = json.loads(websocket.recv(timeout=10))
+            if reply["type"] == expected_type:
+                return reply
+
+    def test_new_audio_and_cancel_messages_abandon_the_turn(self):
+        started = time.perf_counter()
+        with connect(f"ws://{self.url}/ws/audio", max_size=None) as websocket:
+            # Cancelled while the LLM is still answering
+            websocket.send(self.clips["email_check"])
+            first = self._receive(websocket, "transcription")
+            websocket.send(json.dumps({"type": "cancel"}))
+            cancelled = self._receive(websocket, "cancelled")
+            self.assertEqual((cancelled["reason"], cancelled["trace_id"]), ("cancel", first["trace_id"]))
+
+            # Interrupted while speaking the answer
+            websocket.send(self.clips["calendar_today"])
+            self._receive(websocket, "transcription")
+            time.sleep(2.5)
+            websocket.send(self.clips["general_question"])
+            self.assertEqual(self._receive(websocket, "cancelled")["reason"], "barge_in")
+            self.assertEqual(self._receive(websocket, "transcription")["transcription"],
+                             "What time zone is Tokyo in")
+            websocket.send(json.dumps({"type": "cancel"}))
+            self._receive(websocket, "cancelled")
+        # Well within a single answer's playback
+        self.assertLess(time.perf_counter() - started, 20)
+
+        metrics = httpx.get(f"http://{self.url}/metrics").text
+        self.assertIn('pipeline_cancelled_total{reason="barge_in"} 1', metrics)
+        self.assertIn('pipeline_cancelled_total{reason="cancel"} 2', metrics)
+        turns = [line for line in metrics.splitlines() if line.startswith("turns_total{")]
+        self.assertTrue(turns)
+        self.assertTrue(all('outcome="cancelled"' in line for line in turns), turns)
+        # The turn cancelled during the LLM call never reached the history
+        self.assertNotIn('stage="persist",command_type="none"', metrics)
+
+
+if __name__ == "__main__":
+    unittest.main()
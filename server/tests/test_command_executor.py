@@ -0,0 +1,76 @@
+import os
+import sys
+import unittest
+from unittest import mock
+
+parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, parent_dir)
+
+from helpers import import_llm_handler, run_child
+from llm.command_schemas import COMMANDS
+
+# The executor imports the Google clients, so it runs against the benchmark fakes
+MULTI_PART_SCRIPT = """
+import json, time
+from benchmarks.fakes import FakeBackends, install
+install(FakeBackends("zero"))
+from tools import command_executor
+
+def slow_handler(name, seconds):
+    def handler(parameters):
+        time.sleep(seconds)
+        # The formatter passes errors through verbatim, so each part is easy to spot
+        return {"error": name}
+    return handler
+
+command_executor.COMMAND_HANDLERS["calendar_check"] = slow_handler("calendar", 0.6)
+command_executor.COMMAND_HANDLERS["email_check"] = slow_handler("email", 0.3)
+command_executor.COMMAND_HANDLERS["search_file"] = slow_handler("files", 0.1)
+command = {
+    "command_type": "email_check", "parameters": {},
+    "additional_commands": [
+        {"command_type": "calendar_check", "parameters": {"timeframe": "today"}},
+        {"command_type": "search_file", "parameters": {"filename": "notes"}},
+    ],
+}
+started = time.perf_counter()
+response = command_executor.execute_command(command, speak=False)
+print(json.dumps({"seconds": time.perf_counter() - started, "response": response,
+                  "handlers": sorted(command_executor.COMMAND_HANDLERS)}))
+"""
+
+
+class TestMultiPartCommands(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.results = run_child(MULTI_PART_SCRIPT)
+
+    def test_every_command_type_has_a_handler(self):
+        # general_question is answered directly rather than by a tool
+        self.assertEqual(set(self.results["handlers"]) | {"general_question"}, set(COMMANDS))
+
+    def test_parts_run_concurrently_and_keep_their_order(self):
+        result = self.results
+        # As long as the slowest part (0.6s), not the sum (1.0s)
+        self.assertGreaterEqual(result["seconds"], 0.6)
+        self.assertLess(result["seconds"], 0.9)
+        self.assertEqual(result["response"], "email\n\ncalendar\n\nfiles")
+
+    def test_command_needing_a_followup_leads(self):
+        llm_handler = import_llm_handler()
+        command = {
+            "command_type": "calendar_check", "parameters": {"timeframe": "today"},
+            "additional_commands": [
+                {"command_type": "email_send", "parameters": {"subject": "Lunch", "body": "Are we still on?"}},
+            ],
+        }
+        with mock.patch.object(llm_handler, "conversation_manager") as conversation_manager:
+            finished = llm_handler._finish_command("check my calendar and email Sam about lunch", "user", command)
+        order = [finished["command_type"]] + [extra["command_type"] for extra in finished["additional_commands"]]
+        self.assertEqual(order, ["email_send", "calendar_check"])
+        self.assertTrue(finished["requires_followup"])
+        conversation_manager.set_current_context.assert_called_once_with("user", finished)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+import json
+import os
+import sys
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, parent_dir)
+
+from helpers import import_llm_handler
+from llm.command_schemas import COMMAND_TYPES, command_from_tool_call, tool_definitions, validate_parameters
+
+
+def tool_call(name, arguments):
+    return SimpleNamespace(function=SimpleNamespace(name=name, arguments=json.dumps(arguments)))
+
+
+class TestCommandSchemas(unittest.TestCase):
+    def test_tools_are_strict(self):
+        tools = tool_definitions()
+        self.assertEqual([tool["function"]["name"] for tool in tools], COMMAND_TYPES)
+        for tool in tools:
+            schema = tool["function"]["parameters"]
+            self.assertTrue(tool["function"]["strict"])
+            self.assertFalse(schema["additionalProperties"])
+            self.assertEqual(set(schema["required"]), set(schema["properties"]))
+            self.assertNotIn("default", json.dumps(schema))
+
+    def test_parallel_calls_use_non_strict_tools(self):
+        llm_handler = import_llm_handler()
+        requests = []
+
+        def hedged_chat(parse, model, **request):
+            requests.append(request)
+            return None, SimpleNamespace(usage=None), None
+
+        with mock.patch.object(llm_handler, "hedged_chat", hedged_chat), \
+                mock.patch.object(llm_handler.model_router, "select", return_value=("model", None)):
+            for allow_multiple in (False, True):
+                llm_handler._call_tools([{"role": "user", "content": "check my email"}], ["email_check"],
+                                        "required", "full", 10, allow_multiple=allow_multiple)
+        self.assertEqual([(request["parallel_tool_calls"], request["tools"][0]["function"]["strict"])
+                          for request in requests], [(False, True), (True, False)])
+        # The shared definitions are left strict
+        self.assertTrue(tool_definitions(["email_check"])[0]["function"]["strict"])
+
+    def test_tool_call_is_validated(self):
+        command = command_from_tool_call(tool_call("email_draft", {
+            "to": None, "subject": None, "body": "See you at 5",
+            "followup_question": "Who should I send it to?", "parameter_to_update": "to",
+        }))
+        self.assertEqual(command["parameters"], {"subject": "No Subject", "body": "See you at 5"})
+        self.assertTrue(command["requires_followup"])
+        self.assertEqual(command["followup_context"]["parameter_to_update"], "to")
+
+    def test_defaults_and_coercion(self):
+        parameters = validate_parameters("calendar_add", {"title": "Lunch", "date": "friday", "time": "12:00",
+                                                          "duration_minutes": "45"})
+        self.assertEqual(parameters.duration_minutes, 45)
+        self.assertEqual(validate_parameters("email_check", {}).days_back, 7)
+
+    def test_invalid_parameters_raise(self):
+        with self.assertRaises(ValueError):
+            validate_parameters("calendar_add", {"title": "Lunch"})
+        with self.assertRaises(ValueError):
+            validate_parameters("calendar_check", {"timeframe": "someday"})
+        with self.assertRaises(ValueError):
+            validate_parameters("launch_rocket", {})
+        with self.assertRaises(ValueError):
+            command_from_tool_call(SimpleNamespace(function=SimpleNamespace(name="open_app", arguments="{")))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import os
+import sys
+import tempfile
+import unittest
+import zipfile
+
+# Add the parent directory to sys.path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir)
+
+from tools.content_index import ContentIndex, tokenize
+
+
+def write(path, text):
+    with open(path, "w") as f:
+        f.write(text)
+
+
+class TestContentIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.docs = os.path.join(self.tmp.name, "Documents")
+        os.mkdir(self.docs)
+        self.db_path = os.path.join(self.tmp.name, "content.db")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_tokenize_drops_accents_and_stopwords(self):
+        self.assertEqual(tokenize("The Café's LEASE, renewed in 2024"), ["cafe", "lease", "renewed", "2024"])
+
+    def test_incremental_update_and_search(self):
+        write(os.path.join(self.docs, "notes.md"), "Design review notes: latency budget and caching")
+        write(os.path.join(self.docs, "lease.txt"), "The apartment lease ends in June")
+        with zipfile.ZipFile(os.path.join(self.docs, "renewal.docx"), "w") as archive:
+            archive.writestr("word/document.xml", "<w:p><w:t>Landlord offers a lease renewal</w:t></w:p>")
+
+        index = ContentIndex(self.db_path, [self.docs], max_workers=1)
+        self.assertEqual(index.update(), {"indexed": 3, "removed": 0, "unchanged": 0})
+        self.assertEqual(index.update(), {"indexed": 0, "removed": 0, "unchanged": 3})
+
+        paths = [os.path.basename(path) for path, _, _, _ in index.search("the pdf where I wrote about the lease")]
+        self.assertEqual(sorted(paths), ["lease.txt", "renewal.docx"])
+        self.assertEqual([os.path.basename(p) for p, _, _, _ in index.search("lease", extensions=[".docx"])],
+                         ["renewal.docx"])
+
+        # Only the edited file is re-extracted, and deleted files drop out
+        write(os.path.join(self.docs, "notes.md"), "Design review notes now mention the lease too, twice: lease")
+        os.remove(os.path.join(self.docs, "lease.txt"))
+        self.assertEqual(index.update(), {"indexed": 1, "removed": 1, "unchanged": 1})
+        self.assertEqual(os.path.basename(index.search("lease")[0][0]), "notes.md")
+
+    def test_search_reads_while_an_update_writes(self):
+        write(os.path.join(self.docs, "lease.txt"), "The apartment lease ends in June")
+        index = ContentIndex(self.db_path, [self.docs], max_workers=1)
+        index.update()
+
+        # An update in the middle of replacing a document
+        index._conn.execute("BEGIN IMMEDIATE")
+        index._conn.execute("DELETE FROM postings")
+        try:
+            self.assertEqual([os.path.basename(p) for p, _, _, _ in index.search("lease")], ["lease.txt"])
+            self.assertEqual(index.stats()["documents"], 1)
+        finally:
+            index._conn.rollback()
+
+
+if __name__ == "__main__":
+    unittest.main()
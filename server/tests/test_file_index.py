@@ -0,0 +1,138 @@
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+# Add the parent directory to sys.path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir)
+
+from tools import file_index
+from tools.file_index import FileIndex
+
+
+def make_file(path, mtime):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write("x")
+    os.utime(path, (mtime, mtime))
+
+
+def build_tree(root):
+    now = time.time()
+    make_file(os.path.join(root, "Documents", "Resume_2023.pdf"), now - 300)
+    make_file(os.path.join(root, "Documents", "jobs", "resume_final.docx"), now - 100)
+    make_file(os.path.join(root, "Documents", "resume-notes.md"), now - 50)
+    make_file(os.path.join(root, "Documents", ".cache", "resume.pdf"), now)
+    make_file(os.path.join(root, "Downloads", "pdf_resume"), now - 10)
+
+
+class TestFileIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        build_tree(self.root)
+        self.db_path = os.path.join(self.root, "index.db")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_search_after_rescan_and_reload(self):
+        roots = [os.path.join(self.root, "Documents"), os.path.join(self.root, "Downloads")]
+
+        index = FileIndex(self.db_path, roots)
+        self.assertFalse(index.is_ready())
+        index.rescan()
+
+        names = [os.path.basename(p) for p, _, _, _ in index.search("RESUME", extensions=[".pdf", ".docx"])]
+        # Newest first, hidden directories skipped, and "pdf_resume" has no matching extension
+        self.assertEqual(names, ["resume_final.docx", "Resume_2023.pdf"])
+        self.assertEqual(len(index.search("resume")), 4)
+
+        # A second instance serves the persisted index without rescanning
+        reopened = FileIndex(self.db_path, roots)
+        self.assertTrue(reopened.is_ready())
+        self.assertEqual(reopened.search("notes"), index.search("notes"))
+
+    def test_incremental_updates(self):
+        root = os.path.join(self.root, "Documents")
+        index = FileIndex(self.db_path, [root])
+        index.rescan()
+
+        new_file = os.path.join(root, "lease_agreement.pdf")
+        make_file(new_file, time.time())
+        index.update_path(new_file)
+        self.assertEqual([p for p, _, _, _ in index.search("lease")], [new_file])
+
+        index.remove_path(os.path.join(root, "jobs"))
+        self.assertTrue(all("resume_final" not in p for p, _, _, _ in index.search("resume")))
+
+        index._flush()
+        self.assertEqual(FileIndex(self.db_path, [root]).stats()["files"], index.stats()["files"])
+
+    def test_modified_file_keeps_its_id(self):
+        root = os.path.join(self.root, "Documents")
+        index = FileIndex(self.db_path, [root])
+        index.rescan()
+        path = os.path.join(root, "resume-notes.md")
+        name_id = index._path_ids[path]
+        postings = sum(len(p) for p in index._trigrams._postings.values())
+
+        for _ in range(3):
+            make_file(path, time.time())
+            index.update_path(path)
+        self.assertEqual(index._path_ids[path], name_id)
+        self.assertEqual(sum(len(p) for p in index._trigrams._postings.values()), postings)
+        self.assertEqual(index._trigrams._removed, set())
+        self.assertEqual(index.search("notes")[0][2], os.stat(path).st_mtime)
+
+    def test_removing_a_directory_spares_its_look_alike_siblings(self):
+        root = os.path.join(self.root, "Documents")
+        make_file(os.path.join(root, "jobs-old", "resume_2019.pdf"), time.time())
+        make_file(os.path.join(root, "jobs", "deep", "resume_draft.pdf"), time.time())
+        index = FileIndex(self.db_path, [root])
+        index.rescan()
+
+        index.remove_path(os.path.join(root, "jobs"))
+        self.assertEqual(sorted(os.path.basename(p) for p, _, _, _ in index.search("resume")),
+                         ["Resume_2023.pdf", "resume-notes.md", "resume_2019.pdf"])
+        self.assertEqual(index._sorted_paths, sorted(index._entries))
+        index.remove_path(os.path.join(root, "resume-notes.md"))
+        self.assertEqual(index._sorted_paths, sorted(index._entries))
+        self.assertEqual(len(index._entries), 2)
+
+    def test_moved_in_directory_is_walked_outside_the_lock(self):
+        root = os.path.join(self.root, "Documents")
+        index = FileIndex(self.db_path, [root])
+        index.rescan()
+        moved = os.path.join(root, "archive")
+        make_file(os.path.join(moved, "lease_2020.pdf"), time.time())
+        walk = file_index._walk
+        lock_free = []
+
+        def take_lock():
+            acquired = index._lock.acquire(timeout=1)
+            if acquired:
+                index._lock.release()
+            lock_free.append(acquired)
+
+        def checking_walk(path):
+            # Another thread, such as a search, can take the lock meanwhile
+            taker = threading.Thread(target=take_lock)
+            taker.start()
+            taker.join()
+            return walk(path)
+
+        with mock.patch.object(file_index, "_walk", checking_walk):
+            index.update_path(moved)
+        self.assertEqual(lock_free, [True])
+        self.assertEqual([os.path.basename(p) for p, _, _, _ in index.search("lease")], ["lease_2020.pdf"])
+        self.assertEqual(index._sorted_paths, sorted(index._entries))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+import os
+import sys
+import time
+import unittest
+from unittest import mock
+
+# Add the parent directory to sys.path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir)
+
+from tools import fuzzy_match
+from tools.fuzzy_match import TrigramIndex, normalize_name, rank_score
+
+
+class TestFuzzyMatch(unittest.TestCase):
+    def test_normalize_name(self):
+        self.assertEqual(normalize_name("Résumé_2024_final.pdf"), "resume 2024 final")
+        self.assertEqual(normalize_name("Q3-report.docx"), "q 3 report")
+        self.assertEqual(normalize_name("QuarterlyReport.xlsx"), "quarterly report")
+        self.assertEqual(normalize_name("notes v2", strip_extension=False), "notes v 2")
+
+    def test_spoken_queries_find_their_files(self):
+        names = ["Résumé_2024_final.pdf", "Q3-report.docx", "recipes.txt", "lease_agreement.pdf", "budget.xlsx"]
+        index = TrigramIndex()
+        for name_id, name in enumerate(names):
+            index.add(name_id, name)
+
+        def best(query):
+            return names[index.query(query)[0][0]]
+
+        self.assertEqual(best("resume"), "Résumé_2024_final.pdf")
+        self.assertEqual(best("q3 report"), "Q3-report.docx")
+        self.assertEqual(best("reciepes"), "recipes.txt")
+        self.assertEqual(best("the lease"), "lease_agreement.pdf")
+        self.assertEqual(index.query("xylophone"), [])
+
+    def test_removed_names_are_not_returned(self):
+        index = TrigramIndex()
+        index.add(0, "lease_agreement.pdf")
+        index.add(1, "lease_renewal.pdf")
+        index.remove(0)
+        self.assertEqual([name_id for name_id, _ in index.query("lease agreement")], [1])
+
+    @mock.patch.object(fuzzy_match, "COMPACT_MIN_REMOVED", 2)
+    def test_removed_ids_are_compacted_away(self):
+        index = TrigramIndex()
+        for name_id in range(8):
+            index.add(name_id, f"lease_{name_id}.pdf")
+        index.remove(0)
+        index.remove(1)
+        self.assertEqual(index._removed, {0, 1})
+        # A third tombstone passes both the minimum and a quarter of the live ids
+        index.remove(2)
+        self.assertEqual(index._removed, set())
+        self.assertFalse(any(name_id in postings for postings in index._postings.values() for name_id in (0, 1, 2)))
+        self.assertEqual(sorted(name_id for name_id, _ in index.query("lease")), [3, 4, 5, 6, 7])
+
+    def test_rank_score_prefers_similar_then_recent_then_shallow(self):
+        now = time.time()
+        self.assertGreater(rank_score(1.0, now - 400 * 86400, 0, now), rank_score(0.5, now, 0, now))
+        self.assertGreater(rank_score(0.8, now, 2, now), rank_score(0.8, now - 30 * 86400, 2, now))
+        self.assertGreater(rank_score(0.8, now, 0, now), rank_score(0.8, now, 4, now))
+
+
+if __name__ == "__main__":
+    unittest.main()
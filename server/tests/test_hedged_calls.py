@@ -0,0 +1,114 @@
+import asyncio
+import os
+import sys
+import unittest
+from unittest.mock import patch
+
+parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, parent_dir)
+
+from llm import hedged_calls
+from llm.hedged_calls import HedgeStats, ahedged_chat
+
+
+def _parse(response):
+    if response == "invalid":
+        raise ValueError("invalid tool call")
+    return response.upper()
+
+
+class TestHedgedChat(unittest.TestCase):
+    def setUp(self):
+        self.started = []
+        self.cancelled = []
+        self.stats = HedgeStats()
+        patcher = patch.object(hedged_calls, "hedge_stats", self.stats)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _run(self, behaviours, settle=0, **options):
+        """Run ahedged_chat where each model sleeps and then returns or raises"""
+        async def achat(model, **kwargs):
+            self.started.append(model)
+            delay, outcome = behaviours[model].pop(0)
+            try:
+                await asyncio.sleep(delay)
+            except asyncio.CancelledError:
+                self.cancelled.append(model)
+                raise
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+
+        async def run():
+            result = await ahedged_chat(_parse, model="big", **options)
+            # Let cancelled tasks observe their cancellation, or losing ones finish
+            await asyncio.sleep(settle)
+            return result
+
+        with patch.object(hedged_calls.openai_client, "achat", achat):
+            return asyncio.run(run())
+
+    def test_fast_primary_is_not_hedged(self):
+        result, response, path = self._run({"big": [(0.01, "ok")]}, mode="hedge", hedge_after=0.5)
+        self.assertEqual((result, path), ("OK", "primary"))
+        self.assertEqual(self.started, ["big"])
+        self.assertEqual(self.stats.snapshot()["hedged"], 0)
+
+    def test_hedge_wins_and_primary_latency_still_counts(self):
+        result, _, path = self._run({"big": [(0.3, "slow"), (0.01, "hedge")]}, settle=0.5,
+                                    mode="hedge", hedge_after=0.05)
+        self.assertEqual((result, path), ("HEDGE", "hedge"))
+        self.assertEqual(self.started, ["big", "big"])
+        self.assertEqual(self.cancelled, [])
+        self.assertEqual(self.stats.snapshot()["wins"], {"hedge": 1})
+        # The primary's full latency, not the time until the hedge won
+        [primary_seconds] = self.stats._primary_seconds
+        self.assertGreaterEqual(primary_seconds, 0.3)
+
+    def test_pending_backup_is_cancelled(self):
+        with patch.object(hedged_calls, "FALLBACK_MODEL", "small"):
+            _, _, path = self._run({"big": [(0.1, "ok")], "small": [(5, "slow")]}, mode="fallback", hedge_after=0.05)
+        self.assertEqual(path, "primary")
+        self.assertEqual(self.cancelled, ["small"])
+
+    def test_fallback_uses_faster_model(self):
+        with patch.object(hedged_calls, "FALLBACK_MODEL", "small"):
+            _, _, path = self._run({"big": [(5, "slow")], "small": [(0.01, "fast")]},
+                                   mode="fallback", hedge_after=0.05)
+        self.assertEqual(path, "fallback")
+        self.assertEqual(self.started, ["big", "small"])
+
+    def test_invalid_response_does_not_win(self):
+        with patch.object(hedged_calls, "FALLBACK_MODEL", "small"):
+            result, _, path = self._run({"big": [(0.2, "valid")], "small": [(0.01, "invalid")]},
+                                        mode="fallback", hedge_after=0.05)
+        self.assertEqual((result, path), ("VALID", "primary"))
+
+    def test_failed_primary_triggers_backup(self):
+        result, _, path = self._run({"big": [(0.01, RuntimeError("boom")), (0.01, "ok")]},
+                                    mode="hedge", hedge_after=5)
+        self.assertEqual((result, path), ("OK", "hedge"))
+        # A failure says nothing about how long the primary takes to answer
+        self.assertEqual(list(self.stats._primary_seconds), [])
+
+    def test_off_raises_primary_error(self):
+        with self.assertRaises(RuntimeError):
+            self._run({"big": [(0.01, RuntimeError("boom"))]}, mode="off", hedge_after=0.001)
+        self.assertEqual(self.started, ["big"])
+
+
+class TestHedgeStats(unittest.TestCase):
+    def test_auto_delay_follows_primary_p95(self):
+        stats = HedgeStats()
+        with patch.object(hedged_calls, "HEDGE_AFTER", "auto"):
+            self.assertEqual(stats.hedge_after(), hedged_calls.DEFAULT_HEDGE_AFTER)
+            for i in range(100):
+                stats.record("primary", i / 100, False, i / 100)
+            self.assertAlmostEqual(stats.hedge_after(), 0.95)
+        with patch.object(hedged_calls, "HEDGE_AFTER", "1.5"):
+            self.assertEqual(stats.hedge_after(), 1.5)
+
+
+if __name__ == "__main__":
+    unittest.main()
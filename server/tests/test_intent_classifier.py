@@ -0,0 +1,69 @@
+import os
+import sys
+import tempfile
+import unittest
+
+parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, parent_dir)
+
+from llm.intent_classifier import IntentClassifier, cross_validate, featurize, load_examples, log_example, train_from_log
+
+EXAMPLES = [
+    ("open spotify", "open_app"), ("launch chrome", "open_app"), ("start slack please", "open_app"),
+    ("can you open notes", "open_app"), ("open the calculator", "open_app"), ("launch visual studio code", "open_app"),
+    ("find my budget file", "search_file"), ("where is the resume document", "search_file"),
+    ("search for my tax return", "search_file"), ("locate the notes pdf", "search_file"),
+    ("find the invoice spreadsheet", "search_file"), ("where did I save the contract", "search_file"),
+    ("what is the capital of france", "general_question"), ("who wrote hamlet", "general_question"),
+    ("how far is the moon", "general_question"), ("tell me about japan", "general_question"),
+    ("why is the sky blue", "general_question"), ("how many ounces in a pound", "general_question"),
+]
+
+
+class TestIntentClassifier(unittest.TestCase):
+    def test_featurize_is_stable(self):
+        self.assertTrue((featurize("Open Spotify!") == featurize("open spotify")).all())
+
+    def test_train_and_predict(self):
+        model = IntentClassifier()
+        model.train(EXAMPLES)
+        self.assertEqual(model.predict("please open spotify")[0], "open_app")
+        self.assertEqual(model.predict("where is my tax file")[0], "search_file")
+        self.assertEqual(model.evaluate(EXAMPLES)["accuracy"], 1.0)
+
+    def test_rare_intents_are_not_predicted(self):
+        model = IntentClassifier()
+        model.train(EXAMPLES + [("send an email to sam", "email_send")])
+        self.assertNotIn("email_send", model.labels)
+
+    def test_cross_validation_scores_unseen_utterances(self):
+        # Utterances sharing no words with the rest can be memorized but not learned
+        examples = EXAMPLES + [("zork blorp", "open_app"), ("quux frobnicate", "search_file")]
+        model = IntentClassifier()
+        model.train(examples)
+        self.assertEqual(model.evaluate(examples)["accuracy"], 1.0)
+
+        results = cross_validate(examples, folds=5)
+        self.assertEqual((results["examples"], results["folds"]), (len(examples), 5))
+        self.assertLess(results["accuracy"], 1.0)
+        self.assertIsNone(cross_validate(EXAMPLES[:3]))
+
+    def test_log_train_and_load(self):
+        with tempfile.TemporaryDirectory() as directory:
+            log_path = os.path.join(directory, "log.jsonl")
+            model_path = os.path.join(directory, "model.npz")
+            for text, label in EXAMPLES:
+                log_example(text, label, log_path)
+            # A repeated utterance keeps only its latest label
+            log_example("open spotify", "open_app", log_path)
+            self.assertEqual(len(load_examples(log_path)), len(EXAMPLES))
+
+            results = train_from_log(log_path, model_path, holdout=0.2)
+            self.assertEqual(results["trained_on"], len(EXAMPLES))
+            model = IntentClassifier.load(model_path)
+            self.assertEqual(model.labels, ["general_question", "open_app", "search_file"])
+            self.assertEqual(model.predict("launch slack")[0], "open_app")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+import os
+import sys
+import unittest
+from datetime import date
+
+parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, parent_dir)
+
+from llm.intent_router import RouterStats, extract_timeframe, local_parameters, route_command
+
+
+class TestIntentRouter(unittest.TestCase):
+    def test_calendar_check_timeframes(self):
+        command = route_command("What's on my calendar tomorrow?")
+        self.assertEqual(command["command_type"], "calendar_check")
+        self.assertEqual(command["parameters"], {"timeframe": "tomorrow"})
+        self.assertEqual(route_command("show me my schedule")["parameters"], {"timeframe": "today"})
+
+    def test_weekday_resolves_to_date(self):
+        # 2026-10-19 is a Monday
+        monday = date(2026, 10, 19)
+        self.assertEqual(extract_timeframe("am i free on friday", monday), {"date": "2026-10-23"})
+        self.assertEqual(extract_timeframe("meetings next monday", monday), {"date": "2026-10-26"})
+
+    def test_email_check_parameters(self):
+        command = route_command("Any important emails from the last three days?")
+        self.assertEqual(command["command_type"], "email_check")
+        self.assertEqual(command["parameters"], {"days_back": 3, "important_only": True, "max_results": 10})
+
+    def test_ambiguous_utterances_fall_back(self):
+        self.assertIsNone(route_command("Send an email to Sam about my calendar"))
+        self.assertIsNone(route_command("Check my calendar and my email"))
+        self.assertIsNone(route_command("What's the Lakers schedule this week"))
+        self.assertIsNone(route_command("What is the capital of France"))
+
+    def test_unparsed_time_phrases_fall_back(self):
+        for utterance in ["What's on my calendar next month", "What's on my calendar for the next three days",
+                          "What's on my calendar this weekend", "What's on my calendar next weekend",
+                          "What's on my calendar on October 30th", "What's on my calendar in two weeks"]:
+            self.assertIsNone(route_command(utterance), utterance)
+            self.assertIsNone(local_parameters("calendar_check", utterance), utterance)
+        self.assertEqual(route_command("What's next on my calendar")["parameters"], {"timeframe": "next"})
+        self.assertEqual(route_command("What's on my calendar next week")["parameters"], {"timeframe": "next week"})
+
+    def test_stats(self):
+        stats = RouterStats()
+        stats.record("rules", 0.001)
+        stats.record("llm", 1.5)
+        snapshot = stats.snapshot()
+        self.assertEqual(snapshot["hit_rate"], 0.5)
+        self.assertEqual(snapshot["rule_hits"], 1)
+        self.assertAlmostEqual(snapshot["estimated_seconds_saved"], 1.499)
+
+
+if __name__ == '__main__':
+    unittest.main()
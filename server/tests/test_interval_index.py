@@ -0,0 +1,53 @@
+import os
+import sys
+import unittest
+from datetime import datetime, timedelta
+
+# Add the parent directory to sys.path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir)
+
+from tools.interval_index import IntervalIndex
+
+DAY = datetime(2025, 5, 6)
+
+
+def at(hour, minute=0):
+    return DAY.replace(hour=hour, minute=minute)
+
+
+class TestIntervalIndex(unittest.TestCase):
+    def test_overlapping_matches_brute_force(self):
+        intervals = [(at(h, m), at(h, m) + timedelta(minutes=d), f"{h}:{m}")
+                     for h in range(8, 18) for m, d in ((0, 30), (15, 90), (40, 10))]
+        index = IntervalIndex(intervals)
+
+        for start_hour in range(7, 19):
+            start, end = at(start_hour, 20), at(start_hour, 20) + timedelta(minutes=45)
+            expected = sorted(p for s, e, p in intervals if s < end and e > start)
+            self.assertEqual(sorted(p for _, _, p in index.overlapping(start, end)), expected)
+
+    def test_touching_intervals_do_not_conflict(self):
+        index = IntervalIndex([(at(10), at(11), "standup")])
+        self.assertEqual(index.overlapping(at(11), at(12)), [])
+        self.assertEqual(index.overlapping(at(9), at(10)), [])
+        self.assertEqual([p for _, _, p in index.overlapping(at(10, 30), at(10, 45))], ["standup"])
+
+    def test_free_slots_skip_busy_time_and_align(self):
+        index = IntervalIndex([(at(12), at(13), "lunch"), (at(13, 50), at(15), "review")])
+        index.add(at(15, 10), at(16, 40), "1:1")
+
+        slots = index.free_slots(timedelta(minutes=30), at(12), at(17), max_results=5)
+
+        # 13:00-13:50 fits one slot; 15:00-15:10 is too short; 16:40 rounds up to 16:45
+        # and a 30-minute slot from there would run past the window
+        self.assertEqual(slots, [(at(13), at(13, 30))])
+
+    def test_free_slots_in_empty_window(self):
+        slots = IntervalIndex().free_slots(timedelta(minutes=45), at(9, 5), at(12), max_results=3)
+        self.assertEqual(slots, [(at(9, 15), at(10)), (at(10), at(10, 45)), (at(10, 45), at(11, 30))])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+import os
+import sys
+import unittest
+from unittest.mock import patch
+
+parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, parent_dir)
+
+from llm import model_router as model_router_module
+from llm.model_router import ModelRouter, parse_tiers, same_command, score_request
+
+TIERS = "small:0.5,medium:1.0,large"
+
+
+class TestScoring(unittest.TestCase):
+    def test_parse_tiers(self):
+        self.assertEqual(parse_tiers(TIERS), [("small", 0.5), ("medium", 1.0), ("large", None)])
+        # The last model always takes the rest
+        self.assertEqual(parse_tiers("small:0.5,large:2"), [("small", 0.5), ("large", None)])
+
+    def test_simple_requests_go_to_small_model(self):
+        router = ModelRouter(TIERS, "on")
+        self.assertEqual(router.route("yes", ["general_question"])[0], "small")
+        self.assertEqual(router.route("check my email", ["email_check"])[0], "small")
+
+    def test_complex_requests_go_to_larger_models(self):
+        router = ModelRouter(TIERS, "on")
+        score, reasons = score_request("send it to him again", ["email_send"])
+        self.assertIn("refers to history", reasons)
+        self.assertIn("complex intent", reasons)
+        self.assertGreater(score, 0.5)
+        model, _, _ = router.route("check my calendar for tomorrow and then email Sam the agenda we discussed "
+                                   "earlier so that he knows what to prepare", ["calendar_check", "email_send"])
+        self.assertEqual(model, "large")
+
+
+class TestModes(unittest.TestCase):
+    def test_off_always_serves_largest(self):
+        self.assertEqual(ModelRouter(TIERS, "off").select("yes", ["general_question"]), ("large", None))
+
+    def test_shadow_serves_largest_and_shadows_routed(self):
+        self.assertEqual(ModelRouter(TIERS, "shadow").select("yes", ["general_question"]), ("large", "small"))
+
+    def test_auto_trusts_after_enough_agreement(self):
+        router = ModelRouter(TIERS, "auto")
+        with patch.object(model_router_module, "MIN_SHADOW_SAMPLES", 10):
+            for _ in range(9):
+                router.record_shadow("small", "email_check", True)
+            self.assertEqual(router.select("check my email", ["email_check"]), ("large", "small"))
+            router.record_shadow("small", "email_check", True)
+            self.assertEqual(router.select("check my email", ["email_check"]), ("small", None))
+            # Trust is per intent
+            self.assertEqual(router.select("yes", ["general_question"]), ("large", "small"))
+            for _ in range(2):
+                router.record_shadow("small", "email_check", False)
+            self.assertFalse(router.trusted("small", "email_check"))
+
+
+class TestSameCommand(unittest.TestCase):
+    def test_compares_parameters_but_not_answer_text(self):
+        check = {"command_type": "email_check", "parameters": {"days_back": 7}}
+        self.assertTrue(same_command(check, {"command_type": "email_check", "parameters": {"days_back": 7}}))
+        self.assertFalse(same_command(check, {"command_type": "email_check", "parameters": {"days_back": 1}}))
+        self.assertTrue(same_command(
+            {"command_type": "general_question", "parameters": {"response": "Tokyo uses JST"}},
+            {"command_type": "general_question", "parameters": {"response": "Japan Standard Time"}}))
+        self.assertFalse(same_command(check, dict(check, additional_commands=[check])))
+        self.assertFalse(same_command(check, None))
+
+
+if __name__ == "__main__":
+    unittest.main()
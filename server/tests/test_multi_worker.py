@@ -0,0 +1,72 @@
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+import httpx
+
+parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, parent_dir)
+
+from helpers import start_fake_server, stop_server
+from start_server import parse_args
+
+EMAIL_COMMAND = "Send an email saying I'll be ten minutes late to the standup"
+
+
+class TestMultiWorker(unittest.TestCase):
+    """Two server processes stand in for two workers behind one port"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.workers = []
+
+    def tearDown(self):
+        for process in self.workers:
+            stop_server(process)
+        self.temp_dir.cleanup()
+
+    def _start_worker(self, session_store):
+        process, address = start_fake_server(
+            SESSION_STORE=session_store, SESSION_SQLITE_PATH=os.path.join(self.temp_dir.name, "sessions.db"))
+        self.workers.append(process)
+        return f"http://{address}"
+
+    def _command_then_followup(self, first, second):
+        command = httpx.post(first + "/api/process-command",
+                             json={"text": EMAIL_COMMAND, "user_id": "alice"}, timeout=30)
+        self.assertEqual(command.status_code, 200, command.text)
+        self.assertTrue(command.json()["requires_followup"])
+        return httpx.post(second + "/api/handle-followup",
+                          json={"text": "sam@example.com", "user_id": "alice"}, timeout=30)
+
+    def test_followup_reaches_another_worker(self):
+        first, second = self._start_worker("sqlite"), self._start_worker("sqlite")
+        followup = self._command_then_followup(first, second)
+        self.assertEqual(followup.status_code, 200, followup.text)
+        self.assertEqual(followup.json()["parameters"]["to"], "sam@example.com")
+        # Another user's follow-up finds nothing
+        other = httpx.post(first + "/api/handle-followup", json={"text": "x@example.com", "user_id": "bob"},
+                           timeout=30)
+        self.assertEqual(other.status_code, 400)
+
+    def test_in_process_sessions_are_lost_between_workers(self):
+        first, second = self._start_worker("memory"), self._start_worker("memory")
+        self.assertEqual(self._command_then_followup(first, second).status_code, 400)
+
+
+class TestWorkerArguments(unittest.TestCase):
+    def test_several_workers_need_indexing_off(self):
+        with mock.patch.dict(os.environ, {"FILE_INDEXING": "true"}), \
+                mock.patch("sys.stderr"), self.assertRaises(SystemExit):
+            parse_args(["--workers", "2"])
+        with mock.patch.dict(os.environ, {"FILE_INDEXING": "false"}):
+            self.assertEqual(parse_args(["--workers", "2"]).workers, 2)
+        # One worker runs the indexers as before
+        with mock.patch.dict(os.environ, {"FILE_INDEXING": "true"}):
+            self.assertEqual(parse_args(["--workers", "1"]).workers, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+import asyncio
+import os
+import sys
+import time
+import unittest
+from unittest.mock import patch
+
+import httpx
+import openai
+
+parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, parent_dir)
+
+from llm.openai_client import OpenAIClient, request_seconds
+from monitoring.metrics import Histogram
+
+REQUEST = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+
+
+def _status_error(error_class, status_code):
+    return error_class("failed", response=httpx.Response(status_code, request=REQUEST), body=None)
+
+
+class TestRetryPolicy(unittest.TestCase):
+    def setUp(self):
+        self.client = OpenAIClient(api_key="test")
+        self.calls = []
+
+    def _request(self, *outcomes):
+        """Fake request that raises or returns each outcome in turn"""
+        outcomes = list(outcomes)
+
+        async def request(timeout):
+            self.calls.append(timeout)
+            outcome = outcomes.pop(0)
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+        return request
+
+    def _outcomes(self, operation):
+        return {labels["outcome"]: count for labels, _, _, count in request_seconds.series()
+                if labels["operation"] == operation}
+
+    @patch("llm.openai_client.BACKOFF_BASE", 0.001)
+    def test_retries_transient_failures(self):
+        request = self._request(openai.APIConnectionError(request=REQUEST),
+                                _status_error(openai.RateLimitError, 429), "done")
+        response = self.client.run(self.client._call("test_retry", request, "gpt-4o", 5))
+        self.assertEqual(response, "done")
+        self.assertEqual(len(self.calls), 3)
+        # Each attempt only gets what is left of the deadline
+        self.assertTrue(self.calls[0] > self.calls[1] > self.calls[2])
+        self.assertEqual(self._outcomes("test_retry"), {"retriable_error": 2, "ok": 1})
+
+    def test_client_errors_are_not_retried(self):
+        request = self._request(_status_error(openai.BadRequestError, 400), "done")
+        with self.assertRaises(openai.BadRequestError):
+            self.client.run(self.client._call("test_bad_request", request, "gpt-4o", 5))
+        self.assertEqual(len(self.calls), 1)
+
+    @patch("llm.openai_client.BACKOFF_BASE", 0.001)
+    def test_gives_up_after_max_attempts(self):
+        errors = [_status_error(openai.InternalServerError, 500) for _ in range(5)]
+        with self.assertRaises(openai.InternalServerError):
+            self.client.run(self.client._call("test_exhausted", self._request(*errors), "gpt-4o", 5))
+        self.assertEqual(len(self.calls), 3)
+
+    def test_deadline_cancels_hung_request(self):
+        async def hang(timeout):
+            await asyncio.sleep(10)
+
+        started = time.monotonic()
+        with self.assertRaises(openai.APITimeoutError):
+            self.client.run(self.client._call("test_deadline", hang, "gpt-4o", 0.2))
+        self.assertLess(time.monotonic() - started, 2)
+        self.assertEqual(self._outcomes("test_deadline"), {"timeout": 1})
+
+
+class TestHistogram(unittest.TestCase):
+    def test_snapshot_per_label_set(self):
+        histogram = Histogram("test_seconds", "Test", ("operation",), buckets=(0.1, 1.0))
+        for value in (0.05, 0.05, 0.5, 5.0):
+            histogram.observe(value, operation="chat")
+        histogram.observe(0.05, operation="embeddings")
+
+        chat, embeddings = histogram.snapshot()
+        self.assertEqual(chat["operation"], "chat")
+        self.assertEqual(chat["count"], 4)
+        self.assertAlmostEqual(chat["average_ms"], 1400.0)
+        self.assertEqual(chat["p50_ms"], 100.0)
+        self.assertEqual(chat["p95_ms"], float("inf"))
+        self.assertEqual(embeddings["count"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+import contextvars
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, parent_dir)
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from monitoring import profiler as profiler_module
+from monitoring.profiler import Profiler, ProfilingMiddleware, profile_control, profile_trace
+from monitoring.tracing import start_trace
+
+
+def busy_turn(seconds=0.1):
+    deadline = time.perf_counter() + seconds
+    total = 0
+    while time.perf_counter() < deadline:
+        total += sum(range(100))
+    return total
+
+
+class TestProfiler(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        profiler_module.PROFILING_ALLOWED = True
+
+    def tearDown(self):
+        profiler_module.PROFILING_ALLOWED = False
+        self.temp_dir.cleanup()
+
+    def test_sampled_profile_writes_collapsed_stacks(self):
+        profiler = Profiler("turn", "sample", interval=0.001, directory=self.temp_dir.name)
+        self.assertTrue(profiler.start())
+        busy_turn()
+        [path] = profiler.stop()
+        self.assertTrue(path.endswith("turn.folded"))
+        with open(path) as f:
+            lines = f.read().splitlines()
+        self.assertTrue(any("busy_turn (test_profiler.py" in line for line in lines))
+        stack, count = lines[0].rsplit(" ", 1)
+        self.assertGreater(int(count), 0)
+        self.assertIn(";", stack)
+
+    def test_sampling_sees_worker_threads_and_one_at_a_time(self):
+        # Other modes fall back to sampling, which covers every thread
+        profiler = Profiler("turn", "deterministic", interval=0.001, directory=self.temp_dir.name)
+        self.assertEqual(profiler.mode, "sample")
+        self.assertTrue(profiler.start())
+        self.assertFalse(Profiler("other", directory=self.temp_dir.name).start())
+        worker = threading.Thread(target=busy_turn, args=(0.05,), name="worker")
+        worker.start()
+        worker.join()
+        [path] = profiler.stop()
+        with open(path) as f:
+            self.assertTrue(any(line.startswith("worker;") and "busy_turn" in line for line in f))
+        self.assertEqual(profiler.stop(), [])
+
+    def test_switch_refuses_profiles(self):
+        profiler_module.PROFILING_ALLOWED = False
+        self.assertFalse(Profiler("turn", directory=self.temp_dir.name).start())
+
+    def test_trace_profile_stops_when_the_turn_finishes(self):
+        def turn():
+            trace = start_trace("text")
+            profiler = profile_trace(trace, "sample")
+            profiler.directory = self.temp_dir.name
+            busy_turn(0.02)
+            trace.finish("ok")
+            return trace
+
+        trace = contextvars.Context().run(turn)
+        self.assertEqual(os.listdir(self.temp_dir.name), [f"text-{trace.trace_id}.folded"])
+
+    def test_control_messages(self):
+        self.assertEqual(profile_control('{"type": "profile"}'), "sample")
+        self.assertEqual(profile_control('{"type": "profile", "mode": "deterministic"}'), "sample")
+        self.assertIsNone(profile_control('{"type": "followup_response"}'))
+        self.assertIsNone(profile_control("not json"))
+
+    def test_middleware_profiles_only_requests_that_ask(self):
+        app = FastAPI()
+        app.add_middleware(ProfilingMiddleware, directory=self.temp_dir.name)
+
+        @app.get("/work")
+        async def work():
+            return {"total": busy_turn(0.02)}
+
+        client = TestClient(app)
+        response = client.get("/work")
+        self.assertNotIn("x-profile-id", response.headers)
+        self.assertEqual(os.listdir(self.temp_dir.name), [])
+
+        response = client.get("/work?profile=1")
+        profile_id = response.headers["x-profile-id"]
+        self.assertEqual(os.listdir(self.temp_dir.name), [f"{profile_id}.folded"])
+
+        response = client.get("/work", headers={"X-Profile": "sample"})
+        self.assertIn(f"{response.headers['x-profile-id']}.folded", os.listdir(self.temp_dir.name))
+
+
+if __name__ == "__main__":
+    unittest.main()
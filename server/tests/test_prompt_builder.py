@@ -0,0 +1,51 @@
+import json
+import os
+import sys
+import unittest
+
+parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, parent_dir)
+
+from llm.prompt_builder import (COMMAND_TYPES, build_messages, build_system_prompt, count_tokens,
+                                likely_intents, summarize_command)
+
+
+def turn(i, response):
+    return {"query": f"question {i}", "response": response, "timestamp": f"2026-01-01T00:00:{i:02d}"}
+
+
+class TestPromptBuilder(unittest.TestCase):
+    def test_likely_intents(self):
+        self.assertEqual(likely_intents("open spotify"), ["open_app", "general_question"])
+        self.assertIn("email_send", likely_intents("send an email to sam"))
+        self.assertEqual(likely_intents("hmm"), COMMAND_TYPES)
+        self.assertEqual(likely_intents("what is the capital of peru", [("general_question", 0.97)]),
+                         ["general_question"])
+
+    def test_email_rules_only_with_email_intents(self):
+        prompt = build_system_prompt(["open_app", "general_question"])
+        self.assertNotIn("email_send", prompt)
+        self.assertLess(count_tokens(prompt), count_tokens(build_system_prompt(COMMAND_TYPES)))
+
+    def test_summarize_command(self):
+        self.assertEqual(summarize_command({"command_type": "general_question", "parameters": {"response": "Paris."}}),
+                         "Paris.")
+        summary = summarize_command({"command_type": "open_app", "parameters": {"app_name": "Slack", "extra": ""}})
+        self.assertEqual(summary, 'open_app {"app_name":"Slack"}')
+
+    def test_history_is_compacted_and_budgeted(self):
+        stored_json = json.dumps({"command_type": "open_app", "parameters": {"app_name": "Slack"}})
+        context = [turn(i, "x" * 400) for i in range(1, 10)] + [turn(0, stored_json)]
+        messages, tokens, kept = build_messages("system", context, "hello", budget=400)
+        self.assertLessEqual(tokens, 400)
+        self.assertLess(kept, len(context))
+        # The newest turns are kept, in chronological order
+        self.assertEqual(messages[-3]["content"], "question 9")
+        self.assertEqual(messages[-1]["content"], "hello")
+
+        messages, _, kept = build_messages("system", [turn(0, stored_json)], "hello")
+        self.assertEqual(messages[2]["content"], 'open_app {"app_name":"Slack"}')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+import os
+import sys
+import unittest
+from unittest.mock import patch
+
+parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, parent_dir)
+
+from context.response_cache import ResponseCache, is_cacheable, normalize_utterance
+from helpers import run_child
+
+ANSWER = {"command_type": "general_question", "parameters": {"response": "Japan Standard Time"}}
+
+# The same question asked on two /ws/audio connections of one user, then by another
+# user, against the app with every external service faked
+AUDIO_USERS_SCRIPT = """
+import json
+from fastapi.testclient import TestClient
+from benchmarks.fakes import FakeBackends, synthetic_audio
+from benchmarks.run_benchmark import TURNS, start_server
+
+backends = FakeBackends("zero")
+api = start_server(backends)
+turn = next(turn for turn in TURNS if turn["name"] == "general_question")
+audio = synthetic_audio(turn["text"], seed=0)
+backends.register_audio(audio, turn["text"])
+
+client = TestClient(api.app)
+for user_id in ("alice", "alice", "bob"):
+    with client.websocket_connect(f"/ws/audio?user_id={user_id}") as websocket:
+        websocket.send_bytes(audio)
+        websocket.receive_json()
+        websocket.receive_json()
+stats = api.response_cache.stats()
+print(json.dumps({"hits": stats["hits"], "users": stats["users"]}))
+"""
+
+
+class TestResponseCache(unittest.TestCase):
+    def test_similar_question_hits(self):
+        cache = ResponseCache(threshold=0.9)
+        cache.store("alice", "what time zone is tokyo in", [1.0, 0.0, 0.1], ANSWER, llm_seconds=1.2)
+        self.assertEqual(cache.lookup("alice", [0.98, 0.0, 0.12]), ANSWER)
+        self.assertIsNone(cache.lookup("alice", [0.0, 1.0, 0.0]))
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+        self.assertAlmostEqual(stats["estimated_seconds_saved"], 1.2)
+
+    def test_entries_are_scoped_per_user(self):
+        cache = ResponseCache()
+        cache.store("alice", "q", [1.0, 0.0], ANSWER, 1.0)
+        self.assertIsNone(cache.lookup("bob", [1.0, 0.0]))
+
+    def test_entries_expire(self):
+        cache = ResponseCache(ttl=60)
+        with patch("context.response_cache.time.time", return_value=1000.0):
+            cache.store("alice", "q", [1.0, 0.0], ANSWER, 1.0)
+        with patch("context.response_cache.time.time", return_value=1061.0):
+            self.assertIsNone(cache.lookup("alice", [1.0, 0.0]))
+        self.assertEqual(cache.stats()["entries"], 0)
+
+    def test_least_recently_used_is_evicted(self):
+        cache = ResponseCache(max_entries=2)
+        cache.store("alice", "a", [1.0, 0.0, 0.0], ANSWER, 1.0)
+        cache.store("alice", "b", [0.0, 1.0, 0.0], ANSWER, 1.0)
+        cache.lookup("alice", [1.0, 0.0, 0.0])
+        cache.store("alice", "c", [0.0, 0.0, 1.0], ANSWER, 1.0)
+        self.assertIsNotNone(cache.lookup("alice", [1.0, 0.0, 0.0]))
+        self.assertIsNone(cache.lookup("alice", [0.0, 1.0, 0.0]))
+
+    def test_total_entries_are_capped_across_users(self):
+        cache = ResponseCache(max_entries=3, max_total_entries=4)
+        for user_id in ("alice", "bob", "carol"):
+            cache.store(user_id, "a", [1.0, 0.0], ANSWER, 1.0)
+            cache.store(user_id, "b", [0.0, 1.0], ANSWER, 1.0)
+        self.assertEqual(cache.stats()["entries"], 4)
+        # Alice was the least recently active, so she lost both answers
+        self.assertEqual(cache.stats()["users"], 2)
+        self.assertIsNone(cache.lookup("alice", [1.0, 0.0]))
+
+        # A hit makes bob more recent than carol, whose oldest answer goes next
+        self.assertIsNotNone(cache.lookup("bob", [1.0, 0.0]))
+        cache.store("dave", "a", [1.0, 0.0], ANSWER, 1.0)
+        self.assertIsNotNone(cache.lookup("bob", [1.0, 0.0]))
+        self.assertIsNotNone(cache.lookup("bob", [0.0, 1.0]))
+        self.assertIsNone(cache.lookup("carol", [1.0, 0.0]))
+        self.assertIsNotNone(cache.lookup("carol", [0.0, 1.0]))
+
+    def test_users_with_only_expired_answers_are_dropped_on_store(self):
+        cache = ResponseCache(ttl=60)
+        with patch("context.response_cache.time.time", return_value=1000.0):
+            for user_id in ("alice", "bob"):
+                cache.store(user_id, "q", [1.0, 0.0], ANSWER, 1.0)
+        with patch("context.response_cache.time.time", return_value=1030.0):
+            cache.store("bob", "r", [0.0, 1.0], ANSWER, 1.0)
+        with patch("context.response_cache.time.time", return_value=1070.0):
+            cache.store("carol", "q", [1.0, 0.0], ANSWER, 1.0)
+        # Alice never came back; bob's newer answer keeps him until it expires too
+        self.assertEqual(cache.stats()["users"], 2)
+        self.assertEqual(cache.stats()["entries"], 3)
+
+    def test_audio_connections_of_one_user_share_answers(self):
+        result = run_child(AUDIO_USERS_SCRIPT)
+        self.assertEqual(result, {"hits": 1, "users": 2})
+
+    def test_time_sensitive_questions_bypass(self):
+        self.assertTrue(is_cacheable(normalize_utterance("What time zone is Tokyo in?")))
+        self.assertFalse(is_cacheable(normalize_utterance("What's the weather in Tokyo?")))
+        self.assertFalse(is_cacheable(normalize_utterance("Who won the game yesterday?")))
+        self.assertFalse(is_cacheable(normalize_utterance("And what about Osaka?")))
+
+
+if __name__ == '__main__':
+    unittest.main()
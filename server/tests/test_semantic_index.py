@@ -0,0 +1,150 @@
+import os
+import sys
+import tempfile
+import threading
+import unittest
+import zlib
+from unittest import mock
+
+import numpy as np
+
+# Add the parent directory to sys.path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir)
+
+from tools import semantic_index
+from tools.semantic_index import SemanticIndex, chunk_text
+
+DIMENSION = 64
+
+
+class StubEmbedder:
+    """Bag of hashed words, so texts sharing words are close; counts the texts it embeds"""
+
+    def __init__(self):
+        self.texts = []
+        # Cleared to hold document embeddings (not queries) until set again
+        self.release = threading.Event()
+        self.release.set()
+        self.waiting = threading.Event()
+
+    def __call__(self, texts):
+        if not (len(texts) == 1 and texts[0].startswith("query:")):
+            self.texts.extend(texts)
+            self.waiting.set()
+            self.release.wait(10)
+        vectors = np.zeros((len(texts), DIMENSION), dtype=np.float32)
+        for i, text in enumerate(texts):
+            for word in text.lower().replace("query:", "").split():
+                vectors[i, zlib.crc32(word.encode()) % DIMENSION] += 1
+        return vectors.tolist()
+
+
+def write(path, text):
+    with open(path, "w") as f:
+        f.write(text)
+
+
+def make_index(root):
+    docs = os.path.join(root, "Documents")
+    os.mkdir(docs)
+    embedder = StubEmbedder()
+
+    def list_files():
+        return {entry.path: (entry.stat().st_mtime, entry.stat().st_size) for entry in os.scandir(docs)}
+
+    index = SemanticIndex(os.path.join(root, "index"), embedder, list_files, dimension=DIMENSION)
+    return index, docs, embedder
+
+
+def names(results):
+    return [os.path.basename(path) for path, _ in results]
+
+
+class TestChunkText(unittest.TestCase):
+    @mock.patch.object(semantic_index, "CHUNK_OVERLAP", 5)
+    @mock.patch.object(semantic_index, "CHUNK_CHARS", 20)
+    def test_chunk_text_overlaps_on_word_boundaries(self):
+        chunks = chunk_text("alpha beta gamma delta epsilon zeta eta theta")
+        self.assertGreater(len(chunks), 1)
+        self.assertTrue(all(len(chunk) <= 20 for chunk in chunks))
+        self.assertTrue(all(not chunk.startswith(" ") for chunk in chunks))
+        # Every word survives, and neighbouring chunks share some text
+        self.assertGreaterEqual(set(" ".join(chunks).split()),
+                                set("alpha beta gamma delta epsilon zeta eta theta".split()))
+        self.assertIn(chunks[0][-3:], chunks[1])
+        self.assertEqual(chunk_text("   "), [])
+
+
+class TestSemanticIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.index, self.docs, self.embedder = make_index(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, name, text):
+        write(os.path.join(self.docs, name), text)
+
+    def test_update_reuses_cached_content_and_forgets_deleted_files(self):
+        index, embedder = self.index, self.embedder
+        self.write("lease.txt", "apartment lease renewal landlord rent")
+        self.write("notes.md", "design review latency budget caching")
+        self.write("empty.txt", "  \n ")
+        self.assertEqual(index.update(), {"embedded": 2, "cached": 0, "empty": 1, "removed": 0, "unchanged": 0})
+        self.assertEqual(index.update(), {"embedded": 0, "cached": 0, "empty": 0, "removed": 0, "unchanged": 3})
+
+        # Search reads the memory-mapped vectors
+        self.assertEqual(names(index.search("query: landlord rent", limit=1)), ["lease.txt"])
+        self.assertIsInstance(index._get_view()[0], np.memmap)
+
+        # Restoring an earlier version reuses its vectors instead of embedding again
+        embedded = len(embedder.texts)
+        self.write("notes.md", "something else entirely")
+        index.update()
+        self.write("notes.md", "design review latency budget caching")
+        os.utime(os.path.join(self.docs, "notes.md"), (1, 1))
+        os.remove(os.path.join(self.docs, "lease.txt"))
+        self.assertEqual(index.update(), {"embedded": 0, "cached": 1, "empty": 0, "removed": 1, "unchanged": 1})
+        self.assertEqual(len(embedder.texts), embedded + 1)
+        self.assertEqual(names(index.search("query: landlord rent")), ["notes.md"])
+        self.assertEqual(index.stats()["files"], 2)
+
+    def test_identical_files_are_all_returned(self):
+        index = self.index
+        self.write("report.txt", "quarterly budget report")
+        self.write("report copy.txt", "quarterly budget report")
+        self.write("other.txt", "holiday photos beach")
+        self.assertEqual(index.update()["cached"], 1)
+        self.assertEqual(names(index.search("query: budget report", limit=2)), ["report copy.txt", "report.txt"])
+        self.assertEqual(names(index.search("query: budget report", limit=1)), ["report copy.txt"])
+
+    def test_search_does_not_wait_for_update(self):
+        index, embedder = self.index, self.embedder
+        self.write("lease.txt", "apartment lease renewal landlord rent")
+        index.update()
+
+        # The next update stalls inside the embeddings request
+        self.write("notes.md", "design review latency budget caching")
+        embedder.waiting.clear()
+        embedder.release.clear()
+        updater = threading.Thread(target=index.update)
+        updater.start()
+        try:
+            self.assertTrue(embedder.waiting.wait(5))
+            results = []
+            searcher = threading.Thread(target=lambda: results.append(index.search("query: landlord")))
+            searcher.start()
+            searcher.join(5)
+            self.assertFalse(searcher.is_alive())
+            self.assertEqual(names(results[0]), ["lease.txt"])
+        finally:
+            embedder.release.set()
+            updater.join(5)
+        self.assertEqual(names(index.search("query: latency budget", limit=1)), ["notes.md"])
+
+
+if __name__ == "__main__":
+    unittest.main()
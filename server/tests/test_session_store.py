@@ -0,0 +1,100 @@
+import os
+import sys
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, parent_dir)
+
+from context.session_store import MemoryBackend, RedisBackend, SessionStore, SqliteBackend
+from monitoring.metrics import registry
+
+
+class LocalRedis:
+    """The few Redis commands the session store uses, with expiry"""
+
+    def __init__(self):
+        self.data = {}
+
+    def _live(self, key):
+        entry = self.data.get(key)
+        if entry and entry[1] <= time.monotonic():
+            del self.data[key]
+            return None
+        return entry
+
+    def get(self, key):
+        entry = self._live(key)
+        return entry[0].encode() if entry else None
+
+    def set(self, key, value, ex=None):
+        self.data[key] = (value, time.monotonic() + ex if ex else float("inf"))
+
+    def getdel(self, key):
+        value = self.get(key)
+        self.data.pop(key, None)
+        return value
+
+    def scan_iter(self, match="*"):
+        prefix = match.rstrip("*")
+        return [key for key in list(self.data) if key.startswith(prefix) and self._live(key)]
+
+
+class TestSessionStore(unittest.TestCase):
+    def test_users_are_kept_apart_and_values_are_copies(self):
+        for backend in (MemoryBackend("test-copies"), RedisBackend("test-copies", LocalRedis())):
+            store = SessionStore("test-copies", backend=backend, ttl=60)
+            context = {"command_type": "email_send", "parameters": {"to": None}}
+            store.set("alice", context)
+            context["parameters"]["to"] = "changed"
+            self.assertEqual(store.get("alice")["parameters"]["to"], None)
+            self.assertIsNone(store.get("bob"))
+            self.assertIn("alice", store)
+            self.assertEqual(store.pop("alice")["command_type"], "email_send")
+            self.assertIsNone(store.pop("alice"))
+            self.assertEqual(store.size(), 0)
+
+    def test_sqlite_sessions_are_shared_between_connections(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            db_path = os.path.join(temp_dir, "sessions.db")
+            # Each worker process opens its own connection to the file
+            first = SessionStore("test-sqlite", backend=SqliteBackend("test-sqlite", db_path), ttl=60)
+            second = SessionStore("test-sqlite", backend=SqliteBackend("test-sqlite", db_path), ttl=60)
+            other = SessionStore("test-other", backend=SqliteBackend("test-other", db_path), ttl=60)
+            first.set("alice", {"to": None})
+            self.assertEqual(second.get("alice"), {"to": None})
+            self.assertIsNone(other.get("alice"))
+            self.assertEqual(second.pop("alice"), {"to": None})
+            self.assertIsNone(first.pop("alice"))
+
+            first.set("bob", 1)
+            with mock.patch("context.session_store.time.time", return_value=time.time() + 61):
+                self.assertIsNone(second.get("bob"))
+                self.assertEqual(second.size(), 0)
+            for backend in (first.backend, second.backend, other.backend):
+                backend._conn.close()
+
+    def test_entries_expire(self):
+        store = SessionStore("test-ttl", backend=MemoryBackend("test-ttl"), ttl=30)
+        store.set("alice", {"step": 1})
+        with mock.patch("context.session_store.time.monotonic", return_value=time.monotonic() + 31):
+            self.assertIsNone(store.get("alice"))
+        self.assertEqual(store.size(), 0)
+
+    def test_least_recently_used_entries_are_evicted(self):
+        store = SessionStore("test-lru", backend=MemoryBackend("test-lru", max_entries=2), ttl=60)
+        store.set("alice", 1)
+        store.set("bob", 2)
+        store.get("alice")
+        store.set("carol", 3)
+        self.assertIsNone(store.get("bob"))
+        self.assertEqual((store.get("alice"), store.get("carol")), (1, 3))
+        metrics = registry.render()
+        self.assertIn('session_store_entries{namespace="test-lru"} 2', metrics)
+        self.assertIn('session_store_evictions_total{namespace="test-lru",reason="lru"} 1', metrics)
+
+
+if __name__ == "__main__":
+    unittest.main()
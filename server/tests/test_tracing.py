@@ -0,0 +1,93 @@
+import asyncio
+import contextvars
+import os
+import sys
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, parent_dir)
+
+from monitoring.metrics import Registry
+from monitoring.tracing import (current_trace, propagate_context, set_command_type, span, stage_seconds,
+                                start_trace, turns_total)
+
+
+class TestTracing(unittest.TestCase):
+    def test_spans_feed_stage_histograms(self):
+        def turn():
+            trace = start_trace("rest", trace_id="test-trace")
+            with span("stt"):
+                time.sleep(0.01)
+            with span("tool"):
+                pass
+            with span("tool"):
+                pass
+            set_command_type({"command_type": "test_check", "parameters": {}})
+            self.assertIs(current_trace(), trace)
+            self.assertEqual(list(trace.stage_totals()), ["stt", "tool"])
+            self.assertGreater(trace.finish("ok"), 0.01)
+            # Finishing twice does not count the turn again
+            self.assertIsNone(trace.finish("ok"))
+
+        contextvars.copy_context().run(turn)
+        stages = {labels["stage"]: count for labels, _, _, count in stage_seconds.series()
+                  if labels["command_type"] == "test_check"}
+        self.assertEqual(stages, {"stt": 1, "tool": 1})
+        turns = [entry for entry in turns_total.snapshot() if entry["command_type"] == "test_check"]
+        self.assertEqual(turns, [{"kind": "rest", "command_type": "test_check", "outcome": "ok", "value": 1}])
+
+    def test_span_without_trace_is_a_no_op(self):
+        def outside():
+            with span("llm"):
+                pass
+            self.assertIsNone(current_trace())
+
+        contextvars.copy_context().run(outside)
+
+    def test_trace_follows_threads(self):
+        def turn():
+            trace = start_trace("audio")
+
+            def work():
+                with span("tool"):
+                    pass
+
+            with ThreadPoolExecutor(max_workers=2) as pool:
+                for future in [pool.submit(propagate_context(work)) for _ in range(2)]:
+                    future.result()
+
+            async def format_in_thread():
+                def work():
+                    with span("format"):
+                        pass
+                await asyncio.to_thread(work)
+
+            asyncio.run(format_in_thread())
+            return trace.stage_totals()
+
+        totals = contextvars.copy_context().run(turn)
+        self.assertEqual(list(totals), ["tool", "format"])
+
+
+class TestPrometheusRendering(unittest.TestCase):
+    def test_render(self):
+        registry = Registry()
+        histogram = registry.histogram("latency_seconds", "Latency", ("stage",), buckets=(0.1, 1.0))
+        histogram.observe(0.05, stage="stt")
+        histogram.observe(2.0, stage="stt")
+        registry.counter("turns_total", "Turns", ("outcome",)).inc(outcome='say "hi"')
+        text = registry.render()
+        self.assertIn("# TYPE latency_seconds histogram", text)
+        self.assertIn('latency_seconds_bucket{stage="stt",le="0.1"} 1', text)
+        self.assertIn('latency_seconds_bucket{stage="stt",le="1.0"} 1', text)
+        self.assertIn('latency_seconds_bucket{stage="stt",le="+Inf"} 2', text)
+        self.assertIn('latency_seconds_sum{stage="stt"} 2.05', text)
+        self.assertIn('latency_seconds_count{stage="stt"} 2', text)
+        self.assertIn('turns_total{outcome="say \\"hi\\""} 1', text)
+        self.assertTrue(text.endswith("\n"))
+
+
+if __name__ == "__main__":
+    unittest.main()
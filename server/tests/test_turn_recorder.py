@@ -0,0 +1,74 @@
+import asyncio
+import glob
+import os
+import sys
+import tempfile
+import unittest
+
+parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, parent_dir)
+
+from monitoring.tracing import start_trace
+from monitoring.turn_recorder import TurnRecorder, load_turns
+
+
+class TestTurnRecorder(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.recorder = TurnRecorder(enabled=True, directory=self.temp_dir.name)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def _record_turn(self):
+        trace = start_trace("audio")
+        self.recorder.start(trace, audio=b"\x01\x00" * 100)
+        transcript = self.recorder.call("stt", {"audio": "abc"}, lambda: "check my email")
+        output = self.recorder.call("tool", {"command_type": "email_check"}, lambda: {"count": 2})
+        self.recorder.record_output("You have 2 emails")
+        trace.finish("ok")
+        self.recorder.flush()
+        return transcript, output
+
+    def test_records_inputs_calls_and_output(self):
+        self.assertEqual(self._record_turn(), ("check my email", {"count": 2}))
+        paths = glob.glob(os.path.join(self.temp_dir.name, "turns-*.jsonl.gz"))
+        self.assertEqual(len(paths), 1)
+        [turn] = load_turns(paths[0])
+        self.assertEqual(turn["kind"], "audio")
+        self.assertEqual(turn["outcome"], "ok")
+        self.assertEqual(turn["inputs"]["audio_bytes"], 200)
+        self.assertEqual([call["backend"] for call in turn["calls"]], ["stt", "tool"])
+        self.assertEqual(turn["calls"][1]["response"], {"count": 2})
+        self.assertEqual(turn["response"], "You have 2 emails")
+
+    def test_replay_returns_recorded_responses_without_calling(self):
+        self._record_turn()
+        [turn] = load_turns(glob.glob(os.path.join(self.temp_dir.name, "*.gz"))[0])
+
+        def unreachable():
+            raise AssertionError("Replays must not reach the backend")
+
+        replayed = self.recorder.replay_next(turn, time_scale=0)
+        trace = start_trace("audio")
+        self.recorder.start(trace, audio=b"")
+        self.assertEqual(self.recorder.call("stt", {"audio": "abc"}, unreachable), "check my email")
+        # A different request still gets the tool's recorded answer, counted as drift
+        self.assertEqual(self.recorder.call("tool", {"command_type": "other"}, unreachable), {"count": 2})
+        with self.assertRaises(LookupError):
+            asyncio.run(self.recorder.acall("openai_chat", {}, unreachable))
+        trace.finish("ok")
+        self.assertEqual((replayed.drift, replayed.misses), (1, 1))
+
+    def test_nothing_recorded_when_disabled(self):
+        recorder = TurnRecorder(enabled=False, directory=self.temp_dir.name)
+        trace = start_trace("rest")
+        recorder.start(trace, text="hello")
+        self.assertEqual(recorder.call("tool", {}, lambda: "ran"), "ran")
+        trace.finish("ok")
+        recorder.flush()
+        self.assertEqual(os.listdir(self.temp_dir.name), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
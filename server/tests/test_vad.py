@@ -0,0 +1,66 @@
+import os
+import sys
+import unittest
+
+import numpy as np
+
+parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, parent_dir)
+
+from voice.vad import FRAME_SECONDS, EnergyGate, NoiseFloor, frame_rms
+
+SAMPLE_RATE = 16000
+FRAME_SAMPLES = int(SAMPLE_RATE * FRAME_SECONDS)
+
+
+def frames(level, seconds, seed=0):
+    """Frames of noise with the given RMS"""
+    rng = np.random.default_rng(seed)
+    samples = rng.normal(0, level, int(seconds / FRAME_SECONDS) * FRAME_SAMPLES).clip(-32768, 32767)
+    data = samples.astype("<i2").tobytes()
+    size = FRAME_SAMPLES * 2
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+class TestVad(unittest.TestCase):
+    def test_frame_rms(self):
+        self.assertEqual(frame_rms(b""), 0.0)
+        self.assertAlmostEqual(frame_rms(np.full(100, 300, dtype="<i2").tobytes()), 300.0)
+
+    def test_noise_floor_follows_quiet_quickly_and_loud_slowly(self):
+        noise = NoiseFloor()
+        for _ in range(50):
+            noise.update(200.0)
+        noise.update(5000.0)
+        self.assertLess(noise.level, 300.0)
+        for _ in range(50):
+            noise.update(50.0)
+        self.assertLess(noise.level, 60.0)
+
+    def test_gate_finds_the_utterance_in_noise(self):
+        gate = EnergyGate()
+        events = []
+        audio = frames(150, 1.0, 1) + frames(3000, 1.0, 2) + frames(150, 1.5, 3)
+        for index, frame in enumerate(audio):
+            event = gate.feed(frame)
+            if event:
+                events.append((event, index))
+                if event == "end":
+                    utterance = list(gate.utterance)
+        self.assertEqual([event for event, _ in events], ["start", "end"])
+        start, end = events[0][1], events[1][1]
+        # Opens within a few frames of the speech and closes after the trailing silence
+        self.assertTrue(33 <= start <= 33 + 4, start)
+        self.assertTrue(start + 33 < end < start + 33 + 40, end)
+        # The utterance begins with the pre-roll, before the gate opened
+        self.assertGreater(len(utterance), end - start)
+
+    def test_gate_stays_shut_for_steady_noise(self):
+        gate = EnergyGate()
+        # A loud fan is loud but steady
+        self.assertTrue(all(gate.feed(frame) is None for frame in frames(2000, 3.0)))
+        self.assertFalse(gate.in_speech)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,115 @@
+import os
+import sys
+import unittest
+
+parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, parent_dir)
+
+from helpers import run_child
+
+# The listener imports the speech libraries, so it runs against the benchmark
+# fakes. The microphone and the Speech client are replaced by a scripted stream
+# and recognizer.
+LISTENER_SCRIPT = """
+import json
+from types import SimpleNamespace
+import numpy as np
+from benchmarks.fakes import FakeBackends, install
+install(FakeBackends("zero"))
+from voice.vad import FRAME_SECONDS, VAD_END_SECONDS
+from voice.wake_listener import WakeListener, activations_total
+
+
+class FakeStream:
+    # A spoken utterance is a short loud burst followed by enough silence to end it
+    def __init__(self, samples, utterances):
+        self.frames = []
+        quiet, loud = np.zeros(samples, dtype="<i2"), np.full(samples, 3000, dtype="<i2")
+        for _ in range(utterances):
+            self.frames += [quiet.tobytes()] * 10 + [loud.tobytes()] * 10
+            self.frames += [quiet.tobytes()] * (int(VAD_END_SECONDS / FRAME_SECONDS) + 5)
+        self.read_frames = 0
+
+    def read(self, samples):
+        if self.read_frames >= len(self.frames):
+            raise IOError("Microphone closed")
+        self.read_frames += 1
+        return self.frames[self.read_frames - 1]
+
+
+class FakeClient:
+    # Answers each streamed utterance with the next scripted transcript
+    def __init__(self, transcripts):
+        self.transcripts = list(transcripts)
+        self.streamed_frames = []
+
+    def streaming_recognize(self, config, requests):
+        self.streamed_frames.append(sum(1 for _ in requests))
+        transcript = self.transcripts.pop(0)
+        alternatives = [SimpleNamespace(transcript=transcript)]
+        return [SimpleNamespace(results=[SimpleNamespace(is_final=True, alternatives=alternatives)])]
+
+
+def listen(transcripts, require_wake_word=True):
+    listener = WakeListener(wake_word="jarvis", wake_word_model="")
+    listener._client = FakeClient(transcripts)
+    listener._source = SimpleNamespace(stream=FakeStream(listener.frame_samples, len(transcripts)))
+    utterance = listener.listen(require_wake_word)
+    return {
+        "transcript": utterance.transcript if utterance else None,
+        "streamed_utterances": len(listener._client.streamed_frames),
+        "timings_ok": bool(utterance) and utterance.vad_seconds >= 0 and utterance.stt_seconds >= 0,
+    }
+
+
+stripper = WakeListener(wake_word="jarvis", wake_word_model="")
+print(json.dumps({
+    "strip": {text: stripper._strip_wake_word(text) for text in [
+        "Jarvis, open my notes", "Hey Jarvis what time is it", "OK hey Jarvis check my email",
+        "Jarvis.", "I told him Jarvis is busy", "what time is it",
+    ]},
+    "ignored_then_command": listen(["what time is it", "", "Hey Jarvis, what's on my calendar"]),
+    "wake_word_alone": listen(["Jarvis", "check my email"]),
+    "no_wake_word_needed": listen(["what time is it"], require_wake_word=False),
+    "only_ignored": listen(["what time is it"]),
+    "activations": {entry["result"]: entry["value"] for entry in activations_total.snapshot()},
+}))
+"""
+
+
+class TestWakeListener(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.results = run_child(LISTENER_SCRIPT)
+
+    def test_wake_word_within_the_first_three_words(self):
+        self.assertEqual(self.results["strip"], {
+            "Jarvis, open my notes": "open my notes",
+            "Hey Jarvis what time is it": "what time is it",
+            "OK hey Jarvis check my email": "check my email",
+            "Jarvis.": "",
+            "I told him Jarvis is busy": None,
+            "what time is it": None,
+        })
+
+    def test_utterances_without_the_wake_word_are_ignored(self):
+        result = self.results["ignored_then_command"]
+        self.assertEqual(result["transcript"], "what's on my calendar")
+        self.assertEqual(result["streamed_utterances"], 3)
+        self.assertTrue(result["timings_ok"])
+        # The microphone ran out before any command was heard
+        self.assertIsNone(self.results["only_ignored"]["transcript"])
+
+    def test_wake_word_alone_is_followed_by_the_command(self):
+        result = self.results["wake_word_alone"]
+        self.assertEqual((result["transcript"], result["streamed_utterances"]), ("check my email", 2))
+
+    def test_answers_need_no_wake_word(self):
+        self.assertEqual(self.results["no_wake_word_needed"]["transcript"], "what time is it")
+
+    def test_activations_are_counted(self):
+        self.assertEqual(self.results["activations"], {"command": 3, "no_wake_word": 2, "no_speech": 1})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -2,14 +2,43 @@ from google.oauth2 import service_account
 from googleapiclient.discovery import build
 from datetime import datetime, timedelta, timezone
 import os
+import threading
 from dotenv import load_dotenv
 from dateutil import parser
 from dateutil.relativedelta import relativedelta
 import pytz
+from tools.interval_index import IntervalIndex
 
 # Load environment variables
 load_dotenv()
 
+# Hours covered by spoken parts of the day when looking for free time
+PART_OF_DAY_HOURS = {
+    "morning": (9, 12),
+    "afternoon": (12, 17),
+    "evening": (17, 21),
+    "working_hours": (9, 17),
+}
+
+# How long a synced event index stays valid before it is refreshed from the API
+INDEX_TTL_SECONDS = 60
+
+
+class SyncedEvents:
+    """Interval index over the most recently synced window of a calendar's events"""
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.index = None
+        self.window = None
+        self.synced_at = None
+
+
+# A handler is created per command, so the synced events are kept per calendar
+# at module level for the next command to reuse
+_synced_events = {}
+
+
 class CalendarHandler:
     def __init__(self):
         """Initialize the Calendar handler with credentials"""
@@ -17,6 +46,9 @@ class CalendarHandler:
         self.target_calendar_email = os.getenv('TARGET_CALENDAR_EMAIL')
         self.timezone = pytz.timezone('America/New_York')  # Default to Eastern Time
         
+        # Interval index over the most recently synced window of events, shared with other handlers
+        self._synced = _synced_events.setdefault(self.target_calendar_email, SyncedEvents())
+        
         if not self.credentials_path:
             raise Exception("GOOGLE_APPLICATION_CREDENTIALS environment variable not set")
         if not self.target_calendar_email:
@@ -197,8 +229,138 @@ class CalendarHandler:
         except Exception as e:
             print(f"Error fetching calendar events: {str(e)}")
             return []
-    
-    def add_event(self, summary, start_time=None, end_time=None, date=None, time=None, description=None, location=None):
+
+    def to_datetime(self, value):
+        """
+        Convert an event start/end value into a timezone-aware datetime
+
+        Args:
+            value (str): ISO datetime, or YYYY-MM-DD for all-day events
+
+        Returns:
+            datetime: Timezone-aware datetime
+        """
+        if isinstance(value, datetime):
+            parsed = value
+        else:
+            parsed = parser.isoparse(value)
+        if parsed.tzinfo is None:
+            parsed = self.timezone.localize(parsed)
+        return parsed
+
+    def sync_events(self, time_min, time_max):
+        """
+        Load the events in a time range into the interval index
+
+        Args:
+            time_min (datetime): Start of the range to sync
+            time_max (datetime): End of the range to sync
+
+        Returns:
+            IntervalIndex: The refreshed event index
+        """
+        events = self.get_events(
+            time_min=time_min.isoformat(),
+            time_max=time_max.isoformat(),
+            max_results=250
+        )
+
+        intervals = []
+        for event in events:
+            try:
+                intervals.append((self.to_datetime(event['start']), self.to_datetime(event['end']), event))
+            except (ValueError, TypeError) as e:
+                print(f"Skipping event with unparseable time '{event.get('summary')}': {str(e)}")
+
+        index = IntervalIndex(intervals)
+        with self._synced.lock:
+            self._synced.index = index
+            self._synced.window = (time_min, time_max)
+            self._synced.synced_at = datetime.now(self.timezone)
+        print(f"Synced {len(index)} events into the calendar index")
+        return index
+
+    def _get_index(self, time_min, time_max):
+        """Return an index covering the range, syncing it if missing or stale"""
+        synced = self._synced
+        # Held while syncing, so concurrent commands wait for one sync instead of each making their own
+        with synced.lock:
+            fresh = (
+                synced.index is not None
+                and synced.window[0] <= time_min
+                and synced.window[1] >= time_max
+                and (datetime.now(self.timezone) - synced.synced_at).total_seconds() < INDEX_TTL_SECONDS
+            )
+            if not fresh:
+                # Sync the whole days around the range so nearby lookups reuse the index
+                day_start = time_min.replace(hour=0, minute=0, second=0, microsecond=0)
+                day_end = time_max.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+                return self.sync_events(day_start, day_end)
+            return synced.index
+
+    def find_conflicts(self, start_dt, end_dt):
+        """
+        Find events that overlap a proposed time range
+
+        Args:
+            start_dt (datetime): Proposed start
+            end_dt (datetime): Proposed end
+
+        Returns:
+            list: Event dictionaries that overlap the range
+        """
+        # Queries rebuild the index after an insert, so they share its lock
+        with self._synced.lock:
+            index = self._get_index(start_dt, end_dt)
+            return [event for _, _, event in index.overlapping(start_dt, end_dt)]
+
+    def get_time_window(self, date=None, part_of_day=None):
+        """
+        Turn a spoken day and part of day into a search window
+
+        Args:
+            date (str): Natural language date (e.g., "tomorrow"); defaults to today
+            part_of_day (str): "morning", "afternoon", "evening" or None for working hours
+
+        Returns:
+            tuple: (window_start, window_end) timezone-aware datetimes
+        """
+        now = datetime.now(self.timezone)
+        day = self.parse_natural_date(date) if date and date.lower() != "today" else now
+        start_hour, end_hour = PART_OF_DAY_HOURS.get(
+            (part_of_day or "working_hours").lower().replace(" ", "_"),
+            PART_OF_DAY_HOURS["working_hours"]
+        )
+        window_start = day.replace(hour=start_hour, minute=0, second=0, microsecond=0)
+        window_end = day.replace(hour=end_hour, minute=0, second=0, microsecond=0)
+        # Never suggest a slot that has already started
+        if window_start < now < window_end:
+            window_start = now
+        return window_start, window_end
+
+    def find_free_slots(self, duration, window, max_results=5):
+        """
+        Find free slots of a given length inside a window
+
+        Args:
+            duration (timedelta or int): Slot length, or a number of minutes
+            window (tuple): (window_start, window_end) timezone-aware datetimes
+            max_results (int): Maximum number of slots to return
+
+        Returns:
+            list: Slot dictionaries with ISO 'start' and 'end' times
+        """
+        if not isinstance(duration, timedelta):
+            duration = timedelta(minutes=int(duration))
+        window_start, window_end = window
+        with self._synced.lock:
+            index = self._get_index(window_start, window_end)
+            slots = index.free_slots(duration, window_start, window_end, max_results=max_results)
+
+        return [{'start': slot_start.isoformat(), 'end': slot_end.isoformat()} for slot_start, slot_end in slots]
+
+    def add_event(self, summary, start_time=None, end_time=None, date=None, time=None, description=None, location=None,
+                  duration_minutes=60, allow_conflicts=False):
         """
         Add a new event to the calendar
         
@@ -210,9 +372,12 @@ class CalendarHandler:
             time (str): Time in natural language (e.g., "17:30" or "5:30 PM")
             description (str): Event description
             location (str): Event location
+            duration_minutes (int): Event length when no end time is given
+            allow_conflicts (bool): Insert even if the slot overlaps existing events
             
         Returns:
-            dict: The created event or None if failed
+            dict: The created event, the proposed event with a 'conflicts' list if the
+                slot is taken, or None if failed
         """
         try:
             # Handle separate date and time parameters
@@ -223,8 +388,7 @@ class CalendarHandler:
                 time_dt = self.parse_time(time)
                 # Combine date and time
                 start_dt = start_dt.replace(hour=time_dt.hour, minute=time_dt.minute)
-                # Default to 1 hour duration
-                end_dt = start_dt + timedelta(hours=1)
+                end_dt = start_dt + timedelta(minutes=duration_minutes)
             else:
                 # Handle combined start_time and end_time
                 if isinstance(start_time, str):
@@ -245,9 +409,20 @@ class CalendarHandler:
                 else:
                     end_dt = end_time
                 
-                # If no end time specified, make it 1 hour after start
+                # If no end time specified, use the requested duration
                 if not end_dt:
-                    end_dt = start_dt + timedelta(hours=1)
+                    end_dt = start_dt + timedelta(minutes=duration_minutes)
+            
+            if not allow_conflicts:
+                conflicts = self.find_conflicts(start_dt, end_dt)
+                if conflicts:
+                    print(f"Not adding '{summary}': overlaps {len(conflicts)} existing event(s)")
+                    return {
+                        'summary': summary,
+                        'start': start_dt.isoformat(),
+                        'end': end_dt.isoformat(),
+                        'conflicts': conflicts
+                    }
             
             event = {
                 'summary': summary,
@@ -271,7 +446,7 @@ class CalendarHandler:
                 body=event
             ).execute()
             
-            return {
+            created = {
                 'summary': event.get('summary'),
                 'start': event['start'].get('dateTime'),
                 'end': event['end'].get('dateTime'),
@@ -279,6 +454,13 @@ class CalendarHandler:
                 'description': event.get('description', 'No Description')
             }
             
+            # Keep the synced index current so back-to-back requests see the new event
+            with self._synced.lock:
+                if self._synced.index is not None:
+                    self._synced.index.add(start_dt, end_dt, created)
+            
+            return created
+            
         except Exception as e:
             print(f"Error adding calendar event: {str(e)}")
             return None
\ No newline at end of file
@@ -0,0 +1,340 @@
+import math
+import multiprocessing
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+import zipfile
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from tools.file_walker import walk_files
+
+try:
+    from pypdf import PdfReader
+except ImportError:
+    PdfReader = None
+
+# File types whose text can be extracted
+CONTENT_EXTENSIONS = ('.txt', '.md', '.pdf', '.docx')
+# Larger files are skipped; they are rarely what a spoken query is after
+MAX_FILE_BYTES = 20 * 1024 * 1024
+# Text beyond this many characters is not indexed
+MAX_TEXT_CHARS = 500_000
+# How often the background indexer looks for changed files
+UPDATE_INTERVAL = 5 * 60
+# BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "has", "have", "i", "in",
+    "is", "it", "its", "my", "of", "on", "or", "that", "the", "this", "to", "was", "were",
+    "where", "which", "with", "wrote", "about", "file", "document", "pdf", "docx",
+}
+
+_WORD = re.compile(r"[a-z0-9]{2,}")
+_DOCX_PARAGRAPH = re.compile(r"</w:p>")
+_XML_TAG = re.compile(r"<[^>]+>")
+
+
+def tokenize(text):
+    """
+    Split text into lowercase ASCII terms, dropping accents and stopwords
+
+    Args:
+        text (str): Document or query text
+
+    Returns:
+        list: Terms in order of appearance
+    """
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return [term for term in _WORD.findall(text) if term not in STOPWORDS]
+
+
+def extract_text(path):
+    """
+    Extract plain text from a supported document
+
+    Args:
+        path (str): Path to a .txt, .md, .pdf or .docx file
+
+    Returns:
+        str: The document text, or None if it can't be read
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension in ('.txt', '.md'):
+        with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+            return f.read(MAX_TEXT_CHARS)
+    if extension == '.docx':
+        # A .docx is a zip; the body text lives in word/document.xml
+        with zipfile.ZipFile(path) as archive:
+            xml = archive.read('word/document.xml').decode('utf-8', errors='ignore')
+        return _XML_TAG.sub('', _DOCX_PARAGRAPH.sub('\n', xml))[:MAX_TEXT_CHARS]
+    if extension == '.pdf':
+        if PdfReader is None:
+            return None
+        reader = PdfReader(path)
+        parts = []
+        length = 0
+        for page in reader.pages:
+            page_text = page.extract_text() or ''
+            parts.append(page_text)
+            length += len(page_text)
+            if length >= MAX_TEXT_CHARS:
+                break
+        return '\n'.join(parts)[:MAX_TEXT_CHARS]
+    return None
+
+
+def _extract_terms(path):
+    """
+    Worker entry point: extract a file and count its terms
+
+    Runs in a separate process, so it only returns plain picklable values.
+
+    Returns:
+        tuple: (path, {term: frequency}, document length) or (path, None, 0) on failure
+    """
+    try:
+        text = extract_text(path)
+    except Exception as e:
+        print(f"Could not extract text from {path}: {str(e)}")
+        return path, None, 0
+    if not text:
+        return path, None, 0
+    terms = tokenize(text)
+    return path, dict(Counter(terms)), len(terms)
+
+
+class ContentIndex:
+    """
+    Incremental inverted index over the text of local documents.
+
+    Postings are stored in SQLite clustered by term, so a query reads only the
+    rows of its own terms. Each update re-extracts just the files whose mtime or
+    size changed, spreading the extraction over a process pool.
+    """
+
+    def __init__(self, db_path, roots, file_index=None, max_workers=None):
+        """
+        Open (or create) the index
+
+        Args:
+            db_path (str): Path of the SQLite database file
+            roots (list): Directories to index
+            file_index (FileIndex): Optional filename index used to list files without walking
+            max_workers (int): Extraction processes (default: CPU count)
+        """
+        self.db_path = db_path
+        self.roots = [os.path.abspath(root) for root in roots]
+        self.file_index = file_index
+        self.max_workers = max_workers
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._last_update = None
+
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        # Searches read through their own connection while an update writes
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        with self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS docs (
+                    doc_id INTEGER PRIMARY KEY,
+                    path TEXT UNIQUE NOT NULL,
+                    mtime REAL NOT NULL,
+                    size INTEGER NOT NULL,
+                    length INTEGER NOT NULL
+                )
+            """)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS postings (
+                    term TEXT NOT NULL,
+                    doc_id INTEGER NOT NULL,
+                    tf INTEGER NOT NULL,
+                    PRIMARY KEY (term, doc_id)
+                ) WITHOUT ROWID
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS postings_doc ON postings(doc_id)")
+        self._reader = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True, check_same_thread=False)
+        self._read_lock = threading.Lock()
+
+    def start(self):
+        """Index in the background now and every UPDATE_INTERVAL seconds"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, name="content-indexer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the background indexer"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def _run(self):
+        while True:
+            try:
+                self.update()
+            except Exception as e:
+                print(f"Error updating content index: {str(e)}")
+            if self._stop.wait(UPDATE_INTERVAL):
+                return
+
+    def list_files(self):
+        """Return {path: (mtime, size)} for every indexable file under the roots"""
+        if self.file_index is not None and self.file_index.is_ready():
+            return self.file_index.list_files(CONTENT_EXTENSIONS)
+        files = {}
+        for root in self.roots:
+            for entry in walk_files(root):
+                if entry.name.lower().endswith(CONTENT_EXTENSIONS):
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    files[entry.path] = (stat.st_mtime, stat.st_size)
+        return files
+
+    def update(self):
+        """
+        Bring the index in line with the disk, extracting only new or changed files
+
+        Returns:
+            dict: Number of files indexed, removed and left unchanged
+        """
+        with self._lock:
+            started = time.time()
+            on_disk = {
+                path: (mtime, size) for path, (mtime, size) in self.list_files().items()
+                if size <= MAX_FILE_BYTES
+            }
+            indexed = {
+                path: (doc_id, mtime, size)
+                for doc_id, path, mtime, size in self._conn.execute("SELECT doc_id, path, mtime, size FROM docs")
+            }
+
+            changed = [
+                path for path, (mtime, size) in on_disk.items()
+                if path not in indexed or indexed[path][1:] != (mtime, size)
+            ]
+            removed = [indexed[path][0] for path in indexed if path not in on_disk]
+
+            with self._conn:
+                self._delete_docs(removed)
+
+            if changed:
+                workers = self.max_workers or os.cpu_count() or 1
+                # Forking from this background thread could copy locks held by other threads
+                with ProcessPoolExecutor(max_workers=min(workers, len(changed)),
+                                         mp_context=multiprocessing.get_context("spawn")) as pool:
+                    for path, term_counts, length in pool.map(_extract_terms, changed, chunksize=8):
+                        mtime, size = on_disk[path]
+                        with self._conn:
+                            if path in indexed:
+                                self._delete_docs([indexed[path][0]])
+                            # Unreadable files are still recorded so they aren't retried until they change
+                            cursor = self._conn.execute(
+                                "INSERT INTO docs (path, mtime, size, length) VALUES (?, ?, ?, ?)",
+                                (path, mtime, size, length)
+                            )
+                            if term_counts:
+                                self._conn.executemany(
+                                    "INSERT INTO postings VALUES (?, ?, ?)",
+                                    ((term, cursor.lastrowid, tf) for term, tf in term_counts.items())
+                                )
+
+            self._last_update = time.time()
+            result = {
+                "indexed": len(changed),
+                "removed": len(removed),
+                "unchanged": len(on_disk) - len(changed),
+            }
+            print(f"Content index update {result} took {self._last_update - started:.2f} seconds")
+            return result
+
+    def _delete_docs(self, doc_ids):
+        """Remove documents and their postings; call inside a transaction"""
+        for doc_id in doc_ids:
+            self._conn.execute("DELETE FROM postings WHERE doc_id = ?", (doc_id,))
+            self._conn.execute("DELETE FROM docs WHERE doc_id = ?", (doc_id,))
+
+    def search(self, query, extensions=None, limit=5):
+        """
+        Rank documents against a query with BM25
+
+        Args:
+            query (str): Words the document should contain
+            extensions (list): Only return files with one of these extensions
+            limit (int): Maximum number of results
+
+        Returns:
+            list: (path, size, mtime, score) tuples, best first
+        """
+        terms = set(tokenize(query))
+        if not terms:
+            return []
+        suffixes = tuple(ext.lower() for ext in extensions) if extensions else None
+
+        with self._read_lock:
+            # One read transaction, so the whole search sees a single version of the index
+            self._reader.execute("BEGIN")
+            try:
+                return self._search(terms, suffixes, limit)
+            finally:
+                self._reader.rollback()
+
+    def _search(self, terms, suffixes, limit):
+        doc_count, average_length = self._reader.execute(
+            "SELECT COUNT(*), AVG(length) FROM docs WHERE length > 0"
+        ).fetchone()
+        if not doc_count:
+            return []
+
+        scores = Counter()
+        lengths = {}
+        for term in terms:
+            postings = self._reader.execute(
+                "SELECT p.doc_id, p.tf, d.length FROM postings p JOIN docs d ON d.doc_id = p.doc_id WHERE p.term = ?",
+                (term,)
+            ).fetchall()
+            if not postings:
+                continue
+            idf = math.log(1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_id, tf, length in postings:
+                lengths[doc_id] = length
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * length / average_length)
+                scores[doc_id] += idf * tf * (BM25_K1 + 1) / (tf + norm)
+
+        results = []
+        for doc_id, score in scores.most_common():
+            path, mtime, size = self._reader.execute(
+                "SELECT path, mtime, size FROM docs WHERE doc_id = ?", (doc_id,)
+            ).fetchone()
+            if suffixes and not path.lower().endswith(suffixes):
+                continue
+            results.append((path, size, mtime, score))
+            if len(results) >= limit:
+                break
+        return results
+
+    def stats(self):
+        """
+        Report index size and freshness
+
+        Returns:
+            dict: Document and posting counts and the age of the last update
+        """
+        with self._read_lock:
+            docs, terms = self._reader.execute(
+                "SELECT (SELECT COUNT(*) FROM docs), (SELECT COUNT(DISTINCT term) FROM postings)"
+            ).fetchone()
+        return {
+            "documents": docs,
+            "terms": terms,
+            "last_update_age_seconds": time.time() - self._last_update if self._last_update else None,
+        }
@@ -0,0 +1,457 @@
+import os
+import sqlite3
+import threading
+import time
+from bisect import bisect_left, bisect_right, insort
+from heapq import heappush, heapreplace
+from tools.file_walker import walk_files, PRUNED_DIRS
+from tools.fuzzy_match import TrigramIndex
+
+try:
+    # watchdog uses inotify on Linux, FSEvents on macOS and ReadDirectoryChangesW on Windows
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:
+    Observer = None
+    FileSystemEventHandler = object
+
+# Full rescan interval when file system events are available; they catch almost
+# everything, so this only repairs drift (e.g. changes made while the server was down
+# are picked up by the startup scan instead)
+WATCHED_RESCAN_INTERVAL = 6 * 60 * 60
+# Full rescan interval when running without file system events
+POLLING_RESCAN_INTERVAL = 10 * 60
+# How often pending index changes are written to SQLite
+FLUSH_INTERVAL = 2
+
+
+class FileIndex:
+    """
+    Persistent filename and mtime index over the search directories.
+
+    Entries live in memory for lookups and are mirrored into a SQLite table so a
+    restarted server can answer immediately while the startup rescan runs. A
+    background crawler does full rescans, and file system events (through watchdog,
+    which wraps inotify on Linux) keep the index current between them.
+    """
+
+    def __init__(self, db_path, roots):
+        """
+        Open (or create) the index
+
+        Args:
+            db_path (str): Path of the SQLite database file
+            roots (list): Directories to index
+        """
+        self.db_path = db_path
+        self.roots = [os.path.abspath(root) for root in roots]
+        self._lock = threading.RLock()
+        self._entries = {}  # path -> (name_lower, extension, size, mtime, ctime)
+        # Every indexed path in order, so a removed directory's contents are one slice
+        self._sorted_paths = []
+        self._snapshot = None
+        # Trigram index for fuzzy lookups, keyed by a per-path id
+        self._trigrams = TrigramIndex()
+        self._path_ids = {}
+        self._id_paths = {}
+        self._next_id = 0
+        self._dirty_paths = set()
+        self._stop = threading.Event()
+        self._thread = None
+        self._observer = None
+
+        self._last_full_scan = None
+        self._last_scan_duration = None
+        self._last_event_time = None
+        self._scan_in_progress = False
+
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY,
+                name_lower TEXT NOT NULL,
+                extension TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                mtime REAL NOT NULL,
+                ctime REAL NOT NULL
+            ) WITHOUT ROWID
+        """)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self._conn.commit()
+        self._load()
+
+    def _load(self):
+        """Load the persisted index into memory"""
+        rows = self._conn.execute(
+            "SELECT path, name_lower, extension, size, mtime, ctime FROM files"
+        ).fetchall()
+        self._replace_entries({row[0]: row[1:] for row in rows})
+
+        last_scan = self._conn.execute("SELECT value FROM meta WHERE key = 'last_full_scan'").fetchone()
+        if last_scan:
+            self._last_full_scan = float(last_scan[0])
+        print(f"Loaded {len(rows)} entries from file index at {self.db_path}")
+
+    def is_ready(self):
+        """Whether the index has completed at least one full scan"""
+        return self._last_full_scan is not None
+
+    def start(self):
+        """Start the background crawler and, if available, the file system watcher"""
+        if self._thread and self._thread.is_alive():
+            return
+
+        if Observer is not None:
+            try:
+                self._observer = Observer()
+                handler = _IndexEventHandler(self)
+                for root in self.roots:
+                    if os.path.isdir(root):
+                        self._observer.schedule(handler, root, recursive=True)
+                self._observer.daemon = True
+                self._observer.start()
+            except Exception as e:
+                # Typically the inotify watch limit; periodic rescans take over
+                print(f"File watcher unavailable, falling back to periodic rescans: {str(e)}")
+                self._observer = None
+        else:
+            print("watchdog is not installed, file index will use periodic rescans")
+
+        self._thread = threading.Thread(target=self._run, name="file-index-crawler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the crawler and watcher and flush pending changes"""
+        self._stop.set()
+        if self._observer:
+            self._observer.stop()
+        if self._thread:
+            self._thread.join(timeout=5)
+        self._flush()
+
+    def _run(self):
+        """Crawler loop: initial scan, then periodic flushes and rescans"""
+        self.rescan()
+        while not self._stop.wait(FLUSH_INTERVAL):
+            self._flush()
+            interval = WATCHED_RESCAN_INTERVAL if self._observer else POLLING_RESCAN_INTERVAL
+            if time.time() - (self._last_full_scan or 0) > interval:
+                self.rescan()
+
+    def rescan(self):
+        """Walk every root and replace the index contents with what is on disk"""
+        started = time.time()
+        self._scan_in_progress = True
+        try:
+            entries = {}
+            for root in self.roots:
+                for path, stat in _walk(root):
+                    entries[path] = _entry(path, stat)
+
+            self._replace_entries(entries)
+            with self._lock:
+                self._dirty_paths.clear()
+
+            with self._conn:
+                self._conn.execute("DELETE FROM files")
+                self._conn.executemany(
+                    "INSERT INTO files VALUES (?, ?, ?, ?, ?, ?)",
+                    ((path,) + entry for path, entry in entries.items())
+                )
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO meta VALUES ('last_full_scan', ?)", (str(started),)
+                )
+
+            self._last_full_scan = started
+            self._last_scan_duration = time.time() - started
+            print(f"File index rescan found {len(entries)} files in {self._last_scan_duration:.2f} seconds")
+        except Exception as e:
+            print(f"Error rescanning file index: {str(e)}")
+        finally:
+            self._scan_in_progress = False
+
+    def update_path(self, path):
+        """Re-stat a single path after a file system event"""
+        if _is_excluded(path, self.roots):
+            return
+        try:
+            stat = os.stat(path)
+        except OSError:
+            self.remove_path(path)
+            return
+
+        if os.path.isdir(path):
+            # A directory moved into place; walk its contents before taking the lock
+            entries = [(child, _entry(child, child_stat)) for child, child_stat in _walk(path)]
+        else:
+            entries = [(path, _entry(path, stat))]
+
+        with self._lock:
+            for entry_path, entry in entries:
+                self._set_entry(entry_path, entry)
+            self._snapshot = None
+            self._last_event_time = time.time()
+
+    def _replace_entries(self, entries):
+        """Swap in a complete set of entries, rebuilding the trigram index and path order off-lock"""
+        trigram_index = TrigramIndex()
+        path_ids = {}
+        id_paths = {}
+        for name_id, path in enumerate(entries):
+            trigram_index.add(name_id, os.path.basename(path))
+            path_ids[path] = name_id
+            id_paths[name_id] = path
+
+        sorted_paths = sorted(entries)
+
+        with self._lock:
+            self._entries = entries
+            self._sorted_paths = sorted_paths
+            self._trigrams = trigram_index
+            self._path_ids = path_ids
+            self._id_paths = id_paths
+            self._next_id = len(entries)
+            self._snapshot = None
+
+    def _set_entry(self, path, entry):
+        """Add or refresh one entry; call with the lock held"""
+        # A path's name can't change, so a modified file keeps its id and postings;
+        # a renamed one arrives as a removal and a new path
+        if path not in self._path_ids:
+            name_id = self._next_id
+            self._next_id += 1
+            self._trigrams.add(name_id, os.path.basename(path))
+            self._path_ids[path] = name_id
+            self._id_paths[name_id] = path
+            insort(self._sorted_paths, path)
+        self._entries[path] = entry
+        self._dirty_paths.add(path)
+
+    def _forget_id(self, path):
+        """Forget the trigram id of a path; call with the lock held"""
+        name_id = self._path_ids.pop(path)
+        del self._id_paths[name_id]
+        return name_id
+
+    def remove_path(self, path):
+        """Drop a path, and everything under it if it was a directory"""
+        prefix = path.rstrip(os.sep) + os.sep
+        with self._lock:
+            paths = self._sorted_paths
+            # Everything under a directory sorts between its prefix and the prefix
+            # with the separator bumped to the next character
+            start = bisect_left(paths, prefix)
+            end = bisect_left(paths, prefix[:-1] + chr(ord(os.sep) + 1), start)
+            removed = paths[start:end]
+            del paths[start:end]
+            if path in self._entries:
+                del paths[bisect_left(paths, path)]
+                removed.append(path)
+            for p in removed:
+                del self._entries[p]
+                self._trigrams.remove(self._forget_id(p))
+                self._dirty_paths.add(p)
+            if removed:
+                self._snapshot = None
+            self._last_event_time = time.time()
+
+    def _flush(self):
+        """Write changed entries to SQLite"""
+        with self._lock:
+            if not self._dirty_paths:
+                return
+            dirty = self._dirty_paths
+            self._dirty_paths = set()
+            upserts = [(path,) + self._entries[path] for path in dirty if path in self._entries]
+            deletes = [(path,) for path in dirty if path not in self._entries]
+
+        try:
+            with self._conn:
+                self._conn.executemany("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?)", upserts)
+                self._conn.executemany("DELETE FROM files WHERE path = ?", deletes)
+        except Exception as e:
+            print(f"Error writing file index changes: {str(e)}")
+
+    def _get_snapshot(self):
+        """
+        Build (or reuse) a compact read-only view for lookups: every lowercase name
+        joined into one string, so substring matching runs as a C-level str.find
+        instead of a Python loop over entries
+        """
+        with self._lock:
+            if self._snapshot is None:
+                entries = dict(self._entries)
+                paths = list(entries)
+                names = [entries[path][0] for path in paths]
+                mtimes = [entries[path][3] for path in paths]
+                offsets = []
+                position = 0
+                for name in names:
+                    offsets.append(position)
+                    position += len(name) + 1
+                self._snapshot = ("\n".join(names), offsets, paths, names, mtimes, entries)
+            return self._snapshot
+
+    def search(self, term, extensions=None, limit=5):
+        """
+        Find the most recently modified files whose name contains a term
+
+        Args:
+            term (str): Case-insensitive substring of the filename
+            extensions (list): Only return names ending in one of these extensions
+            limit (int): Maximum number of results
+
+        Returns:
+            list: (path, size, mtime, ctime) tuples, newest first
+        """
+        blob, offsets, paths, names, mtimes, entries = self._get_snapshot()
+        term = term.lower()
+        suffixes = tuple(ext.lower() for ext in extensions) if extensions else None
+
+        best = []
+        term_length = len(term)
+        position = blob.find(term)
+        while position != -1:
+            row = bisect_right(offsets, position) - 1
+            name_lower = names[row]
+            name_start = offsets[row]
+            match_end = position - name_start + term_length
+            mtime = mtimes[row]
+            # A match on the name itself (not one spanning the separator) that is
+            # newer than the current k-th best
+            if match_end <= len(name_lower) and (len(best) < limit or mtime > best[0][0]):
+                # The extension has to come after the matched term, as in *term*.ext
+                if suffixes is None or (name_lower.endswith(suffixes) and any(
+                    name_lower.endswith(ext) and match_end <= len(name_lower) - len(ext) for ext in suffixes
+                )):
+                    if len(best) < limit:
+                        heappush(best, (mtime, row))
+                    else:
+                        heapreplace(best, (mtime, row))
+            # Skip the rest of this name; one hit per file is enough
+            position = blob.find(term, name_start + len(name_lower) + 1)
+
+        results = []
+        for _, row in sorted(best, reverse=True):
+            _, _, size, mtime, ctime = entries[paths[row]]
+            results.append((paths[row], size, mtime, ctime))
+        return results
+
+    def fuzzy_search(self, query, extensions=None, limit=5):
+        """
+        Find files whose names are similar to a spoken query, tolerating typos,
+        accents, separators and word order
+
+        Args:
+            query (str): Query text, without an extension
+            extensions (list): Only return names ending in one of these extensions
+            limit (int): Maximum number of results
+
+        Returns:
+            list: (path, size, mtime, ctime, similarity) tuples, most similar first
+        """
+        suffixes = tuple(ext.lower() for ext in extensions) if extensions else None
+        with self._lock:
+            # Over-fetch so the extension filter still leaves enough candidates
+            candidates = self._trigrams.query(query, limit=limit * 10)
+            results = []
+            for name_id, name_similarity in candidates:
+                path = self._id_paths.get(name_id)
+                if path is None:
+                    continue
+                name_lower, _, size, mtime, ctime = self._entries[path]
+                if suffixes is None or name_lower.endswith(suffixes):
+                    results.append((path, size, mtime, ctime, name_similarity))
+                    if len(results) >= limit:
+                        break
+        return results
+
+    def list_files(self, extensions):
+        """
+        List indexed files with the given extensions
+
+        Args:
+            extensions (tuple): Lowercase extensions, e.g. ('.pdf', '.txt')
+
+        Returns:
+            dict: path -> (mtime, size)
+        """
+        with self._lock:
+            return {
+                path: (entry[3], entry[2])
+                for path, entry in self._entries.items() if entry[1] in extensions
+            }
+
+    def depth(self, path):
+        """Number of directories between the file and its search root"""
+        for root in self.roots:
+            if path.startswith(root + os.sep):
+                return path[len(root) + 1:].count(os.sep)
+        return path.count(os.sep)
+
+    def stats(self):
+        """
+        Report index size and freshness
+
+        Returns:
+            dict: Entry count, scan timings and how stale the index may be
+        """
+        now = time.time()
+        return {
+            "files": len(self._entries),
+            "ready": self.is_ready(),
+            "watching": self._observer is not None,
+            "scan_in_progress": self._scan_in_progress,
+            "last_full_scan_age_seconds": now - self._last_full_scan if self._last_full_scan else None,
+            "last_scan_duration_seconds": self._last_scan_duration,
+            "last_event_age_seconds": now - self._last_event_time if self._last_event_time else None,
+            "pending_writes": len(self._dirty_paths),
+        }
+
+
+class _IndexEventHandler(FileSystemEventHandler):
+    """Forward file system events to the index"""
+
+    def __init__(self, index):
+        super().__init__()
+        self.index = index
+
+    def on_created(self, event):
+        self.index.update_path(event.src_path)
+
+    def on_modified(self, event):
+        if not event.is_directory:
+            self.index.update_path(event.src_path)
+
+    def on_deleted(self, event):
+        self.index.remove_path(event.src_path)
+
+    def on_moved(self, event):
+        self.index.remove_path(event.src_path)
+        self.index.update_path(event.dest_path)
+
+
+def _entry(path, stat):
+    """Build the stored tuple for a file"""
+    name = os.path.basename(path)
+    return (name.lower(), os.path.splitext(name)[1].lower(), stat.st_size, stat.st_mtime, stat.st_ctime)
+
+
+def _is_excluded(path, roots):
+    """Whether the walker would skip this path: outside the roots, hidden or vendored"""
+    for root in roots:
+        if path.startswith(root + os.sep):
+            return any(
+                part.startswith('.') or part in PRUNED_DIRS
+                for part in path[len(root) + 1:].split(os.sep)
+            )
+    return True
+
+
+def _walk(root):
+    """Yield (path, stat) for every visible file under root"""
+    for entry in walk_files(root):
+        try:
+            yield entry.path, entry.stat()
+        except OSError:
+            continue
@@ -1,20 +1,217 @@
 import os
+import re
 from pathlib import Path
-import glob
 from datetime import datetime
 import time
+from concurrent.futures import ThreadPoolExecutor
 from heapq import heappush, heappop
+from tools.file_index import FileIndex
+from tools.content_index import ContentIndex
+from llm.openai_client import openai_client
+from tools.file_walker import walk_files
+from tools.fuzzy_match import MIN_SIMILARITY, normalize_name, rank_score, similarity, trigrams
 
-def search_file(filename, max_results=5, timeout=5):
+# Common file extensions to check if none specified
+COMMON_EXTENSIONS = ['.pdf', '.doc', '.docx', '.txt', '.xlsx', '.xls']
+
+# Where the persistent filename index is stored
+FILE_INDEX_PATH = os.getenv(
+    'FILE_INDEX_PATH',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'file_index.db')
+)
+
+# Where the document content index is stored
+CONTENT_INDEX_PATH = os.getenv(
+    'CONTENT_INDEX_PATH',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'content_index.db')
+)
+
+# Where chunk embeddings for semantic search are stored; semantic search sends
+# document text to the embeddings API, so it has to be switched on explicitly
+SEMANTIC_INDEX_DIR = os.getenv(
+    'SEMANTIC_INDEX_DIR',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'semantic_index')
+)
+SEMANTIC_FILE_SEARCH = os.getenv('SEMANTIC_FILE_SEARCH', '').lower() in ('1', 'true', 'yes')
+# With the disk indexes off, file searches walk the disk and content search is unavailable
+FILE_INDEXING = os.getenv('FILE_INDEXING', 'true').lower() in ('1', 'true', 'yes')
+
+_file_index = None
+_content_index = None
+_semantic_index = None
+
+def get_search_dirs():
+    """Directories searched for files, relative to the user's home directory"""
+    home_dir = str(Path.home())
+    return [
+        os.path.join(home_dir, 'Documents'),
+        os.path.join(home_dir, 'Downloads'),
+        os.path.join(home_dir, 'Desktop')
+    ]
+
+def start_file_index():
+    """
+    Open the persistent filename index and start keeping it up to date
+    
+    Returns:
+        FileIndex: The shared index, or None if indexing is off or it could not be opened
+    """
+    global _file_index
+    if _file_index is None and FILE_INDEXING:
+        try:
+            _file_index = FileIndex(FILE_INDEX_PATH, get_search_dirs())
+            _file_index.start()
+        except Exception as e:
+            print(f"Error starting file index, searches will walk the disk: {str(e)}")
+            _file_index = None
+    return _file_index
+
+def start_content_index():
+    """
+    Open the document content index and start indexing changed files in the background
+    
+    Returns:
+        ContentIndex: The shared index, or None if indexing is off or it could not be opened
+    """
+    global _content_index
+    if _content_index is None and FILE_INDEXING:
+        try:
+            _content_index = ContentIndex(CONTENT_INDEX_PATH, get_search_dirs(), file_index=_file_index)
+            _content_index.start()
+        except Exception as e:
+            print(f"Error starting content index, content search is unavailable: {str(e)}")
+            _content_index = None
+    return _content_index
+
+def _embed_texts(texts):
+    """Embed a batch of texts with the same model as conversation memory"""
+    response = openai_client.embed(
+        model="text-embedding-3-small",
+        input=texts
+    )
+    return [item.embedding for item in response.data]
+
+def start_semantic_index():
+    """
+    Open the semantic index and start embedding changed documents, if enabled
+    
+    Returns:
+        SemanticIndex: The shared index, or None if disabled or unavailable
+    """
+    global _semantic_index
+    if _semantic_index is None and SEMANTIC_FILE_SEARCH:
+        content_index = start_content_index()
+        if content_index is None:
+            return None
+        try:
+            # Imported here so numpy is only needed when semantic search is on
+            from tools.semantic_index import SemanticIndex
+            _semantic_index = SemanticIndex(SEMANTIC_INDEX_DIR, _embed_texts, content_index.list_files)
+            _semantic_index.start()
+        except Exception as e:
+            print(f"Error starting semantic index, falling back to keyword search: {str(e)}")
+            _semantic_index = None
+    return _semantic_index
+
+def search_semantic(query, file_type=None, max_results=5):
+    """
+    Find documents by meaning rather than exact words, e.g. "my notes from the design review"
+    Falls back to keyword content search when semantic search is disabled.
+    
+    Args:
+        query (str): Description of the document
+        file_type (str): Optional extension to restrict to, e.g. "pdf"
+        max_results (int): Maximum number of results to return
+        
+    Returns:
+        list: File information dictionaries, best match first
+    """
+    index = start_semantic_index()
+    if index is None:
+        return search_content(query, file_type=file_type, max_results=max_results)
+    suffix = '.' + file_type.lower().lstrip('.') if file_type else None
+    results = []
+    # Over-fetch when filtering by type so enough files survive the filter
+    for path, _ in index.search(query, limit=max_results * 4 if suffix else max_results):
+        if suffix and not path.lower().endswith(suffix):
+            continue
+        try:
+            file_stat = os.stat(path)
+        except OSError:
+            continue
+        results.append(_file_info(path, file_stat.st_size, file_stat.st_mtime, file_stat.st_ctime))
+        if len(results) >= max_results:
+            break
+    return results
+
+def search_content(query, file_type=None, max_results=5):
+    """
+    Search inside documents (txt, md, pdf, docx) for the given words
+    
+    Args:
+        query (str): Words the document should contain
+        file_type (str): Optional extension to restrict to, e.g. "pdf"
+        max_results (int): Maximum number of results to return
+        
+    Returns:
+        list: File information dictionaries, best match first
+    """
+    index = start_content_index()
+    if index is None:
+        return []
+    extensions = ['.' + file_type.lower().lstrip('.')] if file_type else None
+    results = []
+    for path, size, mtime, _ in index.search(query, extensions=extensions, limit=max_results):
+        try:
+            created = os.stat(path).st_ctime
+        except OSError:
+            # Deleted since the last index update
+            continue
+        results.append(_file_info(path, size, mtime, created))
+    return results
+
+def get_file_index_stats():
+    """Return size and freshness of the filename index, or None if it is not running"""
+    return _file_index.stats() if _file_index else None
+
+def _file_info(file_path, size, mod_time, created_time):
+    """Build the result dictionary for a matched file"""
+    return {
+        'path': file_path,
+        'name': os.path.basename(file_path),
+        'extension': os.path.splitext(file_path)[1],
+        'size': size,
+        'modified': datetime.fromtimestamp(mod_time).strftime('%Y-%m-%d %H:%M:%S'),
+        'created': datetime.fromtimestamp(created_time).strftime('%Y-%m-%d %H:%M:%S')
+    }
+
+def _split_query(filename):
+    """
+    Split a query into the text to match and the extensions to accept
+    
+    Returns:
+        tuple: (query stem, list of extensions or None for any)
+    """
+    stem, extension = os.path.splitext(filename)
+    if extension and ' ' not in extension:
+        return stem, [extension]
+    return filename, COMMON_EXTENSIONS
+
+def search_file(filename, max_results=5, timeout=5, fuzzy=True):
     """
     Search for files matching the given filename pattern.
     Supports partial matches and common file extensions.
     Prioritizes most recently modified files.
+    Answers from the persistent filename index once it has been built, and
+    walks the search directories otherwise. With fuzzy matching, names that
+    only resemble the query (typos, accents, separators) are ranked alongside
+    exact matches by similarity, recency and path depth.
     
     Args:
         filename (str): The filename or pattern to search for
         max_results (int): Maximum number of results to return
         timeout (int): Maximum time to search in seconds
+        fuzzy (bool): Also rank names similar to the query
         
     Returns:
         list: List of dictionaries containing file information:
@@ -29,69 +226,118 @@ def search_file(filename, max_results=5, timeout=5):
     """
     start_time = time.time()
     
-    # Common file extensions to check if none specified
-    common_extensions = ['.pdf', '.doc', '.docx', '.txt', '.xlsx', '.xls']
-    
-    # Get user's home directory
-    home_dir = str(Path.home())
+    # Serve from the filename index when it has been built
+    if _file_index is not None and _file_index.is_ready():
+        extensions = None if '.' in filename else COMMON_EXTENSIONS
+        matches = _file_index.search(filename, extensions=extensions, limit=max_results)
+        if fuzzy:
+            stem, fuzzy_extensions = _split_query(filename)
+            # Exact substring matches count as perfectly similar
+            candidates = {path: (size, mtime, ctime, 1.0) for path, size, mtime, ctime in matches}
+            for path, size, mtime, ctime, name_similarity in _file_index.fuzzy_search(
+                stem, extensions=fuzzy_extensions, limit=max_results * 4
+            ):
+                candidates.setdefault(path, (size, mtime, ctime, name_similarity))
+            now = time.time()
+            ranked = sorted(
+                candidates.items(),
+                key=lambda item: rank_score(item[1][3], item[1][1], _file_index.depth(item[0]), now),
+                reverse=True
+            )
+            matches = [(path, size, mtime, ctime) for path, (size, mtime, ctime, _) in ranked[:max_results]]
+        print(f"Index lookup for '{filename}' took {(time.time() - start_time) * 1000:.1f} ms")
+        return [_file_info(*match) for match in matches]
     
-    # Use a min heap to keep track of most recent files
-    # We'll store (modification_time, file_info) tuples
-    recent_files = []
-    
-    # If filename doesn't have an extension, try with common extensions
-    if '.' not in filename:
-        search_patterns = [f"**/*{filename}*{ext}" for ext in common_extensions]
-    else:
-        search_patterns = [f"**/*{filename}*"]
+    return walk_search(filename, get_search_dirs(), max_results=max_results, timeout=timeout, fuzzy=fuzzy)
+
+def _compile_name_pattern(filename):
+    """
+    Compile one pattern covering every extension the search accepts, matching
+    what the per-extension globs *filename*.ext (or *filename* when the name
+    already has an extension) used to match
+    """
+    if '.' in filename:
+        return re.compile(re.escape(filename), re.IGNORECASE)
+    extensions = '|'.join(re.escape(ext) for ext in COMMON_EXTENSIONS)
+    return re.compile(f"{re.escape(filename)}.*(?:{extensions})$", re.IGNORECASE)
+
+def _search_root(root, pattern, query_grams, extensions, max_results, deadline):
+    """
+    Walk one root and keep the best matches in a min heap: by modification time
+    for exact matching, or by rank score when query trigrams are given
+    """
+    best_files = []
+    now = time.time()
+    base_depth = root.rstrip(os.sep).count(os.sep) + 1
+    for entry in walk_files(root, deadline):
+        name = entry.name
+        if pattern.search(name):
+            name_similarity = 1.0
+        elif query_grams and name.lower().endswith(extensions):
+            name_similarity = similarity(query_grams, trigrams(normalize_name(name)))
+            if name_similarity < MIN_SIMILARITY:
+                continue
+        else:
+            continue
+        try:
+            file_stat = entry.stat()
+        except OSError:
+            continue
+        if query_grams:
+            depth = entry.path.count(os.sep) - base_depth
+            key = rank_score(name_similarity, file_stat.st_mtime, depth, now)
+        else:
+            key = file_stat.st_mtime
+        # Only keep (key, path, stat); dictionaries are built for the final top-k
+        heappush(best_files, (key, entry.path, file_stat))
+        if len(best_files) > max_results:
+            heappop(best_files)
+    return best_files
+
+def walk_search(filename, search_dirs, max_results=5, timeout=5, fuzzy=False):
+    """
+    Search directories for matching files without an index, walking each
+    root once in its own thread
     
-    # Search in common directories with max depth of 2
-    search_dirs = [
-        os.path.join(home_dir, 'Documents'),
-        os.path.join(home_dir, 'Downloads'),
-        os.path.join(home_dir, 'Desktop')
-    ]
+    Args:
+        filename (str): The filename or pattern to search for
+        search_dirs (list): Root directories to walk
+        max_results (int): Maximum number of results to return
+        timeout (int): Maximum time to search in seconds
+        fuzzy (bool): Also rank names similar to the query
+        
+    Returns:
+        list: File information dictionaries, best first
+    """
+    deadline = time.time() + timeout
+    pattern = _compile_name_pattern(filename)
+    stem, extensions = _split_query(filename)
+    query_grams = trigrams(normalize_name(stem, strip_extension=False)) if fuzzy else None
+    extensions = tuple(ext.lower() for ext in extensions)
+    roots = [search_dir for search_dir in search_dirs if os.path.isdir(search_dir)]
+    if not roots:
+        return []
     
-    for search_dir in search_dirs:
-        if not os.path.exists(search_dir):
-            continue
-            
-        for pattern in search_patterns:
+    best_files = []
+    with ThreadPoolExecutor(max_workers=len(roots)) as executor:
+        futures = [
+            executor.submit(_search_root, root, pattern, query_grams, extensions, max_results, deadline)
+            for root in roots
+        ]
+        for future in futures:
             try:
-                # Use glob to find matching files with max depth
-                matches = glob.glob(os.path.join(search_dir, pattern), recursive=True)
-                
-                for file_path in matches:
-                    # Check timeout
-                    if time.time() - start_time > timeout:
-                        print("\nSearch timeout reached. Returning best matches found so far.")
-                        return [file_info for _, file_info in sorted(recent_files, reverse=True)]
-                        
-                    if os.path.isfile(file_path):
-                        file_stat = os.stat(file_path)
-                        mod_time = file_stat.st_mtime
-                        
-                        file_info = {
-                            'path': file_path,
-                            'name': os.path.basename(file_path),
-                            'extension': os.path.splitext(file_path)[1],
-                            'size': file_stat.st_size,
-                            'modified': datetime.fromtimestamp(mod_time).strftime('%Y-%m-%d %H:%M:%S'),
-                            'created': datetime.fromtimestamp(file_stat.st_ctime).strftime('%Y-%m-%d %H:%M:%S')
-                        }
-                        
-                        # Add to heap, keeping only the most recent files
-                        heappush(recent_files, (mod_time, file_info))
-                        if len(recent_files) > max_results:
-                            heappop(recent_files)
-                            
+                best_files.extend(future.result())
             except Exception as e:
-                print(f"Error searching in {search_dir}: {str(e)}")
-                continue
+                print(f"Error searching for '{filename}': {str(e)}")
     
-    # Convert heap to sorted list (most recent first)
-    results = [file_info for _, file_info in sorted(recent_files, reverse=True)]
-    return results
+    if time.time() > deadline:
+        print("\nSearch timeout reached. Returning best matches found so far.")
+    
+    top = sorted(best_files, key=lambda match: match[0], reverse=True)[:max_results]
+    return [
+        _file_info(path, file_stat.st_size, file_stat.st_mtime, file_stat.st_ctime)
+        for _, path, file_stat in top
+    ]
 
 if __name__ == "__main__":
     # Test the function
@@ -0,0 +1,41 @@
+import os
+import time
+
+# Dependency and build directories that never hold the user's documents
+PRUNED_DIRS = {'node_modules', 'bower_components', '__pycache__', 'site-packages', 'venv'}
+
+
+def walk_files(root, deadline=None):
+    """
+    Walk a directory tree once with os.scandir, skipping hidden and vendor directories
+
+    Args:
+        root (str): Directory to walk
+        deadline (float): time.time() value after which the walk stops early
+
+    Yields:
+        os.DirEntry: Every visible regular file under root
+    """
+    stack = [root]
+    while stack:
+        if deadline is not None and time.time() > deadline:
+            return
+        directory = stack.pop()
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    name = entry.name
+                    if name.startswith('.'):
+                        continue
+                    try:
+                        # Don't follow symlinked directories; they can loop
+                        if entry.is_dir(follow_symlinks=False):
+                            if name not in PRUNED_DIRS:
+                                stack.append(entry.path)
+                        elif entry.is_file():
+                            yield entry
+                    except OSError:
+                        continue
+        except OSError:
+            # Permission denied, or the directory vanished mid-walk
+            continue
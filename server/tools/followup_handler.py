@@ -28,6 +28,9 @@ def handle_followup(command_data, user_id, simulated_response=None):
     # Get user's response (either simulated or real)
     response_text = simulated_response if simulated_response is not None else listen_for_speech()
     if response_text:
+        # The other parts of a multi-part request already ran with the first execution
+        command_data.pop("additional_commands", None)
+        
         # For simple responses, directly update the parameter
         if "parameter_to_update" in followup_context:
             param_name = followup_context["parameter_to_update"]
@@ -0,0 +1,192 @@
+import math
+import os
+import re
+import time
+import unicodedata
+from array import array
+from collections import Counter
+
+# Weights of the ranking components; similarity dominates so a close name
+# always beats a merely recent one
+SIMILARITY_WEIGHT = 0.7
+RECENCY_WEIGHT = 0.2
+DEPTH_WEIGHT = 0.1
+# Age at which the recency component has decayed to about a third
+RECENCY_SCALE_DAYS = 90
+# Candidates below this similarity are not worth reading out
+MIN_SIMILARITY = 0.3
+# Postings are compacted once removed ids pass this fraction of live ids (and
+# this minimum, so small indexes aren't rewritten on every removal)
+COMPACT_FRACTION = 0.25
+COMPACT_MIN_REMOVED = 64
+
+_CAMEL_BOUNDARY = re.compile(r"(?<=[a-z])(?=[A-Z])|(?<=[A-Za-z])(?=[0-9])|(?<=[0-9])(?=[A-Za-z])")
+_NON_ALNUM = re.compile(r"[^0-9a-z]+")
+
+
+def normalize_name(text, strip_extension=True):
+    """
+    Reduce a filename or spoken query to lowercase ASCII words
+
+    "Résumé_2024_final.pdf" -> "resume 2024 final", "Q3-report.docx" -> "q 3 report"
+
+    Args:
+        text (str): Filename or query
+        strip_extension (bool): Drop a trailing ".ext" first
+
+    Returns:
+        str: Space separated words
+    """
+    if strip_extension:
+        stem, extension = os.path.splitext(text)
+        if extension and ' ' not in extension:
+            text = stem
+    # Decompose accented characters and drop the combining marks
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    text = _CAMEL_BOUNDARY.sub(" ", text)
+    return _NON_ALNUM.sub(" ", text.lower()).strip()
+
+
+def trigrams(normalized):
+    """
+    Trigrams of every word, padded like pg_trgm so short words and word
+    starts still produce distinctive grams
+
+    Args:
+        normalized (str): Output of normalize_name
+
+    Returns:
+        set: Three character strings
+    """
+    grams = set()
+    for word in normalized.split():
+        padded = f"  {word} "
+        for i in range(len(padded) - 2):
+            grams.add(padded[i:i + 3])
+    return grams
+
+
+def similarity(query_grams, name_grams, shared=None):
+    """
+    Blend of how much of the query the name covers and the overall overlap
+
+    Args:
+        query_grams (set): Trigrams of the query
+        name_grams (set or int): Trigrams of the name, or just their count
+        shared (int): Number of shared trigrams, if already known
+
+    Returns:
+        float: Similarity between 0 and 1
+    """
+    name_count = name_grams if isinstance(name_grams, int) else len(name_grams)
+    if shared is None:
+        shared = len(query_grams & name_grams)
+    if not query_grams or not name_count or not shared:
+        return 0.0
+    containment = shared / len(query_grams)
+    jaccard = shared / (len(query_grams) + name_count - shared)
+    return 0.5 * containment + 0.5 * jaccard
+
+
+def rank_score(name_similarity, mtime, depth, now=None):
+    """
+    Combine similarity, recency and path depth into one ranking score
+
+    Args:
+        name_similarity (float): Output of similarity, 1.0 for exact matches
+        mtime (float): Last modification time
+        depth (int): Directories between the search root and the file
+        now (float): Current time, for repeatable scoring
+
+    Returns:
+        float: Higher is better
+    """
+    age_days = max(0.0, ((now or time.time()) - mtime) / 86400)
+    recency = math.exp(-age_days / RECENCY_SCALE_DAYS)
+    shallowness = 1.0 / (1 + depth)
+    return SIMILARITY_WEIGHT * name_similarity + RECENCY_WEIGHT * recency + DEPTH_WEIGHT * shallowness
+
+
+class TrigramIndex:
+    """
+    Inverted index from trigram to the ids of names containing it.
+
+    Postings are compact arrays of unsigned ints; removed ids are tombstoned and
+    dropped from the arrays once the tombstones pass a fraction of the live ids.
+    """
+
+    def __init__(self):
+        self._postings = {}
+        self._gram_counts = {}
+        self._removed = set()
+
+    def add(self, name_id, name):
+        """
+        Index a name
+
+        Args:
+            name_id (int): Caller's identifier for the name
+            name (str): Filename to index
+        """
+        grams = trigrams(normalize_name(name))
+        self._removed.discard(name_id)
+        self._gram_counts[name_id] = len(grams)
+        for gram in grams:
+            postings = self._postings.get(gram)
+            if postings is None:
+                postings = self._postings[gram] = array('I')
+            postings.append(name_id)
+
+    def remove(self, name_id):
+        """Forget a name id"""
+        if self._gram_counts.pop(name_id, None) is not None:
+            self._removed.add(name_id)
+            if len(self._removed) > max(COMPACT_MIN_REMOVED, COMPACT_FRACTION * len(self._gram_counts)):
+                self.compact()
+
+    def compact(self):
+        """Drop removed ids from the postings"""
+        removed = self._removed
+        for gram, postings in list(self._postings.items()):
+            kept = array('I', (name_id for name_id in postings if name_id not in removed))
+            if kept:
+                self._postings[gram] = kept
+            else:
+                del self._postings[gram]
+        self._removed = set()
+
+    def query(self, text, limit=50, min_similarity=MIN_SIMILARITY):
+        """
+        Find the names most similar to a query
+
+        Args:
+            text (str): Spoken or typed query
+            limit (int): Maximum number of candidates
+            min_similarity (float): Drop candidates below this similarity
+
+        Returns:
+            list: (name_id, similarity) tuples, most similar first
+        """
+        query_grams = trigrams(normalize_name(text, strip_extension=False))
+        if not query_grams:
+            return []
+
+        shared = Counter()
+        for gram in query_grams:
+            postings = self._postings.get(gram)
+            if postings:
+                shared.update(postings)
+
+        # Similarity grows with the shared count, so only the names sharing the most
+        # trigrams need scoring; this keeps queries fast when common grams match
+        # a large share of the index
+        scored = []
+        for name_id, count in shared.most_common(max(limit * 5, 200)):
+            if name_id in self._removed:
+                continue
+            score = similarity(query_grams, self._gram_counts[name_id], shared=count)
+            if score >= min_similarity:
+                scored.append((name_id, score))
+        scored.sort(key=lambda item: item[1], reverse=True)
+        return scored[:limit]
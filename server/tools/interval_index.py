@@ -0,0 +1,141 @@
+from bisect import insort
+from datetime import timedelta
+
+
+class IntervalIndex:
+    """
+    Interval tree over half-open [start, end) intervals.
+
+    The intervals are kept in a list sorted by start, and that list is read as an
+    implicit balanced binary tree (the middle element of every range is the node).
+    Each node stores the largest end value of its subtree, so an overlap query can
+    skip whole subtrees that finish before the query starts. Queries run in
+    O(log n + k); inserts are O(n) and rebuild the augmentation lazily, which is
+    fine for the few hundred events a calendar window holds.
+    """
+
+    def __init__(self, intervals=None):
+        """
+        Build the index
+
+        Args:
+            intervals (iterable): Optional (start, end, payload) tuples
+        """
+        self._items = sorted(
+            (item for item in (intervals or []) if item[0] < item[1]),
+            key=lambda item: (item[0], item[1])
+        )
+        self._max_end = []
+        self._dirty = True
+
+    def __len__(self):
+        return len(self._items)
+
+    def add(self, start, end, payload=None):
+        """
+        Insert an interval into the index
+
+        Args:
+            start: Interval start (any comparable value, e.g. an aware datetime)
+            end: Interval end, exclusive
+            payload: Object returned by queries for this interval
+        """
+        if not start < end:
+            raise ValueError("Interval start must be before its end")
+        insort(self._items, (start, end, payload), key=lambda item: (item[0], item[1]))
+        self._dirty = True
+
+    def _build(self):
+        """Recompute the max-end augmentation for every implicit tree node"""
+        self._max_end = [None] * len(self._items)
+
+        def build(lo, hi):
+            if lo >= hi:
+                return None
+            mid = (lo + hi) // 2
+            max_end = self._items[mid][1]
+            for child in (build(lo, mid), build(mid + 1, hi)):
+                if child is not None and child > max_end:
+                    max_end = child
+            self._max_end[mid] = max_end
+            return max_end
+
+        build(0, len(self._items))
+        self._dirty = False
+
+    def overlapping(self, start, end):
+        """
+        Find every interval that overlaps [start, end)
+
+        Args:
+            start: Query start
+            end: Query end, exclusive
+
+        Returns:
+            list: (start, end, payload) tuples ordered by start
+        """
+        if self._dirty:
+            self._build()
+
+        found = []
+
+        def search(lo, hi):
+            if lo >= hi:
+                return
+            mid = (lo + hi) // 2
+            # Nothing in this subtree ends after the query starts
+            if self._max_end[mid] <= start:
+                return
+            search(lo, mid)
+            item_start, item_end, _ = self._items[mid]
+            if item_start < end:
+                if item_end > start:
+                    found.append(self._items[mid])
+                # Right subtree starts at or after item_start, so it may still overlap
+                search(mid + 1, hi)
+
+        search(0, len(self._items))
+        return found
+
+    def free_slots(self, duration, window_start, window_end, max_results=5, align=timedelta(minutes=15)):
+        """
+        Find gaps of at least `duration` inside a window
+
+        Args:
+            duration (timedelta): Required slot length
+            window_start (datetime): Start of the search window
+            window_end (datetime): End of the search window
+            max_results (int): Maximum number of slots to return
+            align (timedelta): Round slot starts up to this granularity (None to disable)
+
+        Returns:
+            list: (slot_start, slot_end) tuples in chronological order
+        """
+        slots = []
+        cursor = window_start
+        busy = self.overlapping(window_start, window_end)
+        # Sentinel so the gap after the last busy interval is checked too
+        busy.append((window_end, window_end, None))
+
+        for busy_start, busy_end, _ in busy:
+            slot_start = _align_up(cursor, align)
+            while slot_start + duration <= min(busy_start, window_end):
+                slots.append((slot_start, slot_start + duration))
+                if len(slots) >= max_results:
+                    return slots
+                slot_start = _align_up(slot_start + duration, align)
+            if busy_end > cursor:
+                cursor = busy_end
+
+        return slots
+
+
+def _align_up(moment, align):
+    """Round a datetime up to the next multiple of `align` within its hour"""
+    if not align:
+        return moment
+    step = int(align.total_seconds())
+    hour_start = moment.replace(minute=0, second=0, microsecond=0)
+    elapsed = (moment - hour_start).total_seconds()
+    rounded = -(-elapsed // step) * step
+    return hour_start + timedelta(seconds=rounded)
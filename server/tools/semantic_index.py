@@ -0,0 +1,314 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+from tools.content_index import MAX_FILE_BYTES, extract_text
+
+# OpenAI text-embedding-3-small dimension, as used for conversation memory
+EMBEDDING_DIMENSION = 1536
+# Characters per chunk and overlap between neighbouring chunks
+CHUNK_CHARS = 1200
+CHUNK_OVERLAP = 200
+# Long documents are represented by their first chunks only
+MAX_CHUNKS_PER_FILE = 64
+# Texts sent per embeddings request
+EMBED_BATCH_SIZE = 96
+# Rows scored per block, so a search never pages the whole matrix into the heap at once
+SEARCH_BLOCK_ROWS = 65536
+# How often the background indexer looks for changed files
+UPDATE_INTERVAL = 15 * 60
+
+
+def chunk_text(text):
+    """
+    Split text into overlapping chunks on whitespace boundaries
+
+    Args:
+        text (str): Document text
+
+    Returns:
+        list: Chunk strings, at most MAX_CHUNKS_PER_FILE
+    """
+    text = " ".join(text.split())
+    chunks = []
+    start = 0
+    while start < len(text) and len(chunks) < MAX_CHUNKS_PER_FILE:
+        end = min(len(text), start + CHUNK_CHARS)
+        if end < len(text):
+            # Back up to the last space so words aren't cut in half
+            space = text.rfind(" ", start + CHUNK_CHARS // 2, end)
+            if space != -1:
+                end = space
+        chunks.append(text[start:end])
+        if end >= len(text):
+            break
+        start = end - CHUNK_OVERLAP
+    return chunks
+
+
+class SemanticIndex:
+    """
+    Chunk embeddings of local documents in a memory-mapped float32 matrix.
+
+    Vectors are appended to a flat file of unit-length rows and read through
+    numpy.memmap, so searches score blocks of rows without loading the matrix
+    into the heap. Embeddings are cached by the SHA-256 of the extracted text:
+    a file is only embedded again when its content changes, and identical
+    copies share rows.
+    """
+
+    def __init__(self, directory, embed_fn, list_files, dimension=EMBEDDING_DIMENSION):
+        """
+        Open (or create) the index
+
+        Args:
+            directory (str): Directory for the vector file and its SQLite metadata
+            embed_fn (callable): Maps a list of strings to a list of embedding vectors
+            list_files (callable): Returns {path: (mtime, size)} of the files to index
+            dimension (int): Embedding dimension
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.vectors_path = os.path.join(directory, 'vectors.f32')
+        self.embed_fn = embed_fn
+        self.list_files = list_files
+        self.dimension = dimension
+        # Guards the connection, the vector file and the cached view; held only briefly,
+        # so searches never wait on text extraction or embedding requests
+        self._lock = threading.RLock()
+        # Serializes update passes
+        self._update_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._matrix = None
+        self._row_paths = None
+        self._last_update = None
+
+        self._conn = sqlite3.connect(os.path.join(directory, 'semantic.db'), check_same_thread=False)
+        with self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS versions (
+                    content_hash TEXT PRIMARY KEY,
+                    first_row INTEGER NOT NULL,
+                    row_count INTEGER NOT NULL
+                )
+            """)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS files (
+                    path TEXT PRIMARY KEY,
+                    mtime REAL NOT NULL,
+                    size INTEGER NOT NULL,
+                    content_hash TEXT
+                )
+            """)
+        if not os.path.exists(self.vectors_path):
+            open(self.vectors_path, 'wb').close()
+
+    def start(self):
+        """Index in the background now and every UPDATE_INTERVAL seconds"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, name="semantic-indexer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the background indexer"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def _run(self):
+        while True:
+            try:
+                self.update()
+            except Exception as e:
+                print(f"Error updating semantic index: {str(e)}")
+            if self._stop.wait(UPDATE_INTERVAL):
+                return
+
+    def _row_count(self):
+        return os.path.getsize(self.vectors_path) // (4 * self.dimension)
+
+    def _append_vectors(self, vectors):
+        """Normalize and append vectors; returns the first new row number"""
+        matrix = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dimension)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix /= np.where(norms == 0, 1, norms)
+        first_row = self._row_count()
+        with open(self.vectors_path, 'ab') as f:
+            f.write(matrix.tobytes())
+        return first_row
+
+    def _embed_chunks(self, text):
+        """Embed the chunks of text, outside the lock"""
+        chunks = chunk_text(text)
+        vectors = []
+        for i in range(0, len(chunks), EMBED_BATCH_SIZE):
+            vectors.extend(self.embed_fn(chunks[i:i + EMBED_BATCH_SIZE]))
+        return vectors
+
+    def _commit_file(self, path, mtime, size, content_hash, vectors=None):
+        """Store a file's row, appending its version's vectors first if they are new"""
+        with self._lock:
+            if vectors:
+                first_row = self._append_vectors(vectors)
+                with self._conn:
+                    self._conn.execute(
+                        "INSERT OR IGNORE INTO versions VALUES (?, ?, ?)", (content_hash, first_row, len(vectors))
+                    )
+            with self._conn:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)", (path, mtime, size, content_hash)
+                )
+            self._matrix = None
+            self._row_paths = None
+
+    def update(self):
+        """
+        Embed new and changed files and forget deleted ones
+
+        Returns:
+            dict: Number of files embedded, reused from cache, without text, removed and unchanged
+        """
+        with self._update_lock:
+            started = time.time()
+            on_disk = {path: stat for path, stat in self.list_files().items() if stat[1] <= MAX_FILE_BYTES}
+            with self._lock:
+                known = {
+                    path: (mtime, size)
+                    for path, mtime, size in self._conn.execute("SELECT path, mtime, size FROM files")
+                }
+            counts = {"embedded": 0, "cached": 0, "empty": 0, "removed": 0, "unchanged": 0}
+
+            for path, (mtime, size) in on_disk.items():
+                if known.get(path) == (mtime, size):
+                    counts["unchanged"] += 1
+                    continue
+                try:
+                    text = extract_text(path)
+                    if not text or not text.strip():
+                        self._commit_file(path, mtime, size, None)
+                        counts["empty"] += 1
+                        continue
+                    content_hash = hashlib.sha256(text.encode('utf-8', errors='ignore')).hexdigest()
+                    with self._lock:
+                        cached = self._conn.execute(
+                            "SELECT 1 FROM versions WHERE content_hash = ?", (content_hash,)
+                        ).fetchone()
+                    vectors = None if cached else self._embed_chunks(text)
+                except Exception as e:
+                    print(f"Could not embed {path}: {str(e)}")
+                    continue
+                self._commit_file(path, mtime, size, content_hash, vectors)
+                counts["cached" if cached else "embedded"] += 1
+
+            removed = [(path,) for path in known if path not in on_disk]
+            if removed:
+                with self._lock:
+                    with self._conn:
+                        self._conn.executemany("DELETE FROM files WHERE path = ?", removed)
+                    self._matrix = None
+                    self._row_paths = None
+            counts["removed"] = len(removed)
+
+            self._last_update = time.time()
+            print(f"Semantic index update {counts} took {self._last_update - started:.2f} seconds")
+            return counts
+
+    def _get_view(self):
+        """Map the vector file and build the row -> paths lookup for live rows"""
+        with self._lock:
+            if self._matrix is None:
+                rows = self._row_count()
+                self._matrix = (
+                    np.memmap(self.vectors_path, dtype=np.float32, mode='r', shape=(rows, self.dimension))
+                    if rows else np.zeros((0, self.dimension), dtype=np.float32)
+                )
+                # Rows map to a version; -1 marks rows whose content no current file has
+                # (superseded versions). Identical files share a version and all are returned.
+                row_versions = np.full(rows, -1, dtype=np.int64)
+                version_paths = []
+                versions = {}
+                for path, content_hash, first_row, row_count in self._conn.execute("""
+                    SELECT f.path, f.content_hash, v.first_row, v.row_count
+                    FROM files f JOIN versions v ON v.content_hash = f.content_hash
+                    ORDER BY f.path
+                """):
+                    if content_hash not in versions:
+                        versions[content_hash] = len(version_paths)
+                        version_paths.append([])
+                        row_versions[first_row:first_row + row_count] = versions[content_hash]
+                    version_paths[versions[content_hash]].append(path)
+                self._row_paths = (row_versions, version_paths)
+            return self._matrix, self._row_paths
+
+    def search(self, query, limit=5):
+        """
+        Find the documents whose chunks are closest to a query
+
+        Args:
+            query (str): Natural language description of the document
+            limit (int): Maximum number of files to return
+
+        Returns:
+            list: (path, score) tuples, best first; score is the best chunk's cosine similarity
+        """
+        matrix, (row_versions, version_paths) = self._get_view()
+        if not len(matrix) or not version_paths:
+            return []
+
+        query_vector = np.asarray(self.embed_fn([query])[0], dtype=np.float32)
+        query_vector /= np.linalg.norm(query_vector) or 1
+
+        # Over-fetch chunks so several chunks of one file still leave `limit` files
+        keep = limit * 8
+        best_scores = np.empty(0, dtype=np.float32)
+        best_rows = np.empty(0, dtype=np.int64)
+        for start in range(0, len(matrix), SEARCH_BLOCK_ROWS):
+            scores = matrix[start:start + SEARCH_BLOCK_ROWS] @ query_vector
+            scores[row_versions[start:start + SEARCH_BLOCK_ROWS] < 0] = -np.inf
+            if len(scores) > keep:
+                top = np.argpartition(scores, -keep)[-keep:]
+            else:
+                top = np.arange(len(scores))
+            best_scores = np.concatenate([best_scores, scores[top]])
+            best_rows = np.concatenate([best_rows, top + start])
+            if len(best_scores) > keep:
+                top = np.argpartition(best_scores, -keep)[-keep:]
+                best_scores, best_rows = best_scores[top], best_rows[top]
+
+        results = []
+        seen = set()
+        for i in np.argsort(-best_scores):
+            if not np.isfinite(best_scores[i]):
+                break
+            version = row_versions[best_rows[i]]
+            if version in seen:
+                continue
+            seen.add(version)
+            results.extend((path, float(best_scores[i])) for path in version_paths[version])
+            if len(results) >= limit:
+                break
+        return results[:limit]
+
+    def stats(self):
+        """
+        Report index size and freshness
+
+        Returns:
+            dict: File, version and vector row counts and the age of the last update
+        """
+        with self._lock:
+            files, versions = self._conn.execute(
+                "SELECT (SELECT COUNT(*) FROM files), (SELECT COUNT(*) FROM versions)"
+            ).fetchone()
+        return {
+            "files": files,
+            "versions": versions,
+            "vector_rows": self._row_count(),
+            "vector_bytes": os.path.getsize(self.vectors_path),
+            "last_update_age_seconds": time.time() - self._last_update if self._last_update else None,
+        }
@@ -1,9 +1,7 @@
-import speech_recognition as sr
 import os
-import json
 from dotenv import load_dotenv
-from google.cloud import speech
 from google.oauth2 import service_account
+from voice.wake_listener import wake_listener
 
 # Load environment variables
 load_dotenv()
@@ -28,61 +26,15 @@ def validate_credentials():
 validate_credentials()
 
 def listen_for_speech():
-    """Listen to microphone input and return the recognized text"""
-    recognizer = sr.Recognizer()
+    """
+    Listen to microphone input and return the recognized text
     
-    # Adjust these values based on your needs
-    recognizer.energy_threshold = 1000  # Increased threshold to reduce false positives
-    recognizer.dynamic_energy_threshold = True
-    recognizer.dynamic_energy_adjustment_damping = 0.15
-    recognizer.dynamic_energy_ratio = 1.5
-    recognizer.pause_threshold = 0.8
+    Uses the shared always-open listener, so there is no noise calibration or
+    client setup per call. No wake word is needed, as this hears answers to
+    the assistant's own questions.
     
-    with sr.Microphone() as source:
-        print("Listening... (Speak now)")
-        # Adjust for ambient noise
-        recognizer.adjust_for_ambient_noise(source, duration=2)
-        
-        try:
-            # This will wait until speech is detected and then continue until there's a pause
-            audio = recognizer.listen(source, 
-                                    timeout=None,  # No timeout for initial speech detection
-                                    phrase_time_limit=None)  # No limit on phrase length
-            print("Speech detected! Processing...")
-            
-            # Get the audio data
-            audio_data = audio.get_raw_data()
-            
-            # Create a Speech client
-            client = speech.SpeechClient()
-            
-            # Configure the audio and recognition settings
-            audio = speech.RecognitionAudio(content=audio_data)
-            config = speech.RecognitionConfig(
-                encoding=speech.RecognitionConfig.AudioEncoding.LINEAR16,
-                sample_rate_hertz=44100,  # Changed to match common microphone sample rate
-                language_code="en-US",
-                enable_automatic_punctuation=True,
-                model="default",
-                use_enhanced=True,
-                audio_channel_count=1,
-            )
-            
-            # Perform the transcription
-            response = client.recognize(config=config, audio=audio)
-            
-            # Get the transcription
-            if response.results:
-                transcript = response.results[0].alternatives[0].transcript
-                print(f"Successfully transcribed: {transcript}")
-                return transcript
-            else:
-                print("No speech detected")
-                return None
-                    
-        except sr.WaitTimeoutError:
-            print("No speech detected")
-            return None
-        except Exception as e:
-            print(f"Error: {str(e)}")
-            return None 
\ No newline at end of file
+    Returns:
+        str: The recognized text, or None
+    """
+    utterance = wake_listener.listen(require_wake_word=False)
+    return utterance.transcript if utterance else None
@@ -4,6 +4,7 @@ from dotenv import load_dotenv
 import tempfile
 import pygame
 import time
+from pipeline.cancellation import check_cancelled, current_token
 
 # Load environment variables
 load_dotenv()
@@ -24,10 +25,18 @@ def speak_text(text):
     """
     Convert text to speech using Google Cloud TTS and play it
     
+    Playback stops early if the current turn is cancelled.
+    
     Args:
         text (str): Text to be spoken
+        
+    Raises:
+        TurnCancelled: If the turn was cancelled before or while speaking
     """
+    token = current_token()
     try:
+        check_cancelled()
+        
         # Initialize the TTS client
         client = texttospeech.TextToSpeechClient()
         
@@ -53,6 +62,8 @@ def speak_text(text):
             input=synthesis_input, voice=voice, audio_config=audio_config
         )
         
+        check_cancelled()
+        
         # Create a temporary file to store the audio
         with tempfile.NamedTemporaryFile(delete=False, suffix='.mp3') as temp_file:
             temp_filename = temp_file.name
@@ -65,13 +76,17 @@ def speak_text(text):
         pygame.mixer.music.load(temp_filename)
         pygame.mixer.music.play()
         
-        # Wait for the audio to finish playing
+        # Wait for the audio to finish playing, or for the user to interrupt it
         while pygame.mixer.music.get_busy():
+            if token is not None and token.cancelled:
+                pygame.mixer.music.stop()
+                break
             time.sleep(0.1)
         
         # Clean up
         pygame.mixer.quit()
         os.unlink(temp_filename)
+        check_cancelled()
         
     except Exception as e:
         print(f"Error in text-to-speech: {str(e)}")
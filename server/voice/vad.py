@@ -0,0 +1,130 @@
+import os
+from collections import deque
+
+import numpy as np
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Frames are this long; short enough to catch the first syllable
+FRAME_SECONDS = 0.03
+# Speech starts when this many frames in a row are this many times louder than the noise floor...
+VAD_START_RATIO = float(os.getenv('VAD_START_RATIO', '3.0'))
+VAD_START_FRAMES = 3
+# ...and ends after this long below VAD_END_RATIO times the floor
+VAD_END_RATIO = float(os.getenv('VAD_END_RATIO', '2.0'))
+VAD_END_SECONDS = float(os.getenv('VAD_END_SECONDS', '0.8'))
+# Audio kept from before the start, so the first word isn't clipped
+PRE_ROLL_SECONDS = 0.3
+# Anything quieter than this is never speech, however quiet the room
+MIN_SPEECH_RMS = 100.0
+MAX_UTTERANCE_SECONDS = 15.0
+
+
+def frame_rms(frame):
+    """
+    Loudness of one frame
+
+    Args:
+        frame (bytes): 16-bit mono PCM
+
+    Returns:
+        float: Root mean square of the samples
+    """
+    samples = np.frombuffer(frame, dtype="<i2").astype(np.float32)
+    if not len(samples):
+        return 0.0
+    return float(np.sqrt(np.mean(samples * samples)))
+
+
+class NoiseFloor:
+    """
+    Running estimate of the background noise level
+
+    It follows quieter frames quickly and louder ones slowly, so a door
+    slam or a cough barely moves it while a fan switching off is picked
+    up within a second. Only frames outside speech should be fed to it.
+    """
+
+    def __init__(self, fall=0.1, rise=0.01):
+        self.fall = fall
+        self.rise = rise
+        self.level = None
+
+    def update(self, rms):
+        if self.level is None:
+            self.level = rms
+        else:
+            rate = self.fall if rms < self.level else self.rise
+            self.level += rate * (rms - self.level)
+        return self.level
+
+
+class EnergyGate:
+    """
+    Energy voice activity detector over a stream of fixed-size frames
+
+    feed() reports "start" when speech begins, "end" when it is over and
+    None otherwise. Between the two, utterance holds the frames of the
+    utterance, starting with the pre-roll.
+    """
+
+    def __init__(self, frame_seconds=FRAME_SECONDS, noise=None):
+        self.frame_seconds = frame_seconds
+        self.noise = noise or NoiseFloor()
+        self.in_speech = False
+        self.utterance = []
+        self._pre_roll = deque(maxlen=max(1, int(PRE_ROLL_SECONDS / frame_seconds)))
+        self._loud_frames = 0
+        self._quiet_frames = 0
+        self._end_frames = max(1, int(VAD_END_SECONDS / frame_seconds))
+        self._max_frames = int(MAX_UTTERANCE_SECONDS / frame_seconds)
+
+    def reset(self):
+        """Forget the audio so far, keeping the noise floor, e.g. after the capture was paused"""
+        self.in_speech = False
+        self.utterance = []
+        self._pre_roll.clear()
+        self._loud_frames = 0
+        self._quiet_frames = 0
+
+    def threshold(self, ratio):
+        return max(MIN_SPEECH_RMS, (self.noise.level or 0.0) * ratio)
+
+    def feed(self, frame):
+        """
+        Process the next frame
+
+        Args:
+            frame (bytes): 16-bit mono PCM
+
+        Returns:
+            str: "start", "end" or None
+        """
+        rms = frame_rms(frame)
+        if not self.in_speech:
+            self._pre_roll.append(frame)
+            if self.noise.level is not None and rms > self.threshold(VAD_START_RATIO):
+                self._loud_frames += 1
+                if self._loud_frames >= VAD_START_FRAMES:
+                    self.in_speech = True
+                    self._quiet_frames = 0
+                    self.utterance = list(self._pre_roll)
+                    self._pre_roll.clear()
+                    return "start"
+            else:
+                self._loud_frames = 0
+                self.noise.update(rms)
+            return None
+
+        self.utterance.append(frame)
+        if rms > self.threshold(VAD_END_RATIO):
+            self._quiet_frames = 0
+        else:
+            self._quiet_frames += 1
+        if self._quiet_frames >= self._end_frames or len(self.utterance) >= self._max_frames:
+            self.in_speech = False
+            self._loud_frames = 0
+            return "end"
+        return None
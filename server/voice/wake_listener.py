@@ -0,0 +1,247 @@
+import os
+import queue
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import speech_recognition as sr
+from dotenv import load_dotenv
+from google.cloud import speech
+
+from monitoring.metrics import registry
+from voice.vad import FRAME_SECONDS, VAD_START_FRAMES, EnergyGate
+
+try:
+    # Optional local wake word detection
+    from openwakeword.model import Model as WakeWordModel
+except ImportError:
+    WakeWordModel = None
+
+# Load environment variables
+load_dotenv()
+
+MIC_SAMPLE_RATE = int(os.getenv('MIC_SAMPLE_RATE', '16000'))
+# Commands start with this word; empty makes any speech a command
+WAKE_WORD = os.getenv('WAKE_WORD', 'jarvis').strip().lower()
+# An openWakeWord model, e.g. "hey_jarvis", detects the wake word locally so
+# only what follows it is streamed; without one the wake word is looked for
+# in the transcript of every utterance
+WAKE_WORD_MODEL = os.getenv('WAKE_WORD_MODEL', '')
+WAKE_WORD_THRESHOLD = float(os.getenv('WAKE_WORD_THRESHOLD', '0.5'))
+# After the wake word, the command may start within this long
+WAKE_WINDOW_SECONDS = 3.0
+# openWakeWord scores 80ms of 16kHz audio at a time
+WAKE_WORD_CHUNK_SAMPLES = 1280
+
+activations_total = registry.counter("wake_activations_total", "Utterances streamed to speech recognition, by result",
+                                     ("result",))
+
+
+class Utterance:
+    """A recognized command, with the timings of its start"""
+
+    def __init__(self, transcript, started, vad_seconds, stt_seconds):
+        self.transcript = transcript
+        # perf_counter time the speech began
+        self.started = started
+        # From the first voiced frame until the gate opened
+        self.vad_seconds = vad_seconds
+        # From the end of the speech until the final transcript
+        self.stt_seconds = stt_seconds
+
+
+class WakeListener:
+    """
+    Always-open microphone with a local gate in front of cloud speech recognition
+
+    The microphone stream and the Speech client are opened once. Each
+    listen() reads 30ms frames through an energy voice activity detector
+    whose noise floor adapts continuously, so there is no calibration
+    pause. Audio is streamed to Google Speech-to-Text only while the gate
+    is open. Idle listening costs one RMS per frame and no network.
+    """
+
+    def __init__(self, sample_rate=MIC_SAMPLE_RATE, wake_word=WAKE_WORD, wake_word_model=WAKE_WORD_MODEL):
+        self.sample_rate = sample_rate
+        self.frame_samples = int(sample_rate * FRAME_SECONDS)
+        self.wake_word = wake_word
+        self.wake_word_model = wake_word_model
+        self.gate = EnergyGate()
+        self._microphone = None
+        self._source = None
+        self._client = None
+        self._spotter = None
+        self._spot_buffer = b""
+        self._woke_at = None
+        # Runs the streaming recognition while the capture loop keeps reading
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="speech-stream")
+        self._config = speech.StreamingRecognitionConfig(
+            config=speech.RecognitionConfig(
+                encoding=speech.RecognitionConfig.AudioEncoding.LINEAR16,
+                sample_rate_hertz=sample_rate,
+                language_code="en-US",
+                enable_automatic_punctuation=True,
+                model="default",
+                use_enhanced=True,
+                audio_channel_count=1,
+            ),
+            interim_results=False,
+        )
+
+    def open(self):
+        """Open the microphone, the Speech client and the wake word model, once"""
+        if self._source is not None:
+            return
+        if self.wake_word_model:
+            if WakeWordModel is None:
+                print("WAKE_WORD_MODEL is set but openwakeword is not installed; checking transcripts instead")
+            else:
+                self._spotter = WakeWordModel(wakeword_models=[self.wake_word_model])
+        self._client = speech.SpeechClient()
+        self._microphone = sr.Microphone(sample_rate=self.sample_rate, chunk_size=self.frame_samples)
+        self._source = self._microphone.__enter__()
+
+    def close(self):
+        """Release the microphone"""
+        if self._source is not None:
+            self._microphone.__exit__(None, None, None)
+            self._source = None
+        self._executor.shutdown(wait=False)
+
+    def _discard_buffered(self):
+        # Audio captured while nobody was listening, e.g. the assistant's own answer
+        stream = getattr(self._source.stream, "pyaudio_stream", None)
+        if stream is not None:
+            available = stream.get_read_available()
+            if available:
+                stream.read(available, exception_on_overflow=False)
+        self.gate.reset()
+        self._spot_buffer = b""
+
+    def _heard_wake_word(self, frame):
+        self._spot_buffer += frame
+        if len(self._spot_buffer) < WAKE_WORD_CHUNK_SAMPLES * 2:
+            return False
+        chunk, self._spot_buffer = self._spot_buffer, b""
+        scores = self._spotter.predict(np.frombuffer(chunk, dtype="<i2"))
+        return max(scores.values(), default=0.0) >= WAKE_WORD_THRESHOLD
+
+    def _awake(self, require_wake_word):
+        if not require_wake_word or not self.wake_word or self._spotter is None:
+            # Without a local detector the wake word is checked in the transcript
+            return True
+        return self._woke_at is not None and time.perf_counter() - self._woke_at <= WAKE_WINDOW_SECONDS
+
+    def _recognize_stream(self, frames):
+        """Stream frames from the queue until None and return the final transcript"""
+        def requests():
+            while True:
+                frame = frames.get()
+                if frame is None:
+                    return
+                yield speech.StreamingRecognizeRequest(audio_content=frame)
+
+        parts = []
+        for response in self._client.streaming_recognize(self._config, requests()):
+            for result in response.results:
+                if result.is_final and result.alternatives:
+                    parts.append(result.alternatives[0].transcript.strip())
+        return " ".join(part for part in parts if part)
+
+    def _strip_wake_word(self, transcript):
+        """
+        The command after the wake word, "" for the wake word alone, or None without it
+
+        The wake word may come within the first few words, e.g. "hey Jarvis".
+        """
+        words = transcript.split()
+        for index, word in enumerate(words[:3]):
+            if re.sub(r"[^\w']", "", word.lower()) == self.wake_word:
+                return " ".join(words[index + 1:]).lstrip(",.!? ")
+        return None
+
+    def listen(self, require_wake_word=True):
+        """
+        Wait for the next command
+
+        Args:
+            require_wake_word (bool): False for answers to the assistant's questions
+
+        Returns:
+            Utterance: The command, or None if the microphone failed
+        """
+        try:
+            self.open()
+            self._discard_buffered()
+        except Exception as e:
+            print(f"Error opening microphone: {str(e)}")
+            return None
+
+        frames = None
+        future = None
+        started = None
+        vad_seconds = 0.0
+        try:
+            while True:
+                frame = self._source.stream.read(self.frame_samples)
+                event = self.gate.feed(frame)
+
+                if self._spotter is not None and frames is None and self._heard_wake_word(frame):
+                    self._woke_at = time.perf_counter()
+                    if self.gate.in_speech and event != "start":
+                        # "Jarvis, ..." in one breath: stream what follows the wake word
+                        vad_seconds = self._woke_at - started
+                        frames = queue.Queue()
+                        future = self._executor.submit(self._recognize_stream, frames)
+                        continue
+
+                if event == "start":
+                    started = time.perf_counter() - VAD_START_FRAMES * FRAME_SECONDS
+                    if self._awake(require_wake_word):
+                        vad_seconds = time.perf_counter() - started
+                        frames = queue.Queue()
+                        for buffered in self.gate.utterance:
+                            frames.put(buffered)
+                        future = self._executor.submit(self._recognize_stream, frames)
+                    continue
+                if frames is None:
+                    continue
+
+                frames.put(frame)
+                if event != "end":
+                    continue
+                frames.put(None)
+                ended = time.perf_counter()
+                transcript = future.result()
+                stt_seconds = time.perf_counter() - ended
+                frames = None
+
+                if not transcript:
+                    activations_total.inc(result="no_speech")
+                    continue
+                if require_wake_word and self.wake_word and self._spotter is None:
+                    command = self._strip_wake_word(transcript)
+                    if command is None:
+                        activations_total.inc(result="no_wake_word")
+                        print(f"Ignored (no wake word): {transcript}")
+                        continue
+                    if not command:
+                        # The wake word alone; the command comes next
+                        print("Listening... (Speak now)")
+                        require_wake_word = False
+                        continue
+                    transcript = command
+                activations_total.inc(result="command")
+                self._woke_at = None
+                print(f"Successfully transcribed: {transcript}")
+                return Utterance(transcript, started, vad_seconds, stt_seconds)
+        except Exception as e:
+            print(f"Error: {str(e)}")
+            if frames is not None:
+                frames.put(None)
+            return None
+
+
+# Shared by main.py and spoken follow-up answers
+wake_listener = WakeListener()